@@ -0,0 +1,133 @@
+"""Activity ledger, corporate hierarchy and EPA facility store tables
+
+Revision ID: 0002_ledger_hierarchy_epa_tables
+Revises: 0001_initial_tables
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002_ledger_hierarchy_epa_tables'
+down_revision = '0001_initial_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create activity_ledger table (one row per facility-month activity line)
+    op.create_table('activity_ledger',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('company', sa.String(), nullable=False),
+        sa.Column('facility', sa.String(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Integer(), nullable=False),
+        sa.Column('activity_key', sa.String(), nullable=False),
+        sa.Column('scope', sa.String(), nullable=False),
+        sa.Column('fuel_type', sa.String(), nullable=True),
+        sa.Column('unit', sa.String(), nullable=True),
+        sa.Column('grid_region', sa.String(), nullable=True),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('factor', sa.Float(), nullable=False),
+        sa.Column('emissions_kg', sa.Float(), nullable=False),
+        sa.Column('factors_version', sa.String(), nullable=False),
+        sa.Column('revision', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('company', 'facility', 'year', 'month', 'activity_key', name='uq_activity_ledger_line')
+    )
+    op.create_index('ix_activity_ledger_company', 'activity_ledger', ['company'])
+
+    # Create ledger_facility_month table
+    op.create_table('ledger_facility_month',
+        sa.Column('company', sa.String(), nullable=False),
+        sa.Column('facility', sa.String(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Integer(), nullable=False),
+        sa.Column('scope1_emissions_kg', sa.Float(), nullable=False),
+        sa.Column('scope2_emissions_kg', sa.Float(), nullable=False),
+        sa.Column('emissions_kg', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('company', 'facility', 'year', 'month')
+    )
+
+    # Create ledger_company_year table
+    op.create_table('ledger_company_year',
+        sa.Column('company', sa.String(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('scope1_emissions_kg', sa.Float(), nullable=False),
+        sa.Column('scope2_emissions_kg', sa.Float(), nullable=False),
+        sa.Column('emissions_kg', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('company', 'year')
+    )
+
+    # Create corporate_entities table (reporting group hierarchy)
+    op.create_table('corporate_entities',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('group_id', sa.String(), nullable=False),
+        sa.Column('parent_id', sa.String(), nullable=True),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('ownership_pct', sa.Float(), nullable=False),
+        sa.Column('scope1_emissions_kg', sa.Float(), nullable=False),
+        sa.Column('scope2_emissions_kg', sa.Float(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_corporate_entities_group_id', 'corporate_entities', ['group_id'])
+    op.create_index('ix_corporate_entities_parent_id', 'corporate_entities', ['parent_id'])
+
+    # Create epa_facilities table (local EPA registry store)
+    op.create_table('epa_facilities',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('source_id', sa.String(), nullable=False),
+        sa.Column('facility_name', sa.String(), nullable=False),
+        sa.Column('parent_company', sa.String(), nullable=True),
+        sa.Column('state', sa.String(2), nullable=True),
+        sa.Column('city', sa.String(), nullable=True),
+        sa.Column('county', sa.String(), nullable=True),
+        sa.Column('zip_code', sa.String(), nullable=True),
+        sa.Column('latitude', sa.Float(), nullable=True),
+        sa.Column('longitude', sa.Float(), nullable=True),
+        sa.Column('content_hash', sa.String(40), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_epa_facilities_state', 'epa_facilities', ['state'])
+    op.create_index('ix_epa_facilities_state_name', 'epa_facilities', ['state', 'facility_name'])
+
+    # Create epa_sync_checkpoints table (Envirofacts bulk sync progress)
+    op.create_table('epa_sync_checkpoints',
+        sa.Column('table_name', sa.String(), nullable=False),
+        sa.Column('state', sa.String(2), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('mode', sa.String(), nullable=True),
+        sa.Column('next_row', sa.Integer(), nullable=False),
+        sa.Column('total_rows', sa.Integer(), nullable=True),
+        sa.Column('inserted', sa.Integer(), nullable=False),
+        sa.Column('updated', sa.Integer(), nullable=False),
+        sa.Column('unchanged', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_full_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('table_name', 'state')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('epa_sync_checkpoints')
+    op.drop_index('ix_epa_facilities_state_name', 'epa_facilities')
+    op.drop_index('ix_epa_facilities_state', 'epa_facilities')
+    op.drop_table('epa_facilities')
+    op.drop_index('ix_corporate_entities_parent_id', 'corporate_entities')
+    op.drop_index('ix_corporate_entities_group_id', 'corporate_entities')
+    op.drop_table('corporate_entities')
+    op.drop_table('ledger_company_year')
+    op.drop_table('ledger_facility_month')
+    op.drop_index('ix_activity_ledger_company', 'activity_ledger')
+    op.drop_table('activity_ledger')
@@ -13,6 +13,7 @@ from .sec_compliance_agent import SECComplianceAgent
 from .epa_validation_agent import EPAValidationAgent
 from .audit_trail_agent import AuditTrailAgent
 from .data_quality_agent import DataQualityAgent
+from ..services.computation_context import ComputationContext
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +43,9 @@ class AgentManager:
             "recommendations": []
         }
         
+        # One computation context per workflow: validation/emissions are shared across agents
+        ctx = ComputationContext()
+
         try:
             logger.info(f"Starting full compliance workflow for company: {data.get('company')}")
             
@@ -52,12 +56,12 @@ class AgentManager:
             
             # Step 2: EPA Validation
             logger.info("Step 2: Running EPA validation")
-            epa_result = await self.agents["epa_validation"].process(data, db=db)
+            epa_result = await self.agents["epa_validation"].process(data, db=db, ctx=ctx)
             workflow_result["results"]["epa_validation"] = epa_result
             
             # Step 3: SEC Compliance Analysis
             logger.info("Step 3: Running SEC compliance analysis")
-            sec_result = await self.agents["sec_compliance"].process(data, db=db)
+            sec_result = await self.agents["sec_compliance"].process(data, db=db, ctx=ctx)
             workflow_result["results"]["sec_compliance"] = sec_result
             
             # Step 4: Audit Trail Creation
@@ -85,6 +89,7 @@ class AgentManager:
             
             # Step 6: Compile Recommendations
             workflow_result["recommendations"] = self._compile_recommendations(workflow_result["results"])
+            workflow_result["computation"] = ctx.stats()
             
             logger.info("Full compliance workflow completed successfully")
             
@@ -106,11 +111,12 @@ class AgentManager:
             "results": {}
         }
         
+        ctx = ComputationContext()
         try:
             for agent_name in agents:
                 if agent_name in self.agents:
                     logger.info(f"Running {agent_name} agent")
-                    agent_result = await self.agents[agent_name].process(data, db=db)
+                    agent_result = await self.agents[agent_name].process(data, db=db, ctx=ctx)
                     result["results"][agent_name] = agent_result
                 else:
                     logger.warning(f"Unknown agent: {agent_name}")
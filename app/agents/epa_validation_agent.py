@@ -38,7 +38,7 @@ class EPAValidationAgent(BaseAgent):
             self.log_action("epa_validation_start", {"company": data.get("company")})
             
             # Step 1: EPA cross-validation
-            validation_result = cross_validate_epa(data, db=db, state=state, year=year)
+            validation_result = cross_validate_epa(data, db=db, state=state, year=year, ctx=kwargs.get("ctx"))
             
             # Step 2: Enhanced confidence analysis
             enhanced_confidence = await self.confidence_analyzer.analyze_confidence(
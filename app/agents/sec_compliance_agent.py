@@ -9,7 +9,7 @@ from typing import Dict, Any, Optional, List
 from sqlalchemy.orm import Session
 
 from .base_agent import BaseAgent
-from ..services.emissions_calculator import calculate_emissions
+from ..services.computation_context import ComputationContext
 from ..services.validation_service import cross_validate_epa
 from ..services.sec_exporter import build_and_upload_sec_package
 from ..services.audit_service import create_audit_entry
@@ -34,17 +34,19 @@ class SECComplianceAgent(BaseAgent):
         4. Create audit trail
         """
         db: Optional[Session] = kwargs.get("db")
+        # Shared memo so emissions/validation are computed once across all steps
+        ctx: ComputationContext = kwargs.get("ctx") or ComputationContext()
         
         try:
             self.validate_input(data, ["company", "scope1", "scope2"])
             self.log_action("sec_compliance_start", {"company": data.get("company")})
             
             # Step 1: Calculate emissions
-            emissions_result = calculate_emissions(data)
+            emissions_result = ctx.calculate_emissions(data)
             self.log_action("emissions_calculated", {"total_kg": emissions_result["totals"]["emissions_kg"]})
             
             # Step 2: EPA validation with confidence scoring
-            validation_result = cross_validate_epa(data, db=db)
+            validation_result = cross_validate_epa(data, db=db, ctx=ctx)
             confidence_score = validation_result.get("confidence_analysis", {})
             
             # Step 3: Deviation detection
@@ -58,7 +60,8 @@ class SECComplianceAgent(BaseAgent):
                 sec_package = build_and_upload_sec_package(
                 company=data["company"],
                 payload=data,
-                db=db
+                db=db,
+                ctx=ctx
             )
                 self.log_action("sec_package_generated")
             
@@ -86,7 +89,8 @@ class SECComplianceAgent(BaseAgent):
                 "confidence": confidence_score,
                 "deviations": deviations,
                 "sec_package": sec_package,
-                "recommendations": self._generate_recommendations(confidence_score, deviations)
+                "recommendations": self._generate_recommendations(confidence_score, deviations),
+                "computation": ctx.stats()
             }
             
             self.log_action("sec_compliance_completed", {"confidence_score": confidence_score.get("score")})
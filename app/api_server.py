@@ -16,6 +16,10 @@ async def lifespan(app: FastAPI):
     # Startup code
     from app.models.database import create_tables
     create_tables()
+    # Replay audit entries spooled by a previous run before taking traffic
+    from app.services.audit_buffer import get_audit_buffer, shutdown_audit_buffer
+    if settings.AUDIT_WRITE_BEHIND:
+        get_audit_buffer()
     
     port = settings.PORT # Use settings for port
     print("="*60)
@@ -47,8 +51,8 @@ async def lifespan(app: FastAPI):
     
     yield
     
-    # Shutdown code (if needed)
-    pass
+    # Shutdown code: write out buffered audit entries
+    shutdown_audit_buffer()
 
 app = FastAPI(
     title="Envoyou SEC Compliance API",
@@ -92,6 +96,8 @@ from app.routes.emissions import router as emissions_router
 from app.routes.validation import router as validation_router
 from app.routes.admin_mapping import router as admin_mapping_router
 from app.routes.emissions_factors import router as emissions_factors_router
+from app.routes.emissions_ledger import router as emissions_ledger_router
+from app.routes.hierarchy import router as hierarchy_router
 from app.routes.user_extended import router as user_extended_router
 from app.routes.agents import router as agents_router
 from app.routes.recaptcha import router as recaptcha_router
@@ -236,6 +242,8 @@ app.include_router(audit_trail_router, prefix="/v1/audit")
 app.include_router(export_router, prefix="/v1/export")
 app.include_router(emissions_router, prefix="/v1/emissions")
 app.include_router(emissions_factors_router, prefix="/v1/emissions")
+app.include_router(emissions_ledger_router, prefix="/v1/emissions")
+app.include_router(hierarchy_router, prefix="/v1/emissions")
 app.include_router(validation_router, prefix="/v1/validation")
 app.include_router(admin_mapping_router, prefix="/v1/admin")
 app.include_router(user_extended_router, prefix="/v1/user")
@@ -77,4 +77,15 @@ class CAMDClient:
         }
         return self._make_request(endpoint, params)
 
+    def get_annual_emissions_page(self, year: int, page: int = 1, per_page: int = 1000) -> Optional[List[Dict[str, Any]]]:
+        """
+        Mengambil satu halaman data emisi tahunan untuk semua fasilitas
+        (dipakai untuk mengisi mirror CAMPD lokal).
+        """
+        return self._make_request("/apportioned/annual", {"year": year, "page": page, "perPage": per_page})
+
+    def get_compliance_page(self, year: int, page: int = 1, per_page: int = 1000) -> Optional[List[Dict[str, Any]]]:
+        """Mengambil satu halaman data kepatuhan tahunan untuk semua fasilitas."""
+        return self._make_request("/compliance/annual", {"year": year, "page": page, "perPage": per_page})
+
 __all__ = ["CAMDClient"]
\ No newline at end of file
@@ -5,18 +5,51 @@ import logging
 from typing import Any, Dict, List, Optional, Tuple
 from functools import lru_cache
 
-from openpyxl import load_workbook  # type: ignore
+import numpy as np
 
+from app.clients.edgar_store import EdgarTable, load_edgar_table
+from app.utils.geo import LatLonGridIndex
 from app.utils.mappings import normalize_country_name
 
 logger = logging.getLogger(__name__)
 
+# Urban-centre attribute columns, first match wins (case-insensitive)
+UC_ID_COLUMNS = ("ID_UC_G0", "ID_HDC_G0", "UC_ID")
+UC_NAME_COLUMNS = ("UC_NM_MN", "UC_name", "UC_NM_LST")
+UC_LAT_COLUMNS = ("GCPNT_LAT", "UC_lat", "latitude", "lat")
+UC_LON_COLUMNS = ("GCPNT_LON", "UC_lon", "longitude", "lon")
+
+
+def series_trend(series: List[Dict[str, Any]], pollutant: str, window: int = 3) -> Dict[str, Any]:
+    """Simple trend over the last `window` points of an ascending [{year, value}] series."""
+    if len(series) < 2:
+        return {"pollutant": pollutant, "slope": 0.0, "increase": False, "years": []}
+    sel = series[-window:] if len(series) >= window else series
+    slope = float(sel[-1]["value"] - sel[0]["value"])  # simple delta
+    return {
+        "pollutant": pollutant,
+        "slope": slope,
+        "increase": slope > 0.0,
+        "years": [r["year"] for r in sel],
+    }
+
+
+def _uc_id(value: Any) -> str:
+    # numeric ids come back from the columnar table as floats
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value).strip()
+
 
 class EDGARClient:
     """Loader for EDGAR UCDB emissions Excel (EDGAR_emiss_on_UCDB_2024.xlsx).
 
     Provides aggregation to country-year totals per pollutant by summing all
-    Urban Centre (UC) rows for the same UC_country across sectors.
+    Urban Centre (UC) rows for the same UC_country across sectors, plus the
+    per-UC series and a nearest-UC lookup by lat/lon.
+
+    The workbook is read through the columnar cache in edgar_store, so only
+    the first process after a workbook change pays for the openpyxl parse.
 
     Notes:
       - Pollutants available include CO2, GWP_100_AR5_GHG, PM2.5, NOx.
@@ -24,7 +57,7 @@ class EDGARClient:
       - Granularity is urban; totals reflect urban emissions only.
     """
 
-    # Global cache shared across instances: key -> {agg_by_country, header, colmap, country_col_idx}
+    # Global cache shared across instances: key -> {totals, present, urban, country_index, pollutant_cols, header, colmap, country_col_idx}
     _GLOBAL_CACHE: Dict[str, Dict[str, Any]] = {}
 
     def __init__(self, xlsx_path: Optional[str] = None) -> None:
@@ -38,7 +71,11 @@ class EDGARClient:
         self._header: Optional[List[str]] = None
         self._colmap: Optional[Dict[Tuple[str, int], List[int]]] = None
         self._country_col_idx: Optional[int] = None
-        self._agg_by_country: Optional[Dict[str, Dict[str, Dict[int, float]]]] = None
+        self._country_index: Dict[str, int] = {}
+        self._pollutant_cols: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._totals: Optional[np.ndarray] = None  # countries x (pollutant, year)
+        self._present: Optional[np.ndarray] = None
+        self._urban: Dict[str, Any] = {}
 
     # ---- Internal helpers ----
     def _cache_key(self) -> str:
@@ -48,21 +85,6 @@ class EDGARClient:
             mtime = "na"
         return f"{self.xlsx_path}:{mtime}"
 
-    def _load_sheet(self):
-        if not os.path.exists(self.xlsx_path):
-            raise FileNotFoundError(f"EDGAR file not found: {self.xlsx_path}")
-        wb = load_workbook(self.xlsx_path, read_only=True, data_only=True)
-        # pick main data sheet
-        ws = None
-        for name in wb.sheetnames:
-            if name.strip() in ("EDGAR_emiss_on_UCDB_2024",):
-                ws = wb[name]
-                break
-        if ws is None:
-            # fallback to last sheet which often is the data sheet
-            ws = wb[wb.sheetnames[-1]]
-        return wb, ws
-
     def _parse_header(self, header_row: List[Any]) -> None:
         header = [str(c).strip() if c is not None else "" for c in header_row]
         self._header = header
@@ -95,76 +117,127 @@ class EDGARClient:
         self._colmap = colmap
 
     def _ensure_aggregated(self) -> None:
-        if self._agg_by_country is not None:
+        if self._totals is not None:
             return
         # Use global cache if available
         key = self._cache_key()
         cached = self._GLOBAL_CACHE.get(key)
-        if cached is not None:
-            self._agg_by_country = cached.get("agg_by_country")
-            self._header = cached.get("header")
-            self._colmap = cached.get("colmap")
-            self._country_col_idx = cached.get("country_col_idx")
-            return
+        if cached is None:
+            cached = self._aggregate(load_edgar_table(self.xlsx_path))
+            self._GLOBAL_CACHE[key] = cached
+        self._header = cached["header"]
+        self._colmap = cached["colmap"]
+        self._country_col_idx = cached["country_col_idx"]
+        self._country_index = cached["country_index"]
+        self._pollutant_cols = cached["pollutant_cols"]
+        self._totals = cached["totals"]
+        self._present = cached["present"]
+        self._urban = cached["urban"]
 
-        wb, ws = self._load_sheet()
-        try:
-            rows = ws.iter_rows(min_row=1, values_only=True)
-            try:
-                header = next(rows)
-            except StopIteration:
-                raise ValueError("EDGAR sheet is empty")
-            self._parse_header(list(header))
-            if self._colmap is None or self._country_col_idx is None:
-                raise ValueError("Failed to parse EDGAR header")
-
-            agg: Dict[str, Dict[str, Dict[int, float]]] = {}
-            for row in rows:
-                if row is None:
-                    continue
-                try:
-                    country = str(row[self._country_col_idx] or "").strip()
-                    # Normalize country name for consistent lookups
-                    country = normalize_country_name(country) or country
-                except Exception:
-                    country = ""
-                if not country:
-                    continue
-
-                # ensure country bucket
-                bucket = agg.setdefault(country, {})
-                # Sum per (pollutant, year) across sectors
-                for (pollutant, year), col_idxs in self._colmap.items():
-                    total = 0.0
-                    any_val = False
-                    for ci in col_idxs:
-                        try:
-                            v = row[ci]
-                            if isinstance(v, (int, float)):
-                                total += float(v)
-                                any_val = True
-                            elif isinstance(v, str) and v.strip() != "":
-                                total += float(v)
-                                any_val = True
-                        except Exception:
-                            continue
-                    if any_val:
-                        polmap = bucket.setdefault(pollutant, {})
-                        polmap[year] = polmap.get(year, 0.0) + total
-
-            self._agg_by_country = agg
-            # Save to global cache
-            self._GLOBAL_CACHE[key] = {
-                "agg_by_country": self._agg_by_country,
-                "header": self._header,
-                "colmap": self._colmap,
-                "country_col_idx": self._country_col_idx,
-            }
-        finally:
-            try:
-                wb.close()
-            except Exception:
-                pass
+    def _aggregate(self, table: EdgarTable) -> Dict[str, Any]:
+        """Country x (pollutant, year) totals from the value matrix.
+
+        Sector columns are folded into (pollutant, year) groups with one
+        matrix product against a 0/1 membership matrix, then urban-centre rows
+        are summed per country with np.add.at. A total exists only where at
+        least one underlying cell held a number (NaN marks empty cells). The
+        per-row totals are kept for urban-centre queries.
+        """
+        self._parse_header(list(table.header))
+        if self._colmap is None or self._country_col_idx is None:
+            raise ValueError("Failed to parse EDGAR header")
+        keys = sorted(self._colmap)
+        members = np.zeros((len(table.value_columns), len(keys)), dtype=np.float64)
+        for k, pol_year in enumerate(keys):
+            for ci in self._colmap[pol_year]:
+                pos = table.value_position(ci)
+                if pos is not None:
+                    members[pos, k] = 1.0
+
+        values = np.asarray(table.values)
+        filled = ~np.isnan(values)
+        row_totals = np.where(filled, values, 0.0) @ members
+        row_counts = filled.astype(np.float64) @ members
+
+        # Normalize each distinct country label once, not once per row
+        raw = table.column(self._header[self._country_col_idx]) if self._country_col_idx < len(self._header) else None
+        labels, inverse = np.unique(np.asarray(raw if raw is not None else np.empty(0), dtype=str), return_inverse=True)
+        names = [normalize_country_name(str(l).strip()) or str(l).strip() for l in labels]
+        countries = sorted({n for n in names if n})
+        country_index = {c: i for i, c in enumerate(countries)}
+        row_country = np.array([country_index.get(n, -1) for n in names], dtype=np.int64)[inverse] if len(labels) else np.empty(0, dtype=np.int64)
+        keep = row_country >= 0
+
+        totals = np.zeros((len(countries), len(keys)), dtype=np.float64)
+        counts = np.zeros((len(countries), len(keys)), dtype=np.float64)
+        np.add.at(totals, row_country[keep], row_totals[keep])
+        np.add.at(counts, row_country[keep], row_counts[keep])
+
+        pollutant_cols: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for k, (pollutant, year) in enumerate(keys):
+            pollutant_cols.setdefault(pollutant, ([], []))
+            pollutant_cols[pollutant][0].append(k)
+            pollutant_cols[pollutant][1].append(year)
+        return {
+            "urban": self._urban_centres(table, row_totals, row_counts > 0, names, inverse),
+            "header": self._header,
+            "colmap": self._colmap,
+            "country_col_idx": self._country_col_idx,
+            "country_index": country_index,
+            # keys are sorted, so each pollutant's columns are in ascending year order
+            "pollutant_cols": {p: (np.array(ks, dtype=np.int64), np.array(ys, dtype=np.int64)) for p, (ks, ys) in pollutant_cols.items()},
+            "totals": totals,
+            "present": counts > 0,
+        }
+
+    def _urban_centres(self, table: EdgarTable, row_totals: np.ndarray, row_present: np.ndarray,
+                       country_names: List[str], inverse: np.ndarray) -> Dict[str, Any]:
+        """Per-urban-centre totals (rows x (pollutant, year)) plus the lat/lon index, built once per workbook."""
+        def pick(candidates: Tuple[str, ...]) -> Optional[np.ndarray]:
+            return next((col for col in (table.column(c) for c in candidates) if col is not None), None)
+
+        ids = pick(UC_ID_COLUMNS)
+        lat, lon = pick(UC_LAT_COLUMNS), pick(UC_LON_COLUMNS)
+        id_labels = [_uc_id(v) if ids is not None else str(i) for i, v in enumerate(ids if ids is not None else range(table.rows))]
+        index = None
+        if lat is not None and lon is not None and lat.dtype.kind == "f" and lon.dtype.kind == "f":
+            index = LatLonGridIndex(np.asarray(lat), np.asarray(lon))
+        return {
+            "totals": row_totals,
+            "present": row_present,
+            "ids": id_labels,
+            "by_id": {uc: i for i, uc in enumerate(id_labels)},
+            "names": pick(UC_NAME_COLUMNS),
+            "countries": [country_names[j] for j in inverse] if len(country_names) else [None] * table.rows,
+            "lat": lat,
+            "lon": lon,
+            "index": index,
+        }
+
+    def _series_from(self, totals: np.ndarray, present: np.ndarray, pollutant: str) -> List[Dict[str, Any]]:
+        cols = self._pollutant_cols.get(pollutant)
+        if cols is None:
+            return []
+        ks, years = cols
+        mask = present[ks]
+        return [{"year": int(y), "value": float(v)} for y, v in zip(years[mask], totals[ks[mask]])]
+
+    def _series(self, normalized_country: str, pollutant: str) -> List[Dict[str, Any]]:
+        row = self._country_index.get(normalized_country)
+        if row is None:
+            return []
+        return self._series_from(self._totals[row], self._present[row], pollutant)
+
+    def _urban_centre_info(self, row: int) -> Dict[str, Any]:
+        urban = self._urban
+        info: Dict[str, Any] = {"id": urban["ids"][row], "name": None, "country": urban["countries"][row] or None, "lat": None, "lon": None}
+        if urban["names"] is not None:
+            info["name"] = str(urban["names"][row]) or None
+        for key in ("lat", "lon"):
+            col = urban[key]
+            if col is not None and col.dtype.kind == "f" and np.isfinite(col[row]):
+                info[key] = float(col[row])
+        return info
 
     # ---- Public API ----
     def get_country_series(self, country: str, pollutant: str) -> List[Dict[str, Any]]:
@@ -178,30 +251,76 @@ class EDGARClient:
             return []
             
         self._ensure_aggregated()
-        series: List[Dict[str, Any]] = []
-        agg = self._agg_by_country or {}
-        data = (agg.get(normalized_country) or {}).get(pollutant) or {}
-        for y, v in data.items():
-            series.append({"year": int(y), "value": float(v)})
-        series.sort(key=lambda r: r["year"])  # ascending
-        return series
+        return self._series(normalized_country, pollutant)
+
+    def get_countries_series(self, countries: List[str], pollutants: List[str]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """Series for every country x pollutant pair in one call.
+
+        Returns {country: {pollutant: [{year, value}]}} keyed by the names as
+        given; unknown countries or pollutants map to empty series.
+        """
+        self._ensure_aggregated()
+        out: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for country in countries:
+            normalized_country = normalize_country_name(country) if country else None
+            out[country] = {p: self._series(normalized_country, p) if normalized_country else [] for p in pollutants}
+        return out
+
+    def list_countries(self) -> List[str]:
+        """Normalized country names present in the workbook."""
+        self._ensure_aggregated()
+        return list(self._country_index)
+
+    def list_pollutants(self) -> List[str]:
+        self._ensure_aggregated()
+        return sorted(self._pollutant_cols)
+
+    def list_urban_centres(self, country: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Urban centres ({id, name, country, lat, lon}), optionally limited to one country."""
+        self._ensure_aggregated()
+        wanted = normalize_country_name(country) if country else None
+        return [self._urban_centre_info(i) for i, c in enumerate(self._urban["countries"]) if wanted is None or c == wanted]
+
+    def get_urban_centre_series(self, uc_id: Any, pollutants: List[str]) -> Optional[Dict[str, Any]]:
+        """Series for one urban centre: {"urban_centre": {...}, "series": {pollutant: [{year, value}]}}; None if unknown."""
+        self._ensure_aggregated()
+        row = self._urban["by_id"].get(_uc_id(uc_id))
+        if row is None:
+            return None
+        totals, present = self._urban["totals"][row], self._urban["present"][row]
+        return {
+            "urban_centre": self._urban_centre_info(row),
+            "series": {p: self._series_from(totals, present, p) for p in pollutants},
+        }
+
+    def nearest_urban_centres(self, lat: float, lon: float, *, k: int = 1, max_km: Optional[float] = None,
+                              pollutants: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """The k urban centres closest to (lat, lon), closest first, each with distance_km.
+
+        Served from a grid index built when the workbook is loaded; empty when
+        the workbook has no coordinate columns. With `pollutants`, each entry
+        also carries that centre's series.
+        """
+        self._ensure_aggregated()
+        index = self._urban["index"]
+        if index is None:
+            return []
+        out = []
+        for row, dist in index.nearest(lat, lon, k=k, max_km=max_km):
+            entry = self._urban_centre_info(row)
+            entry["distance_km"] = round(dist, 3)
+            if pollutants:
+                totals, present = self._urban["totals"][row], self._urban["present"][row]
+                entry["series"] = {p: self._series_from(totals, present, p) for p in pollutants}
+            out.append(entry)
+        return out
 
     def compute_country_trend(self, country: str, pollutant: str = "PM2.5", window: int = 3) -> Dict[str, Any]:
         """Compute simple trend over the last `window` points for a pollutant.
 
         Returns {"pollutant": pollutant, "slope": float, "increase": bool, "years": [..]}
         """
-        series = self.get_country_series(country, pollutant)
-        if len(series) < 2:
-            return {"pollutant": pollutant, "slope": 0.0, "increase": False, "years": []}
-        sel = series[-window:] if len(series) >= window else series
-        slope = float(sel[-1]["value"] - sel[0]["value"])  # simple delta
-        return {
-            "pollutant": pollutant,
-            "slope": slope,
-            "increase": slope > 0.0,
-            "years": [r["year"] for r in sel],
-        }
+        return series_trend(self.get_country_series(country, pollutant), pollutant, window=window)
 
     # Backward/explicit helper name requested in requirements
     def get_country_emissions_trend(self, country: str, pollutant: str = "PM2.5", window: int = 3) -> Dict[str, Any]:
@@ -212,4 +331,4 @@ class EDGARClient:
         return self.compute_country_trend(country, pollutant=pollutant, window=window)
 
 
-__all__ = ["EDGARClient"]
+__all__ = ["EDGARClient", "series_trend"]
@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook  # type: ignore
+
+from app.config import settings
+
+try:  # advisory lock so concurrent workers convert the workbook once
+    import fcntl
+except ImportError:  # non-POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+SHEET_NAME = "EDGAR_emiss_on_UCDB_2024"
+
+# Opened tables keyed by cache entry name (source path + mtime + size)
+_TABLES: Dict[str, "EdgarTable"] = {}
+_TABLES_LOCK = threading.Lock()
+
+
+@dataclass
+class EdgarTable:
+    """The UCDB data sheet in columnar form: one row per urban centre.
+
+    `values` is a (rows x EMI columns) float64 matrix (NaN where the workbook
+    cell is empty or not numeric); other columns are split into a float64
+    `numeric` matrix and a unicode `text` matrix. On disk each matrix is a
+    .npy file opened with mmap_mode="r", so every worker shares the same
+    pages through the OS page cache.
+    """
+
+    header: List[str]
+    values: np.ndarray
+    value_columns: List[int]
+    numeric: np.ndarray
+    numeric_columns: List[int]
+    text: np.ndarray
+    text_columns: List[int]
+    source: Optional[str] = None
+    _positions: Dict[int, tuple] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self) -> None:
+        for kind, cols in (("values", self.value_columns), ("numeric", self.numeric_columns), ("text", self.text_columns)):
+            for pos, idx in enumerate(cols):
+                self._positions[idx] = (kind, pos)
+
+    @property
+    def rows(self) -> int:
+        return int(self.values.shape[0])
+
+    def value_position(self, header_idx: int) -> Optional[int]:
+        """Column of `values` holding header column `header_idx` (None for non-EMI columns)."""
+        kind, pos = self._positions.get(header_idx, (None, None))
+        return pos if kind == "values" else None
+
+    def column(self, name: str) -> Optional[np.ndarray]:
+        """A column by header name (case-insensitive), or None when absent."""
+        wanted = name.strip().lower()
+        idx = next((i for i, h in enumerate(self.header) if h.lower() == wanted), None)
+        if idx is None or idx not in self._positions:
+            return None
+        kind, pos = self._positions[idx]
+        return getattr(self, kind)[:, pos]
+
+
+def _source_stamp(xlsx_path: str) -> Dict[str, Any]:
+    st = os.stat(xlsx_path)
+    return {"path": os.path.abspath(xlsx_path), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def cache_entry_name(xlsx_path: str) -> str:
+    """Directory name of the converted table: workbook stem + hash of path, mtime and size."""
+    stamp = _source_stamp(xlsx_path)
+    digest = hashlib.sha1(f"{FORMAT_VERSION}:{stamp['path']}:{stamp['mtime_ns']}:{stamp['size']}".encode("utf-8")).hexdigest()[:16]
+    return f"{os.path.splitext(os.path.basename(xlsx_path))[0]}-{digest}"
+
+
+def _cache_dir(cache_dir: Optional[str]) -> Optional[str]:
+    return cache_dir or os.getenv("EDGAR_CACHE_DIR") or getattr(settings, "EDGAR_CACHE_DIR", None) or None
+
+
+def _read_sheet(xlsx_path: str) -> tuple:
+    wb = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        ws = next((wb[n] for n in wb.sheetnames if n.strip() == SHEET_NAME), None)
+        if ws is None:
+            # fallback to last sheet which often is the data sheet
+            ws = wb[wb.sheetnames[-1]]
+        rows = ws.iter_rows(min_row=1, values_only=True)
+        try:
+            header = [str(c).strip() if c is not None else "" for c in next(rows)]
+        except StopIteration:
+            raise ValueError("EDGAR sheet is empty")
+        body = [r for r in rows if r is not None]
+    finally:
+        try:
+            wb.close()
+        except Exception:
+            pass
+    return header, body
+
+
+def _cell(v: Any) -> Any:
+    if isinstance(v, str):
+        return v.strip() or None
+    return v
+
+
+def _to_numeric(cells: pd.Series) -> pd.Series:
+    # Same rule as a per-cell float(): numbers and numeric strings count, anything else is missing
+    return pd.to_numeric(cells.map(_cell), errors="coerce").astype(np.float64)
+
+
+def convert_workbook(xlsx_path: str) -> EdgarTable:
+    """Parse the workbook with openpyxl into an in-memory EdgarTable (the slow path)."""
+    header, body = _read_sheet(xlsx_path)
+    frame = pd.DataFrame.from_records(body, columns=range(len(header)), coerce_float=False) if body else pd.DataFrame(columns=range(len(header)))
+    frame = frame.reindex(columns=range(len(header)))
+    n = len(frame)
+
+    value_cols = [i for i, h in enumerate(header) if h.startswith("EMI_")]
+    values = np.empty((n, len(value_cols)), dtype=np.float64)
+    for pos, idx in enumerate(value_cols):
+        values[:, pos] = _to_numeric(frame[idx]).to_numpy()
+
+    numeric_cols: List[int] = []
+    numeric: List[np.ndarray] = []
+    text_cols: List[int] = []
+    text: List[np.ndarray] = []
+    skip = set(value_cols)
+    for idx in (i for i in range(len(header)) if i not in skip):
+        cells = frame[idx]
+        parsed = _to_numeric(cells)
+        present = cells.map(lambda v: bool(pd.notna(_cell(v))))
+        if present.any() and parsed[present].notna().all():
+            numeric_cols.append(idx)
+            numeric.append(parsed.to_numpy())
+        else:
+            text_cols.append(idx)
+            text.append(np.array([str(v).strip() if p else "" for v, p in zip(cells, present)], dtype=str))
+
+    return EdgarTable(
+        header=header,
+        values=values,
+        value_columns=value_cols,
+        numeric=np.column_stack(numeric) if numeric else np.empty((n, 0), dtype=np.float64),
+        numeric_columns=numeric_cols,
+        text=np.column_stack(text) if text else np.empty((n, 0), dtype=str),
+        text_columns=text_cols,
+        source=os.path.abspath(xlsx_path),
+    )
+
+
+def _write_entry(table: EdgarTable, entry_dir: str, stamp: Dict[str, Any]) -> None:
+    tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "values.npy"), np.ascontiguousarray(table.values))
+    np.save(os.path.join(tmp_dir, "numeric.npy"), np.ascontiguousarray(table.numeric))
+    np.save(os.path.join(tmp_dir, "text.npy"), np.ascontiguousarray(table.text))
+    meta = {
+        "version": FORMAT_VERSION,
+        "source": stamp,
+        "header": table.header,
+        "value_columns": table.value_columns,
+        "numeric_columns": table.numeric_columns,
+        "text_columns": table.text_columns,
+        "rows": table.rows,
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_dir, entry_dir)
+
+
+def _open_entry(entry_dir: str) -> Optional[EdgarTable]:
+    try:
+        with open(os.path.join(entry_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            return None
+        table = EdgarTable(
+            header=list(meta["header"]),
+            values=np.load(os.path.join(entry_dir, "values.npy"), mmap_mode="r"),
+            value_columns=list(meta["value_columns"]),
+            numeric=np.load(os.path.join(entry_dir, "numeric.npy"), mmap_mode="r"),
+            numeric_columns=list(meta["numeric_columns"]),
+            text=np.load(os.path.join(entry_dir, "text.npy"), mmap_mode="r"),
+            text_columns=list(meta["text_columns"]),
+            source=(meta.get("source") or {}).get("path"),
+        )
+        if table.values.shape != (meta["rows"], len(table.value_columns)):
+            raise ValueError(f"unexpected EDGAR value matrix shape {table.values.shape}")
+        return table
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable EDGAR cache {entry_dir}: {e}")
+        return None
+
+
+def _prune(cache_dir: str, keep: str) -> None:
+    """Drop entries for older versions of the same workbook (open mmaps stay valid after unlink)."""
+    stem = keep.rsplit("-", 1)[0]
+    for name in os.listdir(cache_dir):
+        if name != keep and name.rsplit("-", 1)[0] == stem and not name.endswith(".lock"):
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+
+def build_edgar_cache(xlsx_path: str, cache_dir: Optional[str] = None, *, force: bool = False) -> str:
+    """Convert `xlsx_path` into the columnar cache (once per path/mtime); returns the entry directory.
+
+    Holds an exclusive lock while converting so workers started together
+    wait for one conversion instead of each parsing the workbook.
+    """
+    base = _cache_dir(cache_dir)
+    if not base:
+        raise ValueError("EDGAR_CACHE_DIR is not configured")
+    os.makedirs(base, exist_ok=True)
+    name = cache_entry_name(xlsx_path)
+    entry_dir = os.path.join(base, name)
+    with open(os.path.join(base, f"{name.rsplit('-', 1)[0]}.lock"), "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if force:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            elif _open_entry(entry_dir) is not None:
+                return entry_dir
+            stamp = _source_stamp(xlsx_path)
+            logger.info(f"Converting EDGAR workbook {xlsx_path} to columnar cache {entry_dir}")
+            table = convert_workbook(xlsx_path)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            _write_entry(table, entry_dir, stamp)
+            _prune(base, name)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    return entry_dir
+
+
+def load_edgar_table(xlsx_path: str, cache_dir: Optional[str] = None) -> EdgarTable:
+    """The columnar table for `xlsx_path`: memory-mapped from the cache, converted on first use.
+
+    Falls back to an in-memory conversion when the cache directory is not
+    configured or not writable.
+    """
+    if not os.path.exists(xlsx_path):
+        raise FileNotFoundError(f"EDGAR file not found: {xlsx_path}")
+    name = cache_entry_name(xlsx_path)
+    with _TABLES_LOCK:
+        cached = _TABLES.get(name)
+    if cached is not None:
+        return cached
+
+    base = _cache_dir(cache_dir)
+    table = _open_entry(os.path.join(base, name)) if base else None
+    if table is None and base:
+        try:
+            table = _open_entry(build_edgar_cache(xlsx_path, base))
+        except OSError as e:
+            logger.warning(f"EDGAR cache unavailable ({e}); parsing workbook in memory")
+    if table is None:
+        table = convert_workbook(xlsx_path)
+    with _TABLES_LOCK:
+        _TABLES[name] = table
+    return table
+
+
+def clear_edgar_tables() -> None:
+    """Forget opened tables (tests / after rebuilding the cache)."""
+    with _TABLES_LOCK:
+        _TABLES.clear()
+
+
+__all__ = [
+    "EdgarTable",
+    "FORMAT_VERSION",
+    "cache_entry_name",
+    "convert_workbook",
+    "build_edgar_cache",
+    "load_edgar_table",
+    "clear_edgar_tables",
+]
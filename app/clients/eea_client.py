@@ -1,22 +1,29 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import logging
+import threading
+import time
 from typing import Any, Dict, List, Optional
-import io
 import requests
-import pandas as pd
-
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from app.config import settings
+from app.utils import cache_codec
+from app.utils.conditional_fetch import fetch_dataset
 from app.utils.mappings import normalize_country_name
 
-# Make sure you have added 'pyarrow' to requirements.txt
-# pip install pyarrow
-
 logger = logging.getLogger(__name__)
 
 class RedisCache:
     """Redis-based cache for EEA data"""
 
+    namespace = "eea"
+
     def __init__(self, default_ttl: int = 86400):  # 24 hours default
         self.default_ttl = default_ttl
         self._redis_service = None
@@ -37,17 +44,18 @@ class RedisCache:
         return f"eea:{dataset_id}"
 
     async def get(self, cache_key: str) -> Any | None:
-        """Get cached data"""
+        """Get cached data (a pyarrow Table for tabular values under the arrow codec)"""
         redis_service = await self._get_redis_service()
         if redis_service:
-            return await redis_service.get_cache(cache_key)
+            return cache_codec.decode(redis_service.get_cache_bytes(cache_key))
         return None
 
     async def set(self, cache_key: str, value: Any, ttl: Optional[int] = None) -> None:
-        """Set cached data"""
+        """Set cached data, encoded with the "eea" namespace codec"""
         redis_service = await self._get_redis_service()
         if redis_service:
-            await redis_service.set_cache(cache_key, value, ttl or self.default_ttl)
+            data = cache_codec.encode(value, cache_codec.codec_for(self.namespace))
+            redis_service.set_cache_bytes(cache_key, data, ttl or self.default_ttl)
 
     async def get_or_set(self, cache_key: str, fetch_func, ttl: Optional[int] = None):
         """Get from cache or set if not exists"""
@@ -64,84 +72,137 @@ class RedisCache:
         # Cache the fresh data
         await self.set(cache_key, fresh_data, ttl)
 
-        return fresh_data
+        # Same shape as a hit: arrow namespaces hand back Tables
+        return cache_codec.as_cached(fresh_data, cache_codec.codec_for(self.namespace))
 
 # Global Redis cache instance for EEA
 eea_cache = RedisCache()
 
+def _normalize_column(name: str) -> str:
+    return name.strip().lower().replace(' ', '_')
+
+
+# One download per dataset at a time within a process
+_DOWNLOAD_LOCKS: Dict[str, threading.Lock] = {}
+_DOWNLOAD_LOCKS_GUARD = threading.Lock()
+
+
+def _download_lock(path: str) -> threading.Lock:
+    with _DOWNLOAD_LOCKS_GUARD:
+        return _DOWNLOAD_LOCKS.setdefault(path, threading.Lock())
+
+
 class EEAClient:
     """
     Client for interacting with EEA Downloads API (Parquet).
     API Docs: https://eeadmz1-downloads-api-appservice.azurewebsites.net/swagger/index.html
+
+    Datasets are streamed to local Parquet files under EEA_CACHE_DIR and
+    revalidated (ETag / Last-Modified / content hash) once older than
+    EEA_DATASET_TTL_SECONDS. Lookups are pyarrow
+    scans of that file that read only the needed columns and push row
+    filters (country, year) down to the Parquet reader.
     """
     BASE_URL = "https://eeadmz1-downloads-api-appservice.azurewebsites.net/api/v1/public"
 
-    def __init__(self) -> None:
+    def __init__(self, cache_dir: Optional[str] = None) -> None:
         self.session = requests.Session()
         self.session.headers.update({
             "Accept": "application/json, application/octet-stream",
             "User-Agent": f"project-permit-api/1.0 (+{os.getenv('GITHUB_REPO_URL', 'https://github.com/hk-dev13')})"
         })
+        self.cache_dir = cache_dir or getattr(settings, "EEA_CACHE_DIR", "data/eea")
+        self.dataset_ttl = float(getattr(settings, "EEA_DATASET_TTL_SECONDS", 86400))
 
-    async def _get_parquet_data(self, dataset_id: str) -> List[Dict[str, Any]]:
-        """
-        Find, download, and parse Parquet dataset from EEA API with Redis caching.
-        This implements a 2-step workflow:
-        1. Get file metadata to find download URL.
-        2. Download and read Parquet file.
-        """
-        cache_key = eea_cache._generate_cache_key(dataset_id)
+    def _dataset_path(self, dataset_id: str) -> str:
+        return os.path.join(self.cache_dir, f"{dataset_id}.parquet")
 
-        async def fetch_fresh_data():
-            logger.info(f"Searching for file for EEA dataset: {dataset_id}")
-            files_url = f"{self.BASE_URL}/datasets/{dataset_id}/files"
+    def _find_download_url(self, dataset_id: str) -> Optional[str]:
+        files_url = f"{self.BASE_URL}/datasets/{dataset_id}/files"
+        resp_files = self.session.get(files_url, timeout=30)
+        resp_files.raise_for_status()
+        # First available Parquet file
+        return next((f['links']['download'] for f in resp_files.json() if f['name'].endswith('.parquet')), None)
 
+    def _is_fresh(self, path: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(path) < self.dataset_ttl
+        except OSError:
+            return False
+
+    def _refresh_dataset(self, dataset_id: str) -> Optional[str]:
+        path = self._dataset_path(dataset_id)
+        with _download_lock(path):
+            if self._is_fresh(path):
+                return path  # another request refreshed it while we waited
+            logger.info(f"Searching for file for EEA dataset: {dataset_id}")
             try:
-                # Step 1: Get download URL
-                resp_files = self.session.get(files_url, timeout=30)
-                resp_files.raise_for_status()
-                files_metadata = resp_files.json()
-
-                # Find first available Parquet file
-                download_url = next((f['links']['download'] for f in files_metadata if f['name'].endswith('.parquet')), None)
-
-                if not download_url:
-                    logger.warning(f"No Parquet file found for dataset {dataset_id}, using fallback data")
-                    return self._get_fallback_data(dataset_id)
-
-                # Step 2: Download and read Parquet file
-                logger.info(f"Downloading Parquet data from: {download_url}")
-                resp_data = self.session.get(download_url, timeout=90) # Longer timeout for downloads
-                resp_data.raise_for_status()
-
-                # Use pandas to read binary content
-                df = pd.read_parquet(io.BytesIO(resp_data.content))
-
-                # Clean column names for consistency (optional but recommended)
-                df.columns = [col.strip().lower().replace(' ', '_') for col in df.columns]
-
-                return df.to_dict(orient="records")
-
+                download_url = self._find_download_url(dataset_id)
+                if download_url:
+                    # Conditional GET: an unchanged file costs a 304, not a re-download
+                    result = fetch_dataset(self.session, download_url, namespace="eea", path=path, timeout=90,
+                                           validate=pq.read_metadata)
+                    logger.info(f"EEA dataset {dataset_id}: {result.status} ({result.size} bytes) at {path}")
+                    return path
+                logger.warning(f"No Parquet file found for dataset {dataset_id}")
             except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 404:
-                    logger.warning(f"Dataset {dataset_id} not found in EEA API, using fallback data")
-                    return self._get_fallback_data(dataset_id)
+                if e.response is not None and e.response.status_code == 404:
+                    logger.warning(f"Dataset {dataset_id} not found in EEA API")
                 else:
                     logger.error(f"HTTP error when retrieving EEA data for {dataset_id}: {e}")
             except requests.exceptions.RequestException as e:
                 logger.error(f"Network error when retrieving EEA data for {dataset_id}: {e}")
             except Exception as e:
                 logger.error(f"Error processing Parquet data for {dataset_id}: {e}")
+        # A stale local copy beats the static fallback
+        return path if os.path.exists(path) else None
+
+    async def _ensure_dataset(self, dataset_id: str) -> Optional[str]:
+        """Local Parquet path for the dataset, refreshed when stale; None when it was never downloaded."""
+        path = self._dataset_path(dataset_id)
+        if self._is_fresh(path):
+            return path
+        return await asyncio.to_thread(self._refresh_dataset, dataset_id)
+
+    async def scan_dataset(self, dataset_id: str, columns: Optional[List[str]] = None,
+                           filters: Optional[Dict[str, List[Any]]] = None) -> pa.Table:
+        """
+        Read `columns` of a dataset, keeping rows whose column values are in `filters`.
 
-            # Fallback to static data if everything fails
-            return self._get_fallback_data(dataset_id)
+        Column names are normalized (lowercase, spaces to underscores) on both
+        input and output; unknown columns are skipped. Falls back to the static
+        dataset when no local copy exists.
+        """
+        path = await self._ensure_dataset(dataset_id)
+        if path is not None:
+            source = ds.dataset(path, format="parquet")
+        else:
+            source = ds.dataset(pa.Table.from_pylist(self._get_fallback_data(dataset_id)))
+        raw_names = {_normalize_column(n): n for n in source.schema.names}
+        projection = [raw_names[c] for c in columns if c in raw_names] if columns else list(raw_names.values())
 
-        # Use Redis cache with 24-hour TTL for EEA data
-        try:
-            return await eea_cache.get_or_set(cache_key, fetch_fresh_data, ttl=86400)
-        except Exception as e:
-            logger.warning(f"Redis cache failed for EEA, fetching directly: {e}")
-            return await fetch_fresh_data()
+        expression = None
+        for column, values in (filters or {}).items():
+            raw = raw_names.get(column)
+            try:
+                if raw is None:
+                    raise pa.ArrowInvalid(column)
+                wanted = pa.array(values).cast(source.schema.field(raw).type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+                # no row can match a missing column or an uncastable value
+                return pa.table({_normalize_column(n): pa.array([], type=source.schema.field(n).type) for n in projection})
+            clause = ds.field(raw).isin(wanted)
+            expression = clause if expression is None else expression & clause
+
+        table = await asyncio.to_thread(source.to_table, columns=projection, filter=expression)
+        return table.rename_columns([_normalize_column(n) for n in table.column_names])
+
+    async def _get_parquet_data(self, dataset_id: str) -> List[Dict[str, Any]]:
+        """
+        Every row of a dataset as records with normalized column names.
+        Prefer scan_dataset, which reads only what a lookup needs.
+        """
+        return (await self.scan_dataset(dataset_id)).to_pylist()
 
     def _get_fallback_data(self, dataset_id: str) -> List[Dict[str, Any]]:
         """
@@ -240,54 +301,64 @@ class EEAClient:
             logger.warning(f"No fallback data available for dataset: {dataset_id}")
             return []
 
+    RENEWABLES_DATASET = "share-of-energy-from-renewable-sources"
+    # Source columns as normalized by scan_dataset -> output keys
+    RENEWABLES_COLUMNS = {
+        "country": "country",
+        "renewable_energy_share_2020": "renewable_energy_share_2020",
+        "renewable_energy_share_2021_(proxy)": "renewable_energy_share_2021_proxy",  # Adjust to actual column name
+        "2020_target": "target_2020",
+    }
+
+    def _renewables_records(self, table: pa.Table) -> List[Dict[str, Any]]:
+        normalized_data = []
+        for record in table.to_pylist():
+            if not record.get("country"):
+                continue
+            normalized_data.append({out: record.get(src) for src, out in self.RENEWABLES_COLUMNS.items()})
+        return normalized_data
+
     async def get_countries_renewables(self) -> List[Dict[str, Any]]:
         """
         Retrieve and normalize renewable energy share data per country.
         """
         # This ID should be verified from API, this is an example
-        dataset_id = "share-of-energy-from-renewable-sources"
-        raw_data = await self._get_parquet_data(dataset_id)
-
-        normalized_data = []
-        for record in raw_data:
-            # Columns are lowercased and underscored by _get_parquet_data
-            country = record.get("country")
-            if not country:
-                continue
+        table = await self.scan_dataset(self.RENEWABLES_DATASET, columns=list(self.RENEWABLES_COLUMNS))
+        return self._renewables_records(table)
 
-            normalized_data.append({
-                "country": country,
-                "renewable_energy_share_2020": record.get("renewable_energy_share_2020"),
-                "renewable_energy_share_2021_proxy": record.get("renewable_energy_share_2021_(proxy)"), # Adjust to actual column name
-                "target_2020": record.get("2020_target"),
-            })
-        return normalized_data
-
-    def get_country_renewables(self, country: Optional[str]) -> Optional[Dict[str, Any]]:
+    async def get_country_renewables(self, country: Optional[str]) -> Optional[Dict[str, Any]]:
         """
         Retrieve renewable energy data for a specific country.
         """
         if not country:
             return None
-        
-        all_countries = self.get_countries_renewables()
+
         normalized_country = normalize_country_name(country)
-        
-        for record in all_countries:
-            if normalize_country_name(record.get("country", "")) == normalized_country:
-                return record
-        return None
+        # Resolve the spellings that normalize to this country from the country column alone,
+        # then push them down as the row filter for the full projection
+        names = await self.scan_dataset(self.RENEWABLES_DATASET, columns=["country"])
+        if "country" not in names.column_names:
+            return None
+        matches = [c for c in pc.unique(names["country"]).to_pylist() if c and normalize_country_name(c) == normalized_country]
+        if not matches:
+            return None
+        table = await self.scan_dataset(self.RENEWABLES_DATASET, columns=list(self.RENEWABLES_COLUMNS), filters={"country": matches})
+        records = self._renewables_records(table)
+        return records[0] if records else None
 
-    async def get_industrial_pollution(self) -> List[Dict[str, Any]]:
+    POLLUTION_DATASET = "industrial-releases-of-pollutants-to-water"
+    POLLUTION_COLUMNS = ("year", "cd_hg_ni_pb", "toc", "total_n", "total_p", "gva")
+
+    async def get_industrial_pollution(self, years: Optional[List[int]] = None) -> List[Dict[str, Any]]:
         """
-        Retrieve and normalize industrial pollution trend data.
+        Retrieve and normalize industrial pollution trend data, optionally for some years only.
         """
         # This ID should be verified from API, this is an example
-        dataset_id = "industrial-releases-of-pollutants-to-water"
-        raw_data = await self._get_parquet_data(dataset_id)
+        table = await self.scan_dataset(self.POLLUTION_DATASET, columns=list(self.POLLUTION_COLUMNS),
+                                        filters={"year": list(years)} if years else None)
 
         normalized_data = []
-        for record in raw_data:
+        for record in table.to_pylist():
             year = record.get("year")
             if not year:
                 continue
@@ -351,7 +422,7 @@ class EEAClient:
             
             # Route GHG/pollution indicators
             elif indicator_lower in ["ghg", "greenhouse", "pollution", "emissions"]:
-                results = await self.get_industrial_pollution()
+                results = await self.get_industrial_pollution(years=[year] if year else None)
 
                 # Apply country filter if specified
                 if country:
@@ -371,10 +442,10 @@ class EEAClient:
             else:
                 logger.warning(f"Unknown indicator '{indicator}', defaulting to renewable energy")
                 if country:
-                    result = self.get_country_renewables(country)
+                    result = await self.get_country_renewables(country)
                     return [result] if result else []
                 else:
-                    results = self.get_countries_renewables()
+                    results = await self.get_countries_renewables()
                     return results[:limit] if results else []
                     
         except Exception as e:
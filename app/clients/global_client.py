@@ -6,12 +6,15 @@ Data ini digunakan sebagai proksi untuk informasi emisi, dengan normalisasi tamb
 """
 from __future__ import annotations
 from typing import Any, Dict, List, Optional
+import json
 import logging
 
 import requests
 
 from app.config import settings
 from app.clients.base import BaseDataClient
+from app.utils import cache as cache_util
+from app.utils.conditional_fetch import fetch_dataset
 from app.utils.schema import ensure_epa_emission_schema
 
 logger = logging.getLogger(__name__)
@@ -111,19 +114,22 @@ class EPAClient(BaseDataClient):
 
 		try:
 			req_timeout = timeout if (timeout is not None and timeout > 0) else 30
-			resp = self.session.get(url, timeout=req_timeout)
-			if resp.status_code == 200:
-				data = resp.json()
-				if not isinstance(data, list):
-					raise ValueError("Unexpected EPA response shape (expected list)")
-				# Jika respons live kosong, gunakan data sampel untuk pengalaman demo yang lebih baik.
-				if not data:
-					logger.info(f"EPA response for {url} was empty. Using sample data as fallback.")
-					return self.create_sample_data()
-				return data
-			else:
-				logger.warning(f"EPA Envirofacts HTTP {resp.status_code} for {url}, using sample data")
+			# Revalidasi kondisional: tabel yang tidak berubah hanya memakan 304, bukan unduhan penuh;
+			# salinan yang divalidasi dalam CACHE_DURATION dipakai tanpa request sama sekali
+			result = fetch_dataset(self.session, url, namespace="epa", timeout=req_timeout, max_age=cache_util.CACHE_DURATION)
+			with open(result.path, "r", encoding="utf-8") as f:
+				data = json.load(f)
+			if not isinstance(data, list):
+				raise ValueError("Unexpected EPA response shape (expected list)")
+			# Jika respons live kosong, gunakan data sampel untuk pengalaman demo yang lebih baik.
+			if not data:
+				logger.info(f"EPA response for {url} was empty. Using sample data as fallback.")
 				return self.create_sample_data()
+			return data
+		except requests.exceptions.HTTPError as e:
+			status = e.response.status_code if e.response is not None else "error"
+			logger.warning(f"EPA Envirofacts HTTP {status} for {url}, using sample data")
+			return self.create_sample_data()
 		except Exception as e:
 			logger.error(f"Error fetching EPA data from {url}: {e}")
 			return self.create_sample_data()
@@ -2,19 +2,52 @@ from __future__ import annotations
 
 import os
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import csv
 import io
-from functools import lru_cache
+import json
 
 import requests
 from openpyxl import load_workbook
 
+from app.config import settings
+from app.utils.conditional_fetch import dataset_path, fetch_dataset, read_meta
+from app.utils.iso_index import ISOIndex, get_iso_index
 from app.utils.schema import ensure_iso_cert_schema
 from app.utils.mappings import normalize_country_name
 
 logger = logging.getLogger(__name__)
 
+# Parsed feed bodies keyed by stored path -> (content sha256, rows)
+_PARSED_FEEDS: Dict[str, Tuple[str, List[Dict[str, Any]]]] = {}
+
+
+def _parse_feed(path: str, sha256: str, content_type: Optional[str]) -> List[Dict[str, Any]]:
+    """Rows of a stored CSV/JSON feed body, parsed once per content hash."""
+    cached = _PARSED_FEEDS.get(path)
+    if cached is not None and sha256 and cached[0] == sha256:
+        return list(cached[1])
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            text = f.read()
+        ct = (content_type or "").lower()
+        if "json" in ct or (text.lstrip().startswith("[") or text.lstrip().startswith("{")):
+            data = json.loads(text)
+            if isinstance(data, dict):
+                # common wrapper key
+                data = data.get("data", [])
+            if not isinstance(data, list):
+                raise ValueError("Unexpected JSON shape for ISO dataset")
+            rows = [d for d in data if isinstance(d, dict)]
+        else:
+            # assume CSV
+            rows = [dict(row) for row in csv.DictReader(io.StringIO(text))]
+    except Exception as e:
+        logger.error(f"ISO CSV/JSON load error: {e}")
+        return []
+    _PARSED_FEEDS[path] = (sha256, rows)
+    return list(rows)
+
 
 class ISOClient:
     """Client for ISO 14001 certifications (scaffold with sample fallback).
@@ -39,29 +72,25 @@ class ISOClient:
             {"company": "Sustain PT", "country": "ID", "certificate": "ISO 14001", "valid_until": "2027-01-15"},
         ]
 
-    @lru_cache(maxsize=5)
-    def _load_from_csv_or_json(self, url: str) -> List[Dict[str, Any]]:
+    def _revalidate_feed(self, url: str) -> Tuple[str, str, Optional[str]]:
+        """(stored path, content sha256, content type) of the feed; ("", "", None) when unavailable."""
         try:
-            resp = self.session.get(url, timeout=30)
-            ct = (resp.headers.get("Content-Type") or "").lower()
-            text = resp.text
-            if "json" in ct or (text.lstrip().startswith("[") or text.lstrip().startswith("{")):
-                data = resp.json()
-                if isinstance(data, dict):
-                    # common wrapper key
-                    data = data.get("data", [])
-                if not isinstance(data, list):
-                    raise ValueError("Unexpected JSON shape for ISO dataset")
-                return [d for d in data if isinstance(d, dict)]
-            # assume CSV
-            buf = io.StringIO(text)
-            reader = csv.DictReader(buf)
-            return [dict(row) for row in reader]
+            result = fetch_dataset(self.session, url, namespace="iso",
+                                   max_age=float(getattr(settings, "ISO_FEED_REVALIDATE_SECONDS", 3600)))
         except Exception as e:
-            logger.error(f"ISO CSV/JSON load error: {e}")
-            return []
+            path = dataset_path("iso", url)
+            if not os.path.exists(path):
+                logger.error(f"ISO CSV/JSON load error: {e}")
+                return "", "", None
+            logger.warning(f"ISO feed revalidation failed, using stored copy: {e}")
+            meta = read_meta(path)
+            return path, meta.get("sha256") or "", meta.get("content_type")
+        return result.path, result.sha256 or "", result.content_type
+
+    def _load_from_csv_or_json(self, url: str) -> List[Dict[str, Any]]:
+        path, sha256, content_type = self._revalidate_feed(url)
+        return _parse_feed(path, sha256, content_type) if path else []
 
-    @lru_cache(maxsize=5)
     def _load_from_excel(self, path: str, sheet_name: Optional[str] = None) -> List[Dict[str, Any]]:
         """Load ISO 14001 list from Excel. Scans for a sheet and header row containing 'Company'."""
         rows: List[Dict[str, Any]] = []
@@ -142,8 +171,18 @@ class ISOClient:
             logger.error(f"ISO Excel load error: {e}")
         return rows
 
-    @lru_cache(maxsize=10)
-    def get_iso14001_certifications(self, *, country: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+    def source_signature(self) -> Tuple[Any, ...]:
+        """What the certificate list is built from: feed content hash and workbook mtime/size."""
+        feed = self._revalidate_feed(self.csv_url)[1] if self.csv_url else None
+        try:
+            st = os.stat(self.xlsx_path)
+            workbook = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            workbook = None
+        return (self.csv_url, feed, self.xlsx_path, workbook)
+
+    def load_certifications(self) -> List[Dict[str, Any]]:
+        """Every known certificate (CSV/JSON feed plus the Excel list), or sample data."""
         data: List[Dict[str, Any]] = []
         # Prefer explicit CSV URL if provided
         if self.csv_url:
@@ -156,8 +195,7 @@ class ISOClient:
             # Placeholder for future real API call
             try:
                 url = f"{self.api_base}/iso1401"  # adjust when real endpoint available
-                params = {"country": country} if country else {}
-                resp = self.session.get(url, params=params, timeout=30)
+                resp = self.session.get(url, timeout=30)
                 if resp.status_code == 200:
                     data = resp.json()
                     if not isinstance(data, list):
@@ -170,13 +208,21 @@ class ISOClient:
                 data = self.create_sample_data()
         if not data:
             data = self.create_sample_data()
+        return data
 
-        if country:
-            normalized_filter = normalize_country_name(country)
-            data = [d for d in data if normalize_country_name(d.get("country", "")) == normalized_filter]
-        if limit and len(data) > limit:
-            data = data[:limit]
-        return [ensure_iso_cert_schema(rec) for rec in data if isinstance(rec, dict)]
+    def certification_index(self, *, refresh: bool = True) -> Optional[ISOIndex]:
+        """Process-wide index of the certificates, shared by every client with the same sources.
+
+        Rebuilt only when the feed content or the workbook changes; with
+        refresh=False the current index is returned without checking the
+        sources (None if it was never built).
+        """
+        key = (self.api_base, self.csv_url, os.path.abspath(self.xlsx_path))
+        return get_iso_index(key, self.source_signature, self.load_certifications, refresh=refresh)
+
+    def get_iso14001_certifications(self, *, country: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        # copies: callers may annotate the records they get back
+        return [dict(rec) for rec in self.certification_index().rows(country=country, limit=limit)]
 
 
 __all__ = ["ISOClient"]
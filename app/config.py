@@ -30,10 +30,20 @@ class Settings(BaseSettings):
     # EPA Envirofacts
     EPA_ENV_BASE: str = "https://data.epa.gov/efservice/"
     EPA_ENV_TABLE: str = "tri_facility"
+    EPA_FACILITY_INDEX_REFRESH_SECONDS: float = 60.0  # how often the local facility index re-checks the store
+    # Bulk Envirofacts -> local facility store sync (app/services/epa_sync.py)
+    EPA_SYNC_TABLES: str = "tri_facility"  # comma-separated; see SYNC_TABLES for known tables
+    EPA_SYNC_STATES: str = ""  # comma-separated; empty = all US states and territories
+    EPA_SYNC_PAGE_SIZE: int = 500
+    EPA_SYNC_WORKERS: int = 4
+    EPA_SYNC_MIN_INTERVAL_SECONDS: float = 0.25  # minimum spacing between request starts, across all workers
+    EPA_SYNC_MAX_RETRIES: int = 3
+    EPA_SYNC_FULL_REFRESH_HOURS: float = 168.0  # between full re-reads, runs only fetch rows past the last total
 
     # EPA CAMPD
     CAMPD_API_BASE_URL: str = "https://api.epa.gov/easey"
     CAMPD_API_KEY: Optional[str] = None
+    CAMPD_MIRROR_DIR: str = "data/campd"  # local columnar mirror of annual emissions / compliance (Parquet)
 
     # Logging
     LOG_FILE: Optional[str] = None
@@ -57,8 +67,19 @@ class Settings(BaseSettings):
     ISO_CSV_URL: Optional[str] = None
     ISO_XLSX_PATH: str = "reference/list_iso.xlsx"
 
+    # Upstream dataset bodies + validators (ETag / Last-Modified / SHA-256) for conditional re-fetches
+    DATASET_CACHE_DIR: str = "data/datasets"
+    DATASET_CACHE_MAX_FILES: int = 256  # bodies kept per namespace; the least recently validated are evicted
+    ISO_FEED_REVALIDATE_SECONDS: int = 3600  # how long a fetched ISO CSV/JSON feed is used before revalidating
+    ISO_INDEX_REFRESH_SECONDS: float = 60.0  # how often the ISO 14001 index re-checks its sources (feed hash, workbook mtime)
+
+    # Sumber Data EEA
+    EEA_CACHE_DIR: str = "data/eea"  # downloaded Parquet datasets, scanned with column projection
+    EEA_DATASET_TTL_SECONDS: int = 86400  # revalidate a dataset once its local copy is older than this
+
     # Sumber Data EDGAR
     EDGAR_XLSX_PATH: str = "reference/EDGAR_emiss_on_UCDB_2024.xlsx"
+    EDGAR_CACHE_DIR: str = "data/edgar"  # columnar (memory-mapped .npy) conversion of the workbook, keyed by path + mtime
 
     # Sumber Data Policy
     POLICY_XLSX_PATH: str = "reference/Annex III_Best practices and justifications.xlsx"
@@ -160,6 +181,7 @@ class Settings(BaseSettings):
     # Redis Configuration (Upstash)
     REDIS_URL: Optional[str] = None
     UPSTASH_REDIS_URL: Optional[str] = None  # Alternative name
+    CACHE_CODECS: str = "epa_emissions=arrow,eea=arrow"  # per-namespace Redis value codec, "namespace=json|arrow,..."
 
     @property
     def redis_url(self) -> Optional[str]:
@@ -190,12 +212,49 @@ class Settings(BaseSettings):
     VALIDATION_MIN_MATCHES: int = 1
     VALIDATION_LOW_DENSITY_THRESHOLD: int = 3
     VALIDATION_REQUIRE_STATE_MATCH: bool = False
+    VALIDATION_DEADLINE_SECONDS: float = 8.0  # per-request budget for upstream lookups (Envirofacts, CAMPD)
+    VALIDATION_SOURCE_WORKERS: int = 8
+    VALIDATION_SOURCE_QUEUE_DEPTH: int = 8  # lookups allowed to wait for a worker; beyond that a source is skipped as saturated
+    VALIDATION_BATCH_MAX_COMPANIES: int = 10000  # portfolio validation (/v1/validation/epa/batch)
+    VALIDATION_BATCH_WORKERS: int = 8
+
+    # CEVS source deadlines; a late source falls back to its last good value
+    CEVS_SOURCE_DEADLINE_SECONDS: float = 6.0
+    CEVS_SOURCE_DEADLINES: str = "edgar=20,policy=10"  # per-source overrides, "name=seconds,..."
+    CEVS_FEATURES_PATH: str = "data/cevs/country_features.json"  # materialized country features
+    CEVS_FEATURES_REFRESH_SECONDS: int = 900  # how often EEA datasets are re-checked for changes
+    CEVS_BATCH_MAX_COMPANIES: int = 5000  # /v1/export/sec/cevs/leaderboard
+    CEVS_SIMULATION_TTL_SECONDS: int = 3600  # what-if snapshots (/v1/export/sec/cevs/simulations)
+    CEVS_SIMULATION_MAX_SNAPSHOTS: int = 1000
+    CEVS_SIMULATION_MAX_GRID: int = 10000
+
+    # Audit trail write-behind buffer (spooled to disk, bulk-inserted in the background)
+    AUDIT_WRITE_BEHIND: bool = True
+    AUDIT_FLUSH_INTERVAL_MS: int = 200
+    AUDIT_FLUSH_MAX_ENTRIES: int = 500
+    AUDIT_SPOOL_DIR: str = "data/audit_spool"
+    AUDIT_SPOOL_FSYNC: bool = False  # fsync every entry (survives power loss, not just process crashes)
+    AUDIT_RETRY_BACKOFF_MAX_SECONDS: float = 60.0  # failed batches are retried with exponential backoff up to this delay
+    AUDIT_QUARANTINE_AFTER_SECONDS: float = 3600.0  # a batch still failing this long after its first failure is set aside as *.failed
     
     # Quantitative deviation thresholds (percentage)
     VALIDATION_CO2_DEVIATION_THRESHOLD: float = 15.0
     VALIDATION_NOX_DEVIATION_THRESHOLD: float = 20.0
     VALIDATION_SO2_DEVIATION_THRESHOLD: float = 25.0
 
+    # Batch emissions calculation
+    EMISSIONS_BATCH_MAX_ROWS: int = 100000
+
+    # Emission factor registry (versioned *.json factor sets, hot reloaded)
+    EMISSION_FACTORS_DIR: str = "app/data/emission_factors"
+    EMISSION_FACTORS_VERSION: Optional[str] = None  # pin active version; default is newest
+    EMISSION_FACTORS_RELOAD_SECONDS: float = 5.0
+    EMISSION_FACTORS_COMPILED_DIR: str = "data/emission_factors_compiled"  # compiled sets shared by workers
+    EMISSIONS_GWP_SET: str = "AR5"  # AR4 | AR5 | AR6, used for CO2e when a request does not choose one
+
+    # Hourly grid factor curves (grid_<year>.npy + grid_<year>.json, memory-mapped)
+    HOURLY_GRID_FACTORS_DIR: str = "app/data/hourly_grid_factors"
+
     @model_validator(mode='after')
     def set_production_defaults(self) -> 'Settings':
         """Set production-specific defaults based on ENVIRONMENT"""
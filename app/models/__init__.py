@@ -21,6 +21,9 @@ from .notification import (
 from .audit_trail import AuditTrail
 from .company_map import CompanyFacilityMap
 from .emissions_calculation import EmissionsCalculation
+from .activity_ledger import ActivityEntry, FacilityMonthTotal, CompanyYearTotal
+from .corporate_hierarchy import CorporateEntity
+from .epa_facility import EPAFacility, EPASyncCheckpoint
 
 # Make all models available at package level
 __all__ = [
@@ -37,4 +40,10 @@ __all__ = [
     "AuditTrail",
     "CompanyFacilityMap",
     "EmissionsCalculation",
+    "ActivityEntry",
+    "FacilityMonthTotal",
+    "CompanyYearTotal",
+    "CorporateEntity",
+    "EPAFacility",
+    "EPASyncCheckpoint",
 ]
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, Integer, String, Float, DateTime, UniqueConstraint, func
+from app.models.user import Base
+
+
+class ActivityEntry(Base):
+    """One activity line for a facility-month, e.g. diesel or grid electricity.
+
+    activity_key identifies the line within the facility-month ("scope1:diesel",
+    "scope2"); unit and grid_region are attributes of the line, so a correction
+    (including a changed unit or region) replaces it in place.
+    """
+    __tablename__ = "activity_ledger"
+    __table_args__ = (UniqueConstraint("company", "facility", "year", "month", "activity_key", name="uq_activity_ledger_line"),)
+
+    id = Column(Integer, primary_key=True)
+    company = Column(String, nullable=False, index=True)
+    facility = Column(String, nullable=False)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    activity_key = Column(String, nullable=False)
+    scope = Column(String, nullable=False)  # scope1 | scope2
+    fuel_type = Column(String, nullable=True)
+    unit = Column(String, nullable=True)
+    grid_region = Column(String, nullable=True)
+    amount = Column(Float, nullable=False)
+    factor = Column(Float, nullable=False)
+    emissions_kg = Column(Float, nullable=False)
+    factors_version = Column(String, nullable=False)
+    revision = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def to_dict(self):
+        return {
+            "company": self.company,
+            "facility": self.facility,
+            "year": self.year,
+            "month": self.month,
+            "scope": self.scope,
+            "fuel_type": self.fuel_type,
+            "unit": self.unit,
+            "grid_region": self.grid_region,
+            "amount": self.amount,
+            "factor": self.factor,
+            "emissions_kg": self.emissions_kg,
+            "factors_version": self.factors_version,
+            "revision": self.revision,
+        }
+
+
+class FacilityMonthTotal(Base):
+    """Rollup of all activity lines of one facility-month."""
+    __tablename__ = "ledger_facility_month"
+
+    company = Column(String, primary_key=True)
+    facility = Column(String, primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    scope1_emissions_kg = Column(Float, nullable=False, default=0.0)
+    scope2_emissions_kg = Column(Float, nullable=False, default=0.0)
+    emissions_kg = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class CompanyYearTotal(Base):
+    """Annual company totals, maintained incrementally from facility-month deltas."""
+    __tablename__ = "ledger_company_year"
+
+    company = Column(String, primary_key=True)
+    year = Column(Integer, primary_key=True)
+    scope1_emissions_kg = Column(Float, nullable=False, default=0.0)
+    scope2_emissions_kg = Column(Float, nullable=False, default=0.0)
+    emissions_kg = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def to_dict(self):
+        return {
+            "company": self.company,
+            "year": self.year,
+            "scope1_emissions_kg": round(self.scope1_emissions_kg, 6),
+            "scope2_emissions_kg": round(self.scope2_emissions_kg, 6),
+            "emissions_kg": round(self.emissions_kg, 6),
+            "emissions_tonnes": round(self.emissions_kg / 1000.0, 6),
+        }
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, String, Float, Integer, DateTime, func
+from app.models.user import Base
+
+
+class CorporateEntity(Base):
+    """Node of a reporting group: the parent company, a subsidiary or a facility.
+
+    ownership_pct is the parent's equity share in this node (0-100) and weights
+    the node's consolidated totals when they roll up into the parent.
+    scope1/scope2 hold the node's own (directly reported) emissions, normally
+    only set on facilities. version is bumped on every write, so a group's
+    (row count, sum of versions) changes whenever any of its rows does.
+    """
+    __tablename__ = "corporate_entities"
+
+    id = Column(String, primary_key=True)
+    group_id = Column(String, nullable=False, index=True)
+    parent_id = Column(String, nullable=True, index=True)
+    name = Column(String, nullable=False)
+    kind = Column(String, nullable=False, default="facility")  # group | subsidiary | facility
+    ownership_pct = Column(Float, nullable=False, default=100.0)
+    scope1_emissions_kg = Column(Float, nullable=False, default=0.0)
+    scope2_emissions_kg = Column(Float, nullable=False, default=0.0)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "group_id": self.group_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "ownership_pct": self.ownership_pct,
+            "scope1_emissions_kg": self.scope1_emissions_kg,
+            "scope2_emissions_kg": self.scope2_emissions_kg,
+        }
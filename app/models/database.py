@@ -37,5 +37,8 @@ def create_tables():
     # Import models to ensure they are registered with Base metadata
     from .audit_trail import AuditTrail  # noqa: F401
     from .company_map import CompanyFacilityMap  # noqa: F401
+    from .activity_ledger import ActivityEntry, FacilityMonthTotal, CompanyYearTotal  # noqa: F401
+    from .corporate_hierarchy import CorporateEntity  # noqa: F401
+    from .epa_facility import EPAFacility, EPASyncCheckpoint  # noqa: F401
     # Create all tables using the same metadata
     Base.metadata.create_all(bind=engine)
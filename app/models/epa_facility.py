@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, String, Float, DateTime, Integer, Index, func
+from app.models.user import Base
+
+
+class EPAFacility(Base):
+    """Local copy of EPA facility registry rows (Envirofacts tri_facility, FRS).
+
+    id is "<source>:<source_id>" so the same site from two registries is kept
+    side by side; name search goes through app.services.facility_index.
+    """
+    __tablename__ = "epa_facilities"
+    __table_args__ = (Index("ix_epa_facilities_state_name", "state", "facility_name"),)
+
+    id = Column(String, primary_key=True)
+    source = Column(String, nullable=False)  # tri_facility | frs
+    source_id = Column(String, nullable=False)
+    facility_name = Column(String, nullable=False)
+    parent_company = Column(String, nullable=True)
+    state = Column(String(2), nullable=True, index=True)
+    city = Column(String, nullable=True)
+    county = Column(String, nullable=True)
+    zip_code = Column(String, nullable=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    content_hash = Column(String(40), nullable=True)  # sha1 of the normalized row; unchanged rows are not rewritten
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def to_record(self):
+        """Same shape as ensure_epa_emission_schema() output, plus registry fields."""
+        return {
+            "facility_name": self.facility_name,
+            "state": self.state,
+            "county": self.county,
+            "city": self.city,
+            "parent_company": self.parent_company,
+            "year": None,
+            "pollutant": "TRI" if self.source == "tri_facility" else "FRS",
+            "emissions": None,
+            "unit": None,
+            "raw_data_id": self.source_id,
+            "source_table": self.source,
+        }
+
+
+class EPASyncCheckpoint(Base):
+    """Progress of the Envirofacts bulk sync for one (table, state) slice.
+
+    next_row is a contiguous watermark: every row below it has been written,
+    so a failed or interrupted run resumes there instead of from zero.
+    """
+    __tablename__ = "epa_sync_checkpoints"
+
+    table_name = Column(String, primary_key=True)
+    state = Column(String(2), primary_key=True)
+    status = Column(String, nullable=False, default="pending")  # pending | running | complete | failed
+    mode = Column(String, nullable=True)  # full | tail | resume
+    next_row = Column(Integer, nullable=False, default=0)
+    total_rows = Column(Integer, nullable=True)
+    inserted = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    unchanged = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    last_full_at = Column(DateTime(timezone=True), nullable=True)
+
+    def to_dict(self):
+        return {
+            "table": self.table_name,
+            "state": self.state,
+            "status": self.status,
+            "mode": self.mode,
+            "next_row": self.next_row,
+            "total_rows": self.total_rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "last_error": self.last_error,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "last_full_at": self.last_full_at.isoformat() if self.last_full_at else None,
+        }
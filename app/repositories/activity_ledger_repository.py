@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.activity_ledger import ActivityEntry, FacilityMonthTotal, CompanyYearTotal
+
+
+def get_entry(
+    db: Session, *, company: str, facility: str, year: int, month: int, activity_key: str, for_update: bool = False
+) -> Optional[ActivityEntry]:
+    query = db.query(ActivityEntry).filter(
+        ActivityEntry.company == company,
+        ActivityEntry.facility == facility,
+        ActivityEntry.year == year,
+        ActivityEntry.month == month,
+        ActivityEntry.activity_key == activity_key,
+    )
+    if for_update:
+        # row lock (no-op on SQLite) and the current values, not a cached copy
+        query = query.with_for_update().populate_existing()
+    return query.one_or_none()
+
+
+def sum_facility_month(db: Session, *, company: str, facility: str, year: int, month: int) -> Tuple[float, float]:
+    """(scope1_kg, scope2_kg) summed over the activity lines of one facility-month."""
+    rows = (
+        db.query(ActivityEntry.scope, func.sum(ActivityEntry.emissions_kg))
+        .filter(
+            ActivityEntry.company == company,
+            ActivityEntry.facility == facility,
+            ActivityEntry.year == year,
+            ActivityEntry.month == month,
+        )
+        .group_by(ActivityEntry.scope)
+        .all()
+    )
+    sums = {scope: float(total or 0.0) for scope, total in rows}
+    return sums.get("scope1", 0.0), sums.get("scope2", 0.0)
+
+
+def get_facility_month(
+    db: Session, *, company: str, facility: str, year: int, month: int, for_update: bool = False
+) -> Optional[FacilityMonthTotal]:
+    if for_update:
+        return db.get(FacilityMonthTotal, (company, facility, year, month), with_for_update=True, populate_existing=True)
+    return db.get(FacilityMonthTotal, (company, facility, year, month))
+
+
+def get_company_year(db: Session, *, company: str, year: int) -> Optional[CompanyYearTotal]:
+    return db.get(CompanyYearTotal, (company, year))
+
+
+def list_facility_months(db: Session, *, company: str, year: int) -> List[FacilityMonthTotal]:
+    return (
+        db.query(FacilityMonthTotal)
+        .filter(FacilityMonthTotal.company == company, FacilityMonthTotal.year == year)
+        .order_by(FacilityMonthTotal.facility.asc(), FacilityMonthTotal.month.asc())
+        .all()
+    )
+
+
+def list_entries(db: Session, *, company: str, year: int, facility: Optional[str] = None, month: Optional[int] = None) -> List[ActivityEntry]:
+    query = db.query(ActivityEntry).filter(ActivityEntry.company == company, ActivityEntry.year == year)
+    if facility:
+        query = query.filter(ActivityEntry.facility == facility)
+    if month:
+        query = query.filter(ActivityEntry.month == month)
+    return query.order_by(ActivityEntry.facility.asc(), ActivityEntry.month.asc(), ActivityEntry.activity_key.asc()).all()
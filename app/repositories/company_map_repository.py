@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional, List
+from typing import Dict, Iterable, Optional, List
 from sqlalchemy.orm import Session
 from app.models.company_map import CompanyFacilityMap
 
@@ -27,3 +27,13 @@ def get_mapping(db: Session, company: str) -> Optional[CompanyFacilityMap]:
 
 def list_mappings(db: Session, limit: int = 100, offset: int = 0) -> List[CompanyFacilityMap]:
     return db.query(CompanyFacilityMap).order_by(CompanyFacilityMap.company.asc()).offset(offset).limit(limit).all()
+
+
+def get_mappings(db: Session, companies: Iterable[str]) -> Dict[str, CompanyFacilityMap]:
+    """Mappings for many companies at once, keyed by the stripped company name."""
+    keys = sorted({c.strip() for c in companies if c and c.strip()})
+    out: Dict[str, CompanyFacilityMap] = {}
+    for i in range(0, len(keys), 500):
+        for m in db.query(CompanyFacilityMap).filter(CompanyFacilityMap.company.in_(keys[i:i + 500])).all():
+            out[m.company] = m
+    return out
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.corporate_hierarchy import CorporateEntity
+
+
+def get_entity(db: Session, entity_id: str) -> Optional[CorporateEntity]:
+    return db.get(CorporateEntity, entity_id)
+
+
+def list_group_entities(db: Session, group_id: str) -> List[CorporateEntity]:
+    return db.query(CorporateEntity).filter(CorporateEntity.group_id == group_id).all()
+
+
+def group_signature(db: Session, group_id: str) -> Tuple[int, int]:
+    """(row count, sum of row versions) for a group; changes with every write to it."""
+    count, versions = (
+        db.query(func.count(CorporateEntity.id), func.coalesce(func.sum(CorporateEntity.version), 0))
+        .filter(CorporateEntity.group_id == group_id)
+        .one()
+    )
+    return int(count), int(versions)
+
+
+def upsert_entities(db: Session, *, group_id: str, nodes: List[Dict[str, Any]]) -> List[CorporateEntity]:
+    rows = []
+    for n in nodes:
+        row = db.get(CorporateEntity, n["id"])
+        if row is None:
+            row = CorporateEntity(id=n["id"], group_id=group_id, version=1)
+            db.add(row)
+        else:
+            row.version = CorporateEntity.version + 1
+        row.parent_id = n.get("parent_id")
+        row.name = n.get("name") or n["id"]
+        row.kind = n.get("kind") or "facility"
+        row.ownership_pct = float(n.get("ownership_pct", 100.0))
+        row.scope1_emissions_kg = float(n.get("scope1_emissions_kg") or 0.0)
+        row.scope2_emissions_kg = float(n.get("scope2_emissions_kg") or 0.0)
+        rows.append(row)
+    db.commit()
+    return rows
+
+
+def update_entity(db: Session, entity: CorporateEntity, **fields: Any) -> CorporateEntity:
+    for k, v in fields.items():
+        setattr(entity, k, v)
+    entity.version = CorporateEntity.version + 1
+    db.commit()
+    db.refresh(entity)
+    return entity
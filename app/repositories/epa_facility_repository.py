@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.epa_facility import EPAFacility, EPASyncCheckpoint
+
+_FIELDS = ("source", "source_id", "facility_name", "parent_company", "state", "city", "county", "zip_code", "latitude", "longitude")
+_IN_CHUNK = 500  # stay under SQLite's bound-parameter limit
+
+
+def upsert_facilities(db: Session, rows: Iterable[Dict[str, Any]], *, commit: bool = True) -> int:
+    """Insert or update normalized facility rows (see facility_index.normalize_facility)."""
+    count = 0
+    for r in rows:
+        f = db.get(EPAFacility, r["id"])
+        if f is None:
+            f = EPAFacility(id=r["id"])
+            db.add(f)
+        for k in _FIELDS:
+            setattr(f, k, r.get(k))
+        f.content_hash = row_hash(r)  # so a later delta sync sees these rows as unchanged
+        count += 1
+    if commit:
+        db.commit()
+    return count
+
+
+def row_hash(row: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps([row.get(k) for k in _FIELDS], default=str).encode("utf-8")).hexdigest()
+
+
+def upsert_facilities_delta(db: Session, rows: Iterable[Dict[str, Any]], *, commit: bool = True) -> Dict[str, int]:
+    """Like upsert_facilities, but rows whose content hash is unchanged are left untouched.
+
+    Existing hashes are read with one IN query per page, so a sync page costs
+    one SELECT plus writes for new/changed facilities only.
+    """
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        by_id[r["id"]] = r
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    if not by_id:
+        return counts
+    ids = list(by_id)
+    existing: Dict[str, EPAFacility] = {}
+    for i in range(0, len(ids), _IN_CHUNK):
+        existing.update((f.id, f) for f in db.query(EPAFacility).filter(EPAFacility.id.in_(ids[i:i + _IN_CHUNK])).all())
+    for fid, r in by_id.items():
+        digest = row_hash(r)
+        f = existing.get(fid)
+        if f is not None and f.content_hash == digest:
+            counts["unchanged"] += 1
+            continue
+        if f is None:
+            f = EPAFacility(id=fid)
+            db.add(f)
+            counts["inserted"] += 1
+        else:
+            counts["updated"] += 1
+        for k in _FIELDS:
+            setattr(f, k, r.get(k))
+        f.content_hash = digest
+    if commit:
+        db.commit()
+    return counts
+
+
+def store_signature(db: Session) -> Tuple[int, Optional[str]]:
+    """(row count, latest update) — changes whenever the store is written."""
+    count, latest = db.query(func.count(EPAFacility.id), func.max(EPAFacility.updated_at)).one()
+    return int(count or 0), str(latest) if latest is not None else None
+
+
+def list_all_facilities(db: Session) -> List[EPAFacility]:
+    return db.query(EPAFacility).all()
+
+
+def facility_counts_by_state(db: Session) -> Dict[str, int]:
+    rows = db.query(EPAFacility.state, func.count(EPAFacility.id)).group_by(EPAFacility.state).all()
+    return {str(state or ""): int(n) for state, n in rows}
+
+
+def get_sync_checkpoint(db: Session, table_name: str, state: str) -> Optional[EPASyncCheckpoint]:
+    return db.get(EPASyncCheckpoint, (table_name, state))
+
+
+def get_or_create_sync_checkpoint(db: Session, table_name: str, state: str) -> EPASyncCheckpoint:
+    cp = get_sync_checkpoint(db, table_name, state)
+    if cp is None:
+        cp = EPASyncCheckpoint(table_name=table_name, state=state, status="pending", next_row=0, inserted=0, updated=0, unchanged=0)
+        db.add(cp)
+        db.flush()
+    return cp
+
+
+def list_sync_checkpoints(db: Session, *, table_name: Optional[str] = None) -> List[EPASyncCheckpoint]:
+    q = db.query(EPASyncCheckpoint)
+    if table_name:
+        q = q.filter(EPASyncCheckpoint.table_name == table_name)
+    return q.order_by(EPASyncCheckpoint.table_name, EPASyncCheckpoint.state).all()
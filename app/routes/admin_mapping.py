@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Query
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List, Dict, Any
 from sqlalchemy.orm import Session
 
 from app.utils.security import require_api_key
 from app.models.database import get_db, create_tables
 from app.repositories.company_map_repository import upsert_mapping, get_mapping, list_mappings
+from app.repositories.epa_facility_repository import facility_counts_by_state, list_sync_checkpoints
+from app.services.facility_index import ingest_facilities, get_facility_index
+from app.services.epa_sync import SYNC_TABLES, run_epa_sync_job, sync_in_progress
+from app.services.campd_mirror import mirror_stats, refresh_campd_mirror, write_campd_mirror
+from app.services.audit_service import replay_quarantined_audits
 
 router = APIRouter()
 
@@ -17,6 +22,26 @@ class MappingPayload(BaseModel):
     notes: Optional[str] = None
 
 
+class FacilityImportPayload(BaseModel):
+    source: str = "tri_facility"
+    records: List[Dict[str, Any]]
+
+
+class EPASyncPayload(BaseModel):
+    states: Optional[List[str]] = None
+    tables: Optional[List[str]] = None
+    full: bool = False
+
+
+class CampdImportPayload(BaseModel):
+    kind: str = "emissions"  # emissions | compliance
+    records: List[Dict[str, Any]]
+
+
+class CampdRefreshPayload(BaseModel):
+    years: List[int]
+
+
 def _require_admin(request: Request):
     client_info = getattr(request.state, "client_info", {})
     if client_info.get("tier") != "premium":
@@ -67,3 +92,83 @@ async def list_company_mappings(request: Request, limit: int = Query(100, ge=1,
             "notes": r.notes,
         } for r in rows
     ], "count": len(rows)}
+
+
+@router.post("/epa/facilities", dependencies=[Depends(require_api_key)])
+async def import_epa_facilities(payload: FacilityImportPayload, request: Request, db: Session = Depends(get_db)):
+    """Load raw tri_facility / FRS records into the local facility store used by validation."""
+    _require_admin(request)
+    if payload.source not in ("tri_facility", "frs"):
+        raise HTTPException(status_code=400, detail="source must be tri_facility or frs")
+    result = ingest_facilities(db, payload.records, source=payload.source)
+    return {"status": "success", "data": result}
+
+
+@router.get("/epa/facilities/stats", dependencies=[Depends(require_api_key)])
+async def epa_facility_stats(request: Request, db: Session = Depends(get_db)):
+    _require_admin(request)
+    by_state = facility_counts_by_state(db)
+    index = get_facility_index(db)
+    return {"status": "success", "data": {
+        "facilities": sum(by_state.values()),
+        "indexed": len(index) if index is not None else 0,
+        "by_state": by_state,
+    }}
+
+
+@router.post("/epa/sync", status_code=202, dependencies=[Depends(require_api_key)])
+async def start_epa_sync(payload: EPASyncPayload, request: Request, background_tasks: BackgroundTasks):
+    """Queue a bulk Envirofacts -> local store sync; progress is visible via GET /epa/sync."""
+    _require_admin(request)
+    unknown = [t for t in (payload.tables or []) if t not in SYNC_TABLES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unsupported tables: {', '.join(unknown)}")
+    if sync_in_progress():
+        raise HTTPException(status_code=409, detail="EPA sync already running")
+    background_tasks.add_task(run_epa_sync_job, states=payload.states, tables=payload.tables, full=payload.full)
+    return {"status": "accepted", "data": {"states": payload.states, "tables": payload.tables, "full": payload.full}}
+
+
+@router.get("/epa/sync", dependencies=[Depends(require_api_key)])
+async def epa_sync_status(request: Request, table: Optional[str] = None, db: Session = Depends(get_db)):
+    _require_admin(request)
+    rows = [cp.to_dict() for cp in list_sync_checkpoints(db, table_name=table)]
+    return {"status": "success", "data": {
+        "running": sync_in_progress(),
+        "slices": len(rows),
+        "failed": sum(1 for r in rows if r["status"] == "failed"),
+        "checkpoints": rows,
+    }}
+
+
+@router.post("/campd/mirror", dependencies=[Depends(require_api_key)])
+async def import_campd_records(payload: CampdImportPayload, request: Request):
+    """Merge raw CAMPD annual emissions / compliance records (API or bulk-file rows) into the local mirror."""
+    _require_admin(request)
+    try:
+        result = write_campd_mirror(payload.records, kind=payload.kind)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", "data": result}
+
+
+@router.post("/campd/mirror/refresh", status_code=202, dependencies=[Depends(require_api_key)])
+async def refresh_campd(payload: CampdRefreshPayload, request: Request, background_tasks: BackgroundTasks):
+    _require_admin(request)
+    if not payload.years:
+        raise HTTPException(status_code=400, detail="years is required")
+    background_tasks.add_task(refresh_campd_mirror, payload.years)
+    return {"status": "accepted", "data": {"years": payload.years}}
+
+
+@router.get("/campd/mirror/stats", dependencies=[Depends(require_api_key)])
+async def campd_mirror_stats(request: Request):
+    _require_admin(request)
+    return {"status": "success", "data": mirror_stats()}
+
+
+@router.post("/audit/replay", dependencies=[Depends(require_api_key)])
+async def replay_audit_spool(request: Request):
+    """Retry audit batches quarantined as *.spool.failed after repeated insert failures."""
+    _require_admin(request)
+    return {"status": "success", "data": {"replayed": replay_quarantined_audits()}}
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel, field_validator
-from typing import Optional, Any, Dict
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, Any, Dict, List
 
 from app.utils.security import require_api_key
-from app.models.database import get_db, create_tables
-from app.services.emissions_calculator import calculate_emissions, FACTORS_VERSION
-from app.services.audit_service import record_audit
+from app.services.emissions_calculator import calculate_emissions
+from app.services.emissions_batch import calculate_emissions_batch, infer_batch_format, read_batch_rows
+from app.services.hourly_scope2 import compute_hourly_scope2, parse_interval_sites
+from app.services.audit_service import enqueue_audit
+from app.config import settings
 
 router = APIRouter()
 
@@ -23,6 +24,8 @@ class CalcPayload(BaseModel):
     company: str
     scope1: Optional[Scope1Schema] = None
     scope2: Optional[Scope2Schema] = None
+    factors_version: Optional[str] = None
+    gwp_set: Optional[str] = Field(None, pattern="^(AR4|AR5|AR6)$")
 
     @field_validator('company')
     @classmethod
@@ -32,6 +35,21 @@ class CalcPayload(BaseModel):
         return v
 
 
+class IntervalSiteSchema(BaseModel):
+    site_id: str
+    start: str
+    kwh: List[Optional[float]]
+    interval_minutes: int = 60
+    grid_region: Optional[str] = None
+
+class HourlyScope2Payload(BaseModel):
+    company: str
+    year: int
+    sites: List[IntervalSiteSchema]
+    include_hourly: bool = False
+    factors_version: Optional[str] = None
+
+
 def _assess_calculation_confidence(payload_dict: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
     """Quick confidence assessment for emissions calculation."""
     score = 85  # Base score for calculation
@@ -69,7 +87,7 @@ def _assess_calculation_confidence(payload_dict: Dict[str, Any], result: Dict[st
 
 
 @router.post("/calculate")
-async def calculate(payload: CalcPayload, api_key: Any = Depends(require_api_key), db: Session = Depends(get_db)):
+async def calculate(payload: CalcPayload, api_key: Any = Depends(require_api_key)):
     try:
         payload_dict = payload.model_dump()
         result = calculate_emissions(payload_dict)
@@ -78,23 +96,95 @@ async def calculate(payload: CalcPayload, api_key: Any = Depends(require_api_key
         confidence = _assess_calculation_confidence(payload_dict, result)
         result["confidence_analysis"] = confidence
         
-        # Ensure schema exists before audit write (CI-safe)
-        try:
-            create_tables()
-        except Exception:
-            pass
         # Record minimal audit trail with inputs and factors version
         notes: Dict[str, Any] = {
             "action": "emissions_calculate",
-            "version": FACTORS_VERSION,
+            "version": result["version"],
             "components": result.get("components", {}),
             "totals": result.get("totals", {}),
             "confidence": confidence
         }
-        record_audit(
-            db,
+        enqueue_audit(
             source_file="emissions_calculator",
-            calculation_version=FACTORS_VERSION,
+            calculation_version=result["version"],
+            company_cik=payload.company,
+            notes=str(notes),
+        )
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/calculate/batch")
+async def calculate_batch(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(json|jsonl|csv|parquet)$"),
+    factors_version: Optional[str] = Query(None),
+    gwp_set: Optional[str] = Query(None, pattern="^(AR4|AR5|AR6)$"),
+    api_key: Any = Depends(require_api_key),
+):
+    """Calculate Scope 1 & 2 emissions for many facility rows in one request.
+
+    The body is JSON (list of rows or {"rows": [...]}), JSONL, CSV or Parquet;
+    the format is taken from the `format` query param or the Content-Type header.
+    Each row uses the columns company, facility, fuel_type, amount, unit, kwh, grid_region.
+    """
+    try:
+        fmt = format or infer_batch_format(request.headers.get("content-type")) or "json"
+        frame = read_batch_rows(await request.body(), fmt)
+        max_rows = int(getattr(settings, "EMISSIONS_BATCH_MAX_ROWS", 100000) or 100000)
+        if len(frame) > max_rows:
+            raise ValueError(f"Batch too large: {len(frame)} rows (max {max_rows})")
+        result = calculate_emissions_batch(frame, factors_version=factors_version, gwp_set=gwp_set)
+
+        # One audit row for the whole batch instead of one per facility
+        companies = sorted(result.get("by_company", {}).keys())
+        notes: Dict[str, Any] = {
+            "action": "emissions_calculate_batch",
+            "version": result["version"],
+            "format": fmt,
+            "companies": companies[:50],
+            "companies_count": len(companies),
+            "totals": result.get("totals", {}),
+        }
+        enqueue_audit(
+            source_file="emissions_batch",
+            calculation_version=result["version"],
+            company_cik=companies[0] if len(companies) == 1 else "batch",
+            notes=str(notes),
+        )
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/calculate/scope2/hourly")
+async def calculate_scope2_hourly(payload: HourlyScope2Payload, api_key: Any = Depends(require_api_key)):
+    """Scope 2 from hourly / 15-minute interval kWh against hourly grid factor curves.
+
+    Returns per-site annual and monthly totals, portfolio monthly totals and,
+    with include_hourly, the portfolio hourly profile for the year.
+    """
+    try:
+        rows = [s.model_dump() for s in payload.sites]
+        sites = parse_interval_sites(rows)
+        result = compute_hourly_scope2(
+            sites,
+            payload.year,
+            factors_version=payload.factors_version,
+            include_hourly=payload.include_hourly,
+        )
+
+        notes: Dict[str, Any] = {
+            "action": "emissions_scope2_hourly",
+            "version": result["factors_version"],
+            "year": payload.year,
+            "hourly_curve_source": result.get("hourly_curve_source"),
+            "totals": result.get("totals", {}),
+        }
+        enqueue_audit(
+            source_file="hourly_scope2",
+            calculation_version=result["factors_version"],
             company_cik=payload.company,
             notes=str(notes),
         )
@@ -1,38 +1,38 @@
-from fastapi import APIRouter, Depends
-from typing import Any, Dict, List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+from typing import Any, Optional
 
 from app.utils.security import require_api_key
-from app.services.emissions_calculator import SCOPE1_FACTORS, SCOPE2_GRID_FACTORS, FACTORS_VERSION
+from app.services.factor_registry import factor_registry
 
 router = APIRouter()
 
+
+def _factor_set_or_404(version: Optional[str]):
+    try:
+        return factor_registry.get(version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @router.get("/factors")
-async def get_emission_factors(api_key: Any = Depends(require_api_key)):
-    """Get current emission factors with version info."""
+async def get_emission_factors(version: Optional[str] = Query(None), api_key: Any = Depends(require_api_key)):
+    """Get current (or a pinned version of) emission factors with version info.
+
+    The JSON body is serialized once per factor set when the registry loads it.
+    """
+    return Response(content=_factor_set_or_404(version).factors_payload, media_type="application/json")
+
+@router.get("/factors/versions")
+async def get_emission_factor_versions(api_key: Any = Depends(require_api_key)):
+    """List factor set versions known to the registry and the active one."""
     return {
         "status": "success",
-        "version": FACTORS_VERSION,
-        "scope1_factors": {
-            f"{fuel}_{unit}": factor 
-            for (fuel, unit), factor in SCOPE1_FACTORS.items()
-        },
-        "scope2_grid_factors": SCOPE2_GRID_FACTORS
+        "active": factor_registry.current().version,
+        "versions": factor_registry.versions(),
     }
 
 @router.get("/units")
-async def get_supported_units(api_key: Any = Depends(require_api_key)):
+async def get_supported_units(version: Optional[str] = Query(None), api_key: Any = Depends(require_api_key)):
     """Get supported units for each fuel type."""
-    scope1_units = {}
-    for (fuel, unit), _ in SCOPE1_FACTORS.items():
-        if fuel not in scope1_units:
-            scope1_units[fuel] = []
-        scope1_units[fuel].append(unit)
-    
-    return {
-        "status": "success",
-        "scope1_units": scope1_units,
-        "scope2_units": {
-            "electricity": ["kwh"],
-            "grid_regions": list(SCOPE2_GRID_FACTORS.keys())
-        }
-    }
\ No newline at end of file
+    return Response(content=_factor_set_or_404(version).units_payload, media_type="application/json")
@@ -0,0 +1,83 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Optional, Any, Dict, List
+from sqlalchemy.orm import Session
+
+from app.utils.security import require_api_key
+from app.models.database import get_db
+from app.routes.emissions import Scope1Schema, Scope2Schema
+from app.services.activity_ledger import record_activities, company_year_summary, rebuild_company_year
+from app.repositories.activity_ledger_repository import list_entries
+from app.services.audit_service import enqueue_audit
+
+router = APIRouter()
+
+
+class LedgerEntrySchema(BaseModel):
+    company: str
+    facility: str
+    year: int
+    month: int = Field(..., ge=1, le=12)
+    scope1: Optional[Scope1Schema] = None
+    scope2: Optional[Scope2Schema] = None
+
+
+class LedgerPayload(BaseModel):
+    entries: List[LedgerEntrySchema]
+    factors_version: Optional[str] = None
+
+
+@router.post("/ledger")
+async def write_ledger(payload: LedgerPayload, api_key: Any = Depends(require_api_key), db: Session = Depends(get_db)):
+    """Record or correct facility-month activity; only touched facility-months are re-aggregated."""
+    try:
+        result = record_activities(db, [e.model_dump() for e in payload.entries], factors_version=payload.factors_version)
+        for cy in result["company_years"]:
+            notes: Dict[str, Any] = {
+                "action": "emissions_ledger_write",
+                "version": result["factors_version"],
+                "year": cy["year"],
+                "facility_months": [
+                    fm for fm in result["recomputed_facility_months"] if fm["company"] == cy["company"]
+                ][:50],
+                "totals": cy,
+            }
+            enqueue_audit(
+                source_file="activity_ledger",
+                calculation_version=result["factors_version"],
+                company_cik=cy["company"],
+                notes=str(notes),
+            )
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/ledger/{company}/{year}")
+async def get_ledger_totals(company: str, year: int, api_key: Any = Depends(require_api_key), db: Session = Depends(get_db)):
+    try:
+        return company_year_summary(db, company, year)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/ledger/{company}/{year}/entries")
+async def get_ledger_entries(
+    company: str,
+    year: int,
+    facility: Optional[str] = Query(None),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    api_key: Any = Depends(require_api_key),
+    db: Session = Depends(get_db),
+):
+    rows = list_entries(db, company=company, year=year, facility=facility, month=month)
+    return {"status": "success", "data": [r.to_dict() for r in rows]}
+
+
+@router.post("/ledger/{company}/{year}/rebuild")
+async def rebuild_ledger_totals(company: str, year: int, api_key: Any = Depends(require_api_key), db: Session = Depends(get_db)):
+    """Recompute all facility-months and the annual total from the ledger lines."""
+    try:
+        return rebuild_company_year(db, company, year)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -10,6 +10,7 @@ from app.utils.security import list_api_keys
 
 from app.services.fallback_sources import fetch_facility_info_with_fallback
 from app.utils.security import get_api_key
+from app.services.factor_registry import factor_registry
 
 router = APIRouter()
 
@@ -50,16 +51,9 @@ class EmissionsCalcResponse(BaseModel):
     total_co2e_kg: float
 
 
-def _load_factors() -> dict:
-    """Load static emission factors from JSON file."""
-    try:
-        with open("app/data/emission_factors.json", "r") as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
-
-FACTORS_CACHE = _load_factors()
+def _factors_table() -> dict:
+    """Activity-style factor table of the active set in the shared factor registry."""
+    return factor_registry.current().activity_table
 
 
 def _static_emission_factor(activity: ActivityItem) -> float:
@@ -67,14 +61,15 @@ def _static_emission_factor(activity: ActivityItem) -> float:
 
     Note: These are placeholder factors for demo purposes only.
     """
+    factors = _factors_table()
     if activity.type == "electricity":
         # Lookup by unit with fallback to kWh
-        elec = FACTORS_CACHE.get("electricity", {})
+        elec = factors.get("electricity", {})
         unit_key = (activity.unit or "").lower()
         return float(elec.get(unit_key, elec.get("kwh", 0.45)))
     if activity.type == "fuel":
         fuel = (activity.fuel or "").lower().replace(" ", "_")
-        fuel_map = FACTORS_CACHE.get("fuel", {})
+        fuel_map = factors.get("fuel", {})
         if fuel in ("lng", "natural_gas", "natural", "cng", "natural gas"):
             fuel = "natural_gas"
         unit_key = (activity.unit or "").lower()
@@ -139,7 +134,7 @@ async def calc_emissions(payload: EmissionsCalcRequest, api_key: str = Depends(g
 
     transaction_id = str(uuid.uuid4())
     response = EmissionsCalcResponse(
-        factors_version="demo-static-v1",
+        factors_version=_factors_table()["version"],
         results=results,
         total_co2e_kg=round(total, 4),
     )
@@ -198,7 +193,7 @@ async def debug_list_keys():
 )
 async def get_latest_factors(api_key: str = Depends(get_api_key)):
     """Expose the current static emission factors for transparency/testing."""
-    data = FACTORS_CACHE or {}
+    data = _factors_table()
     version = data.get("version", "unknown")
     sources = data.get("sources", [])
     return {
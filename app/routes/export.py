@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse, PlainTextResponse
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from app.utils.security import require_api_key
-from app.services.cevs_aggregator import compute_cevs_for_company
+from app.services.cevs_aggregator import compute_cevs_for_company_async
+from app.services.cevs_portfolio import cevs_leaderboard
+from app.services.cevs_simulator import SimulationOverrides, create_simulation, get_simulation, simulate, sweep
 from app.services.sec_exporter import cevs_to_sec_json, audit_trails_to_csv, build_and_upload_sec_package
 from app.models.database import get_db, create_tables
 from sqlalchemy.orm import Session
 from app.repositories.audit_trail_repository import list_audit_entries
-from pydantic import BaseModel
-from app.services.audit_service import record_audit
+from pydantic import BaseModel, Field, ValidationError
+from app.services.audit_service import enqueue_audit, flush_pending_audits
 
 router = APIRouter()
 
@@ -25,12 +27,42 @@ class ExportPayload(BaseModel):
     company: str
     scope1: Optional[Scope1Schema] = None
     scope2: Optional[Scope2Schema] = None
+    factors_version: Optional[str] = None
+    gwp_set: Optional[str] = None
     state: Optional[str] = None
 
+class CEVSPortfolioCompany(BaseModel):
+    company: str
+    country: Optional[str] = None
+
+class CEVSLeaderboardPayload(BaseModel):
+    companies: List[CEVSPortfolioCompany]
+    top: Optional[int] = None  # trim the returned leaderboard; ranks and stats cover the whole portfolio
+
+class CEVSSimulationPayload(BaseModel):
+    company: str
+    country: Optional[str] = None
+
+class CEVSScenarioPayload(BaseModel):
+    overrides: SimulationOverrides = Field(default_factory=SimulationOverrides)
+    pollution_source: Optional[str] = None
+
+class CEVSSweepPayload(CEVSScenarioPayload):
+    grid: Dict[str, List[Any]]
+
+def _scenario_payload(model, body: Dict[str, Any]):
+    """Validate a what-if body; bad override values are a 400 like the simulator's own ValueErrors."""
+    try:
+        return model.model_validate(body)
+    except ValidationError as e:
+        err = e.errors()[0]
+        loc = ".".join(str(part) for part in err["loc"])
+        raise HTTPException(status_code=400, detail=f"{loc}: {err['msg']}" if loc else err["msg"])
+
 @router.get("/sec/cevs/{company_name}")
 async def export_cevs(company_name: str, company_country: Optional[str] = None, format: str = Query("json", pattern="^(json|csv)$"), api_key: str = Depends(require_api_key)):
     try:
-        result = compute_cevs_for_company(company_name, company_country=company_country)
+        result = await compute_cevs_for_company_async(company_name, company_country=company_country)
         if format == "json":
             return JSONResponse(content=cevs_to_sec_json(result))
         else:
@@ -49,6 +81,53 @@ async def export_cevs(company_name: str, company_country: Optional[str] = None,
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/sec/cevs/leaderboard")
+async def export_cevs_leaderboard(payload: CEVSLeaderboardPayload, api_key: str = Depends(require_api_key)):
+    try:
+        result = await cevs_leaderboard([c.model_dump() for c in payload.companies])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if payload.top is not None:
+        result["leaderboard"] = result["leaderboard"][:max(0, payload.top)]
+    return {"status": "success", **result}
+
+
+@router.post("/sec/cevs/simulations")
+async def create_cevs_simulation(payload: CEVSSimulationPayload, api_key: str = Depends(require_api_key)):
+    snapshot = await create_simulation(payload.company, company_country=payload.country)
+    return {"status": "success", **snapshot}
+
+
+@router.get("/sec/cevs/simulations/{simulation_id}")
+async def get_cevs_simulation(simulation_id: str, api_key: str = Depends(require_api_key)):
+    try:
+        return {"status": "success", **get_simulation(simulation_id)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+
+@router.post("/sec/cevs/simulations/{simulation_id}/score")
+async def score_cevs_simulation(simulation_id: str, body: Dict[str, Any] = Body(default_factory=dict), api_key: str = Depends(require_api_key)):
+    payload = _scenario_payload(CEVSScenarioPayload, body)
+    try:
+        return {"status": "success", **simulate(simulation_id, payload.overrides, pollution_source=payload.pollution_source)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/sec/cevs/simulations/{simulation_id}/sweep")
+async def sweep_cevs_simulation(simulation_id: str, body: Dict[str, Any] = Body(...), api_key: str = Depends(require_api_key)):
+    payload = _scenario_payload(CEVSSweepPayload, body)
+    try:
+        return {"status": "success", **sweep(simulation_id, payload.grid, overrides=payload.overrides, pollution_source=payload.pollution_source)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/sec/audit")
 async def export_audit(company_cik: Optional[str] = None, limit: int = 100, offset: int = 0, db: Session = Depends(get_db), api_key: str = Depends(require_api_key)):
     # Ensure schema exists (helpful in CI/TestClient)
@@ -56,6 +135,7 @@ async def export_audit(company_cik: Optional[str] = None, limit: int = 100, offs
         create_tables()
     except Exception:
         pass
+    flush_pending_audits()
     entries = list_audit_entries(db, company_cik=company_cik, limit=limit, offset=offset)
     csv_text = audit_trails_to_csv([e.to_dict() for e in entries])
     return PlainTextResponse(csv_text, media_type="text/csv")
@@ -67,7 +147,7 @@ async def export_sec_package(payload: ExportPayload, db: Session = Depends(get_d
         result = build_and_upload_sec_package(company=payload.company, payload=payload.model_dump(), db=db)
         # record in audit trail (store url in notes)
         notes = {"action": "export_package", "url": result.get("url"), "file": result.get("filename")}
-        record_audit(db, source_file="sec_exporter", calculation_version="v0.1.0", company_cik=payload.company, notes=str(notes))
+        enqueue_audit(source_file="sec_exporter", calculation_version="v0.1.0", company_cik=payload.company, notes=str(notes))
         return {"status": "success", **result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -5,13 +5,16 @@ import logging
 from typing import Any, Dict, List, Optional
 import os
 
+import pyarrow as pa
+import pyarrow.compute as pc
+
 from app.clients.global_client import EPAClient
 from app.utils import cache as cache_util
 from app.clients.iso_client import ISOClient
 from app.clients.eea_client import EEAClient
 from app.clients.edgar_client import EDGARClient
 from app.clients.campd_client import CAMDClient
-from app.services.cevs_aggregator import compute_cevs_for_company
+from app.services.cevs_aggregator import compute_cevs_for_company_async
 from app.utils.security import require_api_key
 from app.services.fallback_sources import fetch_us_emissions_data
 from app.utils.response_cache import response_cache
@@ -40,6 +43,22 @@ def _get_cached_data() -> List[Dict[str, Any]]:
     return data
 
 
+def _count_by(data: Any, field: str) -> Dict[str, int]:
+    """Record counts per value of `field` (missing/empty -> "Unknown"), in first-seen order."""
+    counts: Dict[str, int] = {}
+    if isinstance(data, pa.Table):
+        if field not in data.column_names:
+            return {"Unknown": data.num_rows} if data.num_rows else {}
+        for entry in pc.value_counts(data.column(field)).to_pylist():
+            key = str(entry["values"] or "Unknown")
+            counts[key] = counts.get(key, 0) + entry["counts"]
+        return counts
+    for item in data:
+        key = str(item.get(field) or "Unknown")
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
 def _matches_filters(item: Dict[str, Any], *, state: Optional[str], year: Optional[int], pollutant: Optional[str]) -> bool:
     logger.debug(f"Checking item: {item.get('facility_name')}, state: {item.get('state')}, year: {item.get('year')}, pollutant: {item.get('pollutant')}")
     logger.debug(f"Filters: state={state}, year={year}, pollutant={pollutant}")
@@ -151,21 +170,13 @@ async def global_emissions_stats(request: Request):
 
         # Cache miss - compute fresh data
         logger.info("Computing fresh emissions stats")
-        data = _get_cached_data()
-
-        by_state: Dict[str, int] = {}
-        by_pollutant: Dict[str, int] = {}
-        by_year: Dict[str, int] = {}
-
-        for item in data:
-            # Use fields from the normalized EPA schema
-            state = str(item.get("state") or "Unknown")
-            pol = str(item.get("pollutant") or "Unknown")
-            year = str(item.get("year") or "Unknown")
+        # Columnar: counted per column without materializing the records
+        data = cache_util.get_or_set(_fetch_and_normalize, as_table=True)
 
-            by_state[state] = by_state.get(state, 0) + 1
-            by_pollutant[pol] = by_pollutant.get(pol, 0) + 1
-            by_year[year] = by_year.get(year, 0) + 1
+        # Use fields from the normalized EPA schema
+        by_state = _count_by(data, "state")
+        by_pollutant = _count_by(data, "pollutant")
+        by_year = _count_by(data, "year")
 
         response_data = {
             "status": "success",
@@ -173,7 +184,7 @@ async def global_emissions_stats(request: Request):
                 "by_state": by_state,
                 "by_pollutant": by_pollutant,
                 "by_year": by_year,
-                "total_records": len(data),
+                "total_records": data.num_rows if isinstance(data, pa.Table) else len(data),
             },
             "retrieved_at": datetime.now().isoformat(),
             "cached": False
@@ -267,7 +278,7 @@ async def global_cevs(
     country: Optional[str] = None
 ):
     try:
-        result = compute_cevs_for_company(company_name, company_country=country)
+        result = await compute_cevs_for_company_async(company_name, company_country=country)
         return JSONResponse(content={
             "status": "success",
             "company": company_name,
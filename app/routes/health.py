@@ -6,6 +6,8 @@ from datetime import datetime, timezone
 from app.utils import cache as cache_util
 from app.utils.redis_utils import redis_health_check
 from app.services.redis_metrics import redis_metrics
+from app.services.computation_context import computation_stats
+from app.utils.conditional_fetch import revalidation_stats
 
 router = APIRouter()
 
@@ -105,6 +107,35 @@ async def test_email(email: str):
     except Exception as e:
         return {"status": "error", "message": str(e)}  # Re-raise to let Sentry capture it
 
+@router.get("/computation", tags=["Health"], summary="Computation Context Cache Counters")
+async def computation_metrics():
+    """
+    Cumulative hit/miss counters of the per-request computation contexts.
+    A rising hit count means duplicate emissions/validation work was avoided.
+    """
+    return JSONResponse({
+        "status": "success",
+        "data": {
+            "computation_context": computation_stats(),
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
+    })
+
+@router.get("/datasets", tags=["Health"], summary="Upstream Dataset Revalidation Counters")
+async def dataset_revalidation_metrics():
+    """
+    Cumulative conditional-fetch counters per upstream source (eea, iso, epa).
+    not_modified and unchanged count refreshes that needed no new data;
+    bytes_saved is the size of the bodies a 304 did not have to resend.
+    """
+    return JSONResponse({
+        "status": "success",
+        "data": {
+            "revalidation": revalidation_stats(),
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
+    })
+
 @router.get("/redis", tags=["Health"], summary="Redis Metrics and Health")
 async def redis_metrics_check():
     """
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Optional, Any, List
+from sqlalchemy.orm import Session
+
+from app.utils.security import require_api_key
+from app.models.database import get_db
+from app.services.hierarchy_rollup import get_group_rollup, save_group, update_group_node
+
+router = APIRouter()
+
+
+class HierarchyNodeSchema(BaseModel):
+    id: str
+    parent_id: Optional[str] = None
+    name: Optional[str] = None
+    kind: str = Field("facility", pattern="^(group|subsidiary|facility)$")
+    ownership_pct: float = Field(100.0, ge=0, le=100)
+    scope1_emissions_kg: float = 0.0
+    scope2_emissions_kg: float = 0.0
+
+
+class HierarchyPayload(BaseModel):
+    nodes: List[HierarchyNodeSchema]
+
+
+class HierarchyNodeUpdate(BaseModel):
+    scope1_emissions_kg: Optional[float] = None
+    scope2_emissions_kg: Optional[float] = None
+    ownership_pct: Optional[float] = Field(None, ge=0, le=100)
+    parent_id: Optional[str] = None
+
+
+@router.put("/hierarchy/{group_id}")
+async def put_hierarchy(group_id: str, payload: HierarchyPayload, api_key: Any = Depends(require_api_key), db: Session = Depends(get_db)):
+    """Create or extend a reporting group (parent -> subsidiaries -> facilities)."""
+    try:
+        return save_group(db, group_id, [n.model_dump() for n in payload.nodes])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/hierarchy/{group_id}")
+async def get_hierarchy(
+    group_id: str,
+    node: Optional[str] = Query(None, description="Subtree root; defaults to the group root"),
+    depth: int = Query(1, ge=0, le=10),
+    api_key: Any = Depends(require_api_key),
+    db: Session = Depends(get_db),
+):
+    """Consolidated (ownership-weighted) Scope 1/2 totals for the group or a subtree."""
+    try:
+        rollup = get_group_rollup(db, group_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    start = node or rollup.roots()[0]
+    if start not in rollup.parent:
+        raise HTTPException(status_code=404, detail=f"Unknown node {start} in group {group_id}")
+    return rollup.tree(start, depth=depth)
+
+
+@router.patch("/hierarchy/{group_id}/nodes/{node_id}")
+async def patch_hierarchy_node(group_id: str, node_id: str, payload: HierarchyNodeUpdate, api_key: Any = Depends(require_api_key), db: Session = Depends(get_db)):
+    """Edit one node; only the totals on its path to the root are recomputed."""
+    try:
+        return update_group_node(db, group_id, node_id, **payload.model_dump())
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,10 +1,14 @@
+import json
+
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Any
+from typing import Optional, Any, Dict, List
 from sqlalchemy.orm import Session
 
 from app.utils.security import require_api_key
-from app.services.validation_service import cross_validate_epa
+from app.services.validation_service import cross_validate_epa_async
+from app.services.portfolio_validation import plan_portfolio_validation, stream_portfolio_validation
 from app.models.database import get_db
 
 router = APIRouter()
@@ -22,12 +26,26 @@ class ValidatePayload(BaseModel):
     company: str
     scope1: Optional[Scope1Schema] = None
     scope2: Optional[Scope2Schema] = None
+    factors_version: Optional[str] = None
+    # {year: {"co2_tons": .., "nox_tons": .., "so2_tons": ..}} compared against CAMPD for mapped facilities
+    reported_emissions: Optional[Dict[int, Dict[str, float]]] = None
+
+
+class PortfolioCompany(ValidatePayload):
+    state: Optional[str] = None
+
+
+class PortfolioValidatePayload(BaseModel):
+    companies: List[PortfolioCompany]
+    year: Optional[int] = None
+    sample_limit: int = 5
+    include_details: bool = False
 
 
 @router.post("/epa")
-async def validate_epa(payload: ValidatePayload, state: Optional[str] = Query(None), year: Optional[int] = Query(None), db: Session = Depends(get_db), api_key: Any = Depends(require_api_key)):
+async def validate_epa(payload: ValidatePayload, state: Optional[str] = Query(None), year: Optional[int] = Query(None), deadline: Optional[float] = Query(None, gt=0, le=60), db: Session = Depends(get_db), api_key: Any = Depends(require_api_key)):
     try:
-        result = cross_validate_epa(payload.model_dump(), db=db, state=state, year=year)
+        result = await cross_validate_epa_async(payload.model_dump(), db=db, state=state, year=year, deadline=deadline)
         
         # Extract confidence for top-level response
         confidence = result.get("confidence_analysis", {})
@@ -39,9 +57,29 @@ async def validate_epa(payload: ValidatePayload, state: Optional[str] = Query(No
                 "confidence_level": confidence.get("level", "unknown"),
                 "recommendation": confidence.get("recommendation", "Manual review required"),
                 "matches_found": result.get("epa", {}).get("matches_count", 0),
-                "flags_count": len(result.get("flags", []))
+                "flags_count": len(result.get("flags", [])),
+                "partial": result.get("partial", False)
             },
             **result
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/epa/batch")
+async def validate_epa_batch(payload: PortfolioValidatePayload, db: Session = Depends(get_db), api_key: Any = Depends(require_api_key)):
+    """Validate a whole portfolio; streams NDJSON events (start, result per company, progress, summary).
+
+    Companies are grouped by state so each EPA/CAMPD slice is fetched once
+    for the whole portfolio instead of once per company.
+    """
+    try:
+        plan = plan_portfolio_validation(db, [c.model_dump() for c in payload.companies], year=payload.year, sample_limit=payload.sample_limit)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def lines():
+        for event in stream_portfolio_validation(plan, include_details=payload.include_details):
+            yield json.dumps(event, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.activity_ledger import ActivityEntry, FacilityMonthTotal, CompanyYearTotal
+from app.repositories.activity_ledger_repository import (
+    get_entry,
+    get_facility_month,
+    get_company_year,
+    list_facility_months,
+    list_entries,
+    sum_facility_month,
+)
+from app.services.emissions_calculator import calc_scope1, calc_scope2
+from app.services.factor_registry import factor_registry
+
+FacilityMonth = Tuple[str, str, int, int]
+
+
+def _activity_lines(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Split one ledger entry ({company, facility, year, month, scope1?, scope2?}) into keyed lines."""
+    # Keyed by scope + fuel (scope 2: scope only); unit and grid region are
+    # attributes, so correcting either replaces the line instead of adding one.
+    lines = []
+    s1 = entry.get("scope1")
+    if s1:
+        fuel, unit = str(s1["fuel_type"]).lower(), str(s1["unit"]).lower()
+        lines.append({"activity_key": f"scope1:{fuel}", "scope": "scope1", "fuel_type": fuel, "unit": unit, "amount": float(s1["amount"])})
+    s2 = entry.get("scope2")
+    if s2:
+        lines.append({"activity_key": "scope2", "scope": "scope2", "grid_region": s2.get("grid_region"), "amount": float(s2["kwh"])})
+    if not lines:
+        raise ValueError("ledger entry needs scope1 and/or scope2 activity")
+    return lines
+
+
+def _apply_line(db: Session, key: FacilityMonth, line: Dict[str, Any], factors) -> Optional[float]:
+    """Insert or correct one activity line.
+
+    Returns the change in the line's emissions_kg, or None when nothing changed.
+    The existing line is read under a row lock, so concurrent corrections of
+    the same line see each other's result and their deltas add up.
+    """
+    company, facility, year, month = key
+    if line["scope"] == "scope1":
+        calc = calc_scope1(line["fuel_type"], line["amount"], line["unit"], factors)
+    else:
+        calc = calc_scope2(line["amount"], line.get("grid_region"), factors)
+        line = {**line, "grid_region": calc["region"]}
+
+    row = get_entry(db, company=company, facility=facility, year=year, month=month, activity_key=line["activity_key"], for_update=True)
+    if row is None:
+        db.add(ActivityEntry(
+            company=company, facility=facility, year=year, month=month,
+            activity_key=line["activity_key"], scope=line["scope"],
+            fuel_type=line.get("fuel_type"), unit=line.get("unit"), grid_region=line.get("grid_region"),
+            amount=line["amount"], factor=calc["factor"], emissions_kg=calc["emissions_kg"],
+            factors_version=factors.version, revision=1,
+        ))
+        return calc["emissions_kg"]
+    if (row.amount == line["amount"] and row.factors_version == factors.version
+            and row.unit == line.get("unit") and row.grid_region == line.get("grid_region")):
+        return None
+    delta = calc["emissions_kg"] - row.emissions_kg
+    row.amount = line["amount"]
+    row.unit = line.get("unit")
+    row.grid_region = line.get("grid_region")
+    row.factor = calc["factor"]
+    row.emissions_kg = calc["emissions_kg"]
+    row.factors_version = factors.version
+    row.revision = (row.revision or 1) + 1
+    return delta
+
+
+def _refresh_facility_month(db: Session, key: FacilityMonth) -> Tuple[float, float]:
+    """Recompute one facility-month from its lines; returns its (scope1, scope2) delta.
+
+    Reconciliation only (rebuild_company_year): regular writes add line deltas
+    through _add_totals instead of re-reading and overwriting the row.
+    """
+    company, facility, year, month = key
+    scope1, scope2 = sum_facility_month(db, company=company, facility=facility, year=year, month=month)
+    total = get_facility_month(db, company=company, facility=facility, year=year, month=month, for_update=True)
+    if total is None:
+        total = FacilityMonthTotal(company=company, facility=facility, year=year, month=month,
+                                   scope1_emissions_kg=0.0, scope2_emissions_kg=0.0, emissions_kg=0.0)
+        db.add(total)
+    delta = (scope1 - total.scope1_emissions_kg, scope2 - total.scope2_emissions_kg)
+    total.scope1_emissions_kg = scope1
+    total.scope2_emissions_kg = scope2
+    total.emissions_kg = scope1 + scope2
+    return delta
+
+
+def _add_totals(db: Session, model, ids: Dict[str, Any], d1: float, d2: float) -> None:
+    """Add a delta to one totals row with one atomic UPDATE (x = x + :d).
+
+    Concurrent posts for the same facility-month or company-year therefore
+    never overwrite each other's increments; the row is inserted on first use.
+    """
+    key = and_(*(getattr(model, k) == v for k, v in ids.items()))
+    increment = {
+        model.scope1_emissions_kg: model.scope1_emissions_kg + d1,
+        model.scope2_emissions_kg: model.scope2_emissions_kg + d2,
+        model.emissions_kg: model.emissions_kg + (d1 + d2),
+    }
+    updated = db.execute(update(model).where(key).values(increment).execution_options(synchronize_session=False))
+    if not updated.rowcount:
+        try:
+            with db.begin_nested():
+                db.add(model(**ids, scope1_emissions_kg=d1, scope2_emissions_kg=d2, emissions_kg=d1 + d2))
+        except IntegrityError:
+            # another writer inserted the row first: add to theirs
+            db.execute(update(model).where(key).values(increment).execution_options(synchronize_session=False))
+
+
+def _apply_company_delta(db: Session, company: str, year: int, d1: float, d2: float) -> CompanyYearTotal:
+    _add_totals(db, CompanyYearTotal, {"company": company, "year": year}, d1, d2)
+    row = get_company_year(db, company=company, year=year)
+    db.refresh(row)
+    return row
+
+
+def record_activities(db: Session, entries: List[Dict[str, Any]], *, factors_version: Optional[str] = None) -> Dict[str, Any]:
+    """Write or correct ledger entries and incrementally update the rollups.
+
+    Each changed line's emissions delta is added to its facility-month and to
+    the parent company-year totals, so a correction never rescans the rest of
+    the company's year and concurrent writers never overwrite each other.
+    """
+    factors = factor_registry.get(factors_version)
+    touched: Dict[FacilityMonth, List[float]] = {}
+    try:
+        for i, entry in enumerate(entries):
+            company = (entry.get("company") or "").strip()
+            facility = (entry.get("facility") or "").strip()
+            if not company or not facility:
+                raise ValueError(f"entry {i}: company and facility are required")
+            year, month = int(entry["year"]), int(entry["month"])
+            if not 1 <= month <= 12:
+                raise ValueError(f"entry {i}: month must be 1-12")
+            key = (company, facility, year, month)
+            for line in _activity_lines(entry):
+                delta = _apply_line(db, key, line, factors)
+                if delta is not None:
+                    acc = touched.setdefault(key, [0.0, 0.0])
+                    acc[0 if line["scope"] == "scope1" else 1] += delta
+
+        db.flush()
+        company_years: Dict[Tuple[str, int], CompanyYearTotal] = {}
+        deltas: Dict[Tuple[str, int], List[float]] = {}
+        for key in sorted(touched):
+            d1, d2 = touched[key]
+            company, facility, year, month = key
+            _add_totals(db, FacilityMonthTotal, {"company": company, "facility": facility, "year": year, "month": month}, d1, d2)
+            acc = deltas.setdefault((key[0], key[2]), [0.0, 0.0])
+            acc[0] += d1
+            acc[1] += d2
+        for (company, year), (d1, d2) in deltas.items():
+            company_years[(company, year)] = _apply_company_delta(db, company, year, d1, d2)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        "factors_version": factors.version,
+        "entries": len(entries),
+        "recomputed_facility_months": [
+            {"company": c, "facility": f, "year": y, "month": m} for c, f, y, m in sorted(touched)
+        ],
+        "company_years": [row.to_dict() for row in company_years.values()],
+    }
+
+
+def company_year_summary(db: Session, company: str, year: int) -> Dict[str, Any]:
+    """Annual totals plus monthly and per-facility breakdown, read from the stored rollups."""
+    row = get_company_year(db, company=company, year=year)
+    if row is None:
+        raise ValueError(f"No ledger data for {company} in {year}")
+    monthly = [0.0] * 12
+    facilities: Dict[str, Dict[str, Any]] = {}
+    for fm in list_facility_months(db, company=company, year=year):
+        monthly[fm.month - 1] += fm.emissions_kg
+        f = facilities.setdefault(fm.facility, {"facility": fm.facility, "emissions_kg": 0.0, "monthly_emissions_kg": [0.0] * 12})
+        f["emissions_kg"] += fm.emissions_kg
+        f["monthly_emissions_kg"][fm.month - 1] = round(fm.emissions_kg, 6)
+    for f in facilities.values():
+        f["emissions_kg"] = round(f["emissions_kg"], 6)
+    return {
+        **row.to_dict(),
+        "monthly_emissions_kg": [round(v, 6) for v in monthly],
+        "facilities": list(facilities.values()),
+    }
+
+
+def rebuild_company_year(db: Session, company: str, year: int) -> Dict[str, Any]:
+    """Full recompute of every facility-month and the annual total (reconciliation only)."""
+    keys = {(e.company, e.facility, e.year, e.month) for e in list_entries(db, company=company, year=year)}
+    keys |= {(fm.company, fm.facility, fm.year, fm.month) for fm in list_facility_months(db, company=company, year=year)}
+    try:
+        scope1 = scope2 = 0.0
+        for key in sorted(keys):
+            _refresh_facility_month(db, key)
+            fm = get_facility_month(db, company=key[0], facility=key[1], year=key[2], month=key[3])
+            scope1 += fm.scope1_emissions_kg
+            scope2 += fm.scope2_emissions_kg
+        row = get_company_year(db, company=company, year=year)
+        if row is None:
+            row = CompanyYearTotal(company=company, year=year)
+            db.add(row)
+        row.scope1_emissions_kg = scope1
+        row.scope2_emissions_kg = scope2
+        row.emissions_kg = scope1 + scope2
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return row.to_dict()
+
+
+__all__ = ["record_activities", "company_year_summary", "rebuild_company_year"]
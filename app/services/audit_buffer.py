@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.audit_trail import AuditTrail
+
+logger = logging.getLogger(__name__)
+
+_FIELDS = ("source_file", "calculation_version", "company_cik", "s3_path", "gcs_path", "notes")
+_ID_CHUNK = 500
+_FAILED = ".failed"
+
+_BUFFER: Optional["AuditBuffer"] = None
+_BUFFER_LOCK = threading.Lock()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # exists but owned by someone else
+    return True
+
+
+def _read_spool(path: str) -> List[Dict[str, Any]]:
+    rows = []
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue  # torn last line from a crash mid-write
+    return rows
+
+
+def _mapping(row: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: row.get(k) for k in _FIELDS}
+    out["id"] = row["id"]
+    out["timestamp"] = datetime.fromisoformat(row["timestamp"])
+    return out
+
+
+@dataclass
+class _Segment:
+    path: str  # spool file; "" when the rows never reached disk
+    rows: List[Dict[str, Any]]
+    attempts: int = 0
+    first_failure: Optional[float] = None  # time.monotonic() of the first failed insert
+    next_attempt: float = 0.0
+
+
+class AuditBuffer:
+    """Write-behind buffer for audit trail rows.
+
+    enqueue() appends the entry to a local spool file and returns at once; a
+    background thread bulk-inserts pending entries every `interval_ms` or as
+    soon as `max_entries` are waiting. Each flushed batch is exactly one
+    spool segment, deleted only after its insert commits, so entries survive
+    a crash and are re-inserted on the next start (ids are assigned up front,
+    which makes replays idempotent).
+
+    A batch that keeps failing does not hold up the ones behind it: each
+    segment is retried on its own with exponential backoff (from the flush
+    interval up to `retry_backoff_max` seconds). A segment still failing
+    `quarantine_after` seconds after its first failure is renamed to
+    `*.spool.failed` and dropped from memory; quarantined segments are
+    replayed on the next start (recover()) or on demand (replay_failed()).
+    """
+
+    def __init__(self, spool_dir: Optional[str] = None, *, interval_ms: Optional[int] = None, max_entries: Optional[int] = None,
+                 fsync: Optional[bool] = None, retry_backoff_max: Optional[float] = None,
+                 quarantine_after: Optional[float] = None, session_factory: Optional[Callable[[], Session]] = None) -> None:
+        self.spool_dir = spool_dir or settings.AUDIT_SPOOL_DIR
+        self.interval = max(1, int(interval_ms or settings.AUDIT_FLUSH_INTERVAL_MS)) / 1000.0
+        self.max_entries = max(1, int(max_entries or settings.AUDIT_FLUSH_MAX_ENTRIES))
+        self.fsync = settings.AUDIT_SPOOL_FSYNC if fsync is None else fsync
+        self.retry_backoff_max = float(getattr(settings, "AUDIT_RETRY_BACKOFF_MAX_SECONDS", 60.0) if retry_backoff_max is None else retry_backoff_max)
+        self.quarantine_after = float(getattr(settings, "AUDIT_QUARANTINE_AFTER_SECONDS", 3600.0) if quarantine_after is None else quarantine_after)
+        if session_factory is None:
+            from app.models.database import SessionLocal
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+        self._lock = threading.Lock()        # pending list + open spool segment
+        self._flush_lock = threading.Lock()  # one flush at a time
+        self._wake = threading.Event()
+        self._pending: List[Dict[str, Any]] = []
+        self._retry: List[_Segment] = []
+        self._fh: Any = None
+        self._spool_path: Optional[str] = None
+        self._segment = 0
+        self._token = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.stats = {"enqueued": 0, "flushed": 0, "batches": 0, "errors": 0, "recovered": 0, "quarantined": 0, "replayed": 0}
+
+    # ---- lifecycle ----
+    def start(self) -> "AuditBuffer":
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.recover()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="audit-flush", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self.flush(force=True)
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:  # never let the flusher die
+                logger.warning(f"Audit flush failed: {e}")
+
+    # ---- write path ----
+    def enqueue(self, *, source_file: str, calculation_version: str, company_cik: str, s3_path: Optional[str] = None,
+                gcs_path: Optional[str] = None, notes: Optional[str] = None) -> str:
+        row = {
+            "id": uuid.uuid4().hex,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "source_file": source_file,
+            "calculation_version": calculation_version,
+            "company_cik": company_cik,
+            "s3_path": s3_path,
+            "gcs_path": gcs_path,
+            "notes": notes,
+        }
+        line = json.dumps(row, default=str) + "\n"
+        with self._lock:
+            try:
+                if self._fh is None:
+                    self._segment += 1
+                    self._spool_path = os.path.join(self.spool_dir, f"audit-{self._token}-{self._segment:06d}.spool")
+                    self._fh = open(self._spool_path, "a", encoding="utf-8")
+                self._fh.write(line)
+                self._fh.flush()
+                if self.fsync:
+                    os.fsync(self._fh.fileno())
+            except OSError as e:
+                logger.warning(f"Audit spool write failed, entry kept in memory only: {e}")
+            self._pending.append(row)
+            self.stats["enqueued"] += 1
+            full = len(self._pending) >= self.max_entries
+        if full:
+            self._wake.set()
+        return row["id"]
+
+    def _swap(self) -> Optional[_Segment]:
+        with self._lock:
+            if not self._pending:
+                return None
+            batch, path = self._pending, self._spool_path
+            self._pending = []
+            if self._fh is not None:
+                self._fh.close()
+            self._fh, self._spool_path = None, None
+        return _Segment(path or "", batch)
+
+    def flush(self, force: bool = False) -> int:
+        """Insert everything pending and every retry that is due (all of them with `force`); returns rows written."""
+        with self._flush_lock:
+            now = time.monotonic()
+            segments = self._retry + [s for s in [self._swap()] if s is not None]
+            self._retry = []
+            written = 0
+            for seg in segments:
+                if not force and seg.next_attempt > now:
+                    self._retry.append(seg)  # still backing off
+                    continue
+                try:
+                    written += self._write(seg.rows)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    self._failed(seg, e, now)
+                    continue
+                self.stats["batches"] += 1
+                if seg.path:
+                    try:
+                        os.remove(seg.path)
+                    except OSError:
+                        pass
+            self.stats["flushed"] += written
+            return written
+
+    def _failed(self, seg: _Segment, error: Exception, now: float) -> None:
+        seg.attempts += 1
+        if seg.first_failure is None:
+            seg.first_failure = now
+        if now - seg.first_failure >= self.quarantine_after:
+            self._quarantine(seg, error)
+            return
+        delay = min(self.retry_backoff_max, self.interval * 2 ** (seg.attempts - 1))
+        seg.next_attempt = now + delay
+        logger.warning(f"Audit batch insert failed ({len(seg.rows)} entries, attempt {seg.attempts}), retrying in {delay:.1f}s: {error}")
+        self._retry.append(seg)
+
+    def _quarantine(self, seg: _Segment, error: Exception) -> None:
+        """Set a batch aside once it has failed for `quarantine_after` seconds, so the spool does not grow without bound."""
+        try:
+            if seg.path:
+                target = seg.path + _FAILED
+                os.replace(seg.path, target)
+            else:  # never made it to the spool: write the rows out so they are not lost
+                target = os.path.join(self.spool_dir, f"audit-{self._token}-{uuid.uuid4().hex[:8]}.spool{_FAILED}")
+                with open(target, "w", encoding="utf-8") as fh:
+                    fh.writelines(json.dumps(r, default=str) + "\n" for r in seg.rows)
+        except OSError as e:
+            target = "(not saved)"
+            logger.warning(f"Cannot quarantine audit batch {seg.path or '<memory>'}: {e}")
+        self.stats["quarantined"] += len(seg.rows)
+        logger.error(f"Audit batch of {len(seg.rows)} entries still failing after {seg.attempts} attempts, quarantined to {target}: {error}")
+
+    def _write(self, rows: List[Dict[str, Any]]) -> int:
+        db = self._session_factory()
+        try:
+            ids = [r["id"] for r in rows]
+            existing = set()
+            for start in range(0, len(ids), _ID_CHUNK):
+                chunk = ids[start:start + _ID_CHUNK]
+                existing.update(i for (i,) in db.query(AuditTrail.id).filter(AuditTrail.id.in_(chunk)))
+            fresh = [_mapping(r) for r in rows if r["id"] not in existing]
+            if fresh:
+                db.bulk_insert_mappings(AuditTrail, fresh)
+            db.commit()
+            return len(fresh)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    # ---- crash recovery ----
+    def _claim(self, path: str) -> Optional[_Segment]:
+        """Read a spool segment for replay; quarantined ones are renamed back to *.spool first."""
+        try:
+            if path.endswith(_FAILED):
+                target = path[:-len(_FAILED)]
+                os.replace(path, target)
+                path = target
+            return _Segment(path, _read_spool(path))
+        except OSError as e:  # unreadable, or another worker claimed it first
+            logger.warning(f"Cannot read audit spool {path}: {e}")
+            return None
+
+    def _requeue(self, segments: List[_Segment]) -> int:
+        with self._flush_lock:
+            self._retry.extend(segments)
+        return sum(len(seg.rows) for seg in segments)
+
+    def recover(self) -> int:
+        """Queue spool segments left behind by dead processes (or an earlier run of this one), quarantined ones included, and flush them."""
+        segments = []
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, "audit-*.spool")) + glob.glob(os.path.join(self.spool_dir, f"audit-*.spool{_FAILED}"))):
+            if path == self._spool_path or os.path.basename(path).startswith(f"audit-{self._token}-"):
+                continue
+            try:
+                pid = int(os.path.basename(path).split("-")[1])
+            except (IndexError, ValueError):
+                pid = 0
+            if pid and pid != os.getpid() and _pid_alive(pid) and not path.endswith(_FAILED):
+                continue  # another live worker's segment
+            seg = self._claim(path)
+            if seg is not None:
+                segments.append(seg)
+        found = self._requeue(segments)
+        if found:
+            logger.info(f"Replaying {found} audit entries from spool")
+            self.stats["recovered"] += found
+        self.flush()
+        return found
+
+    def replay_failed(self) -> int:
+        """Give every quarantined segment (*.spool.failed) another round of inserts; returns entries queued."""
+        segments = [seg for seg in map(self._claim, sorted(glob.glob(os.path.join(self.spool_dir, f"audit-*.spool{_FAILED}")))) if seg is not None]
+        found = self._requeue(segments)
+        if found:
+            logger.info(f"Replaying {found} quarantined audit entries")
+            self.stats["replayed"] += found
+        self.flush()
+        return found
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending) + sum(len(seg.rows) for seg in self._retry)
+
+
+def get_audit_buffer() -> AuditBuffer:
+    """Process-wide buffer, started (and its spool replayed) on first use."""
+    global _BUFFER
+    with _BUFFER_LOCK:
+        if _BUFFER is None:
+            _BUFFER = AuditBuffer().start()
+            atexit.register(_BUFFER.close)
+        return _BUFFER
+
+
+def flush_audit_buffer() -> int:
+    """Flush the process-wide buffer if one is running; returns rows written."""
+    buf = _BUFFER
+    return buf.flush() if buf is not None else 0
+
+
+def replay_quarantined_audits() -> int:
+    """Re-queue quarantined audit batches on the process-wide buffer; returns entries queued."""
+    return get_audit_buffer().replay_failed()
+
+
+def shutdown_audit_buffer() -> None:
+    """Flush and stop the process-wide buffer (application shutdown)."""
+    global _BUFFER
+    with _BUFFER_LOCK:
+        buf, _BUFFER = _BUFFER, None
+    if buf is not None:
+        buf.close()
+
+
+__all__ = ["AuditBuffer", "get_audit_buffer", "flush_audit_buffer", "replay_quarantined_audits", "shutdown_audit_buffer"]
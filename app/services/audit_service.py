@@ -1,5 +1,6 @@
 from typing import Optional, List
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.repositories.audit_trail_repository import create_audit_entry, list_audit_entries
 from app.models.audit_trail import AuditTrail
 
@@ -8,5 +9,36 @@ def record_audit(db: Session, source_file: str, calculation_version: str, compan
     return create_audit_entry(db, source_file=source_file, calculation_version=calculation_version, company_cik=company_cik, s3_path=s3_path, gcs_path=gcs_path, notes=notes)
 
 
+def enqueue_audit(source_file: str, calculation_version: str, company_cik: str, s3_path: Optional[str] = None, gcs_path: Optional[str] = None, notes: Optional[str] = None) -> str:
+    """Record an audit entry without waiting for the database; returns its id.
+
+    Goes through the write-behind buffer (spooled to disk, bulk-inserted in
+    the background) unless AUDIT_WRITE_BEHIND is off.
+    """
+    fields = dict(source_file=source_file, calculation_version=calculation_version, company_cik=company_cik, s3_path=s3_path, gcs_path=gcs_path, notes=notes)
+    if getattr(settings, "AUDIT_WRITE_BEHIND", True):
+        from app.services.audit_buffer import get_audit_buffer
+        return get_audit_buffer().enqueue(**fields)
+    from app.models.database import SessionLocal
+    db = SessionLocal()
+    try:
+        return record_audit(db, **fields).id
+    finally:
+        db.close()
+
+
+def flush_pending_audits() -> int:
+    """Write buffered entries now, so a following read sees them."""
+    from app.services.audit_buffer import flush_audit_buffer
+    return flush_audit_buffer()
+
+
+def replay_quarantined_audits() -> int:
+    """Re-queue audit batches the write-behind buffer set aside after repeated insert failures."""
+    from app.services.audit_buffer import replay_quarantined_audits as replay
+    return replay()
+
+
 def get_audits(db: Session, company_cik: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[AuditTrail]:
+    flush_pending_audits()
     return list_audit_entries(db, company_cik=company_cik, limit=limit, offset=offset)
@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Pollutant order of the mirror cube and the deviation engine
+POLLUTANTS = ("CO2", "SO2", "NOX")
+_MASS_COLUMNS = {"CO2": "co2_tons", "SO2": "so2_tons", "NOX": "nox_tons"}
+EMISSION_COLUMNS = ("facility_id", "unit_id", "year", "state", "facility_name", "co2_tons", "so2_tons", "nox_tons", "heat_input_mmbtu")
+COMPLIANCE_COLUMNS = ("facility_id", "year", "program", "allowances_deducted", "excess_emissions")
+
+# CAMPD reports mass in short tons; reported emissions are metric tonnes
+SHORT_TON_TO_TONNES = 0.90718474
+
+_FILES = {"emissions": "apportioned_annual.parquet", "compliance": "compliance_annual.parquet"}
+
+# Loaded mirrors keyed by "<dir>:<mtime of both files>" (shared across requests)
+_MIRROR_CACHE: Dict[str, "CampdMirror"] = {}
+_WRITE_LOCK = threading.Lock()
+
+
+def _pick(rec: Dict[str, Any], *keys: str) -> Any:
+    for k in keys:
+        v = rec.get(k)
+        if v not in (None, ""):
+            return v
+    return None
+
+
+def _num(v: Any) -> float:
+    try:
+        return float(v) if v not in (None, "") else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _facility_key(v: Any) -> Optional[str]:
+    if v in (None, ""):
+        return None
+    s = str(v).strip()
+    return s[:-2] if s.endswith(".0") else s  # 3470.0 from a float column is ORIS 3470
+
+
+def normalize_emission_record(rec: Dict[str, Any], *, facility_id: Any = None, year: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Map a CAMPD apportioned/annual record (API camelCase or bulk snake_case) to a mirror row."""
+    fid = _facility_key(_pick(rec, "facilityId", "facility_id", "orisCode", "oris_code") or facility_id)
+    yr = _pick(rec, "year", "reportingYear") or year
+    if fid is None or yr is None:
+        return None
+    return {
+        "facility_id": fid,
+        "unit_id": str(_pick(rec, "unitId", "unit_id") or ""),
+        "year": int(yr),
+        "state": _pick(rec, "stateCode", "state"),
+        "facility_name": _pick(rec, "facilityName", "facility_name"),
+        "co2_tons": _num(_pick(rec, "co2Mass", "co2_mass_tons", "co2_mass", "co2_emissions")),
+        "so2_tons": _num(_pick(rec, "so2Mass", "so2_mass_tons", "so2_mass")),
+        "nox_tons": _num(_pick(rec, "noxMass", "nox_mass_tons", "nox_mass")),
+        "heat_input_mmbtu": _num(_pick(rec, "heatInput", "heat_input_mmbtu", "heat_input")),
+    }
+
+
+def normalize_compliance_record(rec: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    fid = _facility_key(_pick(rec, "facilityId", "facility_id", "orisCode"))
+    yr = _pick(rec, "year")
+    if fid is None or yr is None:
+        return None
+    return {
+        "facility_id": fid,
+        "year": int(yr),
+        "program": _pick(rec, "programCode", "program"),
+        "allowances_deducted": _num(_pick(rec, "totalAllowancesDeducted", "allowances_deducted")),
+        "excess_emissions": _num(_pick(rec, "excessEmissions", "excess_emissions")),
+    }
+
+
+class CampdMirror:
+    """Annual CAMPD emissions for every mirrored facility as a dense cube.
+
+    `values[p, f, y]` is the facility total (all units) of pollutant
+    POLLUTANTS[p] in short tons, NaN where CAMPD reported nothing, so a
+    deviation check over all pollutants and years is a single slice.
+    """
+
+    def __init__(self, emissions: pd.DataFrame, compliance: Optional[pd.DataFrame] = None, *, source: str = "mirror") -> None:
+        self.source = source
+        mass = [_MASS_COLUMNS[p] for p in POLLUTANTS]
+        if len(emissions):
+            totals = emissions.groupby(["facility_id", "year"])[mass].sum(min_count=1)
+            fac = totals.index.get_level_values(0).astype(str).to_numpy()
+            yrs = totals.index.get_level_values(1).astype(np.int64).to_numpy()
+        else:
+            totals, fac, yrs = None, np.empty(0, dtype=object), np.empty(0, dtype=np.int64)
+        self.facility_ids, f_idx = np.unique(fac, return_inverse=True)
+        self.years, y_idx = np.unique(yrs, return_inverse=True)
+        self.facility_index = {f: i for i, f in enumerate(self.facility_ids.tolist())}
+        self.values = np.full((len(POLLUTANTS), len(self.facility_ids), len(self.years)), np.nan)
+        if totals is not None:
+            self.values[:, f_idx, y_idx] = totals.to_numpy(dtype=np.float64).T
+        names = emissions.dropna(subset=["facility_name"]).drop_duplicates("facility_id") if len(emissions) else emissions
+        self.names = dict(zip(names["facility_id"].astype(str), names["facility_name"])) if len(names) else {}
+        self.compliance: Dict[str, List[Dict[str, Any]]] = {}
+        if compliance is not None and len(compliance):
+            for rec in compliance.to_dict(orient="records"):
+                self.compliance.setdefault(str(rec["facility_id"]), []).append(rec)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], *, facility_id: Any = None, year: Optional[int] = None, source: str = "records") -> "CampdMirror":
+        rows = [r for r in (normalize_emission_record(rec, facility_id=facility_id, year=year) for rec in records or [] if isinstance(rec, dict)) if r]
+        return cls(pd.DataFrame(rows, columns=list(EMISSION_COLUMNS)), source=source)
+
+    def __len__(self) -> int:
+        return len(self.facility_ids)
+
+    def has(self, facility_id: Any) -> bool:
+        return _facility_key(facility_id) in self.facility_index
+
+    def reference(self, facility_ids: Sequence[Any], years: Sequence[int]) -> np.ndarray:
+        """(pollutants x years) totals over `facility_ids`; NaN where no facility reported."""
+        rows = [self.facility_index[k] for k in (_facility_key(f) for f in facility_ids) if k in self.facility_index]
+        out = np.full((len(POLLUTANTS), len(years)), np.nan)
+        if not rows or not len(years):
+            return out
+        pos = np.searchsorted(self.years, np.asarray(years, dtype=np.int64))
+        known = (pos < len(self.years)) & (self.years[np.minimum(pos, len(self.years) - 1)] == np.asarray(years))
+        block = self.values[:, rows][:, :, pos[known]]
+        summed = np.nansum(block, axis=1)
+        summed[np.all(np.isnan(block), axis=1)] = np.nan
+        out[:, known] = summed
+        return out
+
+    def latest_year(self, facility_id: Any, pollutant: str = "CO2") -> Optional[int]:
+        i = self.facility_index.get(_facility_key(facility_id))
+        if i is None:
+            return None
+        have = np.flatnonzero(~np.isnan(self.values[POLLUTANTS.index(pollutant), i]))
+        return int(self.years[have[-1]]) if have.size else None
+
+    def annual(self, facility_id: Any) -> List[Dict[str, Any]]:
+        i = self.facility_index.get(_facility_key(facility_id))
+        if i is None:
+            return []
+        out = []
+        for j, yr in enumerate(self.years.tolist()):
+            cells = self.values[:, i, j]
+            if np.all(np.isnan(cells)):
+                continue
+            out.append({"year": yr, **{_MASS_COLUMNS[p]: (None if np.isnan(v) else float(v)) for p, v in zip(POLLUTANTS, cells)}})
+        return out
+
+
+def deviation_thresholds() -> np.ndarray:
+    """Per-pollutant thresholds (%) in POLLUTANTS order, from the VALIDATION_* settings."""
+    return np.array([
+        float(getattr(settings, "VALIDATION_CO2_DEVIATION_THRESHOLD", 15.0)),
+        float(getattr(settings, "VALIDATION_SO2_DEVIATION_THRESHOLD", 25.0)),
+        float(getattr(settings, "VALIDATION_NOX_DEVIATION_THRESHOLD", 20.0)),
+    ])
+
+
+def reported_matrix(reported: Dict[int, Dict[str, float]], years: Sequence[int]) -> np.ndarray:
+    """(pollutants x years) array from {year: {"CO2": t, "NOX": t, ...}}; NaN where not reported."""
+    out = np.full((len(POLLUTANTS), len(years)), np.nan)
+    for j, yr in enumerate(years):
+        for p, pollutant in enumerate(POLLUTANTS):
+            v = (reported.get(yr) or {}).get(pollutant)
+            if v is not None:
+                out[p, j] = float(v)
+    return out
+
+
+def compute_deviations(mirror: CampdMirror, facility_ids: Sequence[Any], reported: Dict[int, Dict[str, float]], *, thresholds: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """Compare reported metric tonnes against the mirror for every pollutant and year in one pass.
+
+    The mirror's short tons are converted to metric tonnes first, so
+    `reported` and `reference` in the result are both tonnes
+    (`reference_short_tons` keeps the CAMPD figure). Severity follows the
+    validation rule: above twice the threshold is critical, above the
+    threshold high, otherwise medium. Cells where either side is missing or
+    zero are skipped.
+    """
+    years = sorted(int(y) for y in reported)
+    if not years:
+        return []
+    thr = deviation_thresholds() if thresholds is None else np.asarray(thresholds, dtype=np.float64)
+    rep = reported_matrix(reported, years)
+    ref_short = mirror.reference(facility_ids, years)
+    ref = ref_short * SHORT_TON_TO_TONNES
+    valid = (rep > 0) & (ref > 0)
+    pct = np.divide(np.abs(rep - ref), ref, out=np.zeros_like(ref), where=valid) * 100.0
+    limit = thr[:, None]
+    severity = np.where(pct > limit * 2, "critical", np.where(pct > limit, "high", "medium"))
+    out = []
+    for j, p in zip(*np.nonzero(valid.T)):  # year-major, pollutants in POLLUTANTS order
+        out.append({
+            "pollutant": POLLUTANTS[p],
+            "year": years[j],
+            "reported": float(rep[p, j]),
+            "reference": float(ref[p, j]),
+            "reference_short_tons": float(ref_short[p, j]),
+            "deviation_pct": float(pct[p, j]),
+            "threshold": float(thr[p]),
+            "severity": str(severity[p, j]),
+            "source": "CAMPD",
+        })
+    return out
+
+
+def _paths(directory: Optional[str]) -> Dict[str, str]:
+    base = directory or settings.CAMPD_MIRROR_DIR
+    return {kind: os.path.join(base, name) for kind, name in _FILES.items()}
+
+
+def load_campd_mirror(directory: Optional[str] = None) -> Optional[CampdMirror]:
+    """The local mirror, re-read only when its Parquet files change; None when absent."""
+    paths = _paths(directory)
+    try:
+        stamp = os.path.getmtime(paths["emissions"])
+    except OSError:
+        return None
+    comp_stamp = os.path.getmtime(paths["compliance"]) if os.path.exists(paths["compliance"]) else None
+    key = f"{paths['emissions']}:{stamp}:{comp_stamp}"
+    cached = _MIRROR_CACHE.get(key)
+    if cached is not None:
+        return cached
+    try:
+        emissions = pd.read_parquet(paths["emissions"])
+        compliance = pd.read_parquet(paths["compliance"]) if comp_stamp is not None else None
+        mirror = CampdMirror(emissions, compliance, source="local_mirror")
+    except Exception as e:
+        logger.warning(f"Failed to load CAMPD mirror {paths['emissions']}: {e}")
+        return None
+    _MIRROR_CACHE.clear()  # only the newest mirror is worth keeping
+    _MIRROR_CACHE[key] = mirror
+    return mirror
+
+
+def write_campd_mirror(records: Iterable[Dict[str, Any]], *, kind: str = "emissions", directory: Optional[str] = None) -> Dict[str, int]:
+    """Merge raw CAMPD records into the mirror; re-loaded rows replace older copies."""
+    if kind not in _FILES:
+        raise ValueError(f"kind must be one of: {', '.join(_FILES)}")
+    normalize = normalize_emission_record if kind == "emissions" else normalize_compliance_record
+    columns = list(EMISSION_COLUMNS if kind == "emissions" else COMPLIANCE_COLUMNS)
+    key = ["facility_id", "unit_id", "year"] if kind == "emissions" else ["facility_id", "year", "program"]
+    rows, skipped = [], 0
+    for rec in records:
+        row = normalize(rec) if isinstance(rec, dict) else None
+        if row is None:
+            skipped += 1
+        else:
+            rows.append(row)
+    path = _paths(directory)[kind]
+    with _WRITE_LOCK:
+        fresh = pd.DataFrame(rows, columns=columns)
+        if os.path.exists(path):
+            fresh = pd.concat([pd.read_parquet(path), fresh], ignore_index=True)
+        fresh["facility_id"] = fresh["facility_id"].astype(str)
+        fresh["year"] = fresh["year"].astype(np.int64)
+        merged = fresh.drop_duplicates(subset=key, keep="last").sort_values(["facility_id", "year"]).reset_index(drop=True)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        merged.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    return {"written": len(rows), "skipped": skipped, "rows": int(len(merged))}
+
+
+def refresh_campd_mirror(years: Iterable[int], *, client: Any = None, per_page: int = 1000, directory: Optional[str] = None) -> Dict[str, Any]:
+    """Bulk-load apportioned annual emissions and compliance for `years` from the CAMPD API."""
+    if client is None:
+        from app.clients.campd_client import CAMDClient
+        client = CAMDClient()
+    summary: Dict[str, Any] = {"years": [], "emissions": 0, "compliance": 0}
+    for year in years:
+        for kind, fetch in (("emissions", client.get_annual_emissions_page), ("compliance", client.get_compliance_page)):
+            batch: List[Dict[str, Any]] = []
+            page = 1
+            while True:
+                data = fetch(int(year), page=page, per_page=per_page) or []
+                batch.extend(data)
+                if len(data) < per_page:
+                    break
+                page += 1
+            if batch:
+                summary[kind] += write_campd_mirror(batch, kind=kind, directory=directory)["written"]
+        summary["years"].append(int(year))
+    return summary
+
+
+def mirror_stats(directory: Optional[str] = None) -> Dict[str, Any]:
+    mirror = load_campd_mirror(directory)
+    if mirror is None:
+        return {"available": False, "facilities": 0, "years": []}
+    return {
+        "available": True,
+        "facilities": len(mirror),
+        "years": mirror.years.tolist(),
+        "pollutants": list(POLLUTANTS),
+        "reported_cells": int(np.count_nonzero(~np.isnan(mirror.values))),
+    }
+
+
+__all__ = [
+    "POLLUTANTS",
+    "CampdMirror",
+    "normalize_emission_record",
+    "normalize_compliance_record",
+    "deviation_thresholds",
+    "reported_matrix",
+    "compute_deviations",
+    "SHORT_TON_TO_TONNES",
+    "load_campd_mirror",
+    "write_campd_mirror",
+    "refresh_campd_mirror",
+    "mirror_stats",
+]
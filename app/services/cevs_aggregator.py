@@ -1,28 +1,95 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 import os
 
 from app.clients.global_client import EPAClient
 from app.clients.iso_client import ISOClient
 from app.clients.eea_client import EEAClient
-from app.clients.edgar_client import EDGARClient
+from app.clients.edgar_client import EDGARClient, series_trend
 # --- CHANGE 1: Import CAMDClient ---
 from app.clients.campd_client import CAMDClient
-from app.utils.policy import load_best_practices, practices_for_country
+from app.config import settings
+from app.utils.iso_index import ISOIndex
+from app.utils.mappings import normalize_country_name
+from app.utils.policy import load_best_practices
+from app.services.country_features import (
+    build_country_features,
+    build_global_features,
+    get_feature_table,
+    put_country_features,
+    save_feature_table,
+    update_global_features,
+)
 
 # Add imports for audit recording
-from app.models.database import SessionLocal
-from app.services.audit_service import record_audit
+from app.services.audit_service import enqueue_audit
 
 logger = logging.getLogger(__name__)
 
+# Order in which sources are listed in `sources.composition`
+CEVS_SOURCES = ("epa", "iso", "eea_renewables", "eea_pollution", "edgar", "policy", "campd")
+
+# Clients are shared across requests; their own caches (lru_cache, EDGAR
+# aggregate, HTTP sessions) only pay off when the instance survives the call.
+_CLIENTS: Dict[str, Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+# Blocking clients run here rather than on the loop's default executor, so a
+# stuck upstream call never holds up asyncio.run() shutdown in sync callers.
+_SOURCE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="cevs-source")
+
+# Last good value per (source, key), served when a source misses its deadline
+_LAST_GOOD: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+_LAST_GOOD_LOCK = threading.Lock()
+
+_REFRESH_LOCK = threading.Lock()
+
+
+def _client(name: str, factory: Callable[[], Any]) -> Any:
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(name)
+        if client is None:
+            client = _CLIENTS[name] = factory()
+        return client
+
+
+def _blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Awaitable[Any]:
+    return asyncio.get_running_loop().run_in_executor(_SOURCE_POOL, partial(fn, *args, **kwargs))
+
 
 def _normalize_name(name: Optional[str]) -> str:
     return (name or "").strip().lower()
 
 
+def _iso_index(iso_client: Any) -> Optional[ISOIndex]:
+    """The client's process-wide certificate index as last built; None for clients without one."""
+    current = getattr(iso_client, "certification_index", None)
+    return current(refresh=False) if callable(current) else None
+
+
+def has_iso_certificate(company_name: str, company_country: Optional[str], rows: Optional[List[Dict[str, Any]]],
+                        index: Optional[ISOIndex] = None) -> bool:
+    """Whether a certificate holder's normalized name contains the company's (within its country).
+
+    `rows` is what the ISO source returned for the country; nothing there
+    means no bonus. The lookup goes through the client's process-wide index
+    (filtered to the country) when there is one, else through a small index
+    over the rows themselves.
+    """
+    if not rows:
+        return False
+    if index is None:
+        return ISOIndex(rows).has_certification(company_name)
+    return index.has_certification(company_name, country=company_country)
+
+
 def _search_epa_by_company(company_name: str, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Helper to search normalized EPA data based on company/facility name."""
     if not data:
@@ -35,7 +102,265 @@ def _search_epa_by_company(company_name: str, data: List[Dict[str, Any]]) -> Lis
             results.append(rec)
     return results
 
-def compute_cevs_for_company(company_name: str, *, company_country: Optional[str] = None) -> Dict[str, Any]:
+
+def source_deadline(name: str) -> float:
+    """Deadline (s) for one source: CEVS_SOURCE_DEADLINES entry, else CEVS_SOURCE_DEADLINE_SECONDS."""
+    for part in str(getattr(settings, "CEVS_SOURCE_DEADLINES", "") or "").split(","):
+        key, _, value = part.partition("=")
+        if key.strip() == name and value.strip():
+            try:
+                return float(value)
+            except ValueError:
+                break
+    return float(getattr(settings, "CEVS_SOURCE_DEADLINE_SECONDS", 6.0))
+
+
+async def _run_source(name: str, key: str, fetch: Callable[[], Awaitable[Any]]) -> Tuple[Any, Dict[str, Any]]:
+    """Await one source under its deadline; fall back to its last good value on timeout/error."""
+    deadline = source_deadline(name)
+    started = time.perf_counter()
+    try:
+        value = await asyncio.wait_for(fetch(), timeout=deadline)
+    except asyncio.TimeoutError:
+        status: Dict[str, Any] = {"status": "timed_out", "deadline_s": deadline}
+    except Exception as e:
+        logger.warning(f"CEVS source {name} failed: {e}")
+        status = {"status": "error", "error": str(e)}
+    else:
+        with _LAST_GOOD_LOCK:
+            _LAST_GOOD[(name, key)] = (time.time(), value)
+        return value, {"status": "ok", "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1)}
+    with _LAST_GOOD_LOCK:
+        cached = _LAST_GOOD.get((name, key))
+    if cached is not None:
+        return cached[1], {"status": "cached", "reason": status["status"], "age_s": round(time.time() - cached[0], 1)}
+    return None, status
+
+
+def _fetch_epa() -> List[Dict[str, Any]]:
+    epa_client = _client("epa", EPAClient)
+    # Try a short-timeout EPA fetch for responsiveness
+    try:
+        epa_records_raw = epa_client.get_emissions_data(limit=200, timeout=5.0)
+    except Exception:
+        epa_records_raw = epa_client.create_sample_data()
+    return epa_client.format_emission_data(epa_records_raw)
+
+
+def _fetch_edgar(country: str) -> Dict[str, Any]:
+    """PM2.5 and NOx trend plus series from one workbook load (used by both pollution branches)."""
+    edgar_client = _client("edgar", EDGARClient)
+    path = getattr(edgar_client, "xlsx_path", None)
+    if path and not os.path.exists(path):
+        return {}  # no workbook installed: a stable "no EDGAR data" answer, not a failure
+    series = edgar_client.get_countries_series([country], ["PM2.5", "NOx"])[country]
+    return {pol: {"trend": series_trend(values, pol), "series": values} for pol, values in series.items()}
+
+
+def _fetch_campd(facility_id: int) -> Dict[str, Any]:
+    campd_client = _client("campd", CAMDClient)
+    return {
+        "emissions": campd_client.get_emissions_data(facility_id),
+        "compliance": campd_client.get_compliance_data(facility_id),
+    }
+
+
+# Placeholder for mapping company names to CAMPD facility IDs.
+# In real implementation, you need a more dynamic way to get this.
+_FACILITY_ID_MAP = {
+    "example power plant inc.": 12345,
+    "tennessee valley authority": 7, # Real example
+    "southern company": 553, # Real example
+}
+
+
+async def _refresh_global_features() -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]], bool]:
+    """Fetch both EEA datasets; returns (global features, composition, materialized?)."""
+    eea_client = _client("eea", EEAClient)
+    (renewables, r_status), (pollution, p_status) = await asyncio.gather(
+        _run_source("eea_renewables", "all", eea_client.get_countries_renewables),
+        _run_source("eea_pollution", "all", eea_client.get_industrial_pollution),
+    )
+    composition = {"eea_renewables": r_status, "eea_pollution": p_status}
+    if r_status["status"] == "ok" and p_status["status"] == "ok":
+        table = update_global_features(renewables, pollution)
+        await _blocking(save_feature_table, table)
+        return table.global_, composition, True
+    return build_global_features(renewables, pollution), composition, False
+
+
+def _refresh_in_background() -> None:
+    """Re-validate the EEA datasets off the request path (at most one refresh at a time)."""
+    if not _REFRESH_LOCK.acquire(blocking=False):
+        return
+
+    def run() -> None:
+        try:
+            asyncio.run(_refresh_global_features())
+        except Exception as e:
+            logger.warning(f"CEVS feature refresh failed: {e}")
+        finally:
+            _REFRESH_LOCK.release()
+
+    threading.Thread(target=run, name="cevs-features", daemon=True).start()
+
+
+def _from_table(table: Any, *names: str) -> Dict[str, Dict[str, Any]]:
+    status = {"status": "ok", "origin": "feature_table", "age_s": round(time.time() - table.built_at, 1)}
+    return {name: dict(status) for name in names}
+
+
+async def country_features(company_country: Optional[str]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """Country-level CEVS inputs from the materialized table; returns (global, country row, composition).
+
+    Missing pieces are fetched (under their source deadlines) and stored
+    only when every input arrived fresh, so a partial row is never cached.
+    """
+    table = get_feature_table()
+    row = table.get(company_country)
+    pending: Dict[str, Awaitable[Tuple[Any, Dict[str, Any]]]] = {}
+    if company_country and row is None:
+        country_key = normalize_country_name(company_country)
+        pending = {
+            "edgar": asyncio.ensure_future(_run_source("edgar", country_key, lambda: _blocking(_fetch_edgar, company_country))),
+            "policy": asyncio.ensure_future(_run_source("policy", "all", lambda: _blocking(load_best_practices))),
+        }
+
+    if table.global_ is None:
+        global_, composition, materialize = await _refresh_global_features()
+        table = get_feature_table()
+    else:
+        if table.refresh_due():
+            _refresh_in_background()
+        global_, composition, materialize = table.global_, _from_table(table, "eea_renewables", "eea_pollution"), True
+
+    if not company_country:
+        return global_, None, composition
+    if row is not None:
+        composition.update(_from_table(table, "edgar", "policy"))
+        return global_, row, composition
+
+    (edgar, e_status), (practices, p_status) = await asyncio.gather(pending["edgar"], pending["policy"])
+    composition.update({"edgar": e_status, "policy": p_status})
+    row = build_country_features(company_country, global_, edgar, practices)
+    if materialize and e_status["status"] == "ok" and p_status["status"] == "ok" and put_country_features(table, row):
+        await _blocking(save_feature_table, table)
+    return global_, row, composition
+
+
+async def gather_cevs_sources(company_name: str, company_country: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """Fetch every CEVS input concurrently; returns (data by source, composition by source).
+
+    Company-level sources (EPA, ISO, CAMPD) are fetched per call; country
+    inputs come from the materialized feature table. Blocking clients run on
+    worker threads, EEA's async loaders on the loop. Each source has its own
+    deadline; a late or failing source contributes its last good value
+    ("cached") or nothing, and never delays the others.
+    """
+    country_key = normalize_country_name(company_country) if company_country else ""
+    facility_id = _FACILITY_ID_MAP.get(_normalize_name(company_name))
+    iso_client = _client("iso", ISOClient)
+
+    jobs: Dict[str, Tuple[str, Callable[[], Awaitable[Any]]]] = {
+        "epa": ("all", lambda: _blocking(_fetch_epa)),
+        "iso": (country_key or "all", lambda: _blocking(iso_client.get_iso14001_certifications, country=company_country, limit=100)),
+    }
+    if facility_id:
+        jobs["campd"] = (str(facility_id), lambda: _blocking(_fetch_campd, facility_id))
+
+    names = list(jobs)
+    (global_, country_row, composition), *outcomes = await asyncio.gather(
+        country_features(company_country),
+        *(_run_source(n, jobs[n][0], jobs[n][1]) for n in names),
+    )
+    data: Dict[str, Any] = {"facility_id": facility_id, "global": global_, "country": country_row}
+    for name, (value, status) in zip(names, outcomes):
+        data[name] = value
+        composition[name] = status
+    data["iso_index"] = _iso_index(iso_client)
+    return data, {name: composition.get(name, {"status": "skipped"}) for name in CEVS_SOURCES}
+
+
+async def gather_portfolio_sources(companies: List[Tuple[str, Optional[str]]]) -> Dict[str, Any]:
+    """Fetch CEVS inputs for many (company, country) pairs, each shared source once.
+
+    EPA is fetched once, ISO and country features once per distinct
+    country, CAMPD once per mapped facility. Values are (value, status)
+    pairs as returned by the single-company pipeline.
+    """
+    countries = list(dict.fromkeys(country for _, country in companies))
+    facility_ids = {name: _FACILITY_ID_MAP.get(_normalize_name(name)) for name, _ in companies}
+    facilities = sorted({fid for fid in facility_ids.values() if fid})
+    iso_client = _client("iso", ISOClient)
+
+    def iso_job(country: Optional[str]) -> Awaitable[Tuple[Any, Dict[str, Any]]]:
+        key = normalize_country_name(country) if country else "all"
+        return _run_source("iso", key, lambda: _blocking(iso_client.get_iso14001_certifications, country=country, limit=100))
+
+    def campd_job(fid: int) -> Awaitable[Tuple[Any, Dict[str, Any]]]:
+        return _run_source("campd", str(fid), lambda: _blocking(_fetch_campd, fid))
+
+    epa_fut = asyncio.ensure_future(_run_source("epa", "all", lambda: _blocking(_fetch_epa)))
+    iso_futs = [asyncio.ensure_future(iso_job(c)) for c in countries]
+    campd_futs = [asyncio.ensure_future(campd_job(fid)) for fid in facilities]
+    # The first country warms the shared EEA features; the rest then only fetch EDGAR/policy
+    features = [await country_features(countries[0])] if countries else []
+    features += await asyncio.gather(*(country_features(c) for c in countries[1:]))
+    return {
+        "epa": await epa_fut,
+        "iso": dict(zip(countries, await asyncio.gather(*iso_futs))),
+        "features": dict(zip(countries, features)),
+        "campd": dict(zip(facilities, await asyncio.gather(*campd_futs))),
+        "facility_ids": facility_ids,
+        "iso_index": _iso_index(iso_client),
+    }
+
+
+def campd_score(facility_id: Optional[int], campd: Optional[Dict[str, Any]]) -> Tuple[float, Dict[str, Any]]:
+    """CAMPD penalty (emissions thresholds plus non-compliance, capped at 40) and its breakdown."""
+    campd_penalty = 0.0
+    campd_details = {}
+    if facility_id and campd:
+        try:
+            emissions_data = campd.get("emissions")
+            compliance_data = campd.get("compliance")
+
+            # Emissions penalty logic (simple example)
+            # Penalty based on total CO2, SO2, and NOx emissions
+            # You should adjust these thresholds
+            emissions_penalty = 0
+            if emissions_data:
+                total_co2 = sum(d.get('co2Mass', 0) for d in emissions_data)
+                total_so2 = sum(d.get('so2Mass', 0) for d in emissions_data)
+                total_nox = sum(d.get('noxMass', 0) for d in emissions_data)
+
+                if total_co2 > 5000000: emissions_penalty += 10
+                if total_so2 > 1000: emissions_penalty += 5
+                if total_nox > 1000: emissions_penalty += 5
+
+            # Compliance penalty logic
+            # 20 point penalty if any compliance indicator is non-compliant
+            compliance_penalty = 0
+            if compliance_data:
+                is_compliant = all(d.get('compliantIndicator', 1) == 1 for d in compliance_data)
+                if not is_compliant:
+                    compliance_penalty = 20
+
+            campd_penalty = min(40.0, emissions_penalty + compliance_penalty) # Limit maximum penalty
+            campd_details = {
+                "facility_id": facility_id,
+                "emissions_penalty": emissions_penalty,
+                "compliance_penalty": compliance_penalty,
+                "total_penalty": campd_penalty
+            }
+
+        except Exception as e:
+            logger.warning(f"Failed to process CAMPD data for facility_id {facility_id}: {e}")
+
+    return campd_penalty, campd_details
+
+
+def score_cevs(company_name: str, company_country: Optional[str], data: Dict[str, Any], composition: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
     """Compute a simple CEVS score by combining EPA, ISO, and EEA data.
 
     Current heuristic:
@@ -44,72 +369,20 @@ def compute_cevs_for_company(company_name: str, *, company_country: Optional[str
       - - up to 30 penalty based on EPA results count in the company's state (proxy via name contains)
       - + up to 20 boost for EEA indicator improvements (placeholder)
       - - up to 50 penalty based on CAMPD emissions and compliance data
+
+    `data` holds the company-level sources (None when missing) plus the
+    precomputed "global" and "country" feature rows, so scoring is lookups
+    and arithmetic only.
     """
-    company_key = _normalize_name(company_name)
-
-    # --- CHANGE 2: Initialize CAMDClient ---
-    campd_client = CAMDClient()
-    
-    # Placeholder for mapping company names to CAMPD facility IDs.
-    # In real implementation, you need a more dynamic way to get this.
-    facility_id_map = {
-        "example power plant inc.": 12345,
-        "tennessee valley authority": 7, # Real example
-        "southern company": 553, # Real example
-    }
-    facility_id = facility_id_map.get(company_key)
+    facility_id = data.get("facility_id")
+    global_ = data.get("global") or build_global_features(None, None)
+    country_row = data.get("country") or {}
 
+    epa_matches = _search_epa_by_company(company_name, data.get("epa") or [])
 
-    # EPA: use permits data normalized list, then filter by company name
-    epa_client = EPAClient()
-    # Try a short-timeout EPA fetch for responsiveness
-    try:
-        epa_records_raw = epa_client.get_emissions_data(limit=200, timeout=5.0)
-    except Exception:
-        epa_records_raw = epa_client.create_sample_data()
-    epa_norm = epa_client.format_emission_data(epa_records_raw)
-    epa_matches = _search_epa_by_company(company_name, epa_norm)
-
-    # ISO: sample-backed; filter by country if provided, and by company name contains
-    iso_client = ISOClient()
-    iso_norm = iso_client.get_iso14001_certifications(country=company_country, limit=100)
-    has_iso = any(_normalize_name(r.get("company_name")) and company_key in _normalize_name(r.get("company_name")) for r in iso_norm)
-
-    # EEA: use new Parquet-based datasets (renewables and industrial pollution)
-    eea_client = EEAClient()
-    # New: country renewables row and EU average row for comparison
-    renew_row = eea_client.get_country_renewables(company_country) if company_country else None
-    import inspect
-    renew_all = []
-    try:
-        if not inspect.iscoroutinefunction(EEAClient.get_countries_renewables):
-            renew_all = eea_client.get_countries_renewables()
-        else:
-            renew_all = []
-    except Exception:
-        renew_all = []
-    eu_row = next((r for r in renew_all if (r.get("country") or "").strip().lower() in ("eu-27", "eu27", "eu 27", "eu")), None)
-    # New: industrial pollution timeseries/trend from EEA (global, not per company)
-    pol_series = []
-    try:
-        if not inspect.iscoroutinefunction(EEAClient.get_industrial_pollution):
-            pol_series = eea_client.get_industrial_pollution()
-        else:
-            pol_series = []
-    except Exception:
-        pol_series = []
-    pol_trend = eea_client.compute_pollution_trend(pol_series) if pol_series else {"total_n": {"increase": False}, "total_p": {"increase": False}}
-    # New: EDGAR country trends as fallback/augmentation if country provided
-    edgar_details: Dict[str, Any] = {}
-    if company_country:
-        try:
-            edgar_client = EDGARClient()
-            # Prefer PM2.5 and NOx as air-quality related proxies
-            pm_tr = edgar_client.compute_country_trend(company_country, pollutant="PM2.5")
-            nox_tr = edgar_client.compute_country_trend(company_country, pollutant="NOx")
-            edgar_details = {"pm25": pm_tr, "nox": nox_tr}
-        except Exception as e:
-            logger.warning(f"EDGAR trend load failed: {e}")
+    # ISO: filter by country if provided, and by company name contains (indexed lookup)
+    iso_norm = data.get("iso") or []
+    has_iso = has_iso_certificate(company_name, company_country, iso_norm, data.get("iso_index"))
 
     # Scoring heuristic
     score = 50.0
@@ -133,88 +406,30 @@ def compute_cevs_for_company(company_name: str, *, company_country: Optional[str
     components["epa_penalty"] = -epa_penalty
     score -= epa_penalty
 
-    # Renewables bonus (dynamic): reward exceeding target and EU average
-    renew_bonus = 0.0
-    renew_details: Dict[str, Any] = {}
-    if renew_row and isinstance(renew_row.get("renewable_energy_share_2021_proxy"), (int, float)):
-        share = float(renew_row["renewable_energy_share_2021_proxy"])  # %
-        target = float(renew_row.get("target_2020") or 0.0)
-        eu_share = None
-        if eu_row and isinstance(eu_row.get("renewable_energy_share_2021_proxy"), (int, float)):
-            eu_share = float(eu_row["renewable_energy_share_2021_proxy"])  # % EU-27 2021
-
-        # Weights: how much to reward beating target vs EU average
-        W_TARGET = 0.5  # pts per 1% over target
-        W_EU = 0.2      # pts per 1% over EU average
-        MAX_RENEW = 20.0
-
-        bonus_target = max(0.0, (share - target)) * W_TARGET
-        bonus_eu = max(0.0, (share - (eu_share or 0.0))) * W_EU
-        renew_bonus = min(MAX_RENEW, bonus_target + bonus_eu)
-
-        renew_details = {
-            "share_2021": round(share, 2),
-            "target_2020": round(target, 2) if target else None,
-            "eu_share_2021": round(eu_share, 2) if eu_share is not None else None,
-            "bonus_from_target": round(bonus_target, 2),
-            "bonus_from_eu": round(bonus_eu, 2),
-            "weights": {"W_TARGET": W_TARGET, "W_EU": W_EU},
-            "cap": MAX_RENEW,
-        }
-
+    # Renewables bonus: precomputed per country against target and EU average
+    renewables = country_row.get("renewables") or {}
+    renew_bonus = float(renewables.get("bonus") or 0.0)
     components["renewables_bonus"] = round(renew_bonus, 2)
     score += renew_bonus
 
     # Industrial pollution penalty with source selection (ENV: CEVS_POLLUTION_SOURCE=auto|eea|edgar)
-    pol_penalty = 0.0
-    pol_details: Dict[str, Any] = {}
+    edgar = country_row.get("edgar")
+    eea_pol = global_["eea_pollution"]
     source_pref = (os.getenv("CEVS_POLLUTION_SOURCE") or "auto").strip().lower()
     chosen_source = "eea"
-    if source_pref == "edgar" and edgar_details:
+    if source_pref == "edgar" and edgar:
         chosen_source = "edgar"
     elif source_pref == "auto":
-        chosen_source = "eea" if pol_series else ("edgar" if edgar_details else "eea")
+        chosen_source = "eea" if eea_pol["available"] else ("edgar" if edgar else "eea")
+
+    if chosen_source == "edgar":
+        pol_penalty = float(edgar["penalty"])
+        pol_details = edgar["details"]
     else:
-        chosen_source = "eea"
-
-    if chosen_source == "eea" and isinstance(pol_trend, dict):
-        def slope_for(key: str) -> Dict[str, Any]:
-            vals = [r.get(key) for r in pol_series if isinstance(r.get(key), (int, float))]
-            if len(vals) < 2:
-                return {"slope": 0.0, "increase": False}
-            sel = vals[-3:] if len(vals) >= 3 else vals
-            s = float(sel[-1] - sel[0])
-            return {"slope": s, "increase": s > 0.0}
-
-        keys_weights = {"cd_hg_ni_pb": 6.0, "total_n": 4.0, "total_p": 4.0, "toc": 3.0}
-        trend_all: Dict[str, Any] = {}
-        for k, w in keys_weights.items():
-            tr = slope_for(k)
-            trend_all[k] = tr
-            if tr.get("increase"):
-                slope = float(tr.get("slope") or 0.0)
-                intensity = min(max(slope / 10.0, 0.0), 1.0)
-                pol_penalty += w * intensity
-        pol_details = {"source": "eea", "trends": trend_all, "weights": keys_weights, "scaled_penalty": round(pol_penalty, 2)}
-        if edgar_details:
-            pol_details["edgar"] = edgar_details
-    elif chosen_source == "edgar" and edgar_details and company_country:
-        weights = {"PM2.5": 8.0, "NOx": 7.0}
-        trends: Dict[str, Any] = {}
-        try:
-            edgar_client = EDGARClient()
-            for pol, w in [("PM2.5", weights["PM2.5"]), ("NOx", weights["NOx"])]:
-                tr = edgar_client.get_country_emissions_trend(company_country, pollutant=pol)
-                series = edgar_client.get_country_series(company_country, pol)
-                end_val = float(series[-1]["value"]) if series else 0.0
-                delta = float(tr.get("slope") or 0.0)
-                rel = (delta / max(abs(end_val), 1.0)) if tr.get("increase") else 0.0
-                intensity = min(max(rel, 0.0), 1.0)
-                pol_penalty += w * intensity
-                trends[pol] = {"trend": tr, "end_value": end_val, "intensity": round(intensity, 4)}
-            pol_details = {"source": "edgar", "trends": trends, "weights": weights, "scaled_penalty": round(pol_penalty, 2)}
-        except Exception as e:
-            logger.warning(f"EDGAR penalty computation failed: {e}")
+        pol_penalty = float(eea_pol["penalty"])
+        pol_details = dict(eea_pol["details"])
+        if edgar:
+            pol_details["edgar"] = edgar["trends"]
 
     pol_penalty = min(15.0, pol_penalty)
     components["pollution_penalty"] = -pol_penalty
@@ -224,11 +439,7 @@ def compute_cevs_for_company(company_name: str, *, company_country: Optional[str
     policy_bonus = 0.0
     policy_details: Dict[str, Any] = {}
     if has_iso and company_country:
-        practices = load_best_practices()
-        country_pracs = practices_for_country(practices, company_country)
-        # Look for impactful typologies
-        impactful = {"Fast-track permits/simplification in the application", "Reduced inspection frequencies", "Reduced reporting and monitoring requirements"}
-        matches = [p for p in country_pracs if (p.get("scheme") and "iso 14001" in p.get("scheme", "").lower()) and (p.get("typology") in impactful)]
+        matches = country_row.get("policy_matches") or []
         # +1 per impactful practice up to +3
         policy_bonus = float(min(3, len(matches)))
         policy_details = {"practices": matches[:5], "count": len(matches)}
@@ -236,52 +447,15 @@ def compute_cevs_for_company(company_name: str, *, company_country: Optional[str
     score += policy_bonus
 
     # --- CHANGE 4: Scoring logic for CAMPD data ---
-    campd_penalty = 0.0
-    campd_details = {}
-    if facility_id:
-        try:
-            emissions_data = campd_client.get_emissions_data(facility_id)
-            compliance_data = campd_client.get_compliance_data(facility_id)
-            
-            # Emissions penalty logic (simple example)
-            # Penalty based on total CO2, SO2, and NOx emissions
-            # You should adjust these thresholds
-            emissions_penalty = 0
-            if emissions_data:
-                total_co2 = sum(d.get('co2Mass', 0) for d in emissions_data)
-                total_so2 = sum(d.get('so2Mass', 0) for d in emissions_data)
-                total_nox = sum(d.get('noxMass', 0) for d in emissions_data)
-                
-                if total_co2 > 5000000: emissions_penalty += 10
-                if total_so2 > 1000: emissions_penalty += 5
-                if total_nox > 1000: emissions_penalty += 5
-            
-            # Compliance penalty logic
-            # 20 point penalty if any compliance indicator is non-compliant
-            compliance_penalty = 0
-            if compliance_data:
-                is_compliant = all(d.get('compliantIndicator', 1) == 1 for d in compliance_data)
-                if not is_compliant:
-                    compliance_penalty = 20
-
-            campd_penalty = min(40.0, emissions_penalty + compliance_penalty) # Limit maximum penalty
-            campd_details = {
-                "facility_id": facility_id,
-                "emissions_penalty": emissions_penalty,
-                "compliance_penalty": compliance_penalty,
-                "total_penalty": campd_penalty
-            }
-
-        except Exception as e:
-            logger.warning(f"Failed to retrieve or process CAMPD data for facility_id {facility_id}: {e}")
-
+    campd_penalty, campd_details = campd_score(facility_id, data.get("campd"))
     components["campd_penalty"] = -campd_penalty
     score -= campd_penalty
-    
+
     # Clamp score to [0, 100]
     score = max(0.0, min(100.0, score))
 
-    result = {
+    composition = composition or {}
+    return {
         "company": company_name,
         "country": company_country,
         "score": round(score, 2),
@@ -294,28 +468,61 @@ def compute_cevs_for_company(company_name: str, *, company_country: Optional[str
             "edgar_source": os.getenv("EDGAR_XLSX_PATH") or "local:EDGAR_emiss_on_UCDB_2024.xlsx",
             "policy_source": os.getenv("POLICY_XLSX_PATH") or "local:Annex III_Best practices and justifications.xlsx",
             "pollution_trend_source": os.getenv("CEVS_POLLUTION_SOURCE") or "auto",
+            # which inputs made it into this score: ok | cached | timed_out | error | skipped
+            "composition": composition,
+            "partial": any(c.get("status") not in ("ok", "skipped") for c in composition.values()),
         },
         "details": {
             "epa": epa_matches,
             "iso": iso_norm,
-            "renewables": {"country_row": renew_row, "eu_row": eu_row, "bonus_calc": renew_details},
-            "pollution_trend": pol_details or pol_trend,
+            "renewables": {"country_row": renewables.get("country_row"), "eu_row": global_.get("eu_row"), "bonus_calc": renewables.get("bonus_calc") or {}},
+            "pollution_trend": pol_details,
             "policy": policy_details,
             # --- CHANGE 5: Add CAMPD details to output ---
             "campd": campd_details,
         },
     }
 
+
+def _record_cevs_audit(company_name: str, components: Dict[str, Any]) -> None:
     # Record audit entry (non-blocking - failures should not break scoring)
     try:
-        db = SessionLocal()
-        try:
-            calc_version = os.getenv("CEVS_VERSION", "0.1")
-            # Use company_name as a temporary company identifier if CIK is not available
-            record_audit(db, source_file="cevs_aggregator", calculation_version=calc_version, company_cik=company_name, notes=f"components={components}")
-        finally:
-            db.close()
+        calc_version = os.getenv("CEVS_VERSION", "0.1")
+        # Use company_name as a temporary company identifier if CIK is not available
+        enqueue_audit(source_file="cevs_aggregator", calculation_version=calc_version, company_cik=company_name, notes=f"components={components}")
     except Exception as e:
         logger.warning(f"Failed to write audit entry: {e}")
 
+
+async def compute_cevs_for_company_async(company_name: str, *, company_country: Optional[str] = None) -> Dict[str, Any]:
+    """CEVS with all sources fetched concurrently; takes as long as the slowest source deadline."""
+    data, composition = await gather_cevs_sources(company_name, company_country)
+    result = score_cevs(company_name, company_country, data, composition)
+    _record_cevs_audit(company_name, result["components"])
     return result
+
+
+def compute_cevs_for_company(company_name: str, *, company_country: Optional[str] = None) -> Dict[str, Any]:
+    """Synchronous entry point for compute_cevs_for_company_async (scripts, sync callers)."""
+    coro = compute_cevs_for_company_async(company_name, company_country=company_country)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # Called from code running inside an event loop: drive the pipeline on a helper thread
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="cevs") as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+__all__ = [
+    "CEVS_SOURCES",
+    "source_deadline",
+    "country_features",
+    "gather_cevs_sources",
+    "gather_portfolio_sources",
+    "score_cevs",
+    "campd_score",
+    "has_iso_certificate",
+    "compute_cevs_for_company",
+    "compute_cevs_for_company_async",
+]
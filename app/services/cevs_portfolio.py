@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.config import settings
+from app.services.cevs_aggregator import campd_score, gather_portfolio_sources, has_iso_certificate
+from app.services.country_features import build_global_features
+
+logger = logging.getLogger(__name__)
+
+# Components in the order compute_cevs_for_company reports them
+COMPONENTS = ("base", "iso_bonus", "epa_penalty", "renewables_bonus", "pollution_penalty", "policy_bonus", "campd_penalty")
+_STATS_PERCENTILES = (10, 25, 50, 75, 90)
+# Per-company inputs the vectorized heuristic reads
+INPUT_COLUMNS = ("epa_matches", "has_iso", "has_country", "renewables_bonus_raw", "eea_penalty", "eea_available",
+                 "edgar_penalty", "edgar_available", "policy_matches", "campd_raw")
+
+
+def _epa_match_counts(terms: List[str], facility_names: List[str]) -> np.ndarray:
+    """Number of EPA facilities whose name contains each term (same rule as the single-company path)."""
+    names = np.array(facility_names, dtype=str) if facility_names else np.empty(0, dtype=str)
+    counts: Dict[str, int] = {}
+    for term in set(terms):
+        counts[term] = int(np.count_nonzero(np.char.find(names, term) >= 0)) if names.size else 0
+    return np.array([counts[t] for t in terms], dtype=np.float64)
+
+
+def portfolio_frame(companies: List[Tuple[str, Optional[str]]], sources: Dict[str, Any]) -> pd.DataFrame:
+    """One row per company with every CEVS input as a column, ready for array scoring."""
+    epa_rows = sources["epa"][0] or []
+    iso_index = sources.get("iso_index")
+    empty_global = build_global_features(None, None)
+
+    feature_cols: Dict[Optional[str], Tuple[float, float, bool, float, bool, int]] = {}
+    for country, (global_, row, _) in sources["features"].items():
+        row = row or {}
+        eea = (global_ or empty_global)["eea_pollution"]
+        edgar = row.get("edgar")
+        feature_cols[country] = (
+            float((row.get("renewables") or {}).get("bonus") or 0.0),
+            float(eea["penalty"]),
+            bool(eea["available"]),
+            float(edgar["penalty"]) if edgar else 0.0,
+            bool(edgar),
+            len(row.get("policy_matches") or []),
+        )
+    campd = {fid: campd_score(fid, value)[0] for fid, (value, _) in sources["campd"].items()}
+
+    names = [name for name, _ in companies]
+    countries = [country for _, country in companies]
+    frame = pd.DataFrame({"company": names, "country": countries})
+    frame["epa_matches"] = _epa_match_counts([n.lower() for n in names], [str(r.get("facility_name") or "").lower() for r in epa_rows])
+    frame["has_iso"] = [has_iso_certificate(n, c, sources["iso"][c][0], iso_index) for n, c in zip(names, countries)]
+    frame["has_country"] = [bool(c) for c in countries]
+    cols = np.array([feature_cols[c] for c in countries], dtype=object).reshape(len(companies), 6)
+    frame["renewables_bonus_raw"] = cols[:, 0].astype(np.float64)
+    frame["eea_penalty"] = cols[:, 1].astype(np.float64)
+    frame["eea_available"] = cols[:, 2].astype(bool)
+    frame["edgar_penalty"] = cols[:, 3].astype(np.float64)
+    frame["edgar_available"] = cols[:, 4].astype(bool)
+    frame["policy_matches"] = cols[:, 5].astype(np.int64)
+    frame["campd_raw"] = [campd.get(sources["facility_ids"].get(n), 0.0) for n in names]
+    return frame
+
+
+def score_columns(cols: Dict[str, Any], *, pollution_source: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """The compute_cevs_for_company heuristic over input arrays (see portfolio_frame for the columns).
+
+    Returns the score and each component as arrays. `pollution_source`
+    defaults to CEVS_POLLUTION_SOURCE, as in the single-company path.
+    """
+    has_iso = np.asarray(cols["has_iso"], dtype=bool)
+    has_country = np.asarray(cols["has_country"], dtype=bool)
+
+    iso_bonus = np.where(has_iso, 30.0, 0.0)
+    epa_penalty = np.minimum(30.0, np.asarray(cols["epa_matches"], dtype=np.float64) * 2.5)
+    renew_bonus = np.asarray(cols["renewables_bonus_raw"], dtype=np.float64)
+
+    source_pref = (pollution_source or os.getenv("CEVS_POLLUTION_SOURCE") or "auto").strip().lower()
+    edgar_ok = np.asarray(cols["edgar_available"], dtype=bool)
+    if source_pref == "edgar":
+        use_edgar = edgar_ok
+    elif source_pref == "auto":
+        use_edgar = ~np.asarray(cols["eea_available"], dtype=bool) & edgar_ok
+    else:
+        use_edgar = np.zeros(has_iso.shape, dtype=bool)
+    pol_penalty = np.minimum(15.0, np.where(use_edgar, np.asarray(cols["edgar_penalty"], dtype=np.float64), np.asarray(cols["eea_penalty"], dtype=np.float64)))
+
+    policy_bonus = np.where(has_iso & has_country, np.minimum(3, np.asarray(cols["policy_matches"])), 0).astype(np.float64)
+    campd_penalty = np.asarray(cols["campd_raw"], dtype=np.float64)
+
+    score = 50.0 + iso_bonus - epa_penalty + renew_bonus - pol_penalty + policy_bonus - campd_penalty
+    return {
+        "score": np.round(np.clip(score, 0.0, 100.0), 2),
+        "base": np.full(has_iso.shape, 50.0),
+        "iso_bonus": iso_bonus,
+        "epa_penalty": -epa_penalty,
+        "renewables_bonus": np.round(renew_bonus, 2),
+        "pollution_penalty": -pol_penalty,
+        "policy_bonus": policy_bonus,
+        "campd_penalty": -campd_penalty,
+    }
+
+
+def score_portfolio_frame(frame: pd.DataFrame, *, pollution_source: Optional[str] = None) -> pd.DataFrame:
+    """score_columns over a portfolio_frame; adds component and score columns."""
+    scored = score_columns({c: frame[c].to_numpy() for c in INPUT_COLUMNS}, pollution_source=pollution_source)
+    out = frame[["company", "country"]].copy()
+    for name, values in scored.items():
+        out[name] = values
+    return out
+
+
+def _distribution(values: np.ndarray) -> Dict[str, float]:
+    pct = np.percentile(values, _STATS_PERCENTILES)
+    stats = {"mean": float(values.mean()), "std": float(values.std()), "min": float(values.min()), "max": float(values.max())}
+    stats.update({f"p{p}": float(v) for p, v in zip(_STATS_PERCENTILES, pct)})
+    return {k: round(v, 2) for k, v in stats.items()}
+
+
+def rank_portfolio(scored: pd.DataFrame) -> Dict[str, Any]:
+    """Leaderboard (rank 1 = best, ties share a rank), percentiles and per-component distributions."""
+    ranked = scored.assign(
+        rank=scored["score"].rank(method="min", ascending=False).astype(int),
+        # share of the portfolio scoring at or below this company
+        percentile=(scored["score"].rank(method="max", pct=True) * 100.0).round(1),
+    ).sort_values(["rank", "company"], kind="stable")
+    comps = list(COMPONENTS)
+    leaderboard = [
+        {"rank": int(r["rank"]), "percentile": float(r["percentile"]), "company": r["company"],
+         "country": r["country"], "score": float(r["score"]), "components": {c: float(r[c]) for c in comps}}
+        for r in ranked.to_dict(orient="records")
+    ]
+    by_country = scored.assign(country=scored["country"].fillna("")).groupby("country")["score"].agg(["count", "mean"])
+    return {
+        "leaderboard": leaderboard,
+        "distributions": {c: _distribution(scored[c].to_numpy(dtype=np.float64)) for c in ("score", *comps)},
+        "by_country": {k or None: {"companies": int(v["count"]), "mean_score": round(float(v["mean"]), 2)} for k, v in by_country.iterrows()},
+    }
+
+
+def _composition(sources: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    counts: Dict[str, Dict[str, int]] = {}
+
+    def add(name: str, status: Dict[str, Any]) -> None:
+        bucket = counts.setdefault(name, {})
+        bucket[status["status"]] = bucket.get(status["status"], 0) + 1
+
+    add("epa", sources["epa"][1])
+    for _, status in sources["iso"].values():
+        add("iso", status)
+    for _, status in sources["campd"].values():
+        add("campd", status)
+    for _, _, comp in sources["features"].values():
+        for name, status in comp.items():
+            add(name, status)
+    return counts
+
+
+async def cevs_leaderboard(companies: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Score and rank a whole portfolio of {"company", "country"} entries in one pass."""
+    max_companies = int(getattr(settings, "CEVS_BATCH_MAX_COMPANIES", 5000) or 5000)
+    if not companies:
+        raise ValueError("companies is required")
+    if len(companies) > max_companies:
+        raise ValueError(f"Portfolio too large: {len(companies)} companies (max {max_companies})")
+    pairs: List[Tuple[str, Optional[str]]] = []
+    for i, c in enumerate(companies):
+        name = str(c.get("company") or "").strip()
+        if not name:
+            raise ValueError(f"companies[{i}].company is required")
+        pairs.append((name, (str(c.get("country") or "").strip() or None)))
+
+    started = time.perf_counter()
+    sources = await gather_portfolio_sources(pairs)
+    fetched = time.perf_counter()
+    scored = score_portfolio_frame(portfolio_frame(pairs, sources))
+    result = rank_portfolio(scored)
+    composition = _composition(sources)
+    result.update({
+        "companies": len(pairs),
+        "sources": {
+            "composition": composition,
+            "partial": any(k not in ("ok", "skipped") for bucket in composition.values() for k in bucket),
+        },
+        "timing_ms": {"fetch": round((fetched - started) * 1000.0, 1), "score": round((time.perf_counter() - fetched) * 1000.0, 1)},
+    })
+    return result
+
+
+__all__ = ["COMPONENTS", "INPUT_COLUMNS", "portfolio_frame", "score_columns", "score_portfolio_frame", "rank_portfolio", "cevs_leaderboard"]
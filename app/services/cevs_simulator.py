@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Annotated, Any, Dict, List, Optional, Union
+
+import numpy as np
+from pydantic import BaseModel, BeforeValidator, ConfigDict, ValidationError
+
+from app.config import settings
+from app.services.cevs_aggregator import campd_score, gather_cevs_sources, score_cevs
+from app.services.cevs_portfolio import COMPONENTS, score_columns
+from app.services.country_features import build_global_features, renewables_bonus
+
+_FLAG_STRINGS = {"true": True, "1": True, "false": False, "0": False}
+
+
+def _strict_flag(value: Any) -> bool:
+    """JSON true/false or "true"/"false"/"1"/"0"; anything else is rejected rather than truth-tested."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in _FLAG_STRINGS:
+        return _FLAG_STRINGS[value.strip().lower()]
+    raise ValueError('must be true or false ("true"/"false"/"1"/"0" are accepted)')
+
+
+Flag = Annotated[bool, BeforeValidator(_strict_flag)]
+
+
+class SimulationOverrides(BaseModel):
+    """Overridable snapshot inputs; renewables_share_delta shifts the snapshot share."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    has_iso: Optional[Flag] = None
+    epa_matches: Optional[int] = None
+    renewables_share: Optional[float] = None
+    renewables_share_delta: Optional[float] = None
+    renewables_target: Optional[float] = None
+    eu_renewables_share: Optional[float] = None
+    policy_matches: Optional[int] = None
+    eea_pollution_penalty: Optional[float] = None
+    edgar_pollution_penalty: Optional[float] = None
+    campd_co2_mass: Optional[float] = None
+    campd_so2_mass: Optional[float] = None
+    campd_nox_mass: Optional[float] = None
+    campd_compliant: Optional[Flag] = None
+
+
+OVERRIDES = tuple(SimulationOverrides.model_fields)
+
+_SNAPSHOTS: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_SNAPSHOTS_LOCK = threading.Lock()
+
+
+def _num(v: Any) -> Optional[float]:
+    return float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else None
+
+
+def snapshot_inputs(company_name: str, company_country: Optional[str], data: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a CEVS run's resolved sources to the scalar inputs of the heuristic."""
+    global_ = data.get("global") or build_global_features(None, None)
+    country_row = data.get("country") or {}
+    renew_row = (country_row.get("renewables") or {}).get("country_row") or {}
+    eu_row = global_.get("eu_row") or {}
+    edgar = country_row.get("edgar")
+    facility_id = data.get("facility_id")
+    campd = data.get("campd") or {}
+    emissions = campd.get("emissions") or []
+    compliance = campd.get("compliance") or []
+    return {
+        "company": company_name,
+        "country": company_country,
+        "has_country": bool(company_country),
+        "epa_matches": int(baseline["sources"]["epa_matches"]),
+        "has_iso": baseline["components"]["iso_bonus"] > 0,
+        "renewables_share": _num(renew_row.get("renewable_energy_share_2021_proxy")),
+        "renewables_target": _num(renew_row.get("target_2020")),
+        "eu_renewables_share": _num(eu_row.get("renewable_energy_share_2021_proxy")),
+        "eea_pollution_available": bool(global_["eea_pollution"]["available"]),
+        "eea_pollution_penalty": float(global_["eea_pollution"]["penalty"]),
+        "edgar_available": bool(edgar),
+        "edgar_pollution_penalty": float(edgar["penalty"]) if edgar else 0.0,
+        "policy_matches": len(country_row.get("policy_matches") or []),
+        "facility_id": facility_id,
+        "campd_available": bool(facility_id and campd),
+        "campd_co2_mass": float(sum(d.get("co2Mass") or 0 for d in emissions)),
+        "campd_so2_mass": float(sum(d.get("so2Mass") or 0 for d in emissions)),
+        "campd_nox_mass": float(sum(d.get("noxMass") or 0 for d in emissions)),
+        "campd_compliant": all(d.get("compliantIndicator", 1) == 1 for d in compliance),
+    }
+
+
+def parse_overrides(overrides: Union[SimulationOverrides, Dict[str, Any], None]) -> SimulationOverrides:
+    """Validate raw overrides; ValueError names the first offending key."""
+    if isinstance(overrides, SimulationOverrides):
+        return overrides
+    try:
+        return SimulationOverrides.model_validate(overrides or {})
+    except ValidationError as e:
+        err = e.errors()[0]
+        key = ".".join(str(part) for part in err["loc"]) or "overrides"
+        if err["type"] == "extra_forbidden":
+            raise ValueError(f"Unknown override '{key}'; expected one of: {', '.join(OVERRIDES)}")
+        msg = err["ctx"]["error"] if err["type"] == "value_error" else err["msg"]
+        raise ValueError(f"Override '{key}' {msg}" if err["type"] == "value_error" else f"Override '{key}': {msg}")
+
+
+def apply_overrides(inputs: Dict[str, Any], overrides: Union[SimulationOverrides, Dict[str, Any], None]) -> Dict[str, Any]:
+    out = dict(inputs)
+    for key, value in parse_overrides(overrides).model_dump(exclude_none=True).items():
+        if key == "renewables_share_delta":
+            out["renewables_share"] = (out.get("renewables_share") or 0.0) + value
+            continue
+        out[key] = value
+        if key.startswith("campd_"):
+            out["campd_available"] = True
+        elif key == "edgar_pollution_penalty":
+            out["edgar_available"] = True
+        elif key == "eea_pollution_penalty":
+            out["eea_pollution_available"] = True
+    return out
+
+
+def _renewables_raw(inputs: Dict[str, Any]) -> float:
+    if inputs.get("renewables_share") is None:
+        return 0.0
+    row = {"renewable_energy_share_2021_proxy": inputs["renewables_share"], "target_2020": inputs.get("renewables_target")}
+    eu = {"renewable_energy_share_2021_proxy": inputs["eu_renewables_share"]} if inputs.get("eu_renewables_share") is not None else None
+    return renewables_bonus(row, eu)[0]
+
+
+def _campd_raw(inputs: Dict[str, Any]) -> float:
+    if not inputs.get("campd_available"):
+        return 0.0
+    campd = {
+        "emissions": [{"co2Mass": inputs["campd_co2_mass"], "so2Mass": inputs["campd_so2_mass"], "noxMass": inputs["campd_nox_mass"]}],
+        "compliance": [{"compliantIndicator": 1 if inputs["campd_compliant"] else 0}],
+    }
+    return campd_score(inputs.get("facility_id") or -1, campd)[0]
+
+
+def input_columns(points: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Input arrays for score_columns from a list of (overridden) snapshot inputs."""
+    return {
+        "epa_matches": np.array([p["epa_matches"] for p in points], dtype=np.float64),
+        "has_iso": np.array([p["has_iso"] for p in points], dtype=bool),
+        "has_country": np.array([p["has_country"] for p in points], dtype=bool),
+        "renewables_bonus_raw": np.array([_renewables_raw(p) for p in points], dtype=np.float64),
+        "eea_penalty": np.array([p["eea_pollution_penalty"] for p in points], dtype=np.float64),
+        "eea_available": np.array([p["eea_pollution_available"] for p in points], dtype=bool),
+        "edgar_penalty": np.array([p["edgar_pollution_penalty"] for p in points], dtype=np.float64),
+        "edgar_available": np.array([p["edgar_available"] for p in points], dtype=bool),
+        "policy_matches": np.array([p["policy_matches"] for p in points], dtype=np.int64),
+        "campd_raw": np.array([_campd_raw(p) for p in points], dtype=np.float64),
+    }
+
+
+# ---- Snapshot store ----
+
+def _ttl() -> float:
+    return float(getattr(settings, "CEVS_SIMULATION_TTL_SECONDS", 3600))
+
+
+def _store(snapshot: Dict[str, Any]) -> None:
+    max_snapshots = int(getattr(settings, "CEVS_SIMULATION_MAX_SNAPSHOTS", 1000) or 1000)
+    with _SNAPSHOTS_LOCK:
+        _SNAPSHOTS[snapshot["simulation_id"]] = snapshot
+        while len(_SNAPSHOTS) > max_snapshots:
+            _SNAPSHOTS.popitem(last=False)
+
+
+def get_simulation(simulation_id: str) -> Dict[str, Any]:
+    """The stored snapshot; KeyError when unknown or expired."""
+    with _SNAPSHOTS_LOCK:
+        snapshot = _SNAPSHOTS.get(simulation_id)
+        if snapshot is None:
+            raise KeyError(f"Simulation {simulation_id} not found or expired")
+        if time.time() - snapshot["created_at"] > _ttl():
+            del _SNAPSHOTS[simulation_id]
+            raise KeyError(f"Simulation {simulation_id} not found or expired")
+        _SNAPSHOTS.move_to_end(simulation_id)
+        return snapshot
+
+
+async def create_simulation(company_name: str, *, company_country: Optional[str] = None) -> Dict[str, Any]:
+    """Run the CEVS source fetch once and keep its resolved inputs for what-if scoring."""
+    data, composition = await gather_cevs_sources(company_name, company_country)
+    baseline = score_cevs(company_name, company_country, data, composition)
+    snapshot = {
+        "simulation_id": uuid.uuid4().hex,
+        "created_at": time.time(),
+        "company": company_name,
+        "country": company_country,
+        "inputs": snapshot_inputs(company_name, company_country, data, baseline),
+        "baseline": {"score": baseline["score"], "components": baseline["components"]},
+        "sources": {"composition": composition, "partial": baseline["sources"]["partial"]},
+    }
+    _store(snapshot)
+    return snapshot
+
+
+def _result(scored: Dict[str, np.ndarray], i: int) -> Dict[str, Any]:
+    return {"score": float(scored["score"][i]), "components": {c: float(scored[c][i]) for c in COMPONENTS}}
+
+
+def simulate(simulation_id: str, overrides: Union[SimulationOverrides, Dict[str, Any], None] = None, *,
+             pollution_source: Optional[str] = None) -> Dict[str, Any]:
+    """Re-score a snapshot with `overrides` applied; no upstream calls."""
+    snapshot = get_simulation(simulation_id)
+    parsed = parse_overrides(overrides)
+    point = apply_overrides(snapshot["inputs"], parsed)
+    out = _result(score_columns(input_columns([point]), pollution_source=pollution_source), 0)
+    out.update({
+        "simulation_id": simulation_id,
+        "overrides": parsed.model_dump(exclude_none=True),
+        "delta": round(out["score"] - snapshot["baseline"]["score"], 2),
+    })
+    return out
+
+
+def sweep(simulation_id: str, grid: Dict[str, List[Any]], *, overrides: Union[SimulationOverrides, Dict[str, Any], None] = None,
+          pollution_source: Optional[str] = None) -> Dict[str, Any]:
+    """Score every combination of `grid` values (on top of `overrides`) in one vectorized pass."""
+    snapshot = get_simulation(simulation_id)
+    if not grid:
+        raise ValueError("grid is required")
+    for key, values in grid.items():
+        if key not in OVERRIDES:
+            raise ValueError(f"Unknown grid parameter '{key}'; expected one of: {', '.join(OVERRIDES)}")
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"grid.{key} must be a non-empty list")
+    size = int(np.prod([len(v) for v in grid.values()]))
+    max_points = int(getattr(settings, "CEVS_SIMULATION_MAX_GRID", 10000) or 10000)
+    if size > max_points:
+        raise ValueError(f"Grid too large: {size} points (max {max_points})")
+
+    base = apply_overrides(snapshot["inputs"], overrides)
+    keys = list(grid)
+    columns = [[getattr(parse_overrides({k: v}), k) for v in grid[k]] for k in keys]
+    combos = [dict(zip(keys, values)) for values in itertools.product(*columns)]
+    scored = score_columns(input_columns([apply_overrides(base, c) for c in combos]), pollution_source=pollution_source)
+    points = [{"params": c, **_result(scored, i)} for i, c in enumerate(combos)]
+    best, worst = int(np.argmax(scored["score"])), int(np.argmin(scored["score"]))
+    return {
+        "simulation_id": simulation_id,
+        "baseline": snapshot["baseline"]["score"],
+        "points": points,
+        "count": len(points),
+        "best": points[best],
+        "worst": points[worst],
+    }
+
+
+__all__ = [
+    "OVERRIDES",
+    "SimulationOverrides",
+    "parse_overrides",
+    "snapshot_inputs",
+    "apply_overrides",
+    "input_columns",
+    "create_simulation",
+    "get_simulation",
+    "simulate",
+    "sweep",
+]
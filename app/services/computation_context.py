@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from app.services.emissions_calculator import calculate_emissions
+from app.services.factor_registry import factor_registry
+
+# Process-wide counters summed over every ComputationContext (exposed via /computation)
+_STATS_LOCK = threading.Lock()
+_GLOBAL_STATS: Dict[str, int] = {"contexts": 0, "hits": 0, "misses": 0}
+
+
+def canonical_payload_hash(payload: Any) -> str:
+    """Stable sha256 of a payload: key order and whitespace do not change the hash."""
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ComputationContext:
+    """Per-request memo for derived results (emissions, validation, ...).
+
+    Results are keyed by the computation name, a canonical hash of its inputs
+    and the factor set version, so the calculator, validation service, SEC
+    exporter and agents can share one context and compute each result once per
+    request. The context pins the registry's active version when it is created,
+    so a hot reload mid-request cannot mix factor sets.
+    Cached values are returned as deep copies so callers may annotate them freely.
+    """
+
+    def __init__(self, factors_version: Optional[str] = None) -> None:
+        self.factors_version = factors_version or factor_registry.current().version
+        self._results: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with _STATS_LOCK:
+            _GLOBAL_STATS["contexts"] += 1
+
+    def key(self, name: str, inputs: Any) -> str:
+        return f"{name}:{self.factors_version}:{canonical_payload_hash(inputs)}"
+
+    def memoize(self, name: str, inputs: Any, compute: Callable[[], Any]) -> Any:
+        """Return the cached result for (name, inputs) or compute and store it."""
+        k = self.key(name, inputs)
+        with self._lock:
+            if k in self._results:
+                self.hits += 1
+                hit = True
+            else:
+                self.misses += 1
+                hit = False
+        with _STATS_LOCK:
+            _GLOBAL_STATS["hits" if hit else "misses"] += 1
+        if not hit:
+            value = compute()
+            with self._lock:
+                self._results.setdefault(k, value)
+        return copy.deepcopy(self._results[k])
+
+    def calculate_emissions(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Memoized calculate_emissions() over the scope1/scope2 inputs of a payload."""
+        inputs = {
+            "company": payload.get("company"),
+            "scope1": payload.get("scope1"),
+            "scope2": payload.get("scope2"),
+            "factors_version": payload.get("factors_version"),
+            "gwp_set": payload.get("gwp_set"),
+        }
+        pinned = {**payload, "factors_version": inputs["factors_version"] or self.factors_version}
+        return self.memoize("calculate_emissions", inputs, lambda: calculate_emissions(pinned))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "factors_version": self.factors_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._results),
+        }
+
+
+def ensure_context(ctx: Optional[ComputationContext]) -> ComputationContext:
+    """Return `ctx` or a fresh context when the caller did not supply one."""
+    return ctx if ctx is not None else ComputationContext()
+
+
+def computation_stats() -> Dict[str, int]:
+    """Cumulative hit/miss counters across all contexts in this process."""
+    with _STATS_LOCK:
+        return dict(_GLOBAL_STATS)
+
+
+__all__ = ["ComputationContext", "canonical_payload_hash", "ensure_context", "computation_stats"]
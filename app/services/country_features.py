@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.mappings import normalize_country_name
+from app.utils.policy import DEFAULT_POLICY_XLSX, practices_for_country
+
+logger = logging.getLogger(__name__)
+
+# Bump when the shape of a feature row changes; older tables on disk are discarded
+FEATURES_VERSION = 1
+
+# ISO 14001 incentive typologies that earn the CEVS policy bonus
+IMPACTFUL_TYPOLOGIES = {
+    "Fast-track permits/simplification in the application",
+    "Reduced inspection frequencies",
+    "Reduced reporting and monitoring requirements",
+}
+
+_EU_ROWS = ("eu-27", "eu27", "eu 27", "eu")
+_EEA_POLLUTION_WEIGHTS = {"cd_hg_ni_pb": 6.0, "total_n": 4.0, "total_p": 4.0, "toc": 3.0}
+_EDGAR_WEIGHTS = {"PM2.5": 8.0, "NOx": 7.0}
+
+_TABLE: Optional["CountryFeatureTable"] = None
+_TABLE_LOCK = threading.RLock()
+
+
+def _jsonable(v: Any) -> Any:
+    item = getattr(v, "item", None)  # numpy scalars from pandas-built rows
+    return item() if callable(item) else str(v)
+
+
+def dataset_hash(rows: Any) -> str:
+    return hashlib.sha1(json.dumps(rows, sort_keys=True, default=_jsonable).encode("utf-8")).hexdigest()
+
+
+def _file_stamp(path: str) -> str:
+    try:
+        return f"{path}:{os.path.getmtime(path)}"
+    except OSError:
+        return f"{path}:na"
+
+
+def local_versions() -> Dict[str, Any]:
+    """Versions of the file-backed CEVS inputs (EDGAR and policy workbooks), from their mtimes."""
+    edgar = os.getenv("EDGAR_XLSX_PATH") or os.path.join(os.getcwd(), "reference", "EDGAR_emiss_on_UCDB_2024.xlsx")
+    policy = os.getenv("POLICY_XLSX_PATH") or DEFAULT_POLICY_XLSX
+    return {"features": FEATURES_VERSION, "edgar": _file_stamp(edgar), "policy": _file_stamp(policy)}
+
+
+# ---- Feature builders (pure) ----
+
+def renewables_bonus(renew_row: Optional[Dict[str, Any]], eu_row: Optional[Dict[str, Any]]) -> Tuple[float, Dict[str, Any]]:
+    """Renewables bonus (dynamic): reward exceeding target and EU average."""
+    if not (renew_row and isinstance(renew_row.get("renewable_energy_share_2021_proxy"), (int, float))):
+        return 0.0, {}
+    share = float(renew_row["renewable_energy_share_2021_proxy"])  # %
+    target = float(renew_row.get("target_2020") or 0.0)
+    eu_share = None
+    if eu_row and isinstance(eu_row.get("renewable_energy_share_2021_proxy"), (int, float)):
+        eu_share = float(eu_row["renewable_energy_share_2021_proxy"])  # % EU-27 2021
+
+    # Weights: how much to reward beating target vs EU average
+    W_TARGET = 0.5  # pts per 1% over target
+    W_EU = 0.2      # pts per 1% over EU average
+    MAX_RENEW = 20.0
+
+    bonus_target = max(0.0, (share - target)) * W_TARGET
+    bonus_eu = max(0.0, (share - (eu_share or 0.0))) * W_EU
+    bonus = min(MAX_RENEW, bonus_target + bonus_eu)
+    return bonus, {
+        "share_2021": round(share, 2),
+        "target_2020": round(target, 2) if target else None,
+        "eu_share_2021": round(eu_share, 2) if eu_share is not None else None,
+        "bonus_from_target": round(bonus_target, 2),
+        "bonus_from_eu": round(bonus_eu, 2),
+        "weights": {"W_TARGET": W_TARGET, "W_EU": W_EU},
+        "cap": MAX_RENEW,
+    }
+
+
+def eea_pollution_penalty(pol_series: List[Dict[str, Any]]) -> Tuple[float, Dict[str, Any]]:
+    """Penalty from rising EEA industrial pollution over the last three points."""
+    def slope_for(key: str) -> Dict[str, Any]:
+        vals = [r.get(key) for r in pol_series if isinstance(r.get(key), (int, float))]
+        if len(vals) < 2:
+            return {"slope": 0.0, "increase": False}
+        sel = vals[-3:] if len(vals) >= 3 else vals
+        s = float(sel[-1] - sel[0])
+        return {"slope": s, "increase": s > 0.0}
+
+    penalty = 0.0
+    trend_all: Dict[str, Any] = {}
+    for k, w in _EEA_POLLUTION_WEIGHTS.items():
+        tr = slope_for(k)
+        trend_all[k] = tr
+        if tr.get("increase"):
+            slope = float(tr.get("slope") or 0.0)
+            intensity = min(max(slope / 10.0, 0.0), 1.0)
+            penalty += w * intensity
+    return penalty, {"source": "eea", "trends": trend_all, "weights": dict(_EEA_POLLUTION_WEIGHTS), "scaled_penalty": round(penalty, 2)}
+
+
+def edgar_pollution_penalty(edgar: Dict[str, Any]) -> Tuple[float, Dict[str, Any]]:
+    """Penalty from rising EDGAR PM2.5/NOx relative to the latest value; `edgar` is {pollutant: {trend, series}}."""
+    penalty = 0.0
+    trends: Dict[str, Any] = {}
+    for pol, w in _EDGAR_WEIGHTS.items():
+        tr = edgar[pol]["trend"]
+        series = edgar[pol]["series"]
+        end_val = float(series[-1]["value"]) if series else 0.0
+        delta = float(tr.get("slope") or 0.0)
+        rel = (delta / max(abs(end_val), 1.0)) if tr.get("increase") else 0.0
+        intensity = min(max(rel, 0.0), 1.0)
+        penalty += w * intensity
+        trends[pol] = {"trend": tr, "end_value": end_val, "intensity": round(intensity, 4)}
+    return penalty, {"source": "edgar", "trends": trends, "weights": dict(_EDGAR_WEIGHTS), "scaled_penalty": round(penalty, 2)}
+
+
+def build_global_features(renewables: Optional[List[Dict[str, Any]]], pollution: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Country-independent inputs: the EU renewables row and the EEA pollution penalty."""
+    renewables = renewables or []
+    pollution = pollution or []
+    penalty, details = eea_pollution_penalty(pollution)
+    return {
+        "renewables": renewables,
+        "eu_row": next((r for r in renewables if (r.get("country") or "").strip().lower() in _EU_ROWS), None),
+        "eea_pollution": {"available": bool(pollution), "penalty": penalty, "details": details},
+    }
+
+
+def build_country_features(country: str, global_features: Dict[str, Any], edgar: Optional[Dict[str, Any]], practices: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Everything CEVS needs about one country, ready for lookup."""
+    key = normalize_country_name(country)
+    renew_row = next((r for r in global_features.get("renewables") or [] if key and normalize_country_name(r.get("country", "")) == key), None)
+    bonus, bonus_calc = renewables_bonus(renew_row, global_features.get("eu_row"))
+    row: Dict[str, Any] = {
+        "country": key,
+        "renewables": {"country_row": renew_row, "bonus": bonus, "bonus_calc": bonus_calc},
+        "edgar": None,
+        "policy_matches": [
+            p for p in practices_for_country(practices or [], country)
+            if (p.get("scheme") and "iso 14001" in p.get("scheme", "").lower()) and (p.get("typology") in IMPACTFUL_TYPOLOGIES)
+        ],
+    }
+    if edgar:
+        penalty, details = edgar_pollution_penalty(edgar)
+        row["edgar"] = {
+            "trends": {"pm25": edgar["PM2.5"]["trend"], "nox": edgar["NOx"]["trend"]},
+            "penalty": penalty,
+            "details": details,
+        }
+    return row
+
+
+# ---- Materialized table ----
+
+class CountryFeatureTable:
+    """Country-level CEVS features, valid for one set of dataset versions.
+
+    `global_` holds the country-independent part (EU row, EEA pollution);
+    `countries` maps normalized country names to build_country_features rows.
+    Rows are filled on first use and dropped together whenever any source
+    version changes.
+    """
+
+    def __init__(self, versions: Optional[Dict[str, Any]] = None, global_: Optional[Dict[str, Any]] = None,
+                 countries: Optional[Dict[str, Dict[str, Any]]] = None, eea_checked_at: float = 0.0, built_at: Optional[float] = None) -> None:
+        self.versions = versions or local_versions()
+        self.global_ = global_
+        self.countries = countries or {}
+        self.eea_checked_at = eea_checked_at
+        self.built_at = built_at or time.time()
+
+    def get(self, country: Optional[str]) -> Optional[Dict[str, Any]]:
+        return self.countries.get(normalize_country_name(country)) if country else None
+
+    def refresh_due(self) -> bool:
+        return time.time() - self.eea_checked_at > float(getattr(settings, "CEVS_FEATURES_REFRESH_SECONDS", 900))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "versions": self.versions,
+            "global": self.global_,
+            "countries": self.countries,
+            "eea_checked_at": self.eea_checked_at,
+            "built_at": self.built_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CountryFeatureTable":
+        return cls(data.get("versions"), data.get("global"), data.get("countries"), float(data.get("eea_checked_at") or 0.0), data.get("built_at"))
+
+
+def _load(path: str) -> Optional[CountryFeatureTable]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return CountryFeatureTable.from_dict(json.load(fh))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable CEVS feature table {path}: {e}")
+        return None
+
+
+def save_feature_table(table: CountryFeatureTable, path: Optional[str] = None) -> None:
+    path = path or settings.CEVS_FEATURES_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"  # concurrent savers must not share a temp file
+    with _TABLE_LOCK:
+        payload = json.dumps(table.to_dict(), default=_jsonable)
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(payload)
+    os.replace(tmp, path)
+
+
+def get_feature_table() -> CountryFeatureTable:
+    """The in-memory table, loaded from disk on first use and reset when a workbook changes.
+
+    EEA versions cannot be checked without a download, so they are
+    re-validated by the caller (update_global_features) once the table's
+    refresh interval has passed.
+    """
+    global _TABLE
+    versions = local_versions()
+    with _TABLE_LOCK:
+        table = _TABLE
+        if table is None:
+            table = _load(settings.CEVS_FEATURES_PATH)
+        if table is None:
+            table = CountryFeatureTable(versions)
+        elif any(table.versions.get(k) != v for k, v in versions.items()):
+            logger.info("CEVS source workbook changed; rebuilding country features")
+            table = CountryFeatureTable({**table.versions, **versions}, table.global_, eea_checked_at=table.eea_checked_at)
+        _TABLE = table
+        return table
+
+
+def update_global_features(renewables: Optional[List[Dict[str, Any]]], pollution: Optional[List[Dict[str, Any]]]) -> CountryFeatureTable:
+    """Record freshly fetched EEA datasets; country rows survive only if both are unchanged."""
+    global _TABLE
+    hashes = {"eea_renewables": dataset_hash(renewables or []), "eea_pollution": dataset_hash(pollution or [])}
+    with _TABLE_LOCK:
+        table = get_feature_table()
+        if table.global_ is not None and all(table.versions.get(k) == v for k, v in hashes.items()):
+            table.eea_checked_at = time.time()
+            return table
+        if table.global_ is not None:
+            logger.info("EEA datasets changed; rebuilding country features")
+        table = CountryFeatureTable({**local_versions(), **hashes}, build_global_features(renewables, pollution), eea_checked_at=time.time())
+        _TABLE = table
+        return table
+
+
+def put_country_features(table: CountryFeatureTable, row: Dict[str, Any]) -> bool:
+    """Store a row unless `table` has been replaced meanwhile (its inputs are then stale)."""
+    with _TABLE_LOCK:
+        if _TABLE is not table:
+            return False
+        table.countries[row["country"]] = row
+        return True
+
+
+def feature_table_stats() -> Dict[str, Any]:
+    table = get_feature_table()
+    return {
+        "countries": sorted(table.countries),
+        "versions": table.versions,
+        "has_global": table.global_ is not None,
+        "built_at": table.built_at,
+        "eea_checked_at": table.eea_checked_at,
+    }
+
+
+def reset_feature_table() -> None:
+    global _TABLE
+    with _TABLE_LOCK:
+        _TABLE = None
+
+
+__all__ = [
+    "FEATURES_VERSION",
+    "CountryFeatureTable",
+    "dataset_hash",
+    "local_versions",
+    "renewables_bonus",
+    "eea_pollution_penalty",
+    "edgar_pollution_penalty",
+    "build_global_features",
+    "build_country_features",
+    "get_feature_table",
+    "update_global_features",
+    "put_country_features",
+    "save_feature_table",
+    "feature_table_stats",
+    "reset_feature_table",
+]
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import io
+import json
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.factor_registry import factor_registry
+from app.services.ghg import GWP_MATRIX, GWP_SET_NAMES, resolve_gwp_set
+
+# Columns understood by the batch calculator. Every column is optional per row:
+# a row contributes scope1 when fuel_type is present and scope2 when kwh is present.
+BATCH_COLUMNS = ("company", "facility", "fuel_type", "amount", "unit", "kwh", "grid_region")
+
+BATCH_FORMATS = ("json", "jsonl", "csv", "parquet")
+
+_CONTENT_TYPE_FORMATS = {
+    "application/json": "json",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/x-jsonlines": "jsonl",
+    "text/csv": "csv",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "application/octet-stream": "parquet",
+}
+
+
+def infer_batch_format(content_type: Optional[str]) -> Optional[str]:
+    """Map a request Content-Type header to a batch format name."""
+    if not content_type:
+        return None
+    return _CONTENT_TYPE_FORMATS.get(content_type.split(";")[0].strip().lower())
+
+
+def read_batch_rows(content: bytes, fmt: str) -> pd.DataFrame:
+    """Parse a JSON/JSONL/CSV/Parquet payload into a frame with BATCH_COLUMNS.
+
+    JSON bodies may be a list of rows or an object with a "rows" list.
+    """
+    if fmt not in BATCH_FORMATS:
+        raise ValueError(f"Unsupported batch format: {fmt}")
+    if not content:
+        raise ValueError("Batch payload is empty")
+
+    if fmt == "json":
+        data = json.loads(content)
+        if isinstance(data, dict):
+            data = data.get("rows")
+        if not isinstance(data, list):
+            raise ValueError("JSON batch must be a list of rows or an object with a 'rows' list")
+        frame = pd.DataFrame.from_records([r for r in data if isinstance(r, dict)])
+    elif fmt == "jsonl":
+        frame = pd.read_json(io.BytesIO(content), lines=True, dtype=False)
+    elif fmt == "csv":
+        frame = pd.read_csv(io.BytesIO(content), dtype={"company": str, "facility": str, "fuel_type": str, "unit": str, "grid_region": str})
+    else:
+        frame = pd.read_parquet(io.BytesIO(content))
+
+    frame.columns = [str(c).strip().lower() for c in frame.columns]
+    for col in BATCH_COLUMNS:
+        if col not in frame.columns:
+            frame[col] = None
+    return frame[list(BATCH_COLUMNS)].reset_index(drop=True)
+
+
+def _text_column(frame: pd.DataFrame, col: str) -> pd.Series:
+    s = frame[col]
+    return s.where(s.notna(), "").astype(str).str.strip()
+
+
+def calculate_emissions_batch(frame: pd.DataFrame, factors_version: Optional[str] = None, gwp_set: Optional[str] = None) -> Dict[str, Any]:
+    """Calculate Scope 1 & 2 emissions for many rows at once.
+
+    Factor lookups are resolved to indices into the dense factor arrays of the
+    active (or pinned) registry factor set and the
+    emissions are computed with NumPy array operations; rows with unsupported
+    fuel/unit pairs or invalid numbers are reported per row and excluded from
+    the totals instead of failing the whole batch.
+
+    Scope 1 gas masses are one (rows x gases) product of the activity amounts
+    with the set's fuel x gas matrix; CO2e for every GWP set then comes from a
+    single (gases x sets) product, so switching GWP set reuses the gas masses.
+    """
+    factors = factor_registry.get(factors_version)
+    gwp_name = resolve_gwp_set(gwp_set)
+    gwp_col = GWP_SET_NAMES.index(gwp_name)
+    n = len(frame)
+    fuel = _text_column(frame, "fuel_type").str.lower()
+    unit = _text_column(frame, "unit").str.lower().str.replace(r"[\s\-]+", "_", regex=True)
+    region = _text_column(frame, "grid_region").str.upper()
+    amount = pd.to_numeric(frame["amount"], errors="coerce").to_numpy(dtype=np.float64)
+    kwh = pd.to_numeric(frame["kwh"], errors="coerce").to_numpy(dtype=np.float64)
+
+    # Scope 1: (fuel, unit) -> factor index; -1 marks unsupported pairs
+    has_s1 = (fuel != "").to_numpy()
+    s1_idx = (fuel + "|" + unit).map(factors.s1_index).fillna(-1).to_numpy(dtype=np.int64)
+    s1_unsupported = has_s1 & (s1_idx < 0)
+    s1_bad_amount = has_s1 & ~s1_unsupported & np.isnan(amount)
+    s1_ok = has_s1 & ~s1_unsupported & ~s1_bad_amount
+    s1_factor = np.where(s1_ok, factors.s1_factors[np.clip(s1_idx, 0, None)], np.nan)
+    s1_kg = np.where(s1_ok, np.nan_to_num(amount) * np.nan_to_num(s1_factor), 0.0)
+    # (rows x gases) kg; same as the sparse one-hot activity matrix times the fuel x gas matrix
+    s1_gases = np.where(s1_ok, np.nan_to_num(amount), 0.0)[:, None] * factors.s1_gas_matrix[np.clip(s1_idx, 0, None)]
+
+    # Scope 2: region -> factor index with US_default fallback (same rule as grid_factor)
+    has_s2 = frame["kwh"].notna().to_numpy()
+    s2_bad_kwh = has_s2 & np.isnan(kwh)
+    s2_ok = has_s2 & ~s2_bad_kwh
+    s2_idx = region.map(factors.s2_index).fillna(factors.s2_default).to_numpy(dtype=np.int64)
+    s2_factor = np.where(s2_ok, factors.s2_factors[s2_idx], np.nan)
+    s2_kg = np.where(s2_ok, np.nan_to_num(kwh) * np.nan_to_num(s2_factor), 0.0)
+
+    empty = ~has_s1 & ~has_s2
+    row_ok = ~(s1_unsupported | s1_bad_amount | s2_bad_kwh | empty)
+    s1_kg = np.where(row_ok, s1_kg, 0.0)
+    s2_kg = np.where(row_ok, s2_kg, 0.0)
+    total_kg = s1_kg + s2_kg
+    s1_gases[~row_ok] = 0.0
+    s1_co2e_by_set = s1_gases @ GWP_MATRIX  # (rows x GWP sets)
+    s1_co2e = s1_co2e_by_set[:, gwp_col]
+    co2e_kg = s1_co2e + s2_kg  # grid factors are CO2 only
+
+    errors = np.full(n, None, dtype=object)
+    errors[empty] = "row has neither scope1 nor scope2 activity"
+    errors[s2_bad_kwh] = "invalid kwh"
+    errors[s1_bad_amount] = "invalid amount"
+    if s1_unsupported.any():
+        bad = np.flatnonzero(s1_unsupported)
+        errors[bad] = [f"Unsupported fuel/unit: {f}/{u}" for f, u in zip(fuel.to_numpy()[bad], unit.to_numpy()[bad])]
+
+    company = frame["company"].where(frame["company"].notna(), None)
+    results = pd.DataFrame({
+        "row": np.arange(n),
+        "company": company,
+        "facility": frame["facility"].where(frame["facility"].notna(), None),
+        "scope1_factor": s1_factor,
+        "scope2_region": np.where(s2_ok, factors.s2_regions[s2_idx], None),
+        "scope2_factor": s2_factor,
+        "scope1_emissions_kg": np.round(s1_kg, 6),
+        "scope1_ch4_kg": np.round(s1_gases[:, 1], 9),
+        "scope1_n2o_kg": np.round(s1_gases[:, 2], 9),
+        "scope1_co2e_kg": np.round(s1_co2e, 6),
+        "scope2_emissions_kg": np.round(s2_kg, 6),
+        "emissions_kg": np.round(total_kg, 6),
+        "co2e_kg": np.round(co2e_kg, 6),
+        "error": errors,
+    })
+    results = results.astype(object).where(results.notna(), None)
+
+    by_company: Dict[str, Any] = {}
+    valid = pd.DataFrame({"company": company, "s1": s1_kg, "s2": s2_kg, "total": total_kg, "co2e": co2e_kg})[row_ok & company.notna().to_numpy()]
+    if not valid.empty:
+        grouped = valid.groupby("company", sort=True)[["s1", "s2", "total", "co2e"]].sum()
+        for name, s1, s2, tot, co2e in zip(grouped.index, grouped["s1"], grouped["s2"], grouped["total"], grouped["co2e"]):
+            by_company[str(name)] = {
+                "scope1_emissions_kg": round(float(s1), 6),
+                "scope2_emissions_kg": round(float(s2), 6),
+                "emissions_kg": round(float(tot), 6),
+                "emissions_tonnes": round(float(tot) / 1000.0, 6),
+                "co2e_kg": round(float(co2e), 6),
+            }
+
+    total = float(total_kg.sum())
+    return {
+        "version": factors.version,
+        "results": results.to_dict(orient="records"),
+        "by_company": by_company,
+        "totals": {
+            "rows": n,
+            "valid_rows": int(row_ok.sum()),
+            "error_rows": int(n - row_ok.sum()),
+            "scope1_emissions_kg": round(float(s1_kg.sum()), 6),
+            "scope2_emissions_kg": round(float(s2_kg.sum()), 6),
+            "emissions_kg": round(total, 6),
+            "emissions_tonnes": round(total / 1000.0, 6),
+            "scope1_gases_kg": {"CO2": round(float(s1_gases[:, 0].sum()), 6), "CH4": round(float(s1_gases[:, 1].sum()), 6), "N2O": round(float(s1_gases[:, 2].sum()), 6)},
+            "gwp_set": gwp_name,
+            "co2e_kg": round(float(co2e_kg.sum()), 6),
+            "co2e_tonnes": round(float(co2e_kg.sum()) / 1000.0, 6),
+            "co2e_kg_by_gwp_set": {
+                name: round(float(s1_co2e_by_set[:, i].sum() + s2_kg.sum()), 6) for i, name in enumerate(GWP_SET_NAMES)
+            },
+        },
+    }
+
@@ -1,7 +1,14 @@
 from __future__ import annotations
 
-from typing import Dict, Any, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Any, Optional, Tuple
 
+from app.services.ghg import GASES, gwp_vector, resolve_gwp_set
+
+if TYPE_CHECKING:
+    from app.services.factor_registry import FactorSet
+
+# Version of the built-in factor set below. Newer versions are served by
+# app.services.factor_registry from EMISSION_FACTORS_DIR.
 FACTORS_VERSION = "0.1"
 
 # Simple emission factors (v0.1) — rough defaults for MVP
@@ -19,6 +26,17 @@ SCOPE1_FACTORS = {
     ("natural_gas", "mmbtu"): 53.06,       # kg CO2 per MMBtu
 }
 
+# scope1 CH4 / N2O in kg per unit (EPA GHG Emission Factors Hub, stationary combustion)
+SCOPE1_GAS_FACTORS = {
+    ("gasoline", "gallon"): {"CH4": 0.00038, "N2O": 0.00008},
+    ("diesel", "gallon"): {"CH4": 0.00041, "N2O": 0.00008},
+    ("gasoline", "liter"): {"CH4": 0.00038 / 3.78541, "N2O": 0.00008 / 3.78541},
+    ("diesel", "liter"): {"CH4": 0.00041 / 3.78541, "N2O": 0.00008 / 3.78541},
+    ("natural_gas", "m3"): {"CH4": 0.0000364, "N2O": 0.00000364},
+    ("natural_gas", "therm"): {"CH4": 0.0001, "N2O": 0.00001},
+    ("natural_gas", "mmbtu"): {"CH4": 0.001, "N2O": 0.0001},
+}
+
 # scope2 grid factors in kg CO2 per kWh (v0.1)
 SCOPE2_GRID_FACTORS = {
     "US_default": 0.4,
@@ -28,32 +46,42 @@ SCOPE2_GRID_FACTORS = {
 }
 
 
-def grid_factor(region: Optional[str]) -> Tuple[str, float]:
-    if not region:
-        return ("US_default", SCOPE2_GRID_FACTORS["US_default"])
-    region_key = region.upper()
-    if region_key in SCOPE2_GRID_FACTORS:
-        return (region_key, SCOPE2_GRID_FACTORS[region_key])
-    return ("US_default", SCOPE2_GRID_FACTORS["US_default"])  # fallback
+def _factor_set(version: Optional[str] = None) -> FactorSet:
+    # Imported lazily: the registry seeds its built-in set from the dicts above
+    from app.services.factor_registry import factor_registry
+    return factor_registry.get(version)
+
 
+def grid_factor(region: Optional[str], factors: Optional[FactorSet] = None) -> Tuple[str, float]:
+    return (factors or _factor_set()).grid_factor(region)
 
-def calc_scope1(fuel_type: str, amount: float, unit: str) -> Dict[str, Any]:
-    key = (fuel_type.lower(), unit.lower())
-    if key not in SCOPE1_FACTORS:
+
+def calc_scope1(fuel_type: str, amount: float, unit: str, factors: Optional[FactorSet] = None, gwp_set: Optional[str] = None) -> Dict[str, Any]:
+    fs = factors or _factor_set()
+    gas_factors = fs.scope1_gas_factors(fuel_type, unit)
+    if gas_factors is None:
         raise ValueError(f"Unsupported fuel/unit: {fuel_type}/{unit}")
-    factor = SCOPE1_FACTORS[key]
-    co2 = amount * factor
-    return {
+    gwp_name = resolve_gwp_set(gwp_set)
+    gases = amount * gas_factors
+    co2 = float(gases[0])
+    out = {
         "fuel_type": fuel_type,
         "unit": unit,
         "amount": amount,
-        "factor": factor,
+        "factor": float(gas_factors[0]),
         "emissions_kg": round(co2, 6),
+        "gases_kg": {gas: round(float(v), 6) for gas, v in zip(GASES, gases)},
+        "gwp_set": gwp_name,
+        "co2e_kg": round(float(gases @ gwp_vector(gwp_name)), 6),
     }
+    conversion = fs.scope1_conversion(fuel_type, unit)
+    if conversion:
+        out["converted"] = {"base_unit": conversion[0], "multiplier": conversion[1], "amount": amount * conversion[1]}
+    return out
 
 
-def calc_scope2(kwh: float, region: Optional[str]) -> Dict[str, Any]:
-    region_used, factor = grid_factor(region)
+def calc_scope2(kwh: float, region: Optional[str], factors: Optional[FactorSet] = None) -> Dict[str, Any]:
+    region_used, factor = grid_factor(region, factors)
     co2 = kwh * factor
     return {
         "region": region_used,
@@ -64,20 +92,24 @@ def calc_scope2(kwh: float, region: Optional[str]) -> Dict[str, Any]:
 
 
 def calculate_emissions(payload: Dict[str, Any]) -> Dict[str, Any]:
-    """Calculate Scope 1 & 2 emissions using v0.1 factors.
+    """Calculate Scope 1 & 2 emissions using the active (or pinned) factor set.
     Expected payload shape:
     {
       "company": "...",  # required for audit
       "scope1": {"fuel_type": "diesel|gasoline|natural_gas", "amount": 100, "unit": "gallon|liter|m3|therm|mmbtu"},
-      "scope2": {"kwh": 5000, "grid_region": "US_default|RFC|WECC|SERC"}
+      "scope2": {"kwh": 5000, "grid_region": "US_default|RFC|WECC|SERC"},
+      "factors_version": "0.1",  # optional: pin a factor set from the registry
+      "gwp_set": "AR5"  # optional: AR4|AR5|AR6 for the CO2e totals
     }
     """
     company = (payload.get("company") or "").strip()
     if not company:
         raise ValueError("company is required")
 
+    factors = _factor_set(payload.get("factors_version"))
+    gwp_name = resolve_gwp_set(payload.get("gwp_set"))
     out: Dict[str, Any] = {
-        "version": FACTORS_VERSION,
+        "version": factors.version,
         "company": company,
         "components": {},
         "totals": {},
@@ -86,23 +118,30 @@ def calculate_emissions(payload: Dict[str, Any]) -> Dict[str, Any]:
     scope1_res = None
     s1 = payload.get("scope1") or {}
     if s1:
-        scope1_res = calc_scope1(str(s1.get("fuel_type")), float(s1.get("amount", 0.0)), str(s1.get("unit")))
+        scope1_res = calc_scope1(str(s1.get("fuel_type")), float(s1.get("amount", 0.0)), str(s1.get("unit")), factors, gwp_name)
         out["components"]["scope1"] = scope1_res
 
     scope2_res = None
     s2 = payload.get("scope2") or {}
     if s2:
-        scope2_res = calc_scope2(float(s2.get("kwh", 0.0)), s2.get("grid_region"))
+        scope2_res = calc_scope2(float(s2.get("kwh", 0.0)), s2.get("grid_region"), factors)
         out["components"]["scope2"] = scope2_res
 
     total_kg = 0.0
+    co2e_kg = 0.0
     if scope1_res:
         total_kg += scope1_res["emissions_kg"]
+        co2e_kg += scope1_res["co2e_kg"]
     if scope2_res:
+        # grid factors are published as CO2 only, so scope2 enters CO2e as-is
         total_kg += scope2_res["emissions_kg"]
+        co2e_kg += scope2_res["emissions_kg"]
 
     out["totals"] = {
         "emissions_kg": round(total_kg, 6),
         "emissions_tonnes": round(total_kg / 1000.0, 6),
+        "gwp_set": gwp_name,
+        "co2e_kg": round(co2e_kg, 6),
+        "co2e_tonnes": round(co2e_kg / 1000.0, 6),
     }
     return out
@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.repositories.epa_facility_repository import get_or_create_sync_checkpoint, upsert_facilities_delta
+from app.services.facility_index import invalidate_facility_index, normalize_facility
+
+logger = logging.getLogger(__name__)
+
+US_STATES = (
+    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "DC", "FL", "GA", "HI", "ID", "IL", "IN", "IA",
+    "KS", "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ", "NM",
+    "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA",
+    "WV", "WI", "WY", "AS", "GU", "MP", "PR", "VI",
+)
+
+# Envirofacts tables the sync knows how to page: state filter column and the
+# normalize_facility() source the rows are stored under.
+SYNC_TABLES: Dict[str, Dict[str, str]] = {
+    "tri_facility": {"source": "tri_facility", "state_column": "STATE_ABBR"},
+    "frs_facility_site": {"source": "frs", "state_column": "STATE_CODE"},
+}
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+_SYNC_LOCK = threading.Lock()  # one sync per process; overlapping runs would race on checkpoints
+
+
+def _csv(value: Optional[str]) -> List[str]:
+    return [p.strip() for p in str(value or "").split(",") if p.strip()]
+
+
+def _utc(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt is None:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)  # SQLite drops tzinfo
+
+
+class _RateLimiter:
+    """Spaces request starts at least `interval` seconds apart across threads."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = max(0.0, float(interval))
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class EnvirofactsPager:
+    """Row-range reads against the Envirofacts efservice REST API.
+
+    Safe to share between worker threads: each thread gets its own
+    requests.Session and all threads share one rate limiter.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, *, min_interval: Optional[float] = None,
+                 max_retries: Optional[int] = None, backoff: float = 1.0, timeout: float = 30.0) -> None:
+        self.base_url = (base_url or settings.EPA_ENV_BASE).rstrip("/") + "/"
+        self.max_retries = int(settings.EPA_SYNC_MAX_RETRIES if max_retries is None else max_retries)
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = _RateLimiter(settings.EPA_SYNC_MIN_INTERVAL_SECONDS if min_interval is None else min_interval)
+        self.requests_made = 0
+        self._local = threading.local()
+        self._count_lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({"User-Agent": "envoyou-sec-api/epa-sync"})
+            self._local.session = session
+        return session
+
+    def _get_json(self, path: str) -> Any:
+        url = self.base_url + path
+        last: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+            self.limiter.wait()
+            with self._count_lock:
+                self.requests_made += 1
+            try:
+                resp = self._session().get(url, timeout=self.timeout)
+                if resp.status_code in _RETRY_STATUS:
+                    last = requests.HTTPError(f"{resp.status_code} from {url}")
+                    continue
+                resp.raise_for_status()
+                return resp.json()
+            except (requests.RequestException, ValueError) as e:
+                last = e
+        raise last if last else RuntimeError(f"request failed: {url}")
+
+    def count(self, table: str, state_column: str, state: str) -> Optional[int]:
+        """Row count for one state slice, or None when the COUNT endpoint is unavailable."""
+        try:
+            data = self._get_json(f"{table}/{state_column}/{state}/COUNT/JSON")
+        except Exception as e:
+            logger.warning(f"Envirofacts count failed for {table}/{state}: {e}")
+            return None
+        rec = data[0] if isinstance(data, list) and data else data
+        if isinstance(rec, dict):
+            for v in rec.values():
+                try:
+                    return int(v)
+                except (TypeError, ValueError):
+                    continue
+        return None
+
+    def rows(self, table: str, state_column: str, state: str, start: int, end: int) -> List[Dict[str, Any]]:
+        """Rows start..end (inclusive, as Envirofacts counts them) of one state slice."""
+        data = self._get_json(f"{table}/{state_column}/{state}/rows/{start}:{end}/JSON")
+        return [r for r in data if isinstance(r, dict)] if isinstance(data, list) else []
+
+
+@dataclass(eq=False)
+class _Slice:
+    table: str
+    source: str
+    state_column: str
+    state: str
+    total: Optional[int] = None
+    cursor: int = 0
+    next_row: int = 0
+    end_seen: Optional[int] = None
+    inflight: int = 0
+    done: Dict[int, int] = field(default_factory=dict)
+    error: Optional[str] = None
+    resumed: bool = False
+
+    def next_offset(self, page_size: int) -> Optional[int]:
+        if self.error is not None:
+            return None
+        if self.total is not None and self.cursor >= self.total:
+            return None
+        if self.end_seen is not None and self.cursor > self.end_seen:
+            return None
+        a = self.cursor
+        self.cursor += page_size
+        return a
+
+
+def _plan(db: Session, sl: _Slice, *, full: bool, full_refresh_hours: float, now: datetime) -> Optional[Dict[str, Any]]:
+    """Choose where this slice starts; returns a summary when there is nothing to fetch."""
+    cp = get_or_create_sync_checkpoint(db, sl.table, sl.state)
+    last_full = _utc(cp.last_full_at)
+    fresh = last_full is not None and (now - last_full).total_seconds() < full_refresh_hours * 3600
+    if not full and cp.status in ("running", "failed") and cp.next_row > 0:
+        start, mode, sl.resumed = int(cp.next_row), cp.mode or "full", True
+    elif not full and cp.status == "complete" and fresh and cp.total_rows is not None:
+        # Envirofacts appends new facilities, so between full re-reads only rows
+        # past the previous total can be new; edits are picked up by the full pass.
+        start, mode = int(cp.total_rows), "tail"
+        if sl.total is not None and sl.total < start:
+            start, mode = 0, "full"  # upstream shrank: offsets moved, re-read everything
+        elif sl.total is not None and sl.total == start:
+            cp.completed_at = now
+            return {**cp.to_dict(), "fetched": False}
+    else:
+        start, mode = 0, "full"
+    if not sl.resumed:
+        cp.inserted = cp.updated = cp.unchanged = 0
+        cp.started_at = now
+    cp.mode = mode
+    cp.status = "running"
+    cp.next_row = start
+    cp.last_error = None
+    sl.cursor = sl.next_row = start
+    return None
+
+
+def _finish(db: Session, sl: _Slice, now: datetime) -> Dict[str, Any]:
+    cp = get_or_create_sync_checkpoint(db, sl.table, sl.state)
+    cp.next_row = sl.next_row
+    if sl.error is not None:
+        cp.status = "failed"
+        cp.last_error = sl.error[:500]
+    else:
+        cp.status = "complete"
+        cp.total_rows = sl.next_row
+        cp.completed_at = now
+        if cp.mode == "full":
+            cp.last_full_at = now
+    return {**cp.to_dict(), "fetched": True, "resumed": sl.resumed}
+
+
+def run_epa_sync(
+    db: Session,
+    *,
+    states: Optional[Iterable[str]] = None,
+    tables: Optional[Iterable[str]] = None,
+    full: bool = False,
+    pager: Optional[EnvirofactsPager] = None,
+    page_size: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Mirror Envirofacts facility tables into the local facility store.
+
+    Every (table, state) slice is paged by row range; pages are fetched by a
+    bounded worker pool (shared rate limit, retries with backoff) and written
+    on the calling thread through a content-hash delta upsert, so unchanged
+    facilities cost no writes. Each slice keeps a checkpoint whose watermark
+    only moves over contiguously written pages: a failed run resumes from the
+    first missing page. Between full re-reads (EPA_SYNC_FULL_REFRESH_HOURS)
+    only rows past the previous total are requested.
+    """
+    if not _SYNC_LOCK.acquire(blocking=False):
+        raise RuntimeError("EPA sync already running")
+    try:
+        return _run(db, states=states, tables=tables, full=full, pager=pager, page_size=page_size, workers=workers)
+    finally:
+        _SYNC_LOCK.release()
+
+
+def sync_in_progress() -> bool:
+    return _SYNC_LOCK.locked()
+
+
+def run_epa_sync_job(**kwargs: Any) -> Optional[Dict[str, Any]]:
+    """Entry point for background tasks and cron: own session, errors logged, not raised."""
+    from app.models.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return run_epa_sync(db, **kwargs)
+    except Exception as e:
+        logger.error(f"EPA sync failed: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def _run(db: Session, *, states, tables, full, pager, page_size, workers) -> Dict[str, Any]:
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    page_size = int(page_size or settings.EPA_SYNC_PAGE_SIZE)
+    workers = max(1, int(workers or settings.EPA_SYNC_WORKERS))
+    pager = pager or EnvirofactsPager()
+    table_names = list(tables or _csv(settings.EPA_SYNC_TABLES) or ["tri_facility"])
+    state_codes = [s.upper() for s in (states or _csv(settings.EPA_SYNC_STATES) or US_STATES)]
+    slices = []
+    for t in table_names:
+        cfg = SYNC_TABLES.get(t)
+        if cfg is None:
+            raise ValueError(f"Unsupported Envirofacts table: {t}")
+        slices.extend(_Slice(t, cfg["source"], cfg["state_column"], st) for st in state_codes)
+
+    results: List[Dict[str, Any]] = []
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="epa-sync") as pool:
+        for sl, n in zip(slices, pool.map(lambda s: pager.count(s.table, s.state_column, s.state), slices)):
+            sl.total = n
+        active = deque()
+        for sl in slices:
+            skipped = _plan(db, sl, full=full, full_refresh_hours=settings.EPA_SYNC_FULL_REFRESH_HOURS, now=now)
+            if skipped is not None:
+                results.append(skipped)
+            else:
+                active.append(sl)
+        db.commit()
+
+        futures: Dict[Any, Any] = {}
+        window = workers * 2
+        while active or futures:
+            while active and len(futures) < window:
+                sl = active[0]
+                a = sl.next_offset(page_size)
+                if a is None:
+                    active.popleft()
+                    if not sl.inflight:
+                        results.append(_finish(db, sl, now))
+                    continue
+                sl.inflight += 1
+                futures[pool.submit(pager.rows, sl.table, sl.state_column, sl.state, a, a + page_size - 1)] = (sl, a)
+                active.rotate(-1)
+            if not futures:
+                break
+            done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+            for fut in done:
+                sl, a = futures.pop(fut)
+                sl.inflight -= 1
+                try:
+                    raw = fut.result()
+                except Exception as e:
+                    logger.warning(f"Envirofacts page {sl.table}/{sl.state} rows {a}: {e}")
+                    sl.error = sl.error or f"rows {a}:{a + page_size - 1}: {e}"
+                else:
+                    rows = [r for r in (normalize_facility(rec, sl.source) for rec in raw) if r is not None]
+                    counts = upsert_facilities_delta(db, rows, commit=False)
+                    cp = get_or_create_sync_checkpoint(db, sl.table, sl.state)
+                    for k, v in counts.items():
+                        totals[k] += v
+                        setattr(cp, k, (getattr(cp, k) or 0) + v)
+                    sl.done[a] = a + len(raw)
+                    if len(raw) < page_size:
+                        sl.end_seen = a if sl.end_seen is None else min(sl.end_seen, a)
+                    while sl.next_row in sl.done:
+                        nxt = sl.done.pop(sl.next_row)
+                        if nxt == sl.next_row:
+                            break
+                        sl.next_row = nxt
+                    cp.next_row = sl.next_row
+                if not sl.inflight and sl not in active:
+                    results.append(_finish(db, sl, now))
+            db.commit()
+
+    if totals["inserted"] or totals["updated"]:
+        invalidate_facility_index(db)
+    failed = [r for r in results if r.get("status") == "failed"]
+    summary = {
+        **totals,
+        "slices": len(results),
+        "failed": len(failed),
+        "requests": pager.requests_made,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "checkpoints": results,
+    }
+    logger.info(f"EPA sync: {totals} across {len(results)} slices ({len(failed)} failed) in {summary['elapsed_s']}s")
+    return summary
+
+
+__all__ = [
+    "US_STATES",
+    "SYNC_TABLES",
+    "EnvirofactsPager",
+    "run_epa_sync",
+    "run_epa_sync_job",
+    "sync_in_progress",
+]
@@ -19,6 +19,8 @@ from typing import Any, Dict, List, Protocol, Optional
 
 import httpx
 
+from app.utils import cache_codec
+
 import os
 
 logger = logging.getLogger(__name__)
@@ -54,18 +56,25 @@ class RedisCache:
         key_hash = hashlib.md5(param_string.encode()).hexdigest()
         return f"external_api:{prefix}:{key_hash}"
 
+    @staticmethod
+    def _namespace(cache_key: str) -> str:
+        """Codec namespace of a key: the prefix passed to _generate_cache_key."""
+        parts = cache_key.split(":")
+        return parts[1] if len(parts) > 2 else parts[0]
+
     async def get(self, cache_key: str) -> Any | None:
-        """Get cached data"""
+        """Get cached data (a pyarrow Table for namespaces using the arrow codec)"""
         redis_service = await self._get_redis_service()
         if redis_service:
-            return await redis_service.get_cache(cache_key)
+            return cache_codec.decode(redis_service.get_cache_bytes(cache_key))
         return None
 
     async def set(self, cache_key: str, value: Any, ttl: Optional[int] = None) -> None:
-        """Set cached data"""
+        """Set cached data, encoded with the namespace's codec"""
         redis_service = await self._get_redis_service()
         if redis_service:
-            await redis_service.set_cache(cache_key, value, ttl or self.default_ttl)
+            data = cache_codec.encode(value, cache_codec.codec_for(self._namespace(cache_key)))
+            redis_service.set_cache_bytes(cache_key, data, ttl or self.default_ttl)
 
     async def get_or_set(self, cache_key: str, fetch_func, ttl: Optional[int] = None):
         """Get from cache or set if not exists"""
@@ -82,7 +91,8 @@ class RedisCache:
         # Cache the fresh data
         await self.set(cache_key, fresh_data, ttl)
 
-        return fresh_data
+        # Same shape as a hit: arrow namespaces hand back Tables
+        return cache_codec.as_cached(fresh_data, cache_codec.codec_for(self._namespace(cache_key)))
 
 # Global Redis cache instance
 redis_cache = RedisCache()
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.repositories.epa_facility_repository import list_all_facilities, store_signature, upsert_facilities
+
+logger = logging.getLogger(__name__)
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_name(name: Any) -> str:
+    """Lower-case, punctuation folded to single spaces ("Exxon-Mobil, Corp." -> "exxon mobil corp")."""
+    return _NON_ALNUM.sub(" ", str(name or "").lower()).strip()
+
+
+def trigrams(text: str) -> List[str]:
+    padded = f" {text} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def _first(rec: Dict[str, Any], *keys: str) -> Any:
+    for k in keys:
+        v = rec.get(k)
+        if v not in (None, ""):
+            return v
+    return None
+
+
+def _float(v: Any) -> Optional[float]:
+    try:
+        return float(v) if v not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_facility(rec: Dict[str, Any], source: str = "tri_facility") -> Optional[Dict[str, Any]]:
+    """Map a raw tri_facility / FRS record (any key case) to an epa_facilities row; None if unusable."""
+    r = {str(k).lower(): v for k, v in rec.items()}
+    if source == "frs":
+        source_id = _first(r, "registry_id", "frs_registry_id")
+        name = _first(r, "primary_name", "facility_name")
+        state = _first(r, "state_code", "state_abbr", "state")
+    else:
+        source_id = _first(r, "tri_facility_id", "facility_id", "raw_data_id")
+        name = _first(r, "facility_name", "primary_name")
+        state = _first(r, "state_abbr", "state")
+    if not source_id or not name:
+        return None
+    return {
+        "id": f"{source}:{source_id}",
+        "source": source,
+        "source_id": str(source_id),
+        "facility_name": str(name).strip(),
+        "parent_company": _first(r, "parent_co_name", "parent_company", "standardized_parent_company"),
+        "state": str(state).strip().upper()[:2] if state else None,
+        "city": _first(r, "city_name", "city"),
+        "county": _first(r, "county_name", "county"),
+        "zip_code": str(_first(r, "zip_code", "postal_code") or "") or None,
+        "latitude": _float(_first(r, "pref_latitude", "latitude83", "latitude")),
+        "longitude": _float(_first(r, "pref_longitude", "longitude83", "longitude")),
+    }
+
+
+class FacilityIndex:
+    """In-memory search index over the local EPA facility store.
+
+    Facility and parent-company names are normalized and indexed by trigram
+    (posting lists as sorted int32 arrays) plus a per-state posting list.
+    A substring query intersects the postings of its trigrams, smallest first,
+    and verifies the few survivors, so it returns exactly the facilities whose
+    name contains the term (the old linear `term in name` rule) without
+    scanning the table.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]]) -> None:
+        self.records: List[Dict[str, Any]] = list(records)
+        self.names: List[str] = []
+        gram_counts: List[int] = []
+        postings: Dict[str, List[int]] = {}
+        states: Dict[str, List[int]] = {}
+        for i, rec in enumerate(self.records):
+            text = " | ".join(filter(None, (normalize_name(rec.get("facility_name")), normalize_name(rec.get("parent_company")))))
+            self.names.append(text)
+            grams = trigrams(text)
+            gram_counts.append(len(grams))
+            for g in grams:
+                postings.setdefault(g, []).append(i)
+            states.setdefault(str(rec.get("state") or "").upper(), []).append(i)
+        self.postings = {g: np.array(ids, dtype=np.int32) for g, ids in postings.items()}
+        self.states = {s: np.array(ids, dtype=np.int32) for s, ids in states.items()}
+        self._gram_counts = np.array(gram_counts, dtype=np.float64)  # Jaccard denominators for similar()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _candidates(self, term: str, state: Optional[str]) -> Optional[np.ndarray]:
+        lists = []
+        if len(term) >= 3:
+            # interior trigrams only: the query may sit in the middle of a word
+            grams = {term[i:i + 3] for i in range(len(term) - 2)}
+            for g in grams:
+                ids = self.postings.get(g)
+                if ids is None:
+                    return np.empty(0, dtype=np.int32)
+                lists.append(ids)
+        if state:
+            lists.append(self.states.get(state.upper(), np.empty(0, dtype=np.int32)))
+        if not lists:
+            return None  # no selective key: caller verifies every record
+        lists.sort(key=len)
+        out = lists[0]
+        for ids in lists[1:]:
+            if not out.size:
+                break
+            out = np.intersect1d(out, ids, assume_unique=True)
+        return out
+
+    def search(self, term: str, *, state: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Facilities whose facility or parent name contains `term` (normalized), optionally in `state`."""
+        q = normalize_name(term)
+        if not q:
+            return []
+        candidates = self._candidates(q, state)
+        ids = range(len(self.records)) if candidates is None else candidates.tolist()
+        out = []
+        for i in ids:
+            if q in self.names[i]:
+                out.append(self.records[i])
+                if limit and len(out) >= limit:
+                    break
+        return out
+
+    def similar(self, term: str, *, state: Optional[str] = None, limit: int = 5, min_score: float = 0.3) -> List[Tuple[float, Dict[str, Any]]]:
+        """Fuzzy candidates ranked by trigram overlap (Jaccard) — used for 'did you mean' suggestions."""
+        q = normalize_name(term)
+        grams = trigrams(q) if q else []
+        if not grams:
+            return []
+        hits = [self.postings[g] for g in grams if g in self.postings]
+        if not hits:
+            return []
+        ids, shared = np.unique(np.concatenate(hits), return_counts=True)
+        if state:
+            allowed = self.states.get(state.upper(), np.empty(0, dtype=np.int32))
+            keep = np.isin(ids, allowed)
+            ids, shared = ids[keep], shared[keep]
+        if not ids.size:
+            return []
+        scores = shared / (len(grams) + self._gram_counts[ids] - shared)
+        order = np.argsort(-scores)[:limit]
+        return [(round(float(scores[j]), 4), self.records[int(ids[j])]) for j in order if scores[j] >= min_score]
+
+
+# One index per database bind, rebuilt when the store signature changes.
+# _INDEX_LOCK only guards the dicts: signature checks and builds run under a
+# per-bind build lock, so other binds are never blocked and, once an index
+# exists, readers keep getting it while a replacement is built.
+_INDEXES: Dict[int, Tuple[Tuple[Any, ...], FacilityIndex, float]] = {}
+_BUILD_LOCKS: Dict[int, threading.Lock] = {}
+_GENERATIONS: Dict[int, int] = {}
+_INDEX_LOCK = threading.Lock()
+
+
+def get_facility_index(db: Session) -> Optional[FacilityIndex]:
+    """Process-wide index for the store behind `db`; None when the store is empty.
+
+    The store signature (row count, last update) is re-checked at most every
+    EPA_FACILITY_INDEX_REFRESH_SECONDS, so the index follows sync runs without
+    a query per request.
+    """
+    key = id(db.get_bind())
+    refresh = float(getattr(settings, "EPA_FACILITY_INDEX_REFRESH_SECONDS", 60.0))
+    with _INDEX_LOCK:
+        cached = _INDEXES.get(key)
+        if cached is not None and time.monotonic() - cached[2] < refresh:
+            return cached[1] if len(cached[1]) else None
+        build_lock = _BUILD_LOCKS.setdefault(key, threading.Lock())
+    if cached is not None:
+        if not build_lock.acquire(blocking=False):
+            return cached[1] if len(cached[1]) else None  # another thread is refreshing; serve the current index
+    else:
+        build_lock.acquire()  # nothing to serve yet: wait for the first build
+    try:
+        with _INDEX_LOCK:
+            cached = _INDEXES.get(key)
+            if cached is not None and time.monotonic() - cached[2] < refresh:
+                return cached[1] if len(cached[1]) else None
+            generation = _GENERATIONS.get(key, 0)
+        signature = store_signature(db)
+        if cached is not None and cached[0] == signature:
+            index = cached[1]
+        else:
+            started = time.perf_counter()
+            index = FacilityIndex(f.to_record() for f in list_all_facilities(db)) if signature[0] else FacilityIndex([])
+            if signature[0]:
+                logger.info(f"Built EPA facility index over {len(index)} facilities in {time.perf_counter() - started:.2f}s")
+        with _INDEX_LOCK:
+            if _GENERATIONS.get(key, 0) == generation:  # not invalidated while we were reading
+                _INDEXES[key] = (signature, index, time.monotonic())
+        return index if len(index) else None
+    finally:
+        build_lock.release()
+
+
+def invalidate_facility_index(db: Optional[Session] = None) -> None:
+    with _INDEX_LOCK:
+        keys = set(_INDEXES) | set(_BUILD_LOCKS) if db is None else {id(db.get_bind())}
+        for key in keys:
+            _INDEXES.pop(key, None)
+            _GENERATIONS[key] = _GENERATIONS.get(key, 0) + 1
+
+
+def ingest_facilities(db: Session, records: Iterable[Dict[str, Any]], *, source: str = "tri_facility") -> Dict[str, int]:
+    """Normalize raw registry records and upsert them into the local store."""
+    rows, skipped = [], 0
+    for rec in records:
+        row = normalize_facility(rec, source) if isinstance(rec, dict) else None
+        if row is None:
+            skipped += 1
+        else:
+            rows.append(row)
+    written = upsert_facilities(db, rows)
+    invalidate_facility_index(db)
+    return {"written": written, "skipped": skipped}
+
+
+__all__ = [
+    "FacilityIndex",
+    "normalize_name",
+    "normalize_facility",
+    "get_facility_index",
+    "invalidate_facility_index",
+    "ingest_facilities",
+]
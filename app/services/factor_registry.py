@@ -0,0 +1,398 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.ghg import GASES
+from app.services.unit_conversion import FUEL_PROPERTIES, UNIT_ALIASES, canonical_unit, compile_conversions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGION = "US_default"
+_ARTIFACT_FORMAT = 1  # bump when the compiled artifact layout changes
+
+
+def _version_key(version: str) -> Tuple[Tuple[int, Any], ...]:
+    """Sort key so that '0.10' > '0.9' and numeric parts compare numerically."""
+    parts = []
+    for p in str(version).split("."):
+        parts.append((0, int(p)) if p.isdigit() else (1, p))
+    return tuple(parts)
+
+
+@dataclass
+class FactorSet:
+    """One immutable, versioned set of emission factors with compiled lookup tables.
+
+    scope1 maps (fuel, unit) -> kg CO2 per unit; scope2 maps grid region -> kg CO2 per kWh.
+    scope1_gases optionally adds kg CH4 / N2O per unit for the same (fuel, unit) pairs.
+    Everything derived from them (upper-cased region index, dense NumPy arrays for
+    batch calculation, serialized API payloads) is built once in compile().
+    compile() also folds unit conversions into the scope1 tables: every unit that
+    can be converted to a declared unit of the fuel (same dimension, or via
+    fuel_properties density / heat content) gets its own pre-multiplied row, so a
+    lookup or batch row costs the same whichever unit the caller used.
+    """
+
+    version: str
+    scope1: Dict[Tuple[str, str], float]
+    scope2: Dict[str, float]
+    sources: List[str] = field(default_factory=list)
+    origin: str = "builtin"
+    scope1_gases: Dict[Tuple[str, str], Dict[str, float]] = field(default_factory=dict)
+    fuel_properties: Dict[str, Dict[str, float]] = field(default_factory=lambda: dict(FUEL_PROPERTIES))
+
+    def __post_init__(self) -> None:
+        if DEFAULT_REGION not in self.scope2:
+            raise ValueError(f"factor set {self.version} must define scope2 region {DEFAULT_REGION}")
+        self.compile()
+
+    def compile(self) -> None:
+        self.s1_index: Dict[str, int] = {f"{fuel}|{unit}": i for i, (fuel, unit) in enumerate(self.scope1)}
+        declared = np.fromiter(self.scope1.values(), dtype=np.float64, count=len(self.scope1))
+        # (fuel/unit x gas) kg per unit, columns in GASES order; CO2 is the scope1 factor itself
+        gas_rows = np.zeros((len(self.scope1), len(GASES)), dtype=np.float64)
+        gas_rows[:, 0] = declared
+        for i, key in enumerate(self.scope1):
+            for j, gas in enumerate(GASES[1:], start=1):
+                gas_rows[i, j] = float(self.scope1_gases.get(key, {}).get(gas, 0.0))
+
+        units: Dict[str, List[str]] = {}
+        for fuel, unit in self.scope1:
+            units.setdefault(fuel, []).append(unit)
+
+        # Derived rows for convertible units: factor(fuel, unit) = multiplier * factor(fuel, base)
+        self.s1_conversions: Dict[str, Tuple[str, float]] = {}
+        derived_rows = []
+        for fuel, fuel_units in units.items():
+            for unit, (base, multiplier) in compile_conversions(fuel, fuel_units, self.fuel_properties).items():
+                key = f"{fuel}|{unit}"
+                self.s1_index[key] = len(self.scope1) + len(derived_rows)
+                self.s1_conversions[key] = (base, multiplier)
+                derived_rows.append(gas_rows[self.s1_index[f"{fuel}|{base}"]] * multiplier)
+        if derived_rows:
+            gas_rows = np.vstack([gas_rows, np.array(derived_rows)])
+        for alias, unit in UNIT_ALIASES.items():
+            for fuel in units:
+                if f"{fuel}|{unit}" in self.s1_index:
+                    self.s1_index.setdefault(f"{fuel}|{alias}", self.s1_index[f"{fuel}|{unit}"])
+        self.s1_gas_matrix = gas_rows
+        self.s1_factors = np.ascontiguousarray(gas_rows[:, 0])
+
+        self.s2_index: Dict[str, int] = {region.upper(): i for i, region in enumerate(self.scope2)}
+        self.s2_factors = np.fromiter(self.scope2.values(), dtype=np.float64, count=len(self.scope2))
+        self.s2_regions = np.array(list(self.scope2.keys()), dtype=object)
+        self.s2_default = self.s2_index[DEFAULT_REGION.upper()]
+
+        self.factors_payload: bytes = json.dumps({
+            "status": "success",
+            "version": self.version,
+            "sources": self.sources,
+            "scope1_factors": {f"{fuel}_{unit}": factor for (fuel, unit), factor in self.scope1.items()},
+            "scope1_gas_factors": {
+                f"{fuel}_{unit}": dict(zip(GASES, self.s1_gas_matrix[i].tolist()))
+                for i, (fuel, unit) in enumerate(self.scope1)
+            },
+            "scope2_grid_factors": self.scope2,
+        }).encode("utf-8")
+        self.units_payload: bytes = json.dumps({
+            "status": "success",
+            "version": self.version,
+            "scope1_units": units,
+            "scope1_convertible_units": {
+                fuel: sorted(k.split("|", 1)[1] for k in self.s1_conversions if k.split("|", 1)[0] == fuel) for fuel in units
+            },
+            "scope2_units": {"electricity": ["kwh"], "grid_regions": list(self.scope2.keys())},
+        }).encode("utf-8")
+        # Activity-style table used by the environmental calc route
+        self.activity_table: Dict[str, Any] = {
+            "version": self.version,
+            "sources": self.sources,
+            "electricity": {"kwh": self.scope2[DEFAULT_REGION], "mwh": self.scope2[DEFAULT_REGION] * 1000.0},
+            "fuel": {fuel: {unit: self.scope1[(fuel, unit)] for unit in fuel_units} for fuel, fuel_units in units.items()},
+        }
+
+    def _s1_row(self, fuel_type: str, unit: str) -> Optional[int]:
+        return self.s1_index.get(f"{fuel_type.strip().lower()}|{canonical_unit(unit)}")
+
+    def scope1_factor(self, fuel_type: str, unit: str) -> Optional[float]:
+        idx = self._s1_row(fuel_type, unit)
+        return None if idx is None else float(self.s1_factors[idx])
+
+    def scope1_gas_factors(self, fuel_type: str, unit: str) -> Optional[np.ndarray]:
+        """kg of each gas in GASES per unit of fuel, or None when the pair is unsupported."""
+        idx = self._s1_row(fuel_type, unit)
+        return None if idx is None else self.s1_gas_matrix[idx]
+
+    def scope1_conversion(self, fuel_type: str, unit: str) -> Optional[Tuple[str, float]]:
+        """(declared base unit, multiplier) when `unit` is served through a conversion."""
+        return self.s1_conversions.get(f"{fuel_type.strip().lower()}|{canonical_unit(unit)}")
+
+    def grid_factor(self, region: Optional[str]) -> Tuple[str, float]:
+        idx = self.s2_index.get(region.upper()) if region else None
+        if idx is None:
+            return (DEFAULT_REGION, self.scope2[DEFAULT_REGION])  # fallback
+        return (str(self.s2_regions[idx]), float(self.s2_factors[idx]))
+
+    def to_artifact(self) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        """Source tables plus everything compile() derived, as (JSON-able meta, arrays)."""
+        meta = {
+            "version": self.version,
+            "sources": self.sources,
+            "origin": self.origin,
+            "scope1": [[fuel, unit, factor] for (fuel, unit), factor in self.scope1.items()],
+            "scope2": list(self.scope2.items()),
+            "scope1_gases": [[fuel, unit, gases] for (fuel, unit), gases in self.scope1_gases.items()],
+            "fuel_properties": self.fuel_properties,
+            "s1_index": self.s1_index,
+            "s1_conversions": self.s1_conversions,
+            "factors_payload": self.factors_payload.decode("utf-8"),
+            "units_payload": self.units_payload.decode("utf-8"),
+            "activity_table": self.activity_table,
+        }
+        return meta, {"s1_gas_matrix": self.s1_gas_matrix, "s2_factors": self.s2_factors}
+
+    @classmethod
+    def from_artifact(cls, meta: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> "FactorSet":
+        """Rebuild a compiled set from to_artifact() output without recompiling."""
+        fs = cls.__new__(cls)
+        fs.version = meta["version"]
+        fs.sources = list(meta["sources"])
+        fs.origin = meta["origin"]
+        fs.scope1 = {(fuel, unit): float(factor) for fuel, unit, factor in meta["scope1"]}
+        fs.scope2 = {region: float(factor) for region, factor in meta["scope2"]}
+        fs.scope1_gases = {(fuel, unit): dict(gases) for fuel, unit, gases in meta["scope1_gases"]}
+        fs.fuel_properties = meta["fuel_properties"]
+        fs.s1_index = meta["s1_index"]
+        fs.s1_conversions = {k: (base, float(m)) for k, (base, m) in meta["s1_conversions"].items()}
+        fs.s1_gas_matrix = arrays["s1_gas_matrix"]
+        fs.s1_factors = np.ascontiguousarray(fs.s1_gas_matrix[:, 0])
+        fs.s2_index = {region.upper(): i for i, region in enumerate(fs.scope2)}
+        fs.s2_factors = arrays["s2_factors"]
+        fs.s2_regions = np.array(list(fs.scope2.keys()), dtype=object)
+        fs.s2_default = fs.s2_index[DEFAULT_REGION.upper()]
+        fs.factors_payload = meta["factors_payload"].encode("utf-8")
+        fs.units_payload = meta["units_payload"].encode("utf-8")
+        fs.activity_table = meta["activity_table"]
+        return fs
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], origin: str) -> "FactorSet":
+        """Build from a version file:
+        {"version": "0.2", "sources": [...],
+         "scope1": {"diesel": {"gallon": 10.21}, ...}, "scope2": {"US_default": 0.4, ...},
+         "scope1_gases": {"diesel": {"gallon": {"CH4": 0.00041, "N2O": 0.00008}}, ...},  # optional
+         "fuel_properties": {"diesel": {"density": 845.0, "hhv": 38.46}, ...}}  # optional, kg/m3 and GJ/m3
+        """
+        version = str(data.get("version") or "").strip()
+        if not version:
+            raise ValueError("factor file is missing 'version'")
+        scope1: Dict[Tuple[str, str], float] = {}
+        for fuel, units in (data.get("scope1") or {}).items():
+            for unit, factor in (units or {}).items():
+                scope1[(str(fuel).lower(), canonical_unit(unit))] = float(factor)
+        scope2 = {str(region): float(factor) for region, factor in (data.get("scope2") or {}).items()}
+        gases: Dict[Tuple[str, str], Dict[str, float]] = {}
+        for fuel, units in (data.get("scope1_gases") or {}).items():
+            for unit, per_gas in (units or {}).items():
+                key = (str(fuel).lower(), canonical_unit(unit))
+                if key not in scope1:
+                    raise ValueError(f"scope1_gases entry {fuel}/{unit} has no scope1 CO2 factor")
+                gases[key] = {str(g).upper(): float(v) for g, v in (per_gas or {}).items()}
+        properties = {fuel: dict(p) for fuel, p in FUEL_PROPERTIES.items()}
+        for fuel, p in (data.get("fuel_properties") or {}).items():
+            properties.setdefault(str(fuel).lower(), {}).update({str(k): float(v) for k, v in (p or {}).items()})
+        return cls(
+            version=version,
+            scope1=scope1,
+            scope2=scope2,
+            sources=list(data.get("sources") or []),
+            origin=origin,
+            scope1_gases=gases,
+            fuel_properties=properties,
+        )
+
+
+class FactorRegistry:
+    """Process-wide registry of versioned factor sets with hot reload.
+
+    The built-in set from emissions_calculator is always available; additional
+    versions are loaded from *.json files in EMISSION_FACTORS_DIR. The directory is
+    re-scanned (by file mtime/size) at most every EMISSION_FACTORS_RELOAD_SECONDS;
+    when it changed, all sets are rebuilt off to the side and swapped in with a
+    single reference assignment, so readers never see a half-loaded registry.
+    The active version is EMISSION_FACTORS_VERSION when set, else the newest one.
+
+    Compiled sets are also written to EMISSION_FACTORS_COMPILED_DIR, keyed by
+    the directory signature and the built-in tables, so only the first worker
+    to see a change parses and compiles it; the others load the artifact.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        reload_seconds: Optional[float] = None,
+        active_version: Optional[str] = None,
+        compiled_dir: Optional[str] = None,
+    ) -> None:
+        self.directory = directory or settings.EMISSION_FACTORS_DIR
+        self._compiled_dir = compiled_dir
+        self.reload_seconds = settings.EMISSION_FACTORS_RELOAD_SECONDS if reload_seconds is None else reload_seconds
+        self.pinned_version = active_version if active_version is not None else settings.EMISSION_FACTORS_VERSION
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        # (sets by version, active version, directory signature) — replaced as a whole
+        self._state: Tuple[Dict[str, FactorSet], str, Tuple[Any, ...]] = ({}, "", ("unloaded",))
+        self.reloads = 0
+        self.artifact_loads = 0
+        self.reload()
+
+    # ---- Loading ----
+    def _signature(self) -> Tuple[Any, ...]:
+        try:
+            entries = sorted(
+                (e.name, e.stat().st_mtime_ns, e.stat().st_size)
+                for e in os.scandir(self.directory)
+                if e.is_file() and e.name.endswith(".json")
+            )
+        except FileNotFoundError:
+            entries = []
+        return tuple(entries)
+
+    def _builtin(self) -> FactorSet:
+        from app.services.emissions_calculator import FACTORS_VERSION, SCOPE1_FACTORS, SCOPE1_GAS_FACTORS, SCOPE2_GRID_FACTORS
+        return FactorSet(
+            version=FACTORS_VERSION,
+            scope1=dict(SCOPE1_FACTORS),
+            scope2=dict(SCOPE2_GRID_FACTORS),
+            sources=["builtin v0.1 defaults"],
+            scope1_gases=dict(SCOPE1_GAS_FACTORS),
+        )
+
+    # ---- Compiled artifact shared between workers ----
+    @property
+    def compiled_dir(self) -> Optional[str]:
+        if self._compiled_dir is not None:
+            return self._compiled_dir
+        return getattr(settings, "EMISSION_FACTORS_COMPILED_DIR", None)
+
+    def _artifact_key(self, signature: Tuple[Any, ...]) -> str:
+        from app.services.emissions_calculator import FACTORS_VERSION, SCOPE1_FACTORS, SCOPE1_GAS_FACTORS, SCOPE2_GRID_FACTORS
+        builtin = repr((FACTORS_VERSION, SCOPE1_FACTORS, SCOPE1_GAS_FACTORS, SCOPE2_GRID_FACTORS))
+        raw = json.dumps([_ARTIFACT_FORMAT, os.path.abspath(self.directory), builtin, signature], default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _load_artifact(self, directory: str, key: str) -> Optional[Dict[str, FactorSet]]:
+        base = os.path.join(directory, f"factors-{key}")
+        try:
+            with open(base + ".json", "r", encoding="utf-8") as f:
+                metas = json.load(f)
+            with np.load(base + ".npz") as npz:
+                return {
+                    meta["version"]: FactorSet.from_artifact(meta, {name: npz[f"{i}_{name}"] for name in ("s1_gas_matrix", "s2_factors")})
+                    for i, meta in enumerate(metas)
+                }
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable compiled emission factors {base}: {e}")
+            return None
+
+    def _save_artifact(self, directory: str, key: str, sets: Dict[str, FactorSet]) -> None:
+        base = os.path.join(directory, f"factors-{key}")
+        suffix = f".tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.makedirs(directory, exist_ok=True)
+            metas, arrays = [], {}
+            for i, fs in enumerate(sets.values()):
+                meta, fs_arrays = fs.to_artifact()
+                metas.append(meta)
+                arrays.update({f"{i}_{name}": a for name, a in fs_arrays.items()})
+            with open(base + suffix, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(base + suffix, base + ".npz")
+            with open(base + suffix, "w", encoding="utf-8") as f:
+                json.dump(metas, f)
+            os.replace(base + suffix, base + ".json")  # written last: readers only see complete artifacts
+            for name in os.listdir(directory):
+                if name.startswith("factors-") and not name.startswith(f"factors-{key}"):
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError:
+                        pass
+        except Exception as e:
+            logger.warning(f"Failed to write compiled emission factors {base}: {e}")
+
+    def _compile(self, signature: Tuple[Any, ...]) -> Dict[str, FactorSet]:
+        sets: Dict[str, FactorSet] = {}
+        builtin = self._builtin()
+        sets[builtin.version] = builtin
+        for name, _, _ in signature:
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    fs = FactorSet.from_dict(json.load(f), origin=path)
+                sets[fs.version] = fs
+            except Exception as e:
+                logger.warning(f"Skipping invalid emission factor file {path}: {e}")
+        return sets
+
+    def reload(self) -> bool:
+        """Rebuild all factor sets if the version directory changed. Returns True on swap."""
+        with self._lock:
+            self._last_check = time.monotonic()
+            signature = self._signature()
+            if signature == self._state[2]:
+                return False
+            compiled_dir = self.compiled_dir
+            key = self._artifact_key(signature) if compiled_dir else None
+            sets = self._load_artifact(compiled_dir, key) if key else None
+            if sets is not None:
+                self.artifact_loads += 1
+            else:
+                sets = self._compile(signature)
+                if key:
+                    self._save_artifact(compiled_dir, key, sets)
+            newest = max(sets, key=_version_key)
+            active = self.pinned_version if self.pinned_version in sets else newest
+            if self.pinned_version and self.pinned_version not in sets:
+                logger.warning(f"EMISSION_FACTORS_VERSION={self.pinned_version} not found; using {newest}")
+            self._state = (sets, active, signature)
+            self.reloads += 1
+            logger.info(f"Emission factor registry loaded versions {sorted(sets, key=_version_key)}, active {active}")
+            return True
+
+    def _maybe_reload(self) -> None:
+        if self.reload_seconds >= 0 and time.monotonic() - self._last_check >= self.reload_seconds:
+            self.reload()
+
+    # ---- Lookup ----
+    def get(self, version: Optional[str] = None) -> FactorSet:
+        """Return the factor set for `version` (pinned) or the active one."""
+        self._maybe_reload()
+        sets, active, _ = self._state
+        key = version or active
+        if key not in sets:
+            raise ValueError(f"Unknown emission factors version: {version}")
+        return sets[key]
+
+    def current(self) -> FactorSet:
+        return self.get(None)
+
+    def versions(self) -> List[str]:
+        self._maybe_reload()
+        return sorted(self._state[0], key=_version_key)
+
+
+factor_registry = FactorRegistry()
+
+__all__ = ["FactorSet", "FactorRegistry", "factor_registry"]
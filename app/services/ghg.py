@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.config import settings
+
+# Gas order of every per-gas factor vector / matrix column
+GASES = ("CO2", "CH4", "N2O")
+
+# 100-year global warming potentials (IPCC assessment reports). AR6 uses the
+# fossil CH4 value since scope 1 factors here cover fuel combustion.
+GWP_SETS: Dict[str, Dict[str, float]] = {
+    "AR4": {"CO2": 1.0, "CH4": 25.0, "N2O": 298.0},
+    "AR5": {"CO2": 1.0, "CH4": 28.0, "N2O": 265.0},
+    "AR6": {"CO2": 1.0, "CH4": 29.8, "N2O": 273.0},
+}
+
+# (gases x GWP sets) so that gas masses @ GWP_MATRIX yields CO2e under every set at once
+GWP_SET_NAMES = tuple(GWP_SETS)
+GWP_MATRIX = np.array([[GWP_SETS[s][g] for s in GWP_SET_NAMES] for g in GASES], dtype=np.float64)
+
+
+def resolve_gwp_set(name: Optional[str] = None) -> str:
+    key = (name or settings.EMISSIONS_GWP_SET or "AR5").upper()
+    if key not in GWP_SETS:
+        raise ValueError(f"Unsupported GWP set: {name} (expected one of {', '.join(GWP_SET_NAMES)})")
+    return key
+
+
+def gwp_vector(name: Optional[str] = None) -> np.ndarray:
+    return GWP_MATRIX[:, GWP_SET_NAMES.index(resolve_gwp_set(name))]
+
+
+__all__ = ["GASES", "GWP_SETS", "GWP_SET_NAMES", "GWP_MATRIX", "resolve_gwp_set", "gwp_vector"]
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.repositories.corporate_hierarchy_repository import (
+    get_entity,
+    group_signature,
+    list_group_entities,
+    upsert_entities,
+    update_entity,
+)
+
+
+class HierarchyRollup:
+    """Consolidated Scope 1/2 totals over a parent -> subsidiary -> facility tree.
+
+    total(n) = own(n) + sum(share(c) * total(c) for each child c), where share is
+    the parent's ownership fraction in c. Subtree totals are cached per node; an
+    edit to one node changes only the totals on its path to the root, so updates
+    propagate a delta upwards in O(depth) instead of re-aggregating the tree.
+    """
+
+    def __init__(self, nodes: Iterable[Dict[str, Any]]) -> None:
+        self.parent: Dict[str, Optional[str]] = {}
+        self.share: Dict[str, float] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.own: Dict[str, List[float]] = {}
+        self.total: Dict[str, List[float]] = {}
+        self.meta: Dict[str, Dict[str, Any]] = {}
+        for n in nodes:
+            self.parent[n["id"]] = n.get("parent_id")
+            self.share[n["id"]] = _share(n.get("ownership_pct", 100.0))
+            self.own[n["id"]] = [float(n.get("scope1_emissions_kg") or 0.0), float(n.get("scope2_emissions_kg") or 0.0)]
+            self.meta[n["id"]] = {"name": n.get("name") or n["id"], "kind": n.get("kind") or "facility"}
+        self.rebuild()
+
+    # ---- Full build ----
+    def rebuild(self) -> None:
+        self.children = {node: [] for node in self.parent}
+        for node, parent in self.parent.items():
+            if parent is not None:
+                if parent not in self.parent:
+                    raise ValueError(f"node {node} references unknown parent {parent}")
+                self.children[parent].append(node)
+        # iterative DFS from every root (no recursion limit on deep chains); reversed, it visits children first
+        order: List[str] = []
+        stack = [r for r in self.roots()]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(self.children[node])
+        if len(order) != len(self.parent):
+            raise ValueError("hierarchy contains a cycle")
+        self.total = {}
+        for node in reversed(order):
+            s1, s2 = self.own[node]
+            for c in self.children[node]:
+                s1 += self.share[c] * self.total[c][0]
+                s2 += self.share[c] * self.total[c][1]
+            self.total[node] = [s1, s2]
+
+    def roots(self) -> List[str]:
+        return [n for n, p in self.parent.items() if p is None]
+
+    # ---- Incremental updates ----
+    def _propagate(self, start: Optional[str], d1: float, d2: float) -> List[str]:
+        touched = []
+        node = start
+        while node is not None:
+            t = self.total[node]
+            t[0] += d1
+            t[1] += d2
+            touched.append(node)
+            s = self.share[node]
+            d1 *= s
+            d2 *= s
+            node = self.parent[node]
+        return touched
+
+    def set_own(self, node: str, scope1: Optional[float] = None, scope2: Optional[float] = None) -> List[str]:
+        """Set a node's own emissions; returns the ids whose totals were updated (node .. root)."""
+        own = self.own[node]
+        new1 = own[0] if scope1 is None else float(scope1)
+        new2 = own[1] if scope2 is None else float(scope2)
+        d1, d2 = new1 - own[0], new2 - own[1]
+        self.own[node] = [new1, new2]
+        return self._propagate(node, d1, d2)
+
+    def set_ownership(self, node: str, ownership_pct: float) -> List[str]:
+        old, new = self.share[node], _share(ownership_pct)
+        self.share[node] = new
+        t = self.total[node]
+        return self._propagate(self.parent[node], (new - old) * t[0], (new - old) * t[1])
+
+    def add_node(self, node: Dict[str, Any]) -> List[str]:
+        node_id, parent = node["id"], node.get("parent_id")
+        if node_id in self.parent:
+            raise ValueError(f"node {node_id} already exists")
+        if parent is not None and parent not in self.parent:
+            raise ValueError(f"unknown parent {parent}")
+        self.parent[node_id] = parent
+        self.share[node_id] = _share(node.get("ownership_pct", 100.0))
+        self.meta[node_id] = {"name": node.get("name") or node_id, "kind": node.get("kind") or "facility"}
+        self.children[node_id] = []
+        self.own[node_id] = [0.0, 0.0]
+        self.total[node_id] = [0.0, 0.0]
+        if parent is not None:
+            self.children[parent].append(node_id)
+        return self.set_own(node_id, node.get("scope1_emissions_kg") or 0.0, node.get("scope2_emissions_kg") or 0.0)
+
+    def move(self, node: str, new_parent: Optional[str]) -> List[str]:
+        """Re-parent a node (and its subtree); only the old and new root paths change."""
+        ancestor = new_parent
+        while ancestor is not None:
+            if ancestor == node:
+                raise ValueError(f"moving {node} under {new_parent} would create a cycle")
+            ancestor = self.parent[ancestor]
+        old_parent = self.parent[node]
+        s, t = self.share[node], self.total[node]
+        touched = self._propagate(old_parent, -s * t[0], -s * t[1])
+        if old_parent is not None:
+            self.children[old_parent].remove(node)
+        self.parent[node] = new_parent
+        if new_parent is not None:
+            self.children[new_parent].append(node)
+        return touched + self._propagate(new_parent, s * t[0], s * t[1])
+
+    # ---- Reads ----
+    def equity_share(self, node: str) -> float:
+        """Share of this node that the ultimate parent owns (product of ownership on the path)."""
+        share, n = 1.0, node
+        while self.parent[n] is not None:
+            share *= self.share[n]
+            n = self.parent[n]
+        return share
+
+    def totals(self, node: str) -> Dict[str, Any]:
+        s1, s2 = self.total[node]
+        return {
+            "id": node,
+            **self.meta[node],
+            "parent_id": self.parent[node],
+            "ownership_pct": round(self.share[node] * 100.0, 6),
+            "equity_share_of_root": round(self.equity_share(node), 6),
+            "own_emissions_kg": round(sum(self.own[node]), 6),
+            "scope1_emissions_kg": round(s1, 6),
+            "scope2_emissions_kg": round(s2, 6),
+            "emissions_kg": round(s1 + s2, 6),
+            "emissions_tonnes": round((s1 + s2) / 1000.0, 6),
+        }
+
+    def tree(self, node: str, depth: int = 1) -> Dict[str, Any]:
+        out = self.totals(node)
+        if depth > 0 and self.children[node]:
+            out["children"] = [self.tree(c, depth - 1) for c in self.children[node]]
+        return out
+
+
+def _share(ownership_pct: Any) -> float:
+    pct = float(100.0 if ownership_pct is None else ownership_pct)
+    if not 0.0 <= pct <= 100.0:
+        raise ValueError(f"ownership_pct must be between 0 and 100, got {pct}")
+    return pct / 100.0
+
+
+# Process-local rollups per group with the group signature they were built
+# from. Every read compares the signature with the database, so edits made
+# by other workers are picked up; this worker's own edits keep the cached
+# rollup current by propagating their deltas.
+_ROLLUPS: Dict[str, Tuple[Tuple[int, int], HierarchyRollup]] = {}
+_ROLLUPS_LOCK = threading.Lock()
+
+
+def _current_rollup(db: Session, group_id: str) -> Tuple[Tuple[int, int], HierarchyRollup]:
+    signature = group_signature(db, group_id)  # read before the rows: a write in between forces a rebuild later
+    with _ROLLUPS_LOCK:
+        cached = _ROLLUPS.get(group_id)
+        if cached is not None and cached[0] == signature:
+            return cached
+        rows = list_group_entities(db, group_id)
+        if not rows:
+            raise LookupError(f"Unknown group: {group_id}")
+        cached = (signature, HierarchyRollup(r.to_dict() for r in rows))
+        _ROLLUPS[group_id] = cached
+        return cached
+
+
+def get_group_rollup(db: Session, group_id: str) -> HierarchyRollup:
+    return _current_rollup(db, group_id)[1]
+
+
+def save_group(db: Session, group_id: str, nodes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Create or replace the nodes of a group and rebuild its cached rollup."""
+    existing = {r.id: r.to_dict() for r in list_group_entities(db, group_id)}
+    merged = {**existing, **{n["id"]: {**n, "group_id": group_id} for n in nodes}}
+    rollup = HierarchyRollup(merged.values())  # validates parents, cycles and ownership before writing
+    roots = rollup.roots()
+    if len(roots) != 1:
+        raise ValueError(f"group {group_id} must have exactly one root, found {len(roots)}")
+    for n in nodes:
+        other = get_entity(db, n["id"])
+        if other is not None and other.group_id != group_id:
+            raise ValueError(f"node {n['id']} already belongs to group {other.group_id}")
+    upsert_entities(db, group_id=group_id, nodes=nodes)
+    signature = group_signature(db, group_id)
+    with _ROLLUPS_LOCK:
+        _ROLLUPS[group_id] = (signature, rollup)
+    return rollup.tree(roots[0], depth=1)
+
+
+def update_group_node(
+    db: Session,
+    group_id: str,
+    node_id: str,
+    *,
+    scope1_emissions_kg: Optional[float] = None,
+    scope2_emissions_kg: Optional[float] = None,
+    ownership_pct: Optional[float] = None,
+    parent_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Apply one node edit to the database and propagate it up the cached rollup."""
+    signature, rollup = _current_rollup(db, group_id)
+    entity = get_entity(db, node_id)
+    if entity is None or entity.group_id != group_id or node_id not in rollup.parent:
+        raise LookupError(f"Unknown node {node_id} in group {group_id}")
+    if parent_id is not None and parent_id not in rollup.parent:
+        raise ValueError(f"unknown parent {parent_id}")
+    if ownership_pct is not None:
+        _share(ownership_pct)  # validate before any part of the edit is applied
+
+    touched: List[str] = []
+    fields: Dict[str, Any] = {}
+    with _ROLLUPS_LOCK:
+        if parent_id is not None and parent_id != rollup.parent[node_id]:
+            touched += rollup.move(node_id, parent_id)
+            fields["parent_id"] = parent_id
+        if ownership_pct is not None:
+            touched += rollup.set_ownership(node_id, ownership_pct)
+            fields["ownership_pct"] = float(ownership_pct)
+        if scope1_emissions_kg is not None or scope2_emissions_kg is not None:
+            touched += rollup.set_own(node_id, scope1_emissions_kg, scope2_emissions_kg)
+            fields["scope1_emissions_kg"], fields["scope2_emissions_kg"] = rollup.own[node_id]
+    try:
+        update_entity(db, entity, **fields)
+    except Exception:
+        with _ROLLUPS_LOCK:
+            _ROLLUPS.pop(group_id, None)  # rebuilt from the database on next read
+        raise
+    # our write bumps one row version; anything else means another writer got in between
+    after = group_signature(db, group_id)
+    with _ROLLUPS_LOCK:
+        cached = _ROLLUPS.get(group_id)
+        if after == (signature[0], signature[1] + 1) and cached is not None and cached[1] is rollup:
+            _ROLLUPS[group_id] = (after, rollup)
+        else:
+            _ROLLUPS.pop(group_id, None)
+    root = rollup.roots()[0]
+    return {
+        "node": rollup.totals(node_id),
+        "recomputed": list(dict.fromkeys(touched)),
+        "root": rollup.totals(root),
+    }
+
+
+def invalidate_group(group_id: Optional[str] = None) -> None:
+    with _ROLLUPS_LOCK:
+        if group_id is None:
+            _ROLLUPS.clear()
+        else:
+            _ROLLUPS.pop(group_id, None)
+
+
+__all__ = ["HierarchyRollup", "get_group_rollup", "save_group", "update_group_node", "invalidate_group"]
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import calendar
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.factor_registry import factor_registry
+
+logger = logging.getLogger(__name__)
+
+# Loaded curve matrices keyed by "<npy path>:<mtime>" (shared across requests)
+_CURVE_CACHE: Dict[str, "HourlyCurves"] = {}
+
+
+def hours_in_year(year: int) -> int:
+    return 8784 if calendar.isleap(year) else 8760
+
+
+def _month_starts(year: int) -> np.ndarray:
+    """Hour-of-year index where each month begins (12 entries)."""
+    starts, h = [], 0
+    for m in range(1, 13):
+        starts.append(h)
+        h += calendar.monthrange(year, m)[1] * 24
+    return np.array(starts, dtype=np.int64)
+
+
+@dataclass
+class HourlyCurves:
+    """Hourly grid factors (kg CO2/kWh) for one year: a (regions x hours) float32 matrix.
+
+    Stored as grid_<year>.npy (raw columnar matrix, opened with mmap_mode="r" so
+    workers share pages through the OS page cache) plus grid_<year>.json holding
+    the region order and provenance.
+    """
+
+    year: int
+    regions: List[str]
+    factors: np.ndarray
+    source: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        self.region_index = {r.upper(): i for i, r in enumerate(self.regions)}
+
+
+@dataclass
+class IntervalSeries:
+    """Interval meter readings for one site; kwh[i] covers [start + i*interval, start + (i+1)*interval)."""
+
+    site_id: str
+    kwh: np.ndarray
+    start: datetime
+    interval_minutes: int = 60
+    grid_region: Optional[str] = None
+
+
+def write_hourly_curves(directory: str, year: int, curves: Dict[str, Sequence[float]], source: Optional[str] = None) -> str:
+    """Write hourly factor curves for `year` in the memory-mappable layout. Returns the .npy path."""
+    hours = hours_in_year(year)
+    regions = list(curves.keys())
+    matrix = np.empty((len(regions), hours), dtype=np.float32)
+    for i, region in enumerate(regions):
+        values = np.asarray(curves[region], dtype=np.float32)
+        if values.shape != (hours,):
+            raise ValueError(f"curve for {region} must have {hours} hourly values, got {values.shape[0]}")
+        matrix[i] = values
+    os.makedirs(directory, exist_ok=True)
+    npy_path = os.path.join(directory, f"grid_{year}.npy")
+    tmp_path = npy_path + ".tmp.npy"
+    np.save(tmp_path, matrix)
+    with open(os.path.join(directory, f"grid_{year}.json"), "w", encoding="utf-8") as f:
+        json.dump({"year": year, "regions": regions, "source": source}, f)
+    os.replace(tmp_path, npy_path)
+    return npy_path
+
+
+def load_hourly_curves(year: int, directory: Optional[str] = None) -> Optional[HourlyCurves]:
+    """Open the curve matrix for `year` memory-mapped, or None when no file exists."""
+    base = directory or settings.HOURLY_GRID_FACTORS_DIR
+    npy_path = os.path.join(base, f"grid_{year}.npy")
+    meta_path = os.path.join(base, f"grid_{year}.json")
+    try:
+        key = f"{npy_path}:{os.path.getmtime(npy_path)}"
+    except OSError:
+        return None
+    cached = _CURVE_CACHE.get(key)
+    if cached is not None:
+        return cached
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        matrix = np.load(npy_path, mmap_mode="r")
+        if matrix.ndim != 2 or matrix.shape != (len(meta["regions"]), hours_in_year(year)):
+            raise ValueError(f"unexpected curve shape {matrix.shape}")
+        curves = HourlyCurves(year=year, regions=list(meta["regions"]), factors=matrix, source=meta.get("source"))
+    except Exception as e:
+        logger.warning(f"Failed to load hourly grid curves {npy_path}: {e}")
+        return None
+    _CURVE_CACHE[key] = curves
+    return curves
+
+
+def _hourly_pieces(series: IntervalSeries, year: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """(hour-of-year, kWh) per piece, and pieces per reading.
+
+    Sub-hourly readings are one piece each. A reading spanning several hours
+    is split evenly into one piece per covered hour.
+    """
+    start = series.start if series.start.tzinfo else series.start.replace(tzinfo=timezone.utc)
+    year_start = datetime(year, 1, 1, tzinfo=timezone.utc)
+    start_min = int((start - year_start).total_seconds() // 60)
+    step = int(series.interval_minutes)
+    minutes = start_min + np.arange(series.kwh.shape[0], dtype=np.int64) * step
+    kwh = np.asarray(series.kwh, dtype=np.float64)
+    pieces = max(1, step // 60)
+    if pieces > 1:
+        minutes = (minutes[:, None] + np.arange(pieces, dtype=np.int64) * 60).ravel()
+        kwh = np.repeat(kwh / pieces, pieces)
+    return minutes // 60, kwh, pieces
+
+
+def compute_hourly_scope2(
+    sites: List[IntervalSeries],
+    year: int,
+    *,
+    curves: Optional[HourlyCurves] = None,
+    factors_version: Optional[str] = None,
+    include_hourly: bool = False,
+) -> Dict[str, Any]:
+    """Scope 2 emissions from interval meter data x hourly grid factor curves.
+
+    All sites are binned to hour-of-year with one bincount, multiplied against
+    the (memory-mapped) curve row of each site's region, and rolled up to
+    annual and monthly totals with array reductions. Regions without an hourly
+    curve use the flat annual factor from the factor registry. Timestamps are
+    interpreted as UTC; readings outside `year` are ignored and counted.
+    """
+    hours = hours_in_year(year)
+    curves = curves if curves is not None else load_hourly_curves(year)
+    fs = factor_registry.get(factors_version)
+    n_sites = len(sites)
+
+    # 1) interval kWh -> (sites x hours) kWh matrix
+    flat_idx, weights = [], []
+    dropped = np.zeros(n_sites, dtype=np.int64)
+    for i, s in enumerate(sites):
+        h, kwh, pieces = _hourly_pieces(s, year)
+        ok = (h >= 0) & (h < hours) & ~np.isnan(kwh)
+        dropped[i] = int((~ok).reshape(-1, pieces).any(axis=1).sum())  # readings not fully counted
+        flat_idx.append(h[ok] + i * hours)
+        weights.append(kwh[ok])
+    if n_sites:
+        hourly_kwh = np.bincount(np.concatenate(flat_idx), weights=np.concatenate(weights), minlength=n_sites * hours).reshape(n_sites, hours)
+    else:
+        hourly_kwh = np.zeros((0, hours))
+
+    # 2) per-site factor rows: hourly curve when available, else flat registry factor
+    region_names: List[str] = []
+    curve_rows = np.full(n_sites, -1, dtype=np.int64)
+    flat_factor = np.zeros(n_sites, dtype=np.float64)
+    for i, s in enumerate(sites):
+        key = (s.grid_region or "").upper()
+        if curves is not None and key in curves.region_index:
+            curve_rows[i] = curves.region_index[key]
+            region_names.append(curves.regions[curve_rows[i]])
+        else:
+            name, factor = fs.grid_factor(s.grid_region)
+            flat_factor[i] = factor
+            region_names.append(name)
+
+    hourly_kg = hourly_kwh * flat_factor[:, None]
+    with_curve = np.flatnonzero(curve_rows >= 0)
+    if with_curve.size:
+        hourly_kg[with_curve] = hourly_kwh[with_curve] * np.asarray(curves.factors[curve_rows[with_curve]], dtype=np.float64)
+
+    # 3) rollups
+    month_starts = _month_starts(year)
+    monthly_kg = np.add.reduceat(hourly_kg, month_starts, axis=1) if n_sites else np.zeros((0, 12))
+    monthly_kwh = np.add.reduceat(hourly_kwh, month_starts, axis=1) if n_sites else np.zeros((0, 12))
+    annual_kg = hourly_kg.sum(axis=1)
+    annual_kwh = hourly_kwh.sum(axis=1)
+    portfolio_hourly = hourly_kg.sum(axis=0)
+
+    site_results = []
+    for i, s in enumerate(sites):
+        site_results.append({
+            "site_id": s.site_id,
+            "grid_region": region_names[i],
+            "factor_curve": "hourly" if curve_rows[i] >= 0 else "flat",
+            "kwh": round(float(annual_kwh[i]), 6),
+            "emissions_kg": round(float(annual_kg[i]), 6),
+            "monthly_emissions_kg": np.round(monthly_kg[i], 6).tolist(),
+            "dropped_intervals": int(dropped[i]),
+        })
+
+    total_kg = float(annual_kg.sum())
+    out: Dict[str, Any] = {
+        "year": year,
+        "factors_version": fs.version,
+        "hourly_curve_source": curves.source if curves is not None else None,
+        "sites": site_results,
+        "monthly": {
+            "kwh": np.round(monthly_kwh.sum(axis=0), 6).tolist(),
+            "emissions_kg": np.round(monthly_kg.sum(axis=0), 6).tolist(),
+        },
+        "totals": {
+            "sites": n_sites,
+            "kwh": round(float(annual_kwh.sum()), 6),
+            "emissions_kg": round(total_kg, 6),
+            "emissions_tonnes": round(total_kg / 1000.0, 6),
+            # share-weighted factor actually applied, for comparison with the flat annual factor
+            "effective_factor": round(total_kg / float(annual_kwh.sum()), 6) if annual_kwh.sum() > 0 else None,
+        },
+    }
+    if include_hourly:
+        out["hourly"] = {"emissions_kg": np.round(portfolio_hourly, 6).tolist()}
+    return out
+
+
+def parse_interval_sites(rows: List[Dict[str, Any]]) -> List[IntervalSeries]:
+    """Build IntervalSeries from request rows ({site_id, grid_region, start, interval_minutes, kwh: [...]})."""
+    sites: List[IntervalSeries] = []
+    for i, r in enumerate(rows):
+        interval = int(r.get("interval_minutes") or 60)
+        if interval <= 0 or 60 % interval != 0 and interval % 60 != 0:
+            raise ValueError(f"site {i}: interval_minutes must divide or be a multiple of 60")
+        start_raw = r.get("start")
+        if not start_raw:
+            raise ValueError(f"site {i}: start is required")
+        start = start_raw if isinstance(start_raw, datetime) else datetime.fromisoformat(str(start_raw).replace("Z", "+00:00"))
+        sites.append(IntervalSeries(
+            site_id=str(r.get("site_id") or i),
+            kwh=np.asarray(r.get("kwh") or [], dtype=np.float64),
+            start=start,
+            interval_minutes=interval,
+            grid_region=r.get("grid_region"),
+        ))
+    return sites
+
+
+__all__ = ["HourlyCurves", "IntervalSeries", "compute_hourly_scope2", "load_hourly_curves", "write_hourly_curves", "parse_interval_sites", "hours_in_year"]
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.repositories.company_map_repository import get_mappings
+from app.services.campd_mirror import CampdMirror, load_campd_mirror
+from app.services.facility_index import FacilityIndex, get_facility_index
+from app.services.validation_service import fetch_campd_annual, fetch_envirofacts_sample, validate_prefetched
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PortfolioPlan:
+    """Everything a portfolio run needs from the database, read up front.
+
+    Streaming happens after the request's session is closed, so the plan
+    carries plain values only (mappings are detached copies).
+    """
+    items: List[Dict[str, Any]]
+    year: Optional[int] = None
+    sample_limit: int = 5
+    index: Optional[FacilityIndex] = None
+    mirror: Optional[CampdMirror] = None
+    mappings: Dict[str, Any] = field(default_factory=dict)
+
+    def states(self) -> Dict[Optional[str], List[int]]:
+        groups: Dict[Optional[str], List[int]] = {}
+        for i, item in enumerate(self.items):
+            groups.setdefault(item.get("state"), []).append(i)
+        return groups
+
+
+def plan_portfolio_validation(db: Session, companies: List[Dict[str, Any]], *, year: Optional[int] = None, sample_limit: int = 5) -> PortfolioPlan:
+    max_companies = int(getattr(settings, "VALIDATION_BATCH_MAX_COMPANIES", 10000) or 10000)
+    if not companies:
+        raise ValueError("companies is required")
+    if len(companies) > max_companies:
+        raise ValueError(f"Portfolio too large: {len(companies)} companies (max {max_companies})")
+    items = []
+    for i, c in enumerate(companies):
+        name = str(c.get("company") or "").strip()
+        if not name:
+            raise ValueError(f"companies[{i}].company is required")
+        state = str(c.get("state") or "").strip().upper() or None
+        items.append({**c, "company": name, "state": state})
+    mappings = {
+        k: SimpleNamespace(company=m.company, facility_id=m.facility_id, facility_name=m.facility_name, state=m.state, notes=m.notes)
+        for k, m in get_mappings(db, [it["company"] for it in items]).items()
+    }
+    mirror = load_campd_mirror() if any(m.facility_id for m in mappings.values()) else None
+    return PortfolioPlan(items=items, year=year, sample_limit=sample_limit, index=get_facility_index(db), mirror=mirror, mappings=mappings)
+
+
+def _timed_fetch(fn: Any, *args: Any) -> Any:
+    started = time.perf_counter()
+    return fn(*args), (time.perf_counter() - started) * 1000.0
+
+
+def _outcome(fut: Future) -> Dict[str, Any]:
+    try:
+        value, elapsed_ms = fut.result()
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+    return {"status": "ok", "value": value, "elapsed_ms": round(elapsed_ms, 1)}
+
+
+def _summary(result: Dict[str, Any]) -> Dict[str, Any]:
+    confidence = result.get("confidence_analysis", {})
+    return {
+        "confidence_score": confidence.get("score"),
+        "confidence_level": confidence.get("level"),
+        "matches_count": result.get("epa", {}).get("matches_count", 0),
+        "flags": [f["code"] for f in result.get("flags", [])],
+        "deviations": len((result.get("quantitative_deviation") or {}).get("deviations", [])),
+        "partial": result.get("partial", False),
+    }
+
+
+def stream_portfolio_validation(plan: PortfolioPlan, *, workers: Optional[int] = None, include_details: bool = False, progress_every: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Validate a whole portfolio, yielding NDJSON-ready events.
+
+    Each EPA state slice and each CAMPD facility is fetched once (none at all
+    when the facility store / CAMPD mirror cover them), and companies of a
+    state are matched on a worker pool as soon as their slice arrives.
+    Events: start, result (one per company, in completion order), progress,
+    summary.
+    """
+    started = time.perf_counter()
+    workers = max(1, int(workers or getattr(settings, "VALIDATION_BATCH_WORKERS", 8) or 8))
+    total = len(plan.items)
+    groups = plan.states()
+    progress_every = progress_every or max(1, total // 20)
+
+    campd_needed = sorted({
+        m.facility_id for it in plan.items
+        for m in [plan.mappings.get(it["company"])]
+        if m is not None and m.facility_id and not (plan.mirror is not None and plan.mirror.has(m.facility_id))
+    })
+    fetch_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="portfolio-fetch")
+    match_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="portfolio-match")
+    try:
+        epa_futs: Dict[Any, Optional[str]] = {}
+        if plan.index is None:
+            epa_futs = {fetch_pool.submit(_timed_fetch, fetch_envirofacts_sample, st, plan.year): st for st in groups}
+        campd_futs = {fid: fetch_pool.submit(_timed_fetch, fetch_campd_annual, fid, plan.year) for fid in campd_needed}
+        yield {
+            "type": "start",
+            "companies": total,
+            "states": len(groups),
+            "upstream_calls": {"epa": len(epa_futs), "campd": len(campd_futs)},
+            "epa_source": "local_store" if plan.index is not None else "envirofacts",
+        }
+
+        def validate_one(i: int, epa: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            item = plan.items[i]
+            mapping = plan.mappings.get(item["company"])
+            fid = getattr(mapping, "facility_id", None)
+            campd = _outcome(campd_futs[fid]) if fid in campd_futs else None
+            return validate_prefetched(item, index=plan.index, mapping=mapping, mirror=plan.mirror, epa=epa, campd=campd,
+                                       state=item["state"], year=plan.year, sample_limit=plan.sample_limit)
+
+        pending: Dict[Future, Any] = {}
+
+        def submit_state(state: Optional[str], epa: Optional[Dict[str, Any]]) -> None:
+            for i in groups[state]:
+                pending[match_pool.submit(validate_one, i, epa)] = i
+
+        if plan.index is not None:
+            for state in groups:
+                submit_state(state, None)
+        pending.update({f: ("state", st) for f, st in epa_futs.items()})
+
+        done_count, errors, levels = 0, 0, {}
+        while pending:
+            finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for fut in finished:
+                tag = pending.pop(fut)
+                if isinstance(tag, tuple):  # an EPA state slice arrived
+                    submit_state(tag[1], _outcome(fut))
+                    continue
+                item = plan.items[tag]
+                event: Dict[str, Any] = {"type": "result", "index": tag, "company": item["company"], "state": item["state"]}
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    errors += 1
+                    event["error"] = str(e)
+                else:
+                    event.update(_summary(result))
+                    levels[event["confidence_level"]] = levels.get(event["confidence_level"], 0) + 1
+                    if include_details:
+                        event["result"] = result
+                done_count += 1
+                yield event
+                if done_count % progress_every == 0 or done_count == total:
+                    yield {"type": "progress", "done": done_count, "total": total, "elapsed_s": round(time.perf_counter() - started, 3)}
+
+        yield {
+            "type": "summary",
+            "companies": total,
+            "errors": errors,
+            "by_confidence_level": levels,
+            "upstream_calls": {"epa": len(epa_futs), "campd": len(campd_futs)},
+            "elapsed_s": round(time.perf_counter() - started, 3),
+        }
+    finally:
+        # a disconnected client closes the generator: drop work not yet started
+        match_pool.shutdown(wait=False, cancel_futures=True)
+        fetch_pool.shutdown(wait=False, cancel_futures=True)
+
+
+__all__ = ["PortfolioPlan", "plan_portfolio_validation", "stream_portfolio_validation"]
@@ -24,6 +24,7 @@ class RedisService:
 
     def __init__(self):
         self.redis_client = None
+        self.binary_client = None
         self._connect()
 
     def _connect(self):
@@ -41,6 +42,8 @@ class RedisService:
 
             # Connect to Upstash Redis (uses TLS)
             self.redis_client = redis.from_url(redis_url, decode_responses=True)
+            # Raw bytes for codec-encoded cache values (see app.utils.cache_codec)
+            self.binary_client = redis.from_url(redis_url, decode_responses=False)
 
             # Test connection
             self.redis_client.ping()
@@ -49,6 +52,7 @@ class RedisService:
         except Exception as e:
             logger.error(f"❌ Failed to connect to Redis: {e}")
             self.redis_client = None
+            self.binary_client = None
 
     def is_connected(self) -> bool:
         """Check if Redis is connected"""
@@ -111,6 +115,28 @@ class RedisService:
             logger.error(f"Error getting cache for key {key}: {e}")
             return None
 
+    def set_cache_bytes(self, key: str, value: bytes, ttl_seconds: int = 300) -> bool:
+        """Set an already-encoded cache value with TTL"""
+        if not self.is_connected() or self.binary_client is None:
+            return False
+
+        try:
+            return bool(self.binary_client.setex(key, ttl_seconds, value))
+        except Exception as e:
+            logger.error(f"Error setting cache for key {key}: {e}")
+            return False
+
+    def get_cache_bytes(self, key: str) -> Optional[bytes]:
+        """Get a cache value as raw bytes"""
+        if not self.is_connected() or self.binary_client is None:
+            return None
+
+        try:
+            return self.binary_client.get(key)
+        except Exception as e:
+            logger.error(f"Error getting cache for key {key}: {e}")
+            return None
+
     def delete_cache(self, key: str) -> bool:
         """Delete cache key"""
         if not self.is_connected():
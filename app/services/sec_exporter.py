@@ -8,8 +8,9 @@ from typing import Any, Dict, List, Optional
 from datetime import datetime, timezone
 
 from app.services.validation_service import cross_validate_epa
-from app.services.emissions_calculator import calculate_emissions
+from app.services.computation_context import ComputationContext, ensure_context
 from app.repositories.audit_trail_repository import list_audit_entries
+from app.services.audit_service import flush_pending_audits
 from app.services.storage_service import get_storage
 
 
@@ -27,6 +28,9 @@ def emissions_to_cevs_format(emissions: Dict[str, Any], company: str) -> Dict[st
         "scope1_emissions_tonnes": round(scope1.get("emissions_kg", 0) / 1000.0, 3),
         "scope2_emissions_tonnes": round(scope2.get("emissions_kg", 0) / 1000.0, 3),
         "total_emissions_tonnes": totals.get("emissions_tonnes", 0),
+        "scope1_co2e_tonnes": round(scope1.get("co2e_kg", scope1.get("emissions_kg", 0)) / 1000.0, 3),
+        "total_co2e_tonnes": totals.get("co2e_tonnes", totals.get("emissions_tonnes", 0)),
+        "gwp_set": totals.get("gwp_set"),
         "calculation_methodology": f"EPA emission factors v{emissions.get('version', '0.1')}",
         "verification_status": "cross-validated",
         "data_sources": ["EPA", "CAMPD"],
@@ -35,7 +39,8 @@ def emissions_to_cevs_format(emissions: Dict[str, Any], company: str) -> Dict[st
             "fuel_type": scope1.get("fuel_type"),
             "amount": scope1.get("amount"),
             "unit": scope1.get("unit"),
-            "emission_factor": scope1.get("factor")
+            "emission_factor": scope1.get("factor"),
+            "gases_kg": scope1.get("gases_kg"),
         } if scope1 else None,
         "scope2_details": {
             "kwh": scope2.get("kwh"),
@@ -53,9 +58,10 @@ def generate_summary_text(company: str, emissions: Dict[str, Any], validation: D
     scope1 = components.get("scope1", {})
     scope2 = components.get("scope2", {})
     
-    scope1_tonnes = round(scope1.get("emissions_kg", 0) / 1000.0, 2)
+    scope1_tonnes = round(scope1.get("co2e_kg", scope1.get("emissions_kg", 0)) / 1000.0, 2)
     scope2_tonnes = round(scope2.get("emissions_kg", 0) / 1000.0, 2)
-    total_tonnes = totals.get("emissions_tonnes", 0)
+    total_tonnes = totals.get("co2e_tonnes", totals.get("emissions_tonnes", 0))
+    gwp_set = totals.get("gwp_set") or "n/a"
     
     # Validation summary
     epa_matches = validation.get("epa", {}).get("matches_count", 0)
@@ -83,6 +89,7 @@ EMISSIONS SUMMARY
 Scope 1 (Direct): {scope1_tonnes} tonnes CO2e
 Scope 2 (Indirect): {scope2_tonnes} tonnes CO2e
 Total: {total_tonnes} tonnes CO2e
+GWP basis: IPCC {gwp_set} (100-year)
 
 VALIDATION RESULTS
 ------------------
@@ -153,7 +160,7 @@ def audit_trails_to_csv(entries: List[Dict[str, Any]]) -> str:
     return buf.getvalue()
 
 
-def build_and_upload_sec_package(*, company: str, payload: Dict[str, Any], db) -> Dict[str, Any]:
+def build_and_upload_sec_package(*, company: str, payload: Dict[str, Any], db, ctx: Optional[ComputationContext] = None) -> Dict[str, Any]:
     """Build a SEC export package (zip) containing:
     - cevs.json (calculated emissions data)
     - validation.json (cross-validation EPA)
@@ -162,15 +169,18 @@ def build_and_upload_sec_package(*, company: str, payload: Dict[str, Any], db) -
     - readme.txt (timestamp and basic info)
 
     Upload using configured storage and return URL + filenames.
+    Pass the request's ComputationContext to reuse emissions/validation results.
     """
+    ctx = ensure_context(ctx)
     # Calculate emissions for CEVS
-    emissions = calculate_emissions(payload)
+    emissions = ctx.calculate_emissions(payload)
     cevs_data = emissions_to_cevs_format(emissions, company)
     
     # Build validation
-    validation = cross_validate_epa(payload, db=db, state=payload.get("state"))
+    validation = cross_validate_epa(payload, db=db, state=payload.get("state"), ctx=ctx)
 
-    # Fetch audit entries
+    # Fetch audit entries (write-behind ones included)
+    flush_pending_audits()
     audits = list_audit_entries(db, company_cik=company, limit=1000)
     audit_csv = audit_trails_to_csv([a.to_dict() for a in audits])
     
@@ -204,4 +214,5 @@ def build_and_upload_sec_package(*, company: str, payload: Dict[str, Any], db) -
         "filename": fname,
         "size_bytes": len(zip_bytes),
         "files": ["cevs.json", "validation.json", "audit.csv", "summary.txt", "README.txt"],
+        "computation": ctx.stats(),
     }
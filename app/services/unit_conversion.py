@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+# unit -> (dimension, size of one unit in the dimension's reference unit)
+# reference units: volume m3, energy GJ, mass kg
+UNITS: Dict[str, Tuple[str, float]] = {
+    "m3": ("volume", 1.0),
+    "liter": ("volume", 0.001),
+    "gallon": ("volume", 0.003785411784),
+    "barrel": ("volume", 0.158987294928),
+    "scf": ("volume", 0.028316846592),
+    "ccf": ("volume", 2.8316846592),
+    "mcf": ("volume", 28.316846592),
+    "gj": ("energy", 1.0),
+    "mj": ("energy", 0.001),
+    "mmbtu": ("energy", 1.055056),
+    "kbtu": ("energy", 0.001055056),  # thousand Btu ("MBtu" in US energy usage)
+    "therm": ("energy", 0.1055056),
+    "kwh": ("energy", 0.0036),
+    "mwh": ("energy", 3.6),
+    "kg": ("mass", 1.0),
+    "lb": ("mass", 0.45359237),
+    "short_ton": ("mass", 907.18474),
+    "tonne": ("mass", 1000.0),
+}
+
+UNIT_ALIASES: Dict[str, str] = {
+    "m³": "m3", "cubic_meter": "m3", "cubic_meters": "m3",
+    "l": "liter", "liters": "liter", "litre": "liter", "litres": "liter",
+    "gal": "gallon", "gallons": "gallon", "us_gallon": "gallon",
+    "bbl": "barrel", "barrels": "barrel",
+    "cf": "scf", "ft3": "scf", "cubic_feet": "scf",
+    "gigajoule": "gj", "gigajoules": "gj", "megajoule": "mj", "megajoules": "mj",
+    "mmbtus": "mmbtu", "kbtus": "kbtu", "mbtu": "kbtu", "mbtus": "kbtu", "therms": "therm",
+    "kilogram": "kg", "kilograms": "kg", "kgs": "kg",
+    "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "short_tons": "short_ton", "ton": "short_ton", "tons": "short_ton", "us_ton": "short_ton",
+    "metric_ton": "tonne", "metric_tons": "tonne", "tonnes": "tonne", "t": "tonne",
+}
+
+# Approximate fuel properties bridging dimensions (EPA emission factors hub heat
+# contents; typical densities). density: kg per m3, hhv: GJ per m3.
+FUEL_PROPERTIES: Dict[str, Dict[str, float]] = {
+    "diesel": {"density": 845.0, "hhv": 0.138 * 1.055056 / 0.003785411784},
+    "gasoline": {"density": 740.0, "hhv": 0.125 * 1.055056 / 0.003785411784},
+    "propane": {"density": 493.0, "hhv": 0.091 * 1.055056 / 0.003785411784},
+    "natural_gas": {"density": 0.72, "hhv": 0.001026 * 1.055056 / 0.028316846592},
+}
+
+_SEPARATORS = re.compile(r"[\s\-]+")
+
+
+def canonical_unit(unit: str) -> str:
+    """Lower-case, underscore-separated unit name with aliases resolved ("Short Tons" -> "short_ton")."""
+    key = _SEPARATORS.sub("_", str(unit).strip().lower())
+    return UNIT_ALIASES.get(key, key)
+
+
+def _volume_per_unit(unit: str, props: Dict[str, float]) -> Optional[float]:
+    """m3 of fuel in one `unit`, or None when the fuel lacks the property needed."""
+    dim, size = UNITS[unit]
+    if dim == "volume":
+        return size
+    if dim == "mass":
+        return size / props["density"] if props.get("density") else None
+    return size / props["hhv"] if props.get("hhv") else None
+
+
+@lru_cache(maxsize=4096)
+def _multiplier(from_unit: str, to_unit: str, density: Optional[float], hhv: Optional[float]) -> Optional[float]:
+    if from_unit not in UNITS or to_unit not in UNITS:
+        return None
+    from_dim, from_size = UNITS[from_unit]
+    to_dim, to_size = UNITS[to_unit]
+    if from_dim == to_dim:
+        return from_size / to_size
+    props = {"density": density, "hhv": hhv}
+    a, b = _volume_per_unit(from_unit, props), _volume_per_unit(to_unit, props)
+    if a is None or b is None:
+        return None
+    return a / b
+
+
+def conversion_multiplier(fuel: str, from_unit: str, to_unit: str, properties: Optional[Dict[str, Dict[str, float]]] = None) -> Optional[float]:
+    """How many `to_unit` are in one `from_unit` of `fuel` (None when not convertible).
+
+    Same-dimension conversions are exact; volume/mass/energy bridges use the
+    fuel's density and heat content.
+    """
+    props = (properties or FUEL_PROPERTIES).get(fuel, {})
+    return _multiplier(canonical_unit(from_unit), canonical_unit(to_unit), props.get("density"), props.get("hhv"))
+
+
+def compile_conversions(
+    fuel: str,
+    declared_units: Iterable[str],
+    properties: Optional[Dict[str, Dict[str, float]]] = None,
+) -> Dict[str, Tuple[str, float]]:
+    """For every known unit not declared for `fuel`, pick a declared base unit and its multiplier.
+
+    Declared units of the same dimension win over cross-dimension bridges, then
+    declaration order, so an explicitly published factor is always used as-is.
+    """
+    declared = [canonical_unit(u) for u in declared_units]
+    out: Dict[str, Tuple[str, float]] = {}
+    for unit, (dim, _) in UNITS.items():
+        if unit in declared:
+            continue
+        candidates = sorted(
+            (b for b in declared if b in UNITS),
+            key=lambda b: (UNITS[b][0] != dim, declared.index(b)),
+        )
+        for base in candidates:
+            m = conversion_multiplier(fuel, unit, base, properties)
+            if m is not None:
+                out[unit] = (base, m)
+                break
+    return out
+
+
+__all__ = ["UNITS", "UNIT_ALIASES", "FUEL_PROPERTIES", "canonical_unit", "conversion_multiplier", "compile_conversions"]
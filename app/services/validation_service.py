@@ -1,15 +1,24 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 
 from app.clients.global_client import EPAClient
 from app.clients.campd_client import CAMDClient
 # from app.clients.eia_client import EIAClient  # Skip EIA for now
-from app.services.emissions_calculator import calculate_emissions
+from app.services.computation_context import ComputationContext, ensure_context
 from app.repositories.company_map_repository import get_mapping
+from app.services.facility_index import FacilityIndex, get_facility_index
+from app.services.campd_mirror import POLLUTANTS, CampdMirror, compute_deviations, deviation_thresholds, load_campd_mirror
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 
 def _search_matches(company: str, epa_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     term = company.lower()
@@ -21,66 +30,64 @@ def _search_matches(company: str, epa_data: List[Dict[str, Any]]) -> List[Dict[s
     return out
 
 
-def _check_quantitative_deviation(payload: Dict[str, Any], mapping, year: Optional[int] = None) -> Optional[Dict[str, Any]]:
-    """Check quantitative deviation using CAMPD/EIA data for mapped facility."""
-    facility_id = mapping.facility_id
-    if not facility_id:
-        return None
-    
-    # Get thresholds from settings
-    co2_threshold = float(getattr(settings, "VALIDATION_CO2_DEVIATION_THRESHOLD", 15.0))
-    nox_threshold = float(getattr(settings, "VALIDATION_NOX_DEVIATION_THRESHOLD", 20.0))
-    so2_threshold = float(getattr(settings, "VALIDATION_SO2_DEVIATION_THRESHOLD", 25.0))
-    
-    deviations = []
-    
-    try:
-        # Try CAMPD for power plants
-        campd = CAMDClient()
-        campd_data = campd.get_emissions_data(facility_id=facility_id, year=year or 2023)
-        
-        if campd_data:
-            # Check CO2 deviation
-            reported_co2 = _extract_co2_from_payload(payload)
-            campd_co2 = _extract_co2_from_campd(campd_data)
-            
-            if reported_co2 and campd_co2:
-                deviation_pct = abs(reported_co2 - campd_co2) / campd_co2 * 100
-                severity = "critical" if deviation_pct > co2_threshold * 2 else "high" if deviation_pct > co2_threshold else "medium"
-                
-                deviations.append({
-                    "pollutant": "CO2",
-                    "reported": reported_co2,
-                    "reference": campd_co2,
-                    "deviation_pct": deviation_pct,
-                    "threshold": co2_threshold,
-                    "severity": severity,
-                    "source": "CAMPD"
-                })
-    
-    except Exception:
-        # EIA fallback temporarily disabled (async client needs refactoring)
-        pass
-    
+def fetch_campd_annual(facility_id: str, year: Optional[int] = None) -> List[Dict[str, Any]]:
+    return CAMDClient().get_emissions_data(facility_id=facility_id, year=year or 2023) or []
+
+
+def _reported_emissions(payload: Dict[str, Any], year: Optional[int], ctx: Optional[ComputationContext]) -> Dict[int, Dict[str, float]]:
+    """{year: {pollutant: tonnes}} from payload.reported_emissions plus calculated CO2 for `year`."""
+    out: Dict[int, Dict[str, float]] = {}
+    for yr, values in (payload.get("reported_emissions") or {}).items():
+        try:
+            y = int(yr)
+        except (TypeError, ValueError):
+            continue
+        row = out.setdefault(y, {})
+        for key, value in (values or {}).items():
+            pollutant = str(key).upper().replace("_TONS", "").replace("_MASS", "")
+            if pollutant in POLLUTANTS and value is not None:
+                row[pollutant] = float(value)
+    if year is not None and "CO2" not in out.get(year, {}):
+        co2 = _extract_co2_from_payload(payload, ctx)
+        if co2:
+            out.setdefault(year, {})["CO2"] = co2
+    return out
+
+
+def _mirror_deviation(payload: Dict[str, Any], mirror: CampdMirror, facility_id: str, year: Optional[int], ctx: Optional[ComputationContext]) -> Optional[Dict[str, Any]]:
+    """Deviation for every pollutant/year the payload reports, against CAMPD annual totals."""
+    year = year or mirror.latest_year(facility_id) or 2023
+    deviations = compute_deviations(mirror, [facility_id], _reported_emissions(payload, year, ctx))
     if not deviations:
         return None
-    
-    return {
+    thresholds = dict(zip((p.lower() for p in POLLUTANTS), deviation_thresholds().tolist()))
+    years = sorted({d["year"] for d in deviations})
+    out = {
         "facility_id": facility_id,
-        "year": year or 2023,
+        "year": year,
+        "years": years,
         "deviations": deviations,
-        "thresholds": {
-            "co2": co2_threshold,
-            "nox": nox_threshold,
-            "so2": so2_threshold
-        }
+        "thresholds": {"co2": thresholds["co2"], "nox": thresholds["nox"], "so2": thresholds["so2"]},
+        "reference_source": mirror.source,
     }
+    compliance = [c for c in mirror.compliance.get(str(facility_id), []) if c.get("year") in years]
+    if compliance:
+        out["compliance"] = compliance
+    return out
+
+
+def _campd_deviation(payload: Dict[str, Any], facility_id: str, campd_data: List[Dict[str, Any]], year: Optional[int] = None, ctx: Optional[ComputationContext] = None) -> Optional[Dict[str, Any]]:
+    """Compare reported values against CAMPD records fetched live for the mapped facility."""
+    if not campd_data:
+        return None
+    mirror = CampdMirror.from_records(campd_data, facility_id=facility_id, year=year or 2023, source="campd_api")
+    return _mirror_deviation(payload, mirror, facility_id, year or 2023, ctx)
 
 
-def _extract_co2_from_payload(payload: Dict[str, Any]) -> Optional[float]:
+def _extract_co2_from_payload(payload: Dict[str, Any], ctx: Optional[ComputationContext] = None) -> Optional[float]:
     """Extract CO2 emissions from calculated emissions result."""
     try:
-        calc = calculate_emissions(payload)
+        calc = ensure_context(ctx).calculate_emissions(payload)
         total_kg = calc.get("totals", {}).get("emissions_kg", 0.0)
         # Convert kg to tonnes for comparison with external data
         return total_kg / 1000.0 if total_kg > 0 else None
@@ -88,16 +95,6 @@ def _extract_co2_from_payload(payload: Dict[str, Any]) -> Optional[float]:
         return None
 
 
-def _extract_co2_from_campd(campd_data: List[Dict[str, Any]]) -> Optional[float]:
-    """Extract CO2 from CAMPD data."""
-    total = 0.0
-    for record in campd_data:
-        co2 = record.get("co2_mass_tons") or record.get("co2_emissions")
-        if co2:
-            total += float(co2)
-    return total if total > 0 else None
-
-
 def _extract_co2_from_eia(eia_data: List[Dict[str, Any]]) -> Optional[float]:
     """Extract CO2 from EIA data."""
     total = 0.0
@@ -161,7 +158,145 @@ def _calculate_confidence_score(matches_count: int, flags: List[Dict[str, Any]],
     }
 
 
-def cross_validate_epa(payload: Dict[str, Any], *, db: Optional[Session] = None, state: Optional[str] = None, year: Optional[int] = None, sample_limit: int = 5) -> Dict[str, Any]:
+class SourcePoolSaturated(RuntimeError):
+    """Raised (through the returned future) when the lookup pool has no room for more work."""
+
+    def __init__(self, stats: Dict[str, int]) -> None:
+        super().__init__(f"validation source pool saturated ({stats['in_flight']} lookups in flight, limit {stats['limit']})")
+        self.stats = stats
+
+
+class _SourcePool:
+    """Thread pool for upstream lookups with a bounded backlog.
+
+    At most `workers + queue_depth` lookups are in flight (running or queued).
+    Lookups that miss their deadline keep a worker until their client timeout,
+    so under a slow upstream the backlog fills; further submissions then fail
+    fast with SourcePoolSaturated instead of queueing behind work that cannot
+    finish in time. Futures cancelled while still queued free their slot.
+    """
+
+    def __init__(self, workers: int, queue_depth: int) -> None:
+        self.workers = max(1, int(workers))
+        self.limit = self.workers + max(0, int(queue_depth))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="validation-source")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+
+    def submit(self, fn: Callable[[], Any]) -> Future:
+        with self._lock:
+            if self._in_flight >= self.limit:
+                self._rejected += 1
+                fut: Future = Future()
+                fut.set_exception(SourcePoolSaturated(self._stats()))
+                return fut
+            self._in_flight += 1
+        fut = self._executor.submit(fn)
+        fut.add_done_callback(self._release)
+        return fut
+
+    def _release(self, _fut: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _stats(self) -> Dict[str, int]:
+        return {"workers": self.workers, "limit": self.limit, "in_flight": self._in_flight, "rejected": self._rejected}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return self._stats()
+
+
+# Network lookups (Envirofacts, CAMPD) run here so a validation waits for the
+# slowest source once, not for the sum of them.
+_SOURCE_POOL = _SourcePool(int(getattr(settings, "VALIDATION_SOURCE_WORKERS", 8) or 8),
+                           int(getattr(settings, "VALIDATION_SOURCE_QUEUE_DEPTH", 8) or 0))
+
+
+def _deadline_seconds(deadline: Optional[float]) -> float:
+    return float(deadline if deadline is not None else getattr(settings, "VALIDATION_DEADLINE_SECONDS", 8.0))
+
+
+def _timed(fn: Callable[[], Any]) -> Callable[[], Tuple[Any, float]]:
+    def run() -> Tuple[Any, float]:
+        started = time.perf_counter()
+        value = fn()
+        return value, (time.perf_counter() - started) * 1000.0
+    return run
+
+
+def fetch_envirofacts_sample(state: Optional[str], year: Optional[int]) -> List[Dict[str, Any]]:
+    client = EPAClient()
+    raw = client.get_emissions_data(region=state, year=year, limit=500)
+    return client.format_emission_data(raw)
+
+
+def _local_lookups(payload: Dict[str, Any], company: str, *, index: Optional[FacilityIndex], mapping: Any, mirror: Optional[CampdMirror], state: Optional[str], year: Optional[int], sample_limit: int, ctx: ComputationContext) -> Dict[str, Any]:
+    """Everything that needs no upstream call: calculation, store search, mirrored CAMPD deviation."""
+    local: Dict[str, Any] = {"calc": ctx.calculate_emissions(payload), "similar": [], "sources": {}, "mapping": mapping}
+
+    # Indexed lookup over the full local facility store when it has been synced;
+    # otherwise the caller fetches a live Envirofacts sample
+    if index is not None:
+        local["matches"] = index.search(company, state=state)
+        local["epa_source"] = {"source": "local_store", "facilities_indexed": len(index)}
+        local["sources"]["epa"] = {"status": "ok", "origin": "local_store"}
+        if not local["matches"]:
+            local["similar"] = [{"score": score, **rec} for score, rec in index.similar(company, state=state, limit=sample_limit)]
+
+    facility_id = getattr(mapping, "facility_id", None)
+    local["needs_campd"] = False
+    if facility_id:
+        if mirror is not None and mirror.has(facility_id):
+            # Every mirrored pollutant and year, no CAMPD round trip
+            local["campd_deviation"] = _mirror_deviation(payload, mirror, facility_id, year, ctx)
+            local["sources"]["campd"] = {"status": "ok", "origin": "local_mirror"}
+        else:
+            local["needs_campd"] = True
+    return local
+
+
+def _prepare(payload: Dict[str, Any], company: str, *, db: Optional[Session], state: Optional[str], year: Optional[int], sample_limit: int, ctx: ComputationContext) -> Tuple[Dict[str, Any], Dict[str, Future]]:
+    """Local work (calculation, store index, mapping) plus the network lookups started in the pool.
+
+    Database lookups stay on the thread running _prepare: the session is not
+    thread-safe, so it is never shared with the pool.
+    """
+    index = get_facility_index(db) if db is not None else None
+    mapping = get_mapping(db, company) if db else None
+    mirror = load_campd_mirror() if mapping is not None and mapping.facility_id else None
+    local = _local_lookups(payload, company, index=index, mapping=mapping, mirror=mirror, state=state, year=year, sample_limit=sample_limit, ctx=ctx)
+    futures: Dict[str, Future] = {}
+    if index is None:
+        futures["epa"] = _SOURCE_POOL.submit(_timed(lambda: fetch_envirofacts_sample(state, year)))
+    if local["needs_campd"]:
+        facility_id = mapping.facility_id
+        futures["campd"] = _SOURCE_POOL.submit(_timed(lambda: fetch_campd_annual(facility_id, year)))
+    return local, futures
+
+
+def _collect(futures: Dict[str, Future], timeout_s: float) -> Dict[str, Dict[str, Any]]:
+    """Per-source outcome: ok (with value), error, timed_out, or saturated."""
+    out: Dict[str, Dict[str, Any]] = {}
+    for name, fut in futures.items():
+        if not fut.done():
+            fut.cancel()  # only helps if the pool has not started it yet
+            out[name] = {"status": "timed_out", "timeout_ms": round(timeout_s * 1000.0, 1)}
+            continue
+        try:
+            value, elapsed_ms = fut.result()
+        except SourcePoolSaturated as e:
+            logger.warning(f"Skipping {name} lookup: {e}")
+            out[name] = {"status": "saturated", "pool": e.stats}
+        except Exception as e:
+            out[name] = {"status": "error", "error": str(e)}
+        else:
+            out[name] = {"status": "ok", "value": value, "elapsed_ms": round(elapsed_ms, 1)}
+    return out
+
+
+def cross_validate_epa(payload: Dict[str, Any], *, db: Optional[Session] = None, state: Optional[str] = None, year: Optional[int] = None, sample_limit: int = 5, ctx: Optional[ComputationContext] = None, deadline: Optional[float] = None) -> Dict[str, Any]:
     """Cross-validate calculated emissions against EPA Envirofacts presence.
 
     Thresholds (configurable via env):
@@ -169,27 +304,124 @@ def cross_validate_epa(payload: Dict[str, Any], *, db: Optional[Session] = None,
       - VALIDATION_LOW_DENSITY_THRESHOLD (default 3)
       - VALIDATION_REQUIRE_STATE_MATCH (default False)
 
+    Envirofacts and CAMPD are queried concurrently and waited for at most
+    `deadline` seconds (VALIDATION_DEADLINE_SECONDS). A source that misses it,
+    fails, or is skipped because the lookup pool is saturated is reported
+    under `sources` and as a low-severity `source_timed_out` /
+    `source_error` / `source_saturated` flag; the checks that depend on it
+    are skipped and the result is returned with `partial: true`.
+
+    When a ComputationContext is passed, the emissions calculation and the
+    whole validation result are memoized in it, so callers that validate the
+    same payload twice within a request (agents, SEC exporter) pay once.
+
     Returns detailed flags with code/severity/message/details for actionable insights.
     """
     company = (payload.get("company") or "").strip()
     if not company:
         raise ValueError("company is required")
 
-    calc = calculate_emissions(payload)
+    ctx = ensure_context(ctx)
+    inputs = {
+        "company": company,
+        "scope1": payload.get("scope1"),
+        "scope2": payload.get("scope2"),
+        "factors_version": payload.get("factors_version"),
+        "reported_emissions": payload.get("reported_emissions"),
+        "state": state,
+        "year": year,
+        "sample_limit": sample_limit,
+        "with_db": db is not None,
+    }
 
-    client = EPAClient()
-    raw = client.get_emissions_data(region=state, year=year, limit=500)
-    norm = client.format_emission_data(raw)
+    def compute() -> Dict[str, Any]:
+        started = time.monotonic()
+        budget = _deadline_seconds(deadline)
+        local, futures = _prepare(payload, company, db=db, state=state, year=year, sample_limit=sample_limit, ctx=ctx)
+        if futures:
+            wait_futures(list(futures.values()), timeout=max(0.0, budget - (time.monotonic() - started)))
+        return _assemble(payload, company, local, _collect(futures, budget), state=state, year=year, sample_limit=sample_limit, ctx=ctx)
+
+    return ctx.memoize("cross_validate_epa", inputs, compute)
 
-    matches = _search_matches(company, norm)
-    
-    # Check for manual mapping
-    mapping = None
-    quantitative_deviation = None
-    if db:
-        mapping = get_mapping(db, company)
-        if mapping:
-            quantitative_deviation = _check_quantitative_deviation(payload, mapping, year)
+
+async def cross_validate_epa_async(payload: Dict[str, Any], *, db: Optional[Session] = None, state: Optional[str] = None, year: Optional[int] = None, sample_limit: int = 5, ctx: Optional[ComputationContext] = None, deadline: Optional[float] = None) -> Dict[str, Any]:
+    """Same result as cross_validate_epa, awaited without blocking the event loop.
+
+    The local work (index build, mapping query, CAMPD mirror load, emissions
+    calculation) runs on a worker thread and the upstream lookups in the
+    source pool; the result is not memoized in `ctx`.
+    """
+    company = (payload.get("company") or "").strip()
+    if not company:
+        raise ValueError("company is required")
+    ctx = ensure_context(ctx)
+    started = time.monotonic()
+    budget = _deadline_seconds(deadline)
+    local, futures = await asyncio.to_thread(_prepare, payload, company, db=db, state=state, year=year, sample_limit=sample_limit, ctx=ctx)
+    if futures:
+        await asyncio.wait([asyncio.wrap_future(f) for f in futures.values()], timeout=max(0.0, budget - (time.monotonic() - started)))
+    return _assemble(payload, company, local, _collect(futures, budget), state=state, year=year, sample_limit=sample_limit, ctx=ctx)
+
+
+def validate_prefetched(payload: Dict[str, Any], *, index: Optional[FacilityIndex] = None, mapping: Any = None, mirror: Optional[CampdMirror] = None, epa: Optional[Dict[str, Any]] = None, campd: Optional[Dict[str, Any]] = None, state: Optional[str] = None, year: Optional[int] = None, sample_limit: int = 5, ctx: Optional[ComputationContext] = None) -> Dict[str, Any]:
+    """Validation from upstream data fetched by the caller (portfolio jobs fetch each slice once).
+
+    `epa` / `campd` are source outcomes ({"status": "ok", "value": [...]} or
+    error/timed_out); they are only consulted when the store index / mirror
+    cannot answer. Does no I/O, so it is safe to run on worker threads.
+    """
+    company = (payload.get("company") or "").strip()
+    if not company:
+        raise ValueError("company is required")
+    ctx = ensure_context(ctx)
+    local = _local_lookups(payload, company, index=index, mapping=mapping, mirror=mirror, state=state, year=year, sample_limit=sample_limit, ctx=ctx)
+    fetched: Dict[str, Dict[str, Any]] = {}
+    if index is None:
+        fetched["epa"] = epa or {"status": "error", "error": "EPA slice not fetched"}
+    if local["needs_campd"]:
+        fetched["campd"] = campd or {"status": "error", "error": "CAMPD data not fetched"}
+    return _assemble(payload, company, local, fetched, state=state, year=year, sample_limit=sample_limit, ctx=ctx)
+
+
+_UNAVAILABLE_REASONS = {
+    "timed_out": "did not answer within the validation deadline",
+    "error": "failed",
+    "saturated": "was skipped because the lookup pool is saturated",
+}
+
+
+def _assemble(payload: Dict[str, Any], company: str, local: Dict[str, Any], fetched: Dict[str, Dict[str, Any]], *, state: Optional[str], year: Optional[int], sample_limit: int, ctx: ComputationContext) -> Dict[str, Any]:
+    calc = local["calc"]
+    similar = local["similar"]
+    mapping = local["mapping"]
+    sources: Dict[str, Dict[str, Any]] = dict(local["sources"])
+    unavailable: List[str] = []  # sources that did not answer (timed out, failed, or never ran)
+
+    epa = fetched.get("epa")
+    if epa is None:
+        matches = local["matches"]
+        epa_source = local["epa_source"]
+    else:
+        norm = epa.get("value") or []
+        matches = _search_matches(company, norm)
+        epa_source = {"source": "envirofacts", "sample_size": len(norm)}
+        if epa["status"] == "timed_out":
+            epa_source["timed_out"] = True
+        if epa["status"] != "ok":
+            unavailable.append("epa")
+        sources["epa"] = {k: v for k, v in epa.items() if k != "value"}
+        sources["epa"]["origin"] = "envirofacts"
+
+    quantitative_deviation = local.get("campd_deviation")
+    campd = fetched.get("campd")
+    if campd is not None:
+        sources["campd"] = {k: v for k, v in campd.items() if k != "value"}
+        sources["campd"]["origin"] = "campd_api"
+        if campd["status"] == "ok":
+            quantitative_deviation = _campd_deviation(payload, mapping.facility_id, campd["value"], year, ctx)
+        else:
+            unavailable.append("campd")
 
     min_matches = int(getattr(settings, "VALIDATION_MIN_MATCHES", 1) or 1)
     low_density = int(getattr(settings, "VALIDATION_LOW_DENSITY_THRESHOLD", 3) or 3)
@@ -197,15 +429,26 @@ def cross_validate_epa(payload: Dict[str, Any], *, db: Optional[Session] = None,
 
     flags: List[Dict[str, Any]] = []
 
+    # Sources that did not answer: the corresponding checks below are skipped, not failed
+    for name in unavailable:
+        status = sources[name]["status"]
+        flags.append({
+            "code": f"source_{status}",
+            "severity": "low",
+            "message": f"{name.upper()} lookup {_UNAVAILABLE_REASONS.get(status, 'failed')}; result is partial.",
+            "details": {"source": name, **sources[name]}
+        })
+
     # Match thresholds
-    if len(matches) < min_matches:
+    epa_answered = "epa" not in unavailable
+    if epa_answered and len(matches) < min_matches:
         flags.append({
             "code": "no_epa_match",
             "severity": "high",
             "message": "No matching facilities found in EPA for this company name.",
             "details": {"matches_count": len(matches), "min_required": min_matches}
         })
-    elif len(matches) < low_density:
+    elif epa_answered and len(matches) < low_density:
         flags.append({
             "code": "low_match_density",
             "severity": "medium",
@@ -215,7 +458,7 @@ def cross_validate_epa(payload: Dict[str, Any], *, db: Optional[Session] = None,
 
     # State consistency check
     state_mismatch = None
-    if state:
+    if state and epa_answered:
         same_state = [m for m in matches if str(m.get("state") or "").upper() == state.upper()]
         if len(matches) > 0 and len(same_state) == 0:
             state_mismatch = True
@@ -237,6 +480,8 @@ def cross_validate_epa(payload: Dict[str, Any], *, db: Optional[Session] = None,
     suggestions: List[str] = []
     if any(f["code"] == "no_epa_match" for f in flags):
         suggestions.append("Check company name spelling or use legal name alias.")
+        if similar:
+            suggestions.append("Similar EPA facility names: " + ", ".join(str(s["facility_name"]) for s in similar))
     if state and state_mismatch:
         suggestions.append("Check operational state in input or use different state for validation.")
 
@@ -251,6 +496,7 @@ def cross_validate_epa(payload: Dict[str, Any], *, db: Optional[Session] = None,
             "state": state,
             "matches_count": len(matches),
             "sample": matches[:sample_limit],
+            **epa_source,
         },
         "flags": flags,
         "metrics": {
@@ -260,6 +506,8 @@ def cross_validate_epa(payload: Dict[str, Any], *, db: Optional[Session] = None,
         },
         "notes": "EPA TRI does not contain emission numbers; this heuristic checks facility presence and match density.",
         "suggestions": suggestions,
+        "sources": sources,
+        "partial": bool(unavailable),
     }
     
     # Add mapping and quantitative data if available
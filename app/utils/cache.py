@@ -1,12 +1,12 @@
 """
 Redis-backed cache utilities with in-memory fallback.
 This module provides caching functionality using Redis (Upstash) with fallback to in-memory cache.
+Values are stored with the codec configured for the "epa_emissions" namespace (see app.utils.cache_codec).
 """
 
 from typing import Any, Callable, Optional
 import os
 import time
-import json
 import logging
 from urllib.parse import urlparse
 
@@ -17,6 +17,8 @@ except ImportError:
     REDIS_AVAILABLE = False
     redis = None
 
+from app.utils import cache_codec
+
 logger = logging.getLogger(__name__)
 
 # Global in-memory cache state (fallback)
@@ -30,6 +32,7 @@ CACHE_DURATION: int = int(os.getenv("CACHE_DURATION", "3600"))
 REDIS_URL = os.getenv("REDIS_URL")
 REDIS_CACHE_PREFIX = os.getenv("REDIS_CACHE_PREFIX", "envoyou:cache")
 REDIS_CACHE_TTL = int(os.getenv("REDIS_CACHE_TTL", "3600"))
+CACHE_NAMESPACE = "epa_emissions"
 
 # Redis client
 _redis_client: Optional[Any] = None
@@ -53,11 +56,11 @@ def _get_redis_client():
                     username=parsed.username,
                     ssl=True,
                     ssl_cert_reqs=None,
-                    decode_responses=True
+                    decode_responses=False
                 )
             else:
                 # Regular Redis connection
-                _redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+                _redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=False)
 
             # Test connection
             _redis_client.ping()
@@ -78,14 +81,14 @@ def _redis_get(key: str) -> Optional[Any]:
     try:
         data = client.get(key)
         if data:
-            return json.loads(data)
+            return cache_codec.decode(data)
     except Exception as e:
         logger.error(f"Redis get error: {e}")
 
     return None
 
 
-def _redis_set(key: str, value: Any, ttl: int = None) -> bool:
+def _redis_set(key: str, value: Any, ttl: int = None, codec: str = "json") -> bool:
     """Set value in Redis with TTL."""
     client = _get_redis_client()
     if not client:
@@ -93,7 +96,7 @@ def _redis_set(key: str, value: Any, ttl: int = None) -> bool:
 
     try:
         ttl_value = ttl or REDIS_CACHE_TTL
-        serialized = json.dumps(value)
+        serialized = cache_codec.encode(value, codec)
         return client.setex(key, ttl_value, serialized)
     except Exception as e:
         logger.error(f"Redis set error: {e}")
@@ -137,9 +140,22 @@ def is_cache_valid(now: Optional[float] = None, ttl: Optional[int] = None) -> bo
     return (now_ts - _cache_timestamp) < dur
 
 
-def get_or_set(fetcher: Callable[[], Any], *, ttl: Optional[int] = None) -> Any:
+def _shaped(value: Any, as_table: bool) -> Any:
+    """Records by default; a pyarrow Table for tabular values when `as_table`."""
+    if as_table:
+        if isinstance(value, list) and value and all(isinstance(r, dict) for r in value):
+            return cache_codec.to_table(value)
+        return value
+    return cache_codec.to_records(value)
+
+
+def get_or_set(fetcher: Callable[[], Any], *, ttl: Optional[int] = None, as_table: bool = False) -> Any:
     """
     Return cached value if valid, else fetch using fetcher(), cache it, and return it.
+
+    With `as_table=True` a list of records comes back as a pyarrow Table on
+    hits and misses alike; under the arrow codec a hit then needs no per-row
+    decoding at all.
     """
     cache_key = f"{REDIS_CACHE_PREFIX}:data"
     timestamp_key = f"{REDIS_CACHE_PREFIX}:timestamp"
@@ -157,17 +173,17 @@ def get_or_set(fetcher: Callable[[], Any], *, ttl: Optional[int] = None) -> Any:
                     # Cache is valid, return cached data
                     cached_data = _redis_get(cache_key)
                     if cached_data is not None:
-                        return cached_data
+                        return _shaped(cached_data, as_table)
 
             # Cache is invalid or missing, fetch new data
             data = fetcher()
 
             # Cache the new data
             ttl_value = ttl or CACHE_DURATION
-            _redis_set(cache_key, data, ttl_value)
+            _redis_set(cache_key, data, ttl_value, codec=cache_codec.codec_for(CACHE_NAMESPACE))
             _redis_set(timestamp_key, now_ts, ttl_value)
 
-            return data
+            return _shaped(data, as_table)
 
         except Exception as e:
             logger.error(f"Redis cache operation error: {e}")
@@ -177,12 +193,12 @@ def get_or_set(fetcher: Callable[[], Any], *, ttl: Optional[int] = None) -> Any:
     global _data_cache, _cache_timestamp
     now_ts = time.time()
     if is_cache_valid(now_ts, ttl):
-        return _data_cache
+        return _shaped(_data_cache, as_table)
 
     data = fetcher()
     _data_cache = data
     _cache_timestamp = now_ts
-    return data
+    return _shaped(data, as_table)
 
 
 def clear_cache() -> None:
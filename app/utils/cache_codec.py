@@ -0,0 +1,137 @@
+"""
+Binary value codecs for Redis caches.
+
+Values carry a small header naming their codec, so any reader can decode
+any value (plain JSON written before codecs existed still decodes):
+
+  - "arrow": a list of flat records stored as an Arrow IPC stream with typed
+    columns (zstd-compressed buffers when available). Decoding returns a
+    pyarrow Table built over the received buffer, with no per-row parsing;
+    callers that need dicts use to_records(). Records whose keys differ are
+    stored as JSON instead, since a Table cannot tell a missing key from a
+    null and the decoded rows would not match what was cached.
+  - "json": UTF-8 JSON, for small or irregular values.
+
+The codec is chosen per cache namespace via CACHE_CODECS ("ns=codec,...");
+namespaces not listed use "json".
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"EVC1"
+_ARROW = b"A"
+_JSON = b"J"
+CODECS = ("json", "arrow")
+
+_COMPRESSION = "zstd" if pa.Codec.is_available("zstd") else ("lz4" if pa.Codec.is_available("lz4") else None)
+
+
+def codec_for(namespace: str) -> str:
+    """Codec configured for a cache namespace (CACHE_CODECS), "json" by default."""
+    for part in str(getattr(settings, "CACHE_CODECS", "") or "").split(","):
+        name, _, codec = part.partition("=")
+        if name.strip() == namespace and codec.strip() in CODECS:
+            return codec.strip()
+    return "json"
+
+
+def _is_tabular(value: Any) -> bool:
+    return isinstance(value, pa.Table) or (isinstance(value, list) and bool(value) and all(isinstance(r, dict) for r in value))
+
+
+def _columns(rows: List[Dict[str, Any]]) -> List[str]:
+    """Union of the records' keys, in first-seen order."""
+    return list(dict.fromkeys(k for r in rows for k in r))
+
+
+def _uniform(rows: List[Dict[str, Any]]) -> bool:
+    first = rows[0].keys()
+    return all(r.keys() == first for r in rows)
+
+
+def _records_table(rows: List[Dict[str, Any]]) -> pa.Table:
+    # from_pylist() takes its schema from the first record and silently drops
+    # keys that only appear later; build every column over all records instead
+    return pa.table({k: pa.array([r.get(k) for r in rows]) for k in _columns(rows)})
+
+
+def _arrow_table(value: Any) -> Optional[pa.Table]:
+    """The Table the arrow codec stores for `value`, or None when it stores JSON."""
+    if isinstance(value, pa.Table):
+        return value
+    if not _is_tabular(value) or not _uniform(value):
+        return None
+    try:
+        return _records_table(value)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        logger.debug(f"Arrow cache codec not applicable, storing JSON: {e}")
+        return None
+
+
+def _arrow_bytes(table: pa.Table) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression=_COMPRESSION)) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(value: Any, codec: str = "json") -> bytes:
+    """Serialize `value`; non-tabular values (or records Arrow cannot type or that differ in keys) fall back to JSON."""
+    table = _arrow_table(value) if codec == "arrow" else None
+    if table is not None:
+        return MAGIC + _ARROW + _arrow_bytes(table)
+    if isinstance(value, pa.Table):
+        value = value.to_pylist()
+    return MAGIC + _JSON + json.dumps(value, default=str).encode("utf-8")
+
+
+def decode(data: Optional[bytes]) -> Any:
+    """Inverse of encode(); arrow values come back as a pyarrow Table."""
+    if data is None:
+        return None
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if data[:4] == MAGIC:
+        kind, body = data[4:5], memoryview(data)[5:]
+        if kind == _ARROW:
+            return pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+        if kind == _JSON:
+            return json.loads(bytes(body))
+        raise ValueError(f"Unknown cache codec {kind!r}")
+    # values written before the codec header existed
+    try:
+        return json.loads(data)
+    except (ValueError, UnicodeDecodeError):
+        return data.decode("utf-8", errors="replace")
+
+
+def as_cached(value: Any, codec: str = "json") -> Any:
+    """`value` in the shape a cache hit returns for it under `codec` (a Table when stored as Arrow)."""
+    table = _arrow_table(value) if codec == "arrow" else None
+    return table if table is not None else value
+
+
+def to_records(value: Any) -> Any:
+    """Records for a decoded Table; any other value unchanged."""
+    return value.to_pylist() if isinstance(value, pa.Table) else value
+
+
+def to_table(value: Any) -> pa.Table:
+    """A Table for decoded or freshly fetched tabular values."""
+    if isinstance(value, pa.Table):
+        return value
+    rows = list(value or [])
+    return _records_table(rows) if rows else pa.table({})
+
+
+__all__ = ["CODECS", "codec_for", "encode", "decode", "as_cached", "to_records", "to_table"]
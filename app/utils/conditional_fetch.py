@@ -0,0 +1,215 @@
+"""
+Conditional (revalidating) downloads for upstream datasets.
+
+Each fetched body is kept on disk next to its validators (ETag,
+Last-Modified, SHA-256 of the content). Later fetches of the same URL send
+If-None-Match / If-Modified-Since, so an unchanged dataset costs a 304
+instead of a full download; servers that ignore validators are still
+recognised as unchanged by content hash.
+
+Bodies stored at the default per-namespace location (dataset_path) are
+capped at DATASET_CACHE_MAX_FILES per namespace; the least recently
+validated ones are evicted when a new URL is stored.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlencode
+
+import requests
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_CHUNK = 1 << 20
+_COUNTERS = ("requests", "fresh", "not_modified", "unchanged", "fetched", "bytes_downloaded", "bytes_saved")
+
+_STATS: Dict[str, Dict[str, int]] = {}
+_STATS_LOCK = threading.Lock()
+
+
+@dataclass
+class FetchResult:
+    """Where the current body lives and how it was obtained.
+
+    status: "fresh" (validated within max_age, no request), "not_modified"
+    (304), "unchanged" (200 with the same content hash) or "fetched" (new
+    content).
+    """
+
+    path: str
+    status: str
+    size: int
+    sha256: Optional[str] = None
+    content_type: Optional[str] = None
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def changed(self) -> bool:
+        return self.status == "fetched"
+
+
+def _count(namespace: str, **deltas: int) -> None:
+    with _STATS_LOCK:
+        bucket = _STATS.setdefault(namespace, {k: 0 for k in _COUNTERS})
+        for key, value in deltas.items():
+            bucket[key] += value
+
+
+def revalidation_stats() -> Dict[str, Dict[str, int]]:
+    """Cumulative per-namespace counters (requests, 304s, hash hits, bytes downloaded/saved)."""
+    with _STATS_LOCK:
+        return {ns: dict(counts) for ns, counts in _STATS.items()}
+
+
+def reset_revalidation_stats() -> None:
+    with _STATS_LOCK:
+        _STATS.clear()
+
+
+def dataset_path(namespace: str, url: str, params: Optional[Dict[str, Any]] = None, store_dir: Optional[str] = None) -> str:
+    """Default on-disk location of the body for `url` (+ query params) within `namespace`."""
+    key = url + ("?" + urlencode(sorted(params.items())) if params else "")
+    base = store_dir or getattr(settings, "DATASET_CACHE_DIR", "data/datasets")
+    return os.path.join(base, namespace, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".body")
+
+
+def _meta_path(path: str) -> str:
+    return path + ".meta.json"
+
+
+def read_meta(path: str) -> Dict[str, Any]:
+    try:
+        with open(_meta_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(path: str, meta: Dict[str, Any]) -> None:
+    tmp = f"{_meta_path(path)}.tmp-{os.getpid()}-{threading.get_ident()}"  # concurrent fetches must not share a temp file
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, _meta_path(path))
+
+
+def _evict(directory: str, keep: int, current: str) -> int:
+    """Remove the least recently validated bodies (and their meta) beyond `keep`; returns files removed."""
+    try:
+        bodies = [os.path.join(directory, n) for n in os.listdir(directory) if n.endswith(".body")]
+    except OSError:
+        return 0
+    if len(bodies) <= keep:
+        return 0
+    aged = []
+    for body in bodies:
+        try:
+            aged.append((os.path.getmtime(body), body))  # mtime is bumped on every revalidation
+        except OSError:
+            continue
+    aged.sort()
+    removed = 0
+    for _, body in aged[:max(0, len(aged) - keep)]:
+        if body == current:
+            continue
+        for victim in (body, _meta_path(body)):
+            try:
+                os.remove(victim)
+            except OSError:
+                pass
+        removed += 1
+    if removed:
+        logger.info(f"Evicted {removed} cached dataset bodies from {directory}")
+    return removed
+
+
+def fetch_dataset(session: requests.Session, url: str, *, namespace: str, path: Optional[str] = None,
+                  params: Optional[Dict[str, Any]] = None, timeout: float = 30, max_age: Optional[float] = None,
+                  validate: Optional[Callable[[str], Any]] = None) -> FetchResult:
+    """Bring the local copy of `url` up to date with a conditional GET.
+
+    `max_age` skips the request entirely when the copy was validated that
+    recently. `validate(tmp_path)` may raise to reject a new body before it
+    replaces the current one. HTTP and network errors propagate (the local
+    copy, if any, is left untouched).
+    """
+    managed = path is None  # default location: subject to the per-namespace file cap
+    path = path or dataset_path(namespace, url, params)
+    meta = read_meta(path)
+    have_body = os.path.exists(path) and meta.get("url") == url and meta.get("params") == (params or None)
+    if not have_body:
+        meta = {}
+    if have_body and max_age is not None and time.time() - float(meta.get("validated_at") or 0) < max_age:
+        _count(namespace, fresh=1)
+        return FetchResult(path, "fresh", int(meta.get("size") or 0), meta.get("sha256"), meta.get("content_type"), meta)
+
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    _count(namespace, requests=1)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with session.get(url, params=params, headers=headers or None, timeout=timeout, stream=True) as resp:
+            if resp.status_code == 304 and have_body:
+                status = "not_modified"
+                _count(namespace, not_modified=1, bytes_saved=int(meta.get("size") or 0))
+            else:
+                resp.raise_for_status()
+                digest = hashlib.sha256()
+                size = 0
+                with open(tmp, "wb") as fh:
+                    for chunk in resp.iter_content(chunk_size=_CHUNK):
+                        fh.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                _count(namespace, bytes_downloaded=size)
+                sha = digest.hexdigest()
+                if have_body and sha == meta.get("sha256"):
+                    status = "unchanged"
+                    _count(namespace, unchanged=1)
+                else:
+                    if validate is not None:
+                        validate(tmp)
+                    os.replace(tmp, path)
+                    status = "fetched"
+                    _count(namespace, fetched=1)
+                    meta = {"url": url, "params": params or None, "sha256": sha, "size": size,
+                            "content_type": resp.headers.get("Content-Type"), "fetched_at": time.time()}
+            # validators may be refreshed on any 200/304
+            for header, key in (("ETag", "etag"), ("Last-Modified", "last_modified")):
+                if resp.headers.get(header):
+                    meta[key] = resp.headers[header]
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    meta["validated_at"] = time.time()
+    _write_meta(path, meta)
+    if status != "fetched":
+        os.utime(path)  # restart mtime-based freshness windows
+    elif managed and not have_body:
+        _evict(os.path.dirname(path), max(1, int(getattr(settings, "DATASET_CACHE_MAX_FILES", 256) or 256)), path)
+    return FetchResult(path, status, int(meta.get("size") or 0), meta.get("sha256"), meta.get("content_type"), meta)
+
+
+__all__ = [
+    "FetchResult",
+    "fetch_dataset",
+    "dataset_path",
+    "read_meta",
+    "revalidation_stats",
+    "reset_revalidation_stats",
+]
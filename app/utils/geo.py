@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lon1: float, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Great-circle distance (km) from one point to arrays of points."""
+    p1, p2 = math.radians(lat1), np.radians(lat2)
+    dphi = p2 - p1
+    dlmb = np.radians(lon2) - math.radians(lon1)
+    a = np.sin(dphi / 2.0) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dlmb / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class LatLonGridIndex:
+    """Nearest-neighbour index over lat/lon points using a fixed degree grid.
+
+    Points are bucketed into `cell_deg` cells (sorted cell ids + searchsorted
+    for the bucket bounds). A query scans rings of cells outward from the
+    query cell and stops once the closest point any unscanned cell could hold
+    is farther than the k-th best distance found so far, so typical queries
+    touch a handful of cells regardless of the number of points. Points with
+    missing or out-of-range coordinates are not indexed.
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, cell_deg: float = 1.0) -> None:
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        if cell_deg <= 0:
+            raise ValueError("cell_deg must be positive")
+        self.cell_deg = float(cell_deg)
+        self.rows = int(math.ceil(180.0 / self.cell_deg))
+        self.cols = int(math.ceil(360.0 / self.cell_deg))
+        valid = np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90.0) & (np.abs(lon) <= 180.0)
+        ids = np.flatnonzero(valid)
+        cells = self._cell_rows(lat[ids]) * self.cols + self._cell_cols(lon[ids])
+        order = np.argsort(cells, kind="stable")
+        self.point_ids = ids[order]
+        self.cells = cells[order]
+        self.lat = lat[self.point_ids]
+        self.lon = lon[self.point_ids]
+
+    def __len__(self) -> int:
+        return int(self.point_ids.size)
+
+    def _cell_rows(self, lat: np.ndarray) -> np.ndarray:
+        return np.minimum(((lat + 90.0) // self.cell_deg).astype(np.int64), self.rows - 1)
+
+    def _cell_cols(self, lon: np.ndarray) -> np.ndarray:
+        return np.minimum(((lon + 180.0) // self.cell_deg).astype(np.int64), self.cols - 1)
+
+    def _ring(self, row: int, col: int, r: int) -> np.ndarray:
+        """Positions (into the sorted arrays) of the points in the square ring at Chebyshev radius r."""
+        if r == 0:
+            rr, cc = np.array([row]), np.array([col])
+        else:
+            side = np.arange(-r, r + 1)
+            inner = side[1:-1]
+            rr = np.concatenate([np.full(side.size, row - r), np.full(side.size, row + r), row + inner, row + inner])
+            cc = np.concatenate([col + side, col + side, np.full(inner.size, col - r), np.full(inner.size, col + r)])
+        ok = (rr >= 0) & (rr < self.rows)
+        cells = np.unique(rr[ok] * self.cols + cc[ok] % self.cols)  # longitude wraps around
+        lo = np.searchsorted(self.cells, cells, side="left")
+        hi = np.searchsorted(self.cells, cells, side="right")
+        hit = hi > lo
+        if not hit.any():
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(a, b) for a, b in zip(lo[hit], hi[hit])])
+
+    def _unscanned_bound_km(self, lat: float, r: int) -> float:
+        """Lower bound on the distance to any point outside the (2r+1)^2 cells around the query cell."""
+        span = r * self.cell_deg
+        # outside in latitude: at least `span` degrees of latitude away
+        lat_bound = math.radians(span) * EARTH_RADIUS_KM
+        if span >= 180.0:
+            return math.inf
+        # outside in longitude (and inside the latitude band): hav(d) >= cos(lat1) * min cos(lat2) * hav(dlon)
+        band_lo, band_hi = max(-90.0, lat - span - self.cell_deg), min(90.0, lat + span + self.cell_deg)
+        cos_min = min(math.cos(math.radians(band_lo)), math.cos(math.radians(band_hi)))
+        hav = math.cos(math.radians(lat)) * max(0.0, cos_min) * math.sin(math.radians(min(span, 180.0)) / 2.0) ** 2
+        lon_bound = 2.0 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, hav)))
+        return min(lat_bound, lon_bound)
+
+    def nearest(self, lat: float, lon: float, k: int = 1, max_km: Optional[float] = None) -> List[Tuple[int, float]]:
+        """Up to k (point id, distance km) pairs, closest first, optionally within `max_km`."""
+        if not len(self) or k < 1:
+            return []
+        if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+            raise ValueError("lat must be in [-90, 90] and lon in [-180, 180]")
+        row = int(self._cell_rows(np.array([lat]))[0])
+        col = int(self._cell_cols(np.array([lon]))[0])
+        k = min(k, len(self))
+        best_pos = np.empty(0, dtype=np.int64)
+        best_dist = np.empty(0, dtype=np.float64)
+        for r in range(max(self.rows, self.cols) + 1):
+            pos = self._ring(row, col, r)
+            if pos.size:
+                dist = haversine_km(lat, lon, self.lat[pos], self.lon[pos])
+                best_pos = np.concatenate([best_pos, pos])
+                best_dist = np.concatenate([best_dist, dist])
+                keep = np.argsort(best_dist, kind="stable")[:k]
+                best_pos, best_dist = best_pos[keep], best_dist[keep]
+            bound = self._unscanned_bound_km(lat, r)
+            if max_km is not None and bound > max_km:
+                break
+            if best_dist.size == k and best_dist[-1] <= bound:
+                break
+            if r >= self.rows and 2 * r + 1 >= self.cols:
+                break  # every cell scanned
+        out = [(int(self.point_ids[p]), float(d)) for p, d in zip(best_pos, best_dist)]
+        if max_km is not None:
+            out = [(i, d) for i, d in out if d <= max_km]
+        return out
+
+
+__all__ = ["EARTH_RADIUS_KM", "haversine_km", "LatLonGridIndex"]
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import bisect
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.utils.mappings import normalize_country_name
+from app.utils.schema import ensure_iso_cert_schema
+
+logger = logging.getLogger(__name__)
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_EMPTY = np.empty(0, dtype=np.int32)
+MATCH_MODES = ("exact", "prefix", "contains", "fuzzy")
+
+
+def normalize_name(name: Any) -> str:
+    """Lower-case, punctuation folded to single spaces (same rule as the EPA facility index)."""
+    return _NON_ALNUM.sub(" ", str(name or "").lower()).strip()
+
+
+def trigrams(text: str) -> List[str]:
+    padded = f" {text} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+class ISOIndex:
+    """Membership index over ISO 14001 certificate holders.
+
+    Records are schema-normalized once; company names are normalized into
+    space-separated tokens and indexed three ways: a dict for exact names, a
+    sorted name list (bisect) for prefixes, and trigram posting lists
+    (sorted int32 arrays) for substring and fuzzy matches. Substring lookups
+    intersect the postings of the query's trigrams and verify the few
+    survivors, so they equal the old `key in name` scan without touching
+    every record. Country filters compare normalize_country_name() keys, as
+    the client's country filter does.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]]) -> None:
+        self.records: List[Dict[str, Any]] = [ensure_iso_cert_schema(r) for r in records if isinstance(r, dict)]
+        self.names: List[str] = [normalize_name(r.get("company_name")) for r in self.records]
+        self.countries: List[Optional[str]] = [normalize_country_name(r.get("country") or "") for r in self.records]
+        exact: Dict[str, List[int]] = {}
+        postings: Dict[str, List[int]] = {}
+        by_country: Dict[Optional[str], List[int]] = {}
+        for i, (name, country) in enumerate(zip(self.names, self.countries)):
+            by_country.setdefault(country, []).append(i)
+            if not name:
+                continue
+            exact.setdefault(name, []).append(i)
+            for g in trigrams(name):
+                postings.setdefault(g, []).append(i)
+        self.exact_names = exact
+        self.postings = {g: np.array(ids, dtype=np.int32) for g, ids in postings.items()}
+        self.by_country = {c: np.array(ids, dtype=np.int32) for c, ids in by_country.items()}
+        order = sorted((n, i) for i, n in enumerate(self.names) if n)
+        self.sorted_names = [n for n, _ in order]
+        self.sorted_ids = [i for _, i in order]
+        self._gram_counts = np.array([len(trigrams(n)) if n else 0 for n in self.names], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _country_ok(self, i: int, country_key: Optional[str], filtered: bool) -> bool:
+        return not filtered or self.countries[i] == country_key
+
+    @staticmethod
+    def _country_key(country: Optional[str]) -> Tuple[Optional[str], bool]:
+        return (normalize_country_name(country), True) if country else (None, False)
+
+    def rows(self, country: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Records (in source order), optionally only those for `country`."""
+        if not country:
+            return self.records[:limit] if limit else list(self.records)
+        ids = self.by_country.get(normalize_country_name(country), _EMPTY)
+        return [self.records[i] for i in (ids[:limit] if limit else ids).tolist()]
+
+    def exact(self, name: str, *, country: Optional[str] = None) -> List[Dict[str, Any]]:
+        key, filtered = self._country_key(country)
+        ids = self.exact_names.get(normalize_name(name), [])
+        return [self.records[i] for i in ids if self._country_ok(i, key, filtered)]
+
+    def prefix(self, name: str, *, country: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Records whose normalized name starts with `name` (normalized), in name order."""
+        q = normalize_name(name)
+        if not q:
+            return []
+        key, filtered = self._country_key(country)
+        out = []
+        for pos in range(bisect.bisect_left(self.sorted_names, q), len(self.sorted_names)):
+            if not self.sorted_names[pos].startswith(q):
+                break
+            i = self.sorted_ids[pos]
+            if self._country_ok(i, key, filtered):
+                out.append(self.records[i])
+                if limit and len(out) >= limit:
+                    break
+        return out
+
+    def _substring_candidates(self, q: str) -> Optional[np.ndarray]:
+        if len(q) < 3:
+            return None  # no interior trigram: verify every record
+        # interior trigrams only: the query may sit in the middle of a word
+        lists = []
+        for g in {q[i:i + 3] for i in range(len(q) - 2)}:
+            ids = self.postings.get(g)
+            if ids is None:
+                return _EMPTY
+            lists.append(ids)
+        lists.sort(key=len)
+        out = lists[0]
+        for ids in lists[1:]:
+            if not out.size:
+                break
+            out = np.intersect1d(out, ids, assume_unique=True)
+        return out
+
+    def search(self, name: str, *, country: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Records whose normalized name contains `name` (normalized)."""
+        q = normalize_name(name)
+        if not q:
+            return []
+        key, filtered = self._country_key(country)
+        candidates = self._substring_candidates(q)
+        ids = range(len(self.records)) if candidates is None else candidates.tolist()
+        out = []
+        for i in ids:
+            if q in self.names[i] and self._country_ok(i, key, filtered):
+                out.append(self.records[i])
+                if limit and len(out) >= limit:
+                    break
+        return out
+
+    def similar(self, name: str, *, country: Optional[str] = None, limit: int = 5, min_score: float = 0.3) -> List[Tuple[float, Dict[str, Any]]]:
+        """Fuzzy matches ranked by trigram overlap (Jaccard), best first."""
+        q = normalize_name(name)
+        grams = trigrams(q) if q else []
+        hits = [self.postings[g] for g in grams if g in self.postings]
+        if not hits:
+            return []
+        ids, shared = np.unique(np.concatenate(hits), return_counts=True)
+        if country:
+            keep = np.isin(ids, self.by_country.get(normalize_country_name(country), _EMPTY))
+            ids, shared = ids[keep], shared[keep]
+        if not ids.size:
+            return []
+        scores = shared / (len(grams) + self._gram_counts[ids] - shared)
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [(round(float(scores[j]), 4), self.records[int(ids[j])]) for j in order if scores[j] >= min_score]
+
+    def has_certification(self, name: str, *, country: Optional[str] = None, mode: str = "contains", min_score: float = 0.6) -> bool:
+        """Whether `name` holds a certificate: exact, prefix, contains (substring) or fuzzy match."""
+        if mode == "exact":
+            return bool(self.exact(name, country=country))
+        if mode == "prefix":
+            return bool(self.prefix(name, country=country, limit=1))
+        if mode == "contains":
+            return bool(self.search(name, country=country, limit=1))
+        if mode == "fuzzy":
+            return bool(self.similar(name, country=country, limit=1, min_score=min_score))
+        raise ValueError(f"Unknown match mode {mode!r}; expected one of {MATCH_MODES}")
+
+
+# One index per source configuration, rebuilt when the source signature changes
+_INDEXES: Dict[Hashable, Tuple[Hashable, ISOIndex, float]] = {}
+_INDEX_LOCK = threading.Lock()
+
+
+def get_iso_index(key: Hashable, signature: Callable[[], Hashable], load: Callable[[], Iterable[Dict[str, Any]]],
+                  *, refresh: bool = True) -> Optional[ISOIndex]:
+    """Process-wide index for the sources behind `key`.
+
+    `signature()` (e.g. feed hash + workbook mtime) is re-checked at most
+    every ISO_INDEX_REFRESH_SECONDS and `load()` runs only when it changed.
+    With refresh=False the current index is returned as is (None if never
+    built), without touching the sources.
+    """
+    with _INDEX_LOCK:
+        cached = _INDEXES.get(key)
+        if not refresh:
+            return cached[1] if cached is not None else None
+        now = time.monotonic()
+        if cached is not None and now - cached[2] < float(getattr(settings, "ISO_INDEX_REFRESH_SECONDS", 60.0)):
+            return cached[1]
+        sig = signature()
+        if cached is not None and cached[0] == sig:
+            _INDEXES[key] = (sig, cached[1], now)
+            return cached[1]
+        started = time.perf_counter()
+        index = ISOIndex(load())
+        logger.info(f"Built ISO 14001 index over {len(index)} certificates in {time.perf_counter() - started:.2f}s")
+        _INDEXES[key] = (sig, index, now)
+        return index
+
+
+def invalidate_iso_index(key: Optional[Hashable] = None) -> None:
+    with _INDEX_LOCK:
+        if key is None:
+            _INDEXES.clear()
+        else:
+            _INDEXES.pop(key, None)
+
+
+__all__ = [
+    "ISOIndex",
+    "MATCH_MODES",
+    "normalize_name",
+    "get_iso_index",
+    "invalidate_iso_index",
+]
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Convert the EDGAR UCDB workbook into the columnar cache read by EDGARClient.
+
+Run once per deploy (or after replacing the workbook) so API workers open the
+memory-mapped table instead of parsing the .xlsx on their first request.
+"""
+import argparse
+import os
+import sys
+
+from app.clients.edgar_store import build_edgar_cache, load_edgar_table
+from app.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--xlsx', default=os.getenv('EDGAR_XLSX_PATH') or settings.EDGAR_XLSX_PATH, help='workbook path (default: EDGAR_XLSX_PATH)')
+    parser.add_argument('--cache-dir', help='output directory (default: EDGAR_CACHE_DIR)')
+    parser.add_argument('--force', action='store_true', help='rebuild even if a cache for this workbook version exists')
+    args = parser.parse_args()
+    if not os.path.exists(args.xlsx):
+        print(f'EDGAR workbook not found: {args.xlsx}', file=sys.stderr)
+        sys.exit(1)
+    entry = build_edgar_cache(args.xlsx, args.cache_dir, force=args.force)
+    table = load_edgar_table(args.xlsx, args.cache_dir)
+    print(f'{entry}: {table.rows} rows, {len(table.value_columns)} emission columns')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Mirror Envirofacts facility tables into the local EPA facility store.
+
+Meant for a nightly cron: runs fetch only rows past each state's last total
+(and resume failed slices) until EPA_SYNC_FULL_REFRESH_HOURS forces a full pass.
+"""
+import argparse
+import json
+import sys
+
+from app.services.epa_sync import run_epa_sync_job
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--states', help='comma-separated state codes (default: EPA_SYNC_STATES or all)')
+    parser.add_argument('--tables', help='comma-separated Envirofacts tables (default: EPA_SYNC_TABLES)')
+    parser.add_argument('--full', action='store_true', help='re-read every slice from row 0')
+    args = parser.parse_args()
+    split = lambda v: [p.strip() for p in v.split(',') if p.strip()] if v else None
+    summary = run_epa_sync_job(states=split(args.states), tables=split(args.tables), full=args.full)
+    if summary is None:
+        sys.exit(1)
+    print(json.dumps({k: v for k, v in summary.items() if k != 'checkpoints'}, indent=2))
+    sys.exit(1 if summary['failed'] else 0)
+
+if __name__ == '__main__':
+    main()
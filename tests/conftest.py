@@ -1,7 +1,9 @@
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import StaticPool
 from app.clients.amdalnet_client import AmdalnetClient
+from app.config import settings
 from app.data.mock_permits import mock_permits
 from app.models.user import Base
 
@@ -16,12 +18,38 @@ def mock_amdalnet_client(monkeypatch):
     monkeypatch.setattr(AmdalnetClient, "get_sk_final", lambda self, page=1, limit=100: mock_permits)
 
 
+@pytest.fixture(autouse=True)
+def app_tables():
+    """
+    Creates the app database schema, as the API's startup hook does;
+    TestClient(app) without a context manager never runs that hook.
+    Per test, because some modules drop the shared schema on teardown.
+    """
+    from app.models.database import create_tables
+    create_tables()
+
+
+@pytest.fixture(autouse=True)
+def runtime_dirs(tmp_path, monkeypatch):
+    """
+    Points every directory the app writes runtime state to (caches, mirrors,
+    spools) at the test's tmp_path, so tests never write into the checkout.
+    """
+    runtime = tmp_path / "runtime"
+    for name in ("DATASET_CACHE_DIR", "EEA_CACHE_DIR", "EDGAR_CACHE_DIR", "CAMPD_MIRROR_DIR", "AUDIT_SPOOL_DIR", "EMISSION_FACTORS_COMPILED_DIR"):
+        monkeypatch.setattr(settings, name, str(runtime / name.lower()))
+    monkeypatch.setattr(settings, "CEVS_FEATURES_PATH", str(runtime / "cevs" / "country_features.json"))
+    monkeypatch.delenv("EDGAR_CACHE_DIR", raising=False)
+    return runtime
+
+
 @pytest.fixture
 def test_db() -> Session:
     """
     Creates a test database session for testing.
     """
-    engine = create_engine("sqlite:///:memory:", echo=False)
+    # same SQLite setup as app.models.database: one connection, usable from worker threads
+    engine = create_engine("sqlite:///:memory:", echo=False, connect_args={"check_same_thread": False}, poolclass=StaticPool)
     Base.metadata.create_all(engine)
     
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
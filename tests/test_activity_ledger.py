@@ -0,0 +1,130 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api_server import app
+from app.models.activity_ledger import ActivityEntry, FacilityMonthTotal, CompanyYearTotal  # noqa: F401
+from app.services import activity_ledger
+from app.services.activity_ledger import record_activities, company_year_summary, rebuild_company_year
+
+client = TestClient(app)
+headers = {"X-API-Key": "demo_key_premium_2025"}
+
+
+def _year_of_diesel(company, facilities):
+    return [
+        {"company": company, "facility": f, "year": 2024, "month": m,
+         "scope1": {"fuel_type": "diesel", "amount": 100, "unit": "gallon"},
+         "scope2": {"kwh": 1000, "grid_region": "RFC"}}
+        for f in facilities for m in range(1, 13)
+    ]
+
+
+def test_year_rollup(test_db: Session):
+    out = record_activities(test_db, _year_of_diesel("Ledger Co", ["plant-a", "plant-b"]))
+    assert len(out["recomputed_facility_months"]) == 24
+    summary = company_year_summary(test_db, "Ledger Co", 2024)
+    assert summary["scope1_emissions_kg"] == pytest.approx(24 * 100 * 10.21)
+    assert summary["scope2_emissions_kg"] == pytest.approx(24 * 1000 * 0.45)
+    assert summary["monthly_emissions_kg"][0] == pytest.approx(2 * (1021 + 450))
+    assert len(summary["facilities"]) == 2
+
+
+def test_correction_recomputes_only_that_facility_month(test_db: Session):
+    record_activities(test_db, _year_of_diesel("Fix Co", ["plant-a", "plant-b"]))
+    correction = {"company": "Fix Co", "facility": "plant-b", "year": 2024, "month": 3,
+                  "scope1": {"fuel_type": "diesel", "amount": 50, "unit": "gallon"}}
+    with patch.object(activity_ledger, "sum_facility_month", wraps=activity_ledger.sum_facility_month) as summed, \
+            patch.object(activity_ledger, "_add_totals", wraps=activity_ledger._add_totals) as added:
+        out = record_activities(test_db, [correction])
+    assert summed.call_count == 0  # line deltas only, nothing is re-summed
+    assert [c.args[1] for c in added.call_args_list] == [FacilityMonthTotal, CompanyYearTotal]
+    assert out["recomputed_facility_months"] == [{"company": "Fix Co", "facility": "plant-b", "year": 2024, "month": 3}]
+    assert out["company_years"][0]["scope1_emissions_kg"] == pytest.approx((24 * 100 - 50) * 10.21)
+
+    line = test_db.query(ActivityEntry).filter_by(company="Fix Co", facility="plant-b", month=3, scope="scope1").one()
+    assert line.revision == 2
+
+    # resubmitting the same figure changes nothing
+    assert record_activities(test_db, [correction])["recomputed_facility_months"] == []
+
+    incremental = company_year_summary(test_db, "Fix Co", 2024)
+    rebuilt = rebuild_company_year(test_db, "Fix Co", 2024)
+    assert rebuilt["emissions_kg"] == pytest.approx(incremental["emissions_kg"])
+
+
+def test_unit_or_region_change_replaces_the_line(test_db: Session):
+    base = {"company": "Unit Co", "facility": "plant-a", "year": 2024, "month": 1}
+    record_activities(test_db, [{**base, "scope1": {"fuel_type": "diesel", "amount": 100, "unit": "gallon"},
+                                 "scope2": {"kwh": 1000, "grid_region": "RFC"}}])
+    out = record_activities(test_db, [{**base, "scope1": {"fuel_type": "diesel", "amount": 378.5411784, "unit": "liter"},
+                                       "scope2": {"kwh": 1000, "grid_region": "US"}}])
+    lines = test_db.query(ActivityEntry).filter_by(company="Unit Co").order_by(ActivityEntry.scope).all()
+    assert [(l.scope, l.unit, l.grid_region, l.revision) for l in lines] == [("scope1", "liter", None, 2), ("scope2", None, "US_default", 2)]
+    assert out["company_years"][0]["scope1_emissions_kg"] == pytest.approx(100 * 10.21)
+    assert rebuild_company_year(test_db, "Unit Co", 2024)["emissions_kg"] == pytest.approx(out["company_years"][0]["emissions_kg"])
+
+
+def test_company_delta_is_atomic_across_sessions(test_db: Session):
+    entry = {"company": "Busy Co", "facility": "plant-a", "year": 2024, "month": 1,
+             "scope1": {"fuel_type": "diesel", "amount": 100, "unit": "gallon"}}
+    record_activities(test_db, [entry])
+    other = sessionmaker(bind=test_db.get_bind())()
+    try:
+        # test_db holds a stale copy of the total while another writer adds to it
+        stale = test_db.get(CompanyYearTotal, ("Busy Co", 2024))
+        assert stale.scope1_emissions_kg == pytest.approx(1021.0)
+        record_activities(other, [{**entry, "facility": "plant-b"}])
+        out = record_activities(test_db, [{**entry, "facility": "plant-c"}])
+    finally:
+        other.close()
+    assert out["company_years"][0]["scope1_emissions_kg"] == pytest.approx(3 * 1021.0)
+
+
+def test_facility_month_delta_is_atomic_across_sessions(test_db: Session):
+    entry = {"company": "Shared Co", "facility": "plant-a", "year": 2024, "month": 2,
+             "scope1": {"fuel_type": "diesel", "amount": 100, "unit": "gallon"}}
+    record_activities(test_db, [entry])
+    other = sessionmaker(bind=test_db.get_bind())()
+    try:
+        # test_db holds a stale copy of the facility-month while another writer adds a line to it
+        stale = test_db.get(FacilityMonthTotal, ("Shared Co", "plant-a", 2024, 2))
+        assert stale.scope2_emissions_kg == 0.0
+        scope2 = record_activities(other, [{**entry, "scope1": None, "scope2": {"kwh": 1000, "grid_region": "WECC"}}])
+        s2 = scope2["company_years"][0]["scope2_emissions_kg"]
+        out = record_activities(test_db, [{**entry, "scope1": {**entry["scope1"], "amount": 200}}])
+    finally:
+        other.close()
+    assert out["company_years"][0]["scope1_emissions_kg"] == pytest.approx(2 * 1021.0)
+    assert out["company_years"][0]["scope2_emissions_kg"] == pytest.approx(s2)
+    test_db.expire_all()
+    fm = test_db.get(FacilityMonthTotal, ("Shared Co", "plant-a", 2024, 2))
+    assert (fm.scope1_emissions_kg, fm.scope2_emissions_kg) == (pytest.approx(2 * 1021.0), pytest.approx(s2))
+
+
+def test_invalid_entry_rolls_back(test_db: Session):
+    bad = {"company": "Bad Co", "facility": "x", "year": 2024, "month": 1,
+           "scope1": {"fuel_type": "unobtanium", "amount": 1, "unit": "kg"}}
+    with pytest.raises(ValueError):
+        record_activities(test_db, [bad])
+    with pytest.raises(ValueError):
+        company_year_summary(test_db, "Bad Co", 2024)
+
+
+def test_ledger_endpoints():
+    payload = {"entries": [{"company": "Ledger API Co", "facility": "hq", "year": 2031, "month": 5,
+                            "scope2": {"kwh": 2000, "grid_region": "WECC"}}]}
+    r = client.post("/v1/emissions/ledger", json=payload, headers=headers)
+    assert r.status_code == 200
+
+    r = client.get("/v1/emissions/ledger/Ledger API Co/2031", headers=headers)
+    assert r.status_code == 200
+    assert r.json()["scope2_emissions_kg"] >= 700.0
+
+    r = client.get("/v1/emissions/ledger/Ledger API Co/2031/entries?month=5", headers=headers)
+    assert r.json()["data"][0]["grid_region"] == "WECC"
+
+    r = client.get("/v1/emissions/ledger/Nobody/2031", headers=headers)
+    assert r.status_code == 404
@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.config import settings
+from app.services import cevs_aggregator
+from app.services.cevs_aggregator import compute_cevs_for_company, compute_cevs_for_company_async, source_deadline
+from app.services.country_features import get_feature_table, reset_feature_table
+
+
+class SlowEPA:
+    def __init__(self, delay=0.3):
+        self.delay = delay
+
+    def get_emissions_data(self, limit=200, timeout=5.0):
+        time.sleep(self.delay)
+        return [{"facility_name": "Pipeline Co Plant"}]
+
+    def create_sample_data(self):
+        return []
+
+    def format_emission_data(self, rows):
+        return rows
+
+
+class SlowISO:
+    def __init__(self, delay=0.3, release=None):
+        self.delay = delay
+        self.release = release
+
+    def get_iso14001_certifications(self, country=None, limit=100):
+        if self.release is not None:
+            self.release.wait(5)
+        time.sleep(self.delay)
+        return [{"company_name": "Pipeline Co"}]
+
+
+class SlowEEA:
+    async def get_countries_renewables(self):
+        await asyncio.sleep(0.3)
+        return [{"country": "Sweden", "renewable_energy_share_2021_proxy": 60.0, "target_2020": 49.0}]
+
+    async def get_industrial_pollution(self):
+        await asyncio.sleep(0.3)
+        return []
+
+    def compute_pollution_trend(self, series):
+        return {}
+
+
+class SlowEDGAR:
+    def get_countries_series(self, countries, pollutants):
+        time.sleep(0.15)
+        return {c: {p: [] for p in pollutants} for c in countries}
+
+
+@pytest.fixture
+def fake_clients(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "CEVS_FEATURES_PATH", str(tmp_path / "country_features.json"))
+    reset_feature_table()
+    clients = {"epa": SlowEPA(), "iso": SlowISO(), "eea": SlowEEA(), "edgar": SlowEDGAR()}
+    monkeypatch.setattr(cevs_aggregator, "_CLIENTS", clients)
+    monkeypatch.setattr(cevs_aggregator, "_LAST_GOOD", {})
+    monkeypatch.setattr(cevs_aggregator, "load_best_practices", lambda: [])
+    monkeypatch.setattr(cevs_aggregator, "_record_cevs_audit", lambda *a, **k: None)
+    yield clients
+    reset_feature_table()
+
+
+def test_sources_are_fetched_concurrently(fake_clients):
+    started = time.perf_counter()
+    result = asyncio.run(compute_cevs_for_company_async("Pipeline Co", company_country="Sweden"))
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.9  # serial would be >= 1.5s
+    composition = result["sources"]["composition"]
+    assert {k: v["status"] for k, v in composition.items()} == {
+        "epa": "ok", "iso": "ok", "eea_renewables": "ok", "eea_pollution": "ok",
+        "edgar": "ok", "policy": "ok", "campd": "skipped",
+    }
+    assert result["sources"]["partial"] is False
+    assert result["components"]["iso_bonus"] == 30.0
+    assert result["details"]["renewables"]["country_row"]["country"] == "Sweden"
+
+
+def test_late_source_falls_back_to_last_good_value(fake_clients, monkeypatch):
+    compute_cevs_for_company("Pipeline Co")
+    release = threading.Event()
+    fake_clients["iso"] = SlowISO(delay=0, release=release)
+    monkeypatch.setattr(settings, "CEVS_SOURCE_DEADLINES", "iso=0.1")
+
+    started = time.perf_counter()
+    result = compute_cevs_for_company("Pipeline Co")
+    release.set()
+
+    assert time.perf_counter() - started < 0.9
+    iso = result["sources"]["composition"]["iso"]
+    assert iso["status"] == "cached" and iso["reason"] == "timed_out"
+    assert result["components"]["iso_bonus"] == 30.0
+    assert result["sources"]["partial"] is True
+
+
+def test_late_source_without_history_is_left_out(fake_clients, monkeypatch):
+    release = threading.Event()
+    fake_clients["iso"] = SlowISO(delay=0, release=release)
+    monkeypatch.setattr(settings, "CEVS_SOURCE_DEADLINES", "iso=0.1")
+    result = compute_cevs_for_company("Pipeline Co")
+    release.set()
+
+    assert result["sources"]["composition"]["iso"] == {"status": "timed_out", "deadline_s": 0.1}
+    assert result["components"]["iso_bonus"] == 0.0
+    assert result["sources"]["iso_count"] == 0
+
+
+def test_source_deadline_overrides(monkeypatch):
+    monkeypatch.setattr(settings, "CEVS_SOURCE_DEADLINE_SECONDS", 4.0)
+    monkeypatch.setattr(settings, "CEVS_SOURCE_DEADLINES", "edgar=20, policy=bad")
+    assert source_deadline("edgar") == 20.0
+    assert source_deadline("policy") == 4.0
+    assert source_deadline("iso") == 4.0
+
+
+def test_country_features_are_materialized(fake_clients, monkeypatch):
+    first = compute_cevs_for_company("Pipeline Co", company_country="Sweden")
+    assert get_feature_table().get("sweden") is not None
+
+    calls = []
+    monkeypatch.setattr(cevs_aggregator, "load_best_practices", lambda: calls.append(1) or [])
+    fake_clients["eea"] = None  # any EEA/EDGAR access would now fail
+    fake_clients["edgar"] = None
+    second = compute_cevs_for_company("Other Co", company_country="Sweden")
+
+    assert calls == []
+    composition = second["sources"]["composition"]
+    assert {composition[k]["origin"] for k in ("eea_renewables", "eea_pollution", "edgar", "policy")} == {"feature_table"}
+    assert second["components"]["renewables_bonus"] == first["components"]["renewables_bonus"] > 0
+
+
+def test_feature_table_survives_restart_and_tracks_workbooks(fake_clients, monkeypatch, tmp_path):
+    compute_cevs_for_company("Pipeline Co", company_country="Sweden")
+    reset_feature_table()
+    assert get_feature_table().get("Sweden") is not None  # reloaded from disk
+
+    policy = tmp_path / "policy.xlsx"
+    policy.write_bytes(b"")
+    monkeypatch.setenv("POLICY_XLSX_PATH", str(policy))
+    table = get_feature_table()
+    assert table.get("Sweden") is None and table.global_ is not None
+
+
+def test_partial_country_row_is_not_stored(fake_clients, monkeypatch):
+    release = threading.Event()
+
+    class StuckEDGAR(SlowEDGAR):
+        def get_countries_series(self, countries, pollutants):
+            release.wait(5)
+            return super().get_countries_series(countries, pollutants)
+
+    fake_clients["edgar"] = StuckEDGAR()
+    monkeypatch.setattr(settings, "CEVS_SOURCE_DEADLINES", "edgar=0.1")
+    result = compute_cevs_for_company("Pipeline Co", company_country="Sweden")
+    release.set()
+
+    assert result["sources"]["composition"]["edgar"]["status"] == "timed_out"
+    assert get_feature_table().get("Sweden") is None
@@ -0,0 +1,182 @@
+import io
+import os
+import time
+import zipfile
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base
+from app.models.audit_trail import AuditTrail
+from app.services import audit_buffer
+from app.services.audit_buffer import AuditBuffer
+from app.services.sec_exporter import build_and_upload_sec_package
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def _rows(factory):
+    with factory() as db:
+        return db.query(AuditTrail).order_by(AuditTrail.timestamp).all()
+
+
+def _entry(i):
+    return {"source_file": "emissions_calculator", "calculation_version": "v1", "company_cik": f"C{i}", "notes": "{}"}
+
+
+def test_entries_are_batched_and_spool_is_cleared(session_factory, tmp_path):
+    buf = AuditBuffer(str(tmp_path), interval_ms=60000, max_entries=1000, session_factory=session_factory).start()
+    ids = [buf.enqueue(**_entry(i)) for i in range(5)]
+    assert _rows(session_factory) == []
+    assert len(os.listdir(tmp_path)) == 1  # one spool segment holds the pending batch
+
+    assert buf.flush() == 5
+    rows = _rows(session_factory)
+    assert [r.id for r in rows] == ids and rows[0].company_cik == "C0"
+    assert os.listdir(tmp_path) == []
+    assert buf.stats["batches"] == 1
+    buf.close()
+
+
+def test_size_threshold_wakes_the_flusher(session_factory, tmp_path):
+    buf = AuditBuffer(str(tmp_path), interval_ms=60000, max_entries=3, session_factory=session_factory).start()
+    for i in range(3):
+        buf.enqueue(**_entry(i))
+    deadline = time.time() + 2
+    while len(_rows(session_factory)) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(_rows(session_factory)) == 3
+    buf.close()
+
+
+def test_spool_is_replayed_after_crash(session_factory, tmp_path):
+    crashed = AuditBuffer(str(tmp_path), interval_ms=60000, session_factory=session_factory)
+    crashed.enqueue(**_entry(1))
+    crashed.enqueue(**_entry(2))
+    # simulate a crash mid-write of a third entry; the process never flushed
+    with open(crashed._spool_path, "a", encoding="utf-8") as fh:
+        fh.write('{"id": "torn"')
+
+    restarted = AuditBuffer(str(tmp_path), interval_ms=60000, session_factory=session_factory).start()
+    assert [r.company_cik for r in _rows(session_factory)] == ["C1", "C2"]
+    assert restarted.stats["recovered"] == 2
+    assert os.listdir(tmp_path) == []
+
+    # replaying entries that were already committed does not duplicate them
+    assert restarted.recover() == 0 and len(_rows(session_factory)) == 2
+    restarted.close()
+
+
+def test_failed_insert_is_retried(session_factory, tmp_path):
+    calls = {"n": 0}
+
+    def flaky():
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise RuntimeError("database unavailable")
+        return session_factory()
+
+    buf = AuditBuffer(str(tmp_path), interval_ms=60000, retry_backoff_max=0, session_factory=flaky).start()
+    buf.enqueue(**_entry(1))
+    assert buf.flush() == 0 and buf.pending() == 1
+    assert len(os.listdir(tmp_path)) == 1  # still spooled
+    assert buf.flush() == 1 and buf.pending() == 0
+    assert os.listdir(tmp_path) == []
+    buf.close()
+
+
+def _rejecting(session_factory, bad):
+    """Session factory whose inserts fail for batches holding an entry with a CIK in `bad`."""
+    def factory():
+        db = session_factory()
+        insert = db.bulk_insert_mappings
+
+        def bulk_insert_mappings(model, rows):
+            if any(r["company_cik"] in bad for r in rows):
+                raise ValueError("row violates a constraint")
+            return insert(model, rows)
+
+        db.bulk_insert_mappings = bulk_insert_mappings
+        return db
+    return factory
+
+
+def test_failed_batches_back_off(session_factory, tmp_path):
+    calls = {"n": 0}
+
+    def down():
+        calls["n"] += 1
+        raise RuntimeError("database unavailable")
+
+    buf = AuditBuffer(str(tmp_path), interval_ms=60000, session_factory=down)
+    buf.enqueue(**_entry(1))
+    assert buf.flush() == 0 and calls["n"] == 1
+    assert buf.flush() == 0 and calls["n"] == 1  # not due yet: no attempt on this tick
+    assert buf.pending() == 1 and buf.stats["quarantined"] == 0
+    buf._session_factory = session_factory
+    assert buf.flush(force=True) == 1 and buf.pending() == 0
+
+
+def test_failing_batch_is_quarantined_without_blocking_later_ones(session_factory, tmp_path):
+    bad = {"BAD"}
+    buf = AuditBuffer(str(tmp_path), interval_ms=60000, retry_backoff_max=0, quarantine_after=0.2,
+                      session_factory=_rejecting(session_factory, bad)).start()
+    buf.enqueue(**{**_entry(0), "company_cik": "BAD"})
+    assert buf.flush() == 0 and buf.pending() == 1
+
+    buf.enqueue(**_entry(1))
+    assert buf.flush() == 1  # the later batch goes through while the bad one waits
+    assert [r.company_cik for r in _rows(session_factory)] == ["C1"]
+    assert buf.pending() == 1
+
+    time.sleep(0.25)
+    assert buf.flush() == 0  # failing for longer than quarantine_after: set aside
+    assert buf.pending() == 0 and buf.stats["quarantined"] == 1
+    [failed] = os.listdir(tmp_path)
+    assert failed.endswith(".spool.failed")
+    with open(tmp_path / failed, encoding="utf-8") as fh:
+        assert '"BAD"' in fh.read()
+
+    # once the cause is fixed, quarantined segments are replayed on demand
+    bad.clear()
+    assert buf.replay_failed() == 1
+    assert sorted(r.company_cik for r in _rows(session_factory)) == ["BAD", "C1"]
+    assert os.listdir(tmp_path) == []
+    buf.close()
+
+
+def test_quarantined_segments_are_replayed_on_start(session_factory, tmp_path):
+    buf = AuditBuffer(str(tmp_path), interval_ms=60000, quarantine_after=0, session_factory=_rejecting(session_factory, {"C1"}))
+    buf.enqueue(**_entry(1))
+    buf.flush()
+    assert buf.stats["quarantined"] == 1 and os.listdir(tmp_path)[0].endswith(".failed")
+
+    restarted = AuditBuffer(str(tmp_path), interval_ms=60000, session_factory=session_factory).start()
+    assert restarted.stats["recovered"] == 1
+    assert [r.company_cik for r in _rows(session_factory)] == ["C1"]
+    assert os.listdir(tmp_path) == []
+    restarted.close()
+
+
+def test_sec_package_includes_buffered_entries(session_factory, tmp_path, monkeypatch):
+    buf = AuditBuffer(str(tmp_path), interval_ms=60000, session_factory=session_factory)
+    monkeypatch.setattr(audit_buffer, "_BUFFER", buf)
+    buf.enqueue(**{**_entry(1), "company_cik": "Pkg Co"})
+    payload = {"company": "Pkg Co", "scope1": {"fuel_type": "diesel", "amount": 10, "unit": "gallon"}}
+    with session_factory() as db, \
+         patch("app.services.validation_service.EPAClient") as mock_epa, \
+         patch("app.services.sec_exporter.get_storage") as storage:
+        mock_epa.return_value.format_emission_data.return_value = []
+        storage.return_value.upload_bytes.return_value = "memory://package.zip"
+        build_and_upload_sec_package(company="Pkg Co", payload=payload, db=db)
+    package = storage.return_value.upload_bytes.call_args[0][1]
+    with zipfile.ZipFile(io.BytesIO(package)) as z:
+        assert "Pkg Co" in z.read("audit.csv").decode()
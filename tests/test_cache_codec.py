@@ -0,0 +1,139 @@
+import asyncio
+import json
+
+import pyarrow as pa
+import pytest
+
+from app.config import settings
+from app.routes import global_data
+from app.services.external_api import RedisCache
+from app.utils import cache as cache_util
+from app.utils import cache_codec
+
+RECORDS = [
+    {"facility_name": f"Plant {i}", "state": ["TX", "CA", None][i % 3], "pollutant": "CO2", "year": 2023 if i % 2 else None,
+     "emissions": float(i) * 1.5}
+    for i in range(30)
+]
+
+
+class FakeRedis:
+    """Bytes-in/bytes-out stand-in for a redis client (decode_responses=False)."""
+
+    def __init__(self):
+        self.store = {}
+
+    def setex(self, key, ttl, value):
+        self.store[key] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def delete(self, key):
+        return 1 if self.store.pop(key, None) is not None else 0
+
+
+class FakeRedisService:
+    def __init__(self):
+        self.client = FakeRedis()
+
+    def set_cache_bytes(self, key, value, ttl_seconds=300):
+        return self.client.setex(key, ttl_seconds, value)
+
+    def get_cache_bytes(self, key):
+        return self.client.get(key)
+
+
+def test_arrow_round_trip_keeps_types():
+    data = cache_codec.encode(RECORDS, "arrow")
+    assert len(data) < len(json.dumps(RECORDS))
+    table = cache_codec.decode(data)
+    assert isinstance(table, pa.Table)
+    assert table.schema.field("emissions").type == pa.float64()
+    assert table.schema.field("year").type == pa.int64()
+    assert cache_codec.to_records(table) == RECORDS
+
+
+def test_json_and_legacy_values_decode():
+    assert cache_codec.decode(cache_codec.encode({"a": 1}, "arrow")) == {"a": 1}  # not tabular -> JSON
+    assert cache_codec.decode(cache_codec.encode(RECORDS, "json")) == RECORDS
+    assert cache_codec.decode(json.dumps(RECORDS).encode()) == RECORDS  # written before the codec header
+    assert cache_codec.decode(b"plain text") == "plain text"
+    # records Arrow cannot type fall back to JSON instead of failing
+    mixed = [{"v": 1}, {"v": "one"}]
+    assert cache_codec.decode(cache_codec.encode(mixed, "arrow")) == mixed
+
+
+def test_heterogeneous_records_keep_every_key():
+    rows = [{"facility_name": "A", "state": "TX"}, {"facility_name": "B", "emissions": 2.5}, {"facility_name": "C", "state": "CA", "year": 2023}]
+    assert cache_codec.decode(cache_codec.encode(rows, "arrow")) == rows  # stored as JSON: keys differ per row
+    assert cache_codec.as_cached(rows, "arrow") == rows
+    table = cache_codec.to_table(rows)
+    assert table.column_names == ["facility_name", "state", "emissions", "year"]
+    assert table.column("emissions").to_pylist() == [None, 2.5, None]
+    assert global_data._count_by(table, "year") == {"Unknown": 2, "2023": 1}
+
+
+def test_codec_negotiated_per_namespace(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_CODECS", "airnow=arrow, eea=json,bad=msgpack")
+    assert cache_codec.codec_for("airnow") == "arrow"
+    assert cache_codec.codec_for("eea") == "json"
+    assert cache_codec.codec_for("bad") == "json"
+    assert cache_codec.codec_for("unlisted") == "json"
+
+
+def test_redis_cache_hits_return_tables_for_arrow_namespaces(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_CODECS", "airnow=arrow")
+    cache = RedisCache()
+    cache._redis_service = FakeRedisService()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return RECORDS
+
+    key = cache._generate_cache_key("airnow", {"zip_code": "10001"})
+    miss = asyncio.run(cache.get_or_set(key, fetch))
+    hit = asyncio.run(cache.get_or_set(key, fetch))
+    assert len(calls) == 1
+    assert isinstance(miss, pa.Table) and hit.equals(miss)
+
+    other = cache._generate_cache_key("weather", {"q": 1})
+    assert asyncio.run(cache.get_or_set(other, fetch)) == RECORDS
+    assert asyncio.run(cache.get(other)) == RECORDS
+
+
+@pytest.fixture
+def fake_util_redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(cache_util, "_get_redis_client", lambda: fake)
+    monkeypatch.setattr(settings, "CACHE_CODECS", "epa_emissions=arrow")
+    return fake
+
+
+def test_get_or_set_shape_matches_on_hit_and_miss(fake_util_redis):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return RECORDS
+
+    assert cache_util.get_or_set(fetch) == RECORDS
+    assert fake_util_redis.store[f"{cache_util.REDIS_CACHE_PREFIX}:data"].startswith(cache_codec.MAGIC + b"A")
+    assert cache_util.get_or_set(fetch) == RECORDS
+    table = cache_util.get_or_set(fetch, as_table=True)
+    assert isinstance(table, pa.Table) and table.num_rows == len(RECORDS)
+    assert len(calls) == 1
+    assert cache_util.get_cache_timestamp() is not None
+
+
+def test_columnar_stats_match_record_counts():
+    table = pa.Table.from_pylist(RECORDS)
+    for field in ("state", "pollutant", "year", "missing"):
+        expected = {}
+        for item in RECORDS:
+            key = str(item.get(field) or "Unknown")
+            expected[key] = expected.get(key, 0) + 1
+        assert global_data._count_by(table, field) == expected
+        assert global_data._count_by(RECORDS, field) == expected
@@ -0,0 +1,108 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.api_server import app
+from app.config import settings
+from app.repositories.company_map_repository import upsert_mapping
+from app.services.campd_mirror import SHORT_TON_TO_TONNES, CampdMirror, compute_deviations, load_campd_mirror, refresh_campd_mirror, write_campd_mirror
+from app.services.validation_service import cross_validate_epa
+
+client = TestClient(app)
+headers = {"X-API-Key": "demo_key_premium_2025"}
+
+API_ROWS = [
+    {"facilityId": 3470, "unitId": "1", "year": 2022, "facilityName": "W A Parish", "stateCode": "TX", "co2Mass": 600.0, "so2Mass": 10.0, "noxMass": 4.0},
+    {"facilityId": 3470, "unitId": "2", "year": 2022, "co2Mass": 400.0, "so2Mass": 10.0, "noxMass": None},
+    {"facilityId": 3470, "unitId": "1", "year": 2023, "co2Mass": 900.0, "so2Mass": 15.0, "noxMass": 5.0},
+    {"facilityId": 55, "unitId": "A", "year": 2023, "co2Mass": 50.0},
+    {"unitId": "no facility"},
+]
+
+PAYLOAD = {"company": "Parish Power", "scope1": {"fuel_type": "natural_gas", "amount": 20000.0, "unit": "mmbtu"}}
+
+
+@pytest.fixture
+def mirror_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CAMPD_MIRROR_DIR", str(tmp_path / "campd"))
+    return str(tmp_path / "campd")
+
+
+def test_mirror_rolls_units_up_per_facility_year(mirror_dir):
+    assert write_campd_mirror(API_ROWS)["skipped"] == 1
+    mirror = load_campd_mirror()
+    assert len(mirror) == 2 and mirror.years.tolist() == [2022, 2023]
+    ref = mirror.reference(["3470"], [2022, 2023, 2030])
+    assert ref[:, 0].tolist() == [1000.0, 20.0, 4.0]  # CO2, SO2, NOX; one NOx unit missing
+    assert np.isnan(ref[:, 2]).all()
+    assert mirror.latest_year(3470) == 2023
+    assert load_campd_mirror() is mirror
+
+    # reloading a year replaces unit rows instead of duplicating them
+    write_campd_mirror([{**API_ROWS[2], "co2Mass": 1000.0}])
+    assert load_campd_mirror().reference([3470], [2023])[0, 0] == 1000.0
+
+
+def test_deviations_cover_all_pollutants_and_years():
+    mirror = CampdMirror.from_records(API_ROWS)
+    short_tons = {2022: {"CO2": 1000.0, "SO2": 30.0}, 2023: {"CO2": 1200.0, "NOX": 5.5}, 2030: {"CO2": 1.0}}
+    reported = {y: {p: v * SHORT_TON_TO_TONNES for p, v in row.items()} for y, row in short_tons.items()}
+    devs = compute_deviations(mirror, [3470], reported, thresholds=np.array([15.0, 25.0, 20.0]))
+    got = {(d["year"], d["pollutant"]): (round(d["deviation_pct"], 1), d["severity"]) for d in devs}
+    assert got == {
+        (2022, "CO2"): (0.0, "medium"),
+        (2022, "SO2"): (50.0, "high"),
+        (2023, "CO2"): (33.3, "critical"),
+        (2023, "NOX"): (10.0, "medium"),
+    }
+
+
+def test_reporting_the_campd_mass_is_no_deviation(test_db: Session, mirror_dir):
+    write_campd_mirror(API_ROWS)
+    upsert_mapping(test_db, company="Parish Power", facility_id="3470", facility_name="W A Parish")
+    # 1000 short tons of CO2 in 2022, reported in metric tonnes
+    payload = {**PAYLOAD, "reported_emissions": {2022: {"co2_tons": 1000.0 * SHORT_TON_TO_TONNES}}}
+    with patch("app.services.validation_service.EPAClient") as mock_epa:
+        mock_epa.return_value.format_emission_data.return_value = []
+        result = cross_validate_epa(payload, db=test_db, year=2022)
+    (dev,) = result["quantitative_deviation"]["deviations"]
+    assert dev["deviation_pct"] == pytest.approx(0.0, abs=1e-9)
+    assert dev["reference_short_tons"] == 1000.0 and dev["reference"] == pytest.approx(907.18474)
+
+
+def test_validation_uses_mirror_without_campd_calls(test_db: Session, mirror_dir):
+    write_campd_mirror(API_ROWS)
+    write_campd_mirror([{"facilityId": 3470, "year": 2023, "programCode": "ARP", "excessEmissions": 0}], kind="compliance")
+    upsert_mapping(test_db, company="Parish Power", facility_id="3470", facility_name="W A Parish")
+    payload = {**PAYLOAD, "reported_emissions": {2022: {"so2_tons": 40.0}}}
+    with patch("app.services.validation_service.EPAClient") as mock_epa, \
+         patch("app.services.validation_service.CAMDClient") as mock_campd:
+        mock_epa.return_value.format_emission_data.return_value = []
+        result = cross_validate_epa(payload, db=test_db)
+    assert mock_campd.call_count == 0
+    assert result["sources"]["campd"] == {"status": "ok", "origin": "local_mirror"}
+    qd = result["quantitative_deviation"]
+    assert qd["year"] == 2023  # latest mirrored year when the request has none
+    assert {(d["year"], d["pollutant"]) for d in qd["deviations"]} == {(2022, "SO2"), (2023, "CO2")}
+    assert qd["compliance"][0]["program"] == "ARP"
+
+
+def test_refresh_pages_through_campd(mirror_dir):
+    api = MagicMock()
+    api.get_annual_emissions_page.side_effect = lambda year, page, per_page: API_ROWS[:2] if page == 1 else API_ROWS[2:3]
+    api.get_compliance_page.return_value = []
+    out = refresh_campd_mirror([2022], client=api, per_page=2)
+    assert out["emissions"] == 3
+    assert api.get_annual_emissions_page.call_count == 2
+
+
+def test_admin_campd_import_and_stats(mirror_dir):
+    r = client.post("/v1/admin/campd/mirror", json={"records": API_ROWS}, headers=headers)
+    assert r.status_code == 200 and r.json()["data"]["written"] == 4
+    r = client.post("/v1/admin/campd/mirror", json={"kind": "hourly", "records": []}, headers=headers)
+    assert r.status_code == 400
+    r = client.get("/v1/admin/campd/mirror/stats", headers=headers)
+    assert r.json()["data"]["facilities"] == 2
@@ -23,6 +23,10 @@ def test_compute_cevs_records_audit(tmp_path, monkeypatch):
     result = compute_cevs_for_company("Audit Co", company_country="US")
     assert "score" in result
 
+    # audit writes are buffered; flush before checking
+    from app.services.audit_service import flush_pending_audits
+    flush_pending_audits()
+
     # verify audit entry exists
     with SessionLocal() as db:
         rows = db.query(AuditTrail).filter_by(company_cik="Audit Co").all()
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api_server import app
+from app.services.emissions_batch import calculate_emissions_batch, read_batch_rows
+from app.services.emissions_calculator import calc_scope1, calculate_emissions
+from app.services.factor_registry import FactorSet
+from app.services.ghg import GWP_SETS
+
+client = TestClient(app)
+headers = {"X-API-Key": "demo_key_premium_2025"}
+
+
+def test_scope1_gas_breakdown_and_gwp_sets():
+    ar5 = calc_scope1("diesel", 100, "gallon", gwp_set="AR5")
+    assert ar5["emissions_kg"] == pytest.approx(1021.0)
+    assert ar5["gases_kg"] == {"CO2": 1021.0, "CH4": 0.041, "N2O": 0.008}
+    assert ar5["co2e_kg"] == pytest.approx(1021.0 + 0.041 * 28 + 0.008 * 265)
+    ar4 = calc_scope1("diesel", 100, "gallon", gwp_set="ar4")
+    assert ar4["co2e_kg"] == pytest.approx(1021.0 + 0.041 * 25 + 0.008 * 298)
+    with pytest.raises(ValueError):
+        calc_scope1("diesel", 1, "gallon", gwp_set="AR9")
+
+
+def test_batch_matches_single_and_reports_every_gwp_set():
+    rows = [
+        {"company": "A", "fuel_type": "natural_gas", "amount": 500, "unit": "mmbtu", "kwh": 1000, "grid_region": "WECC"},
+        {"company": "B", "fuel_type": "gasoline", "amount": 20, "unit": "liter"},
+        {"company": "B", "fuel_type": "coal", "amount": 1, "unit": "ton"},
+    ]
+    out = calculate_emissions_batch(read_batch_rows(json.dumps(rows).encode(), "json"), gwp_set="AR6")
+    single = calculate_emissions({"company": "A", "scope1": {"fuel_type": "natural_gas", "amount": 500, "unit": "mmbtu"},
+                                  "scope2": {"kwh": 1000, "grid_region": "WECC"}, "gwp_set": "AR6"})
+    assert out["results"][0]["co2e_kg"] == pytest.approx(single["totals"]["co2e_kg"])
+    assert out["results"][2]["scope1_co2e_kg"] == 0.0
+    totals = out["totals"]
+    assert totals["gwp_set"] == "AR6"
+    assert set(totals["co2e_kg_by_gwp_set"]) == set(GWP_SETS)
+    assert totals["co2e_kg_by_gwp_set"]["AR6"] == pytest.approx(totals["co2e_kg"])
+    assert totals["co2e_kg_by_gwp_set"]["AR4"] != totals["co2e_kg_by_gwp_set"]["AR5"]
+    assert out["by_company"]["B"]["co2e_kg"] > out["by_company"]["B"]["emissions_kg"]
+
+
+def test_factor_file_gas_columns():
+    fs = FactorSet.from_dict({
+        "version": "9.0",
+        "scope1": {"diesel": {"gallon": 10.0}, "propane": {"gallon": 5.0}},
+        "scope1_gases": {"diesel": {"gallon": {"ch4": 0.001, "N2O": 0.0001}}},
+        "scope2": {"US_default": 0.4},
+    }, origin="test")
+    assert fs.scope1_gas_factors("diesel", "gallon").tolist() == [10.0, 0.001, 0.0001]
+    assert fs.scope1_gas_factors("propane", "gallon").tolist() == [5.0, 0.0, 0.0]
+    assert json.loads(fs.factors_payload)["scope1_gas_factors"]["diesel_gallon"]["CH4"] == 0.001
+    with pytest.raises(ValueError):
+        FactorSet.from_dict({"version": "9.1", "scope1": {}, "scope2": {"US_default": 0.4},
+                             "scope1_gases": {"diesel": {"gallon": {"CH4": 1}}}}, origin="test")
+
+
+def test_calculate_endpoint_gwp_set():
+    payload = {"company": "GWP Co", "scope1": {"fuel_type": "diesel", "amount": 100, "unit": "gallon"}, "gwp_set": "AR6"}
+    r = client.post("/v1/emissions/calculate", json=payload, headers=headers)
+    assert r.status_code == 200
+    assert r.json()["totals"]["gwp_set"] == "AR6"
+
+    payload["gwp_set"] = "SAR"
+    assert client.post("/v1/emissions/calculate", json=payload, headers=headers).status_code == 422
@@ -0,0 +1,62 @@
+from unittest.mock import patch
+from sqlalchemy.orm import Session
+
+from app.services import emissions_calculator
+from app.services.computation_context import ComputationContext, canonical_payload_hash, computation_stats
+from app.services.validation_service import cross_validate_epa
+from app.services.sec_exporter import build_and_upload_sec_package
+from app.repositories.company_map_repository import upsert_mapping
+
+PAYLOAD = {
+    "company": "Memo Co",
+    "scope1": {"fuel_type": "natural_gas", "amount": 1000.0, "unit": "mmbtu"},
+    "scope2": {"kwh": 500.0, "grid_region": "RFC"},
+}
+
+
+def test_canonical_hash_ignores_key_order():
+    reordered = {"scope2": PAYLOAD["scope2"], "company": "Memo Co", "scope1": dict(reversed(list(PAYLOAD["scope1"].items())))}
+    assert canonical_payload_hash(PAYLOAD) == canonical_payload_hash(reordered)
+
+
+def test_context_memoizes_and_returns_copies():
+    ctx = ComputationContext()
+    first = ctx.calculate_emissions(PAYLOAD)
+    first["totals"]["emissions_kg"] = -1
+    second = ctx.calculate_emissions(PAYLOAD)
+    assert second["totals"]["emissions_kg"] > 0
+    assert ctx.stats()["hits"] == 1
+    assert ctx.stats()["misses"] == 1
+
+
+def test_validation_computes_emissions_once(test_db: Session):
+    upsert_mapping(test_db, company="Memo Co", facility_id="123", facility_name="Memo Facility")
+    ctx = ComputationContext()
+    before = computation_stats()
+    with patch("app.services.validation_service.EPAClient") as mock_epa, \
+         patch("app.services.validation_service.CAMDClient") as mock_campd, \
+         patch("app.services.computation_context.calculate_emissions", wraps=emissions_calculator.calculate_emissions) as calc:
+        mock_epa.return_value.format_emission_data.return_value = []
+        mock_campd.return_value.get_emissions_data.return_value = [{"co2_mass_tons": 50.0}]
+        result = cross_validate_epa(PAYLOAD, db=test_db, ctx=ctx)
+        again = cross_validate_epa(PAYLOAD, db=test_db, ctx=ctx)
+
+    assert calc.call_count == 1
+    assert mock_epa.return_value.get_emissions_data.call_count == 1
+    assert result["quantitative_deviation"]["deviations"][0]["pollutant"] == "CO2"
+    assert again == result
+    assert ctx.stats()["hits"] >= 2
+    assert computation_stats()["hits"] - before["hits"] >= 2
+
+
+def test_sec_package_reuses_validation_from_context(test_db: Session):
+    ctx = ComputationContext()
+    with patch("app.services.validation_service.EPAClient") as mock_epa:
+        mock_epa.return_value.format_emission_data.return_value = []
+        cross_validate_epa(PAYLOAD, db=test_db, ctx=ctx)
+        with patch("app.services.sec_exporter.list_audit_entries", return_value=[]), \
+             patch("app.services.sec_exporter.get_storage") as storage:
+            storage.return_value.upload_bytes.return_value = "memory://package.zip"
+            out = build_and_upload_sec_package(company="Memo Co", payload=PAYLOAD, db=test_db, ctx=ctx)
+    assert mock_epa.return_value.get_emissions_data.call_count == 1
+    assert out["computation"]["hits"] >= 2
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+from app.api_server import app
+from app.utils import conditional_fetch
+from app.utils.conditional_fetch import fetch_dataset, reset_revalidation_stats, revalidation_stats
+
+
+class Response:
+    def __init__(self, status, body=b"", headers=None):
+        self.status_code, self.body, self.headers = status, body, headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(response=self)
+
+    def iter_content(self, chunk_size=1):
+        yield self.body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Origin:
+    """Serves `body`; honours If-None-Match only when `etag` is set."""
+
+    def __init__(self, body, etag=None):
+        self.body, self.etag = body, etag
+        self.sent = []
+
+    def get(self, url, params=None, headers=None, timeout=None, stream=False):
+        self.sent.append(dict(headers or {}))
+        if self.etag and (headers or {}).get("If-None-Match") == self.etag:
+            return Response(304, headers={"ETag": self.etag})
+        return Response(200, self.body, {"ETag": self.etag} if self.etag else {"Content-Type": "text/csv"})
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats():
+    reset_revalidation_stats()
+    yield
+    reset_revalidation_stats()
+
+
+def test_etag_revalidation_returns_304(tmp_path):
+    origin = Origin(b"x" * 1000, etag='"v1"')
+    path = str(tmp_path / "data.body")
+    first = fetch_dataset(origin, "https://up/data", namespace="t", path=path)
+    assert first.status == "fetched" and first.sha256 == hashlib.sha256(b"x" * 1000).hexdigest()
+    second = fetch_dataset(origin, "https://up/data", namespace="t", path=path)
+    assert second.status == "not_modified" and origin.sent[-1]["If-None-Match"] == '"v1"'
+    assert open(path, "rb").read() == b"x" * 1000
+
+    origin.body, origin.etag = b"y" * 10, '"v2"'
+    assert fetch_dataset(origin, "https://up/data", namespace="t", path=path).status == "fetched"
+    assert open(path, "rb").read() == b"y" * 10
+    assert revalidation_stats()["t"] == {"requests": 3, "fresh": 0, "not_modified": 1, "unchanged": 0, "fetched": 2,
+                                         "bytes_downloaded": 1010, "bytes_saved": 1000}
+
+
+def test_content_hash_and_max_age(tmp_path):
+    origin = Origin(b"a,b\n1,2\n")
+    path = str(tmp_path / "feed.body")
+    fetch_dataset(origin, "https://up/feed.csv", namespace="t", path=path)
+    assert fetch_dataset(origin, "https://up/feed.csv", namespace="t", path=path).status == "unchanged"
+    assert fetch_dataset(origin, "https://up/feed.csv", namespace="t", path=path, max_age=60).status == "fresh"
+    assert len(origin.sent) == 2
+
+
+def test_concurrent_fetches_of_one_url(tmp_path, monkeypatch):
+    dump = conditional_fetch.json.dump
+
+    def slow_dump(obj, fh):  # widen the window between writing and renaming the meta file
+        time.sleep(0.05)
+        dump(obj, fh)
+
+    monkeypatch.setattr(conditional_fetch.json, "dump", slow_dump)
+    origin = Origin(b"z" * 100, etag='"v1"')
+    path = str(tmp_path / "shared.body")
+    start = threading.Barrier(8)
+
+    def fetch(_):
+        start.wait()
+        return fetch_dataset(origin, "https://up/shared", namespace="t", path=path).status
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(fetch, range(8)))  # would raise FileNotFoundError on a shared temp file
+    assert set(statuses) <= {"fetched", "not_modified", "unchanged"}
+    assert open(path, "rb").read() == b"z" * 100
+
+
+def test_rejected_body_keeps_previous_copy(tmp_path):
+    origin = Origin(b"good")
+    path = str(tmp_path / "d.body")
+    fetch_dataset(origin, "https://up/d", namespace="t", path=path)
+    origin.body = b"bad"
+
+    def validate(tmp):
+        raise ValueError("not parquet")
+
+    with pytest.raises(ValueError):
+        fetch_dataset(origin, "https://up/d", namespace="t", path=path, validate=validate)
+    assert open(path, "rb").read() == b"good"
+
+
+def test_metrics_endpoint(tmp_path):
+    fetch_dataset(Origin(b"z"), "https://up/z", namespace="iso", path=str(tmp_path / "z.body"))
+    body = TestClient(app).get("/datasets").json()
+    assert body["data"]["revalidation"]["iso"]["fetched"] == 1
+
+
+def test_iso_feed_is_revalidated_not_redownloaded(tmp_path, monkeypatch):
+    from app.clients.iso_client import ISOClient
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "DATASET_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "ISO_FEED_REVALIDATE_SECONDS", 0)
+    origin = Origin(b"company_name,country\nAcme,Sweden\n", etag='"iso1"')
+    for _ in range(2):
+        iso = ISOClient()
+        iso.session, iso.csv_url, iso.xlsx_path = origin, "https://up/iso.csv", str(tmp_path / "none.xlsx")
+        rows = iso.get_iso14001_certifications(country="Sweden")
+        assert [r["company_name"] for r in rows] == ["Acme"]
+    assert revalidation_stats()["iso"]["not_modified"] == 1
+
+
+def test_namespace_keeps_only_recent_bodies(monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "DATASET_CACHE_MAX_FILES", 3)
+    origin = Origin(b"[]")
+    paths = []
+    for i in range(5):
+        paths.append(fetch_dataset(origin, f"https://up/rows/0:{i}", namespace="t").path)
+        if i == 2:  # revalidating the first body makes it recently used
+            assert fetch_dataset(origin, "https://up/rows/0:0", namespace="t").status == "unchanged"
+        time.sleep(0.02)
+    kept = sorted(os.listdir(os.path.dirname(paths[0])))
+    assert len([n for n in kept if n.endswith(".body")]) == 3
+    assert [os.path.exists(p) for p in paths] == [True, False, False, True, True]
+    assert all(n.endswith((".body", ".meta.json")) for n in kept) and len(kept) == 6
+
+
+def test_epa_client_reuses_a_fresh_copy():
+    from app.clients.global_client import EPAClient
+
+    origin = Origin(b'[{"facility_name": "Plant", "state_abbr": "TX"}]', etag='"e1"')
+    client = EPAClient()
+    client.session = origin
+    assert client.get_emissions_data(region="TX", limit=5) == client.get_emissions_data(region="TX", limit=5)
+    assert len(origin.sent) == 1
+    assert revalidation_stats()["epa"]["fresh"] == 1
@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+import pytest
+from openpyxl import Workbook
+
+from app.clients import edgar_store
+from app.clients.edgar_client import EDGARClient
+from app.clients.edgar_store import build_edgar_cache, clear_edgar_tables, load_edgar_table
+
+HEADER = ["ID_UC_G0", "UC_name", "UC_country", "EMI_PM2.5_RES_2020", "EMI_PM2.5_IND_2020", "EMI_PM2.5_RES_2022", "EMI_NOx_TRA_2022",
+          "GCPNT_LAT", "GCPNT_LON"]
+ROWS = [
+    [1, "Stockholm", "Sweden", 10, "2.5", 12, None, 59.33, 18.07],
+    [2, "Gothenburg", "Sweden", 5, None, 6, 7, 57.71, 11.97],
+    [3, "Berlin", "Germany", None, None, None, "n/a", 52.52, 13.40],
+]
+
+
+def write_workbook(path, rows=ROWS):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "EDGAR_emiss_on_UCDB_2024"
+    ws.append(HEADER)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    monkeypatch.setenv("EDGAR_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(EDGARClient, "_GLOBAL_CACHE", {})
+    clear_edgar_tables()
+    yield write_workbook(tmp_path / "edgar.xlsx")
+    clear_edgar_tables()
+
+
+def test_conversion_is_memory_mapped_and_reused(workbook, monkeypatch):
+    table = load_edgar_table(workbook)
+    assert isinstance(table.values, np.memmap)
+    assert table.rows == 3 and len(table.value_columns) == 4
+    assert list(table.column("UC_name")) == ["Stockholm", "Gothenburg", "Berlin"]
+    assert list(table.column("ID_UC_G0")) == [1.0, 2.0, 3.0]
+    assert np.isnan(table.values[2]).all()
+
+    # a fresh worker opens the cache without touching the workbook
+    clear_edgar_tables()
+    monkeypatch.setattr(edgar_store, "load_workbook", lambda *a, **k: pytest.fail("workbook re-parsed"))
+    again = load_edgar_table(workbook)
+    np.testing.assert_array_equal(again.values, table.values)
+
+
+def test_client_series_from_cache(workbook):
+    client = EDGARClient(workbook)
+    assert client.get_country_series("Sweden", "PM2.5") == [{"year": 2020, "value": 17.5}, {"year": 2022, "value": 18.0}]
+    assert client.get_country_series("Sweden", "NOx") == [{"year": 2022, "value": 7.0}]
+    assert client.get_country_series("Germany", "PM2.5") == []
+
+
+def test_workbook_change_rebuilds_and_prunes(workbook, tmp_path):
+    first = build_edgar_cache(workbook)
+    write_workbook(workbook, ROWS[:1])
+    os.utime(workbook, ns=(os.stat(workbook).st_atime_ns, os.stat(workbook).st_mtime_ns + 10**9))
+    second = build_edgar_cache(workbook)
+    assert second != first and not os.path.exists(first)
+    assert load_edgar_table(workbook).rows == 1
+
+
+def test_multi_country_multi_pollutant_query(workbook):
+    client = EDGARClient(workbook)
+    out = client.get_countries_series(["Sweden", "Germany", "Atlantis"], ["PM2.5", "NOx", "CO2"])
+    assert out["Sweden"]["PM2.5"] == client.get_country_series("Sweden", "PM2.5")
+    assert out["Sweden"]["NOx"] == [{"year": 2022, "value": 7.0}]
+    assert out["Germany"] == {"PM2.5": [], "NOx": [], "CO2": []}
+    assert out["Atlantis"]["PM2.5"] == []
+    assert sorted(client.list_countries()) == ["germany", "sweden"]
+    assert client.list_pollutants() == ["NOx", "PM2.5"]
+
+
+def test_grouped_sums_match_cell_by_cell_reference(tmp_path, workbook):
+    rng = np.random.default_rng(7)
+    rows = []
+    for i in range(200):
+        cells = [None if rng.random() < 0.3 else round(float(rng.random() * 100), 3) for _ in range(4)]
+        rows.append([i, f"UC{i}", ["Sweden", "Germany", "France", ""][i % 4], *cells])
+    path = write_workbook(tmp_path / "random.xlsx", rows)
+
+    expected = {}
+    for row in rows:
+        if not row[2]:
+            continue
+        for (pol, year), cols in {("PM2.5", 2020): [3, 4], ("PM2.5", 2022): [5], ("NOx", 2022): [6]}.items():
+            cells = [row[c] for c in cols if row[c] is not None]
+            if cells:
+                bucket = expected.setdefault((row[2], pol), {})
+                bucket[year] = bucket.get(year, 0.0) + sum(cells)
+
+    out = EDGARClient(path).get_countries_series(["Sweden", "Germany", "France"], ["PM2.5", "NOx"])
+    for (country, pol), years in expected.items():
+        got = {r["year"]: r["value"] for r in out[country][pol]}
+        assert got == pytest.approx(years)
+
+
+def test_urban_centre_series_and_nearest_lookup(workbook):
+    client = EDGARClient(workbook)
+    got = client.get_urban_centre_series(2, ["PM2.5", "NOx"])
+    assert got["urban_centre"] == {"id": "2", "name": "Gothenburg", "country": "sweden", "lat": 57.71, "lon": 11.97}
+    assert got["series"] == {"PM2.5": [{"year": 2020, "value": 5.0}, {"year": 2022, "value": 6.0}], "NOx": [{"year": 2022, "value": 7.0}]}
+    assert client.get_urban_centre_series("404", ["PM2.5"]) is None
+    assert [uc["name"] for uc in client.list_urban_centres("Sweden")] == ["Stockholm", "Gothenburg"]
+
+    # a facility near Uppsala resolves to Stockholm, one in Potsdam to Berlin
+    near = client.nearest_urban_centres(59.86, 17.64, k=2, pollutants=["PM2.5"])
+    assert [uc["name"] for uc in near] == ["Stockholm", "Gothenburg"]
+    assert 60 < near[0]["distance_km"] < 70
+    assert near[0]["series"]["PM2.5"] == [{"year": 2020, "value": 12.5}, {"year": 2022, "value": 12.0}]
+    assert client.nearest_urban_centres(52.40, 13.06)[0]["name"] == "Berlin"
+    assert client.nearest_urban_centres(52.40, 13.06, max_km=5) == []
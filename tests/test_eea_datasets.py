@@ -0,0 +1,108 @@
+import asyncio
+import io
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+import requests
+
+from app.clients.eea_client import EEAClient
+
+RENEWABLES = pa.table({
+    "Country": ["Germany", "Sweden", "EU-27"],
+    "Renewable energy share 2020": [19.3, 60.1, 22.1],
+    "Renewable energy share 2021 (proxy)": [19.2, 62.0, 21.8],
+    "2020 target": [18.0, 49.0, 20.0],
+    "Notes": ["a", "b", "c"],
+})
+POLLUTION = pa.table({"Year": [2019, 2020, 2021], "Total N": [40.0, 38.0, 35.0], "TOC": [14.0, 13.0, 12.0]})
+
+
+def parquet_bytes(table):
+    buf = io.BytesIO()
+    pq.write_table(table, buf, row_group_size=1)
+    return buf.getvalue()
+
+
+class FakeResponse:
+    def __init__(self, payload=None, content=b"", status=200):
+        self.payload, self.content, self.status_code = payload, content, status
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(response=self)
+
+    def json(self):
+        return self.payload
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, datasets):
+        self.datasets = datasets
+        self.calls = []
+        self.fail = False
+
+    def get(self, url, timeout=None, stream=False, params=None, headers=None):
+        self.calls.append(url)
+        if self.fail:
+            raise requests.exceptions.ConnectionError("offline")
+        if url.endswith("/files"):
+            dataset_id = url.split("/datasets/")[1].split("/")[0]
+            return FakeResponse([{"name": f"{dataset_id}.parquet", "links": {"download": f"https://dl/{dataset_id}"}}])
+        assert stream, "dataset downloads must be streamed"
+        return FakeResponse(content=parquet_bytes(self.datasets[url.rsplit("/", 1)[1]]))
+
+
+@pytest.fixture
+def client(tmp_path):
+    c = EEAClient(cache_dir=str(tmp_path))
+    c.session = FakeSession({
+        "share-of-energy-from-renewable-sources": RENEWABLES,
+        "industrial-releases-of-pollutants-to-water": POLLUTION,
+    })
+    return c
+
+
+def test_download_is_stored_once_and_scanned_locally(client, tmp_path):
+    rows = asyncio.run(client.get_countries_renewables())
+    assert rows[1] == {"country": "Sweden", "renewable_energy_share_2020": 60.1, "renewable_energy_share_2021_proxy": 62.0, "target_2020": 49.0}
+    assert os.path.exists(tmp_path / "share-of-energy-from-renewable-sources.parquet")
+    calls = len(client.session.calls)
+    assert asyncio.run(client.get_country_renewables("sweden"))["target_2020"] == 49.0
+    assert asyncio.run(client.get_country_renewables("Atlantis")) is None
+    assert len(client.session.calls) == calls
+
+
+def test_projection_and_pushdown(client):
+    table = asyncio.run(client.scan_dataset("share-of-energy-from-renewable-sources", columns=["country", "missing"]))
+    assert table.column_names == ["country"] and table.num_rows == 3
+    table = asyncio.run(client.scan_dataset("industrial-releases-of-pollutants-to-water", columns=["year", "total_n"], filters={"year": [2020, 2021]}))
+    assert table.to_pylist() == [{"year": 2020, "total_n": 38.0}, {"year": 2021, "total_n": 35.0}]
+    pollution = asyncio.run(client.get_industrial_pollution(years=[2021]))
+    assert [(r["year"], r["total_n"], r["toc"], r["gva"]) for r in pollution] == [(2021, 35.0, 12.0, None)]
+    assert asyncio.run(client.get_indicator(indicator="pollution", year=2019))[0]["total_n"] == 40.0
+
+
+def test_stale_copy_beats_fallback_when_offline(client, tmp_path, monkeypatch):
+    monkeypatch.setenv("EEA_POLLUTION_SOURCE", "")  # the fallback path records itself here
+    asyncio.run(client.get_countries_renewables())
+    client.dataset_ttl = 0
+    client.session.fail = True
+    assert len(asyncio.run(client.get_countries_renewables())) == 3
+
+    offline = EEAClient(cache_dir=str(tmp_path / "empty"))
+    offline.session = client.session
+    fallback = asyncio.run(offline.get_industrial_pollution())
+    assert [r["year"] for r in fallback] == [2018, 2019, 2020, 2021, 2022]
@@ -0,0 +1,62 @@
+import io
+from dotenv import load_dotenv
+load_dotenv()
+
+import pandas as pd
+from fastapi.testclient import TestClient
+from app.api_server import app
+from app.services.emissions_batch import calculate_emissions_batch, read_batch_rows
+from app.services.emissions_calculator import calculate_emissions
+
+client = TestClient(app)
+headers = {"X-API-Key": "demo_key_premium_2025"}
+
+ROWS = [
+    {"company": "DemoCo", "facility": "A", "fuel_type": "diesel", "amount": 10, "unit": "gallon", "kwh": 1000, "grid_region": "RFC"},
+    {"company": "DemoCo", "facility": "B", "fuel_type": "natural_gas", "amount": 3, "unit": "mmbtu"},
+    {"company": "OtherCo", "facility": "C", "kwh": 250, "grid_region": "unknown"},
+    {"company": "OtherCo", "facility": "D", "fuel_type": "coal", "amount": 1, "unit": "ton"},
+]
+
+
+def test_batch_matches_single_calculation():
+    result = calculate_emissions_batch(read_batch_rows(pd.DataFrame(ROWS).to_json(orient="records").encode(), "json"))
+    single = calculate_emissions({
+        "company": "DemoCo",
+        "scope1": {"fuel_type": "diesel", "amount": 10, "unit": "gallon"},
+        "scope2": {"kwh": 1000, "grid_region": "RFC"},
+    })
+    assert result["results"][0]["emissions_kg"] == single["totals"]["emissions_kg"]
+    assert result["results"][2]["scope2_region"] == "US_default"
+    assert result["results"][3]["error"] == "Unsupported fuel/unit: coal/ton"
+    assert result["totals"]["valid_rows"] == 3
+    assert result["totals"]["error_rows"] == 1
+    expected = sum(r["emissions_kg"] for r in result["results"][:3])
+    assert abs(result["totals"]["emissions_kg"] - expected) < 1e-6
+    assert set(result["by_company"]) == {"DemoCo", "OtherCo"}
+
+
+def test_batch_endpoint_json_rows():
+    r = client.post("/v1/emissions/calculate/batch", json={"rows": ROWS}, headers=headers)
+    assert r.status_code == 200
+    data = r.json()
+    assert len(data["results"]) == 4
+    assert data["totals"]["emissions_kg"] > 0
+
+
+def test_batch_endpoint_csv_and_parquet():
+    frame = pd.DataFrame(ROWS)
+    r = client.post("/v1/emissions/calculate/batch", content=frame.to_csv(index=False), headers={**headers, "Content-Type": "text/csv"})
+    assert r.status_code == 200
+    csv_totals = r.json()["totals"]
+
+    buf = io.BytesIO()
+    frame.to_parquet(buf)
+    r = client.post("/v1/emissions/calculate/batch?format=parquet", content=buf.getvalue(), headers=headers)
+    assert r.status_code == 200
+    assert r.json()["totals"] == csv_totals
+
+
+def test_batch_endpoint_rejects_bad_payload():
+    r = client.post("/v1/emissions/calculate/batch", content=b"not json", headers={**headers, "Content-Type": "application/json"})
+    assert r.status_code == 400
@@ -0,0 +1,129 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.api_server import app
+from app.models.epa_facility import EPAFacility, EPASyncCheckpoint  # noqa: F401
+from app.services.epa_sync import EnvirofactsPager, run_epa_sync
+from app.services.facility_index import ingest_facilities
+
+client = TestClient(app)
+headers = {"X-API-Key": "demo_key_premium_2025"}
+
+
+def _rows(state, n, start=0):
+    return [{"TRI_FACILITY_ID": f"{state}{i:05d}", "FACILITY_NAME": f"Plant {i}", "STATE_ABBR": state} for i in range(start, start + n)]
+
+
+class FakePager:
+    def __init__(self, data, *, with_count=True, fail=()):
+        self.data = data
+        self.with_count = with_count
+        self.fail = set(fail)
+        self.calls = []
+        self.requests_made = 0
+        self._lock = threading.Lock()
+
+    def count(self, table, state_column, state):
+        with self._lock:
+            self.requests_made += 1
+        return len(self.data.get(state, [])) if self.with_count else None
+
+    def rows(self, table, state_column, state, start, end):
+        with self._lock:
+            self.requests_made += 1
+            self.calls.append((state, start))
+        if (state, start) in self.fail:
+            self.fail.discard((state, start))
+            raise RuntimeError("503 from upstream")
+        return self.data.get(state, [])[start:end + 1]
+
+
+def _cp(db, state):
+    return db.get(EPASyncCheckpoint, ("tri_facility", state))
+
+
+def test_full_sync_then_tail_only_fetches_new_rows(test_db: Session):
+    data = {"TX": _rows("TX", 1200), "CA": _rows("CA", 40)}
+    pager = FakePager(data)
+    out = run_epa_sync(test_db, states=["TX", "CA"], pager=pager, page_size=500, workers=3)
+    assert out["inserted"] == 1240 and out["failed"] == 0
+    assert sorted(pager.calls) == [("CA", 0), ("TX", 0), ("TX", 500), ("TX", 1000)]
+    assert test_db.query(EPAFacility).count() == 1240
+    assert _cp(test_db, "TX").status == "complete" and _cp(test_db, "TX").total_rows == 1200
+
+    # nothing new upstream: count only, no page requests
+    pager = FakePager(data)
+    out = run_epa_sync(test_db, states=["TX", "CA"], pager=pager, page_size=500)
+    assert pager.calls == [] and out["inserted"] == 0
+
+    data["TX"] += _rows("TX", 30, start=1200)
+    pager = FakePager(data)
+    out = run_epa_sync(test_db, states=["TX", "CA"], pager=pager, page_size=500)
+    assert pager.calls == [("TX", 1200)]
+    assert out["inserted"] == 30 and _cp(test_db, "TX").mode == "tail"
+
+
+def test_full_pass_writes_only_changed_rows(test_db: Session):
+    data = {"NY": _rows("NY", 20)}
+    run_epa_sync(test_db, states=["NY"], pager=FakePager(data), page_size=8)
+    data["NY"][3] = {**data["NY"][3], "FACILITY_NAME": "Renamed Works"}
+    out = run_epa_sync(test_db, states=["NY"], pager=FakePager(data), page_size=8, full=True)
+    assert (out["inserted"], out["updated"], out["unchanged"]) == (0, 1, 19)
+    assert test_db.get(EPAFacility, "tri_facility:NY00003").facility_name == "Renamed Works"
+
+
+def test_rows_from_a_plain_import_are_unchanged_for_the_delta_sync(test_db: Session):
+    data = {"WA": _rows("WA", 6)}
+    assert ingest_facilities(test_db, data["WA"])["written"] == 6
+    out = run_epa_sync(test_db, states=["WA"], pager=FakePager(data), page_size=8, full=True)
+    assert (out["inserted"], out["updated"], out["unchanged"]) == (0, 0, 6)
+
+
+def test_failed_page_resumes_from_watermark(test_db: Session):
+    data = {"OH": _rows("OH", 25)}
+    pager = FakePager(data, fail=[("OH", 10)])
+    out = run_epa_sync(test_db, states=["OH"], pager=pager, page_size=5, workers=1)
+    cp = _cp(test_db, "OH")
+    assert out["failed"] == 1 and cp.status == "failed"
+    assert cp.next_row == 10  # pages below the failure are contiguous
+    pager = FakePager(data)
+    out = run_epa_sync(test_db, states=["OH"], pager=pager, page_size=5)
+    assert min(start for _, start in pager.calls) == 10
+    assert out["checkpoints"][0]["resumed"] is True
+    assert _cp(test_db, "OH").status == "complete" and _cp(test_db, "OH").total_rows == 25
+    assert test_db.query(EPAFacility).count() == 25
+
+
+def test_pages_until_short_page_without_count(test_db: Session):
+    pager = FakePager({"WA": _rows("WA", 12)}, with_count=False)
+    out = run_epa_sync(test_db, states=["WA"], pager=pager, page_size=5, workers=2)
+    assert out["inserted"] == 12
+    assert _cp(test_db, "WA").total_rows == 12
+
+
+def test_pager_urls_and_retry():
+    ok = MagicMock(status_code=200)
+    ok.json.return_value = [{"TRI_FACILITY_ID": "1"}]
+    busy = MagicMock(status_code=503)
+    session = MagicMock()
+    session.get.side_effect = [busy, ok]
+    pager = EnvirofactsPager("https://example.test/efservice", min_interval=0, backoff=0)
+    with patch("app.services.epa_sync.requests.Session", return_value=session):
+        assert pager.rows("tri_facility", "STATE_ABBR", "TX", 0, 499) == [{"TRI_FACILITY_ID": "1"}]
+    assert session.get.call_args[0][0] == "https://example.test/efservice/tri_facility/STATE_ABBR/TX/rows/0:499/JSON"
+    assert pager.requests_made == 2
+
+
+def test_admin_sync_endpoints():
+    r = client.post("/v1/admin/epa/sync", json={"tables": ["nope"]}, headers=headers)
+    assert r.status_code == 400
+    with patch("app.routes.admin_mapping.run_epa_sync_job") as job:
+        r = client.post("/v1/admin/epa/sync", json={"states": ["TX"]}, headers=headers)
+    assert r.status_code == 202
+    job.assert_called_once_with(states=["TX"], tables=None, full=False)
+    r = client.get("/v1/admin/epa/sync", headers=headers)
+    assert r.status_code == 200
+    assert r.json()["data"]["running"] is False
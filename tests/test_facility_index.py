@@ -0,0 +1,103 @@
+import time
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.api_server import app
+from app.models.epa_facility import EPAFacility  # noqa: F401
+from app.services import facility_index
+from app.services.facility_index import FacilityIndex, get_facility_index, ingest_facilities, normalize_facility, trigrams
+from app.services.validation_service import cross_validate_epa
+
+client = TestClient(app)
+headers = {"X-API-Key": "demo_key_premium_2025"}
+
+TRI_ROWS = [
+    {"TRI_FACILITY_ID": "77001ACME1", "FACILITY_NAME": "ACME Chemical Plant #1", "PARENT_CO_NAME": "Acme Holdings Inc.", "STATE_ABBR": "TX", "CITY_NAME": "HOUSTON"},
+    {"TRI_FACILITY_ID": "77002ACME2", "FACILITY_NAME": "Bayport Works", "PARENT_CO_NAME": "ACME HOLDINGS INC", "STATE_ABBR": "TX"},
+    {"TRI_FACILITY_ID": "90001ACME3", "FACILITY_NAME": "Acme West", "STATE_ABBR": "CA"},
+    {"TRI_FACILITY_ID": "10001OTHER", "FACILITY_NAME": "Northwind Refinery", "STATE_ABBR": "NY"},
+    {"FACILITY_NAME": "no id, skipped"},
+]
+
+PAYLOAD = {"company": "Acme Holdings", "scope1": {"fuel_type": "diesel", "amount": 10, "unit": "gallon"}}
+
+
+def test_normalize_tri_and_frs_records():
+    tri = normalize_facility(TRI_ROWS[0])
+    assert tri["id"] == "tri_facility:77001ACME1"
+    assert tri["parent_company"] == "Acme Holdings Inc."
+    frs = normalize_facility({"registry_id": "110000", "primary_name": "Plant", "state_code": "oh"}, source="frs")
+    assert frs["id"] == "frs:110000" and frs["state"] == "OH"
+
+
+def test_index_substring_search_matches_linear_scan():
+    recs = [normalize_facility(r) for r in TRI_ROWS[:4]]
+    index = FacilityIndex(recs)
+    assert {r["source_id"] for r in index.search("acme")} == {"77001ACME1", "77002ACME2", "90001ACME3"}
+    assert [r["source_id"] for r in index.search("Acme Holdings", state="tx")] == ["77001ACME1", "77002ACME2"]
+    assert index.search("hem") and not index.search("zzz")
+    assert index.search("ac", state="CA")[0]["source_id"] == "90001ACME3"  # short terms still work
+    assert index.similar("Northwind Refinering")[0][1]["facility_name"] == "Northwind Refinery"
+
+
+def test_index_query_is_fast_on_large_store():
+    recs = [{"facility_name": f"Facility {i} Energy Partners", "state": "TX" if i % 2 else "LA"} for i in range(50000)]
+    recs.append({"facility_name": "Zephyr Unique Works", "state": "TX"})
+    index = FacilityIndex(recs)
+    started = time.perf_counter()
+    for _ in range(20):
+        hits = index.search("zephyr unique", state="TX")
+    assert (time.perf_counter() - started) / 20 < 0.05
+    assert len(hits) == 1
+
+
+def test_similar_scores_are_trigram_jaccard_and_fast():
+    recs = [{"facility_name": f"Facility {i} Energy Partners", "state": "TX" if i % 2 else "LA"} for i in range(50000)]
+    recs.append({"facility_name": "Energy Partners Facility", "state": "TX"})
+    index = FacilityIndex(recs)
+    q = set(trigrams("energy partners facility"))
+    started = time.perf_counter()
+    ranked = index.similar("Energy Partners Facility", limit=3)
+    assert time.perf_counter() - started < 0.05  # every record shares trigrams with the query
+    assert ranked[0] == (1.0, recs[-1])
+    for score, rec in ranked:
+        grams = set(trigrams(index.names[recs.index(rec)]))
+        assert score == round(len(q & grams) / len(q | grams), 4)
+
+
+def test_validation_uses_local_store_when_populated(test_db: Session):
+    assert ingest_facilities(test_db, TRI_ROWS) == {"written": 4, "skipped": 1}
+    with patch("app.services.validation_service.EPAClient") as mock_epa:
+        result = cross_validate_epa(PAYLOAD, db=test_db, state="TX")
+        miss = cross_validate_epa({**PAYLOAD, "company": "Northwind Refinering"}, db=test_db)
+    assert mock_epa.call_count == 0
+    assert result["epa"]["source"] == "local_store"
+    assert result["epa"]["matches_count"] == 2
+    assert miss["epa"]["matches_count"] == 0
+    assert any("Northwind Refinery" in s for s in miss["suggestions"])
+
+
+def test_index_is_built_outside_the_global_lock(test_db: Session):
+    ingest_facilities(test_db, TRI_ROWS)
+    seen = []
+    real = facility_index.list_all_facilities
+
+    def listing(db):
+        seen.append(facility_index._INDEX_LOCK.locked())
+        return real(db)
+
+    with patch.object(facility_index, "list_all_facilities", listing):
+        index = get_facility_index(test_db)
+        assert get_facility_index(test_db) is index
+    assert seen == [False] and len(index) == 4
+
+
+def test_admin_facility_import_and_stats():
+    r = client.post("/v1/admin/epa/facilities", json={"source": "tri_facility", "records": TRI_ROWS[:2]}, headers=headers)
+    assert r.status_code == 200
+    assert r.json()["data"]["written"] == 2
+    r = client.get("/v1/admin/epa/facilities/stats", headers=headers)
+    assert r.status_code == 200
+    assert r.json()["data"]["by_state"]["TX"] >= 2
@@ -0,0 +1,103 @@
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api_server import app
+from app.services.factor_registry import FactorRegistry, FactorSet
+from app.services.emissions_calculator import FACTORS_VERSION, calc_scope1, calc_scope2
+
+client = TestClient(app)
+headers = {"X-API-Key": "demo_key_premium_2025"}
+
+V02 = {
+    "version": "0.2",
+    "sources": ["test"],
+    "scope1": {"diesel": {"gallon": 10.5}, "propane": {"gallon": 5.72}},
+    "scope2": {"US_default": 0.38, "RFC": 0.41},
+}
+
+
+def _write(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def test_builtin_set_only_when_directory_missing(tmp_path):
+    reg = FactorRegistry(directory=str(tmp_path / "missing"), reload_seconds=-1)
+    assert reg.versions() == [FACTORS_VERSION]
+    fs = reg.current()
+    assert fs.grid_factor("wecc") == ("WECC", 0.35)
+    assert fs.grid_factor("nowhere") == ("US_default", 0.4)
+
+
+def test_new_version_file_is_hot_swapped(tmp_path):
+    reg = FactorRegistry(directory=str(tmp_path), reload_seconds=0)
+    before = reg.current()
+    assert before.version == FACTORS_VERSION
+
+    _write(tmp_path / "factors_0.2.json", V02)
+    fs = reg.current()
+    assert fs.version == "0.2"
+    assert calc_scope1("propane", 2, "gallon", fs)["emissions_kg"] == pytest.approx(11.44)
+    assert calc_scope2(100, "rfc", fs)["factor"] == 0.41
+    # the previous set is still usable by pinned callers
+    assert reg.get(FACTORS_VERSION) is not fs
+    assert json.loads(fs.factors_payload)["scope1_factors"]["propane_gallon"] == 5.72
+
+
+def test_invalid_file_is_skipped_and_pin_respected(tmp_path):
+    _write(tmp_path / "factors_0.2.json", V02)
+    (tmp_path / "broken.json").write_text("{not json")
+    reg = FactorRegistry(directory=str(tmp_path), reload_seconds=-1, active_version=FACTORS_VERSION)
+    assert reg.versions() == [FACTORS_VERSION, "0.2"]
+    assert reg.current().version == FACTORS_VERSION
+    with pytest.raises(ValueError):
+        reg.get("9.9")
+
+
+def test_compiled_sets_are_shared_through_disk(tmp_path):
+    src, compiled = tmp_path / "factors", tmp_path / "compiled"
+    src.mkdir()
+    _write(src / "factors_0.2.json", V02)
+    first = FactorRegistry(directory=str(src), reload_seconds=-1, compiled_dir=str(compiled))
+    assert first.artifact_loads == 0
+
+    # a second worker loads the artifact instead of parsing and compiling
+    with patch.object(FactorSet, "compile", side_effect=AssertionError("recompiled")):
+        second = FactorRegistry(directory=str(src), reload_seconds=-1, compiled_dir=str(compiled))
+    assert second.artifact_loads == 1
+    assert second.versions() == first.versions()
+    for version in first.versions():
+        a, b = first.get(version), second.get(version)
+        assert b.factors_payload == a.factors_payload and b.units_payload == a.units_payload
+        assert b.s1_index == a.s1_index and b.activity_table == a.activity_table
+        assert np.array_equal(b.s1_gas_matrix, a.s1_gas_matrix)
+    assert calc_scope1("diesel", 2, "liter", second.get("0.2")) == calc_scope1("diesel", 2, "liter", first.get("0.2"))
+    assert second.get("0.2").grid_factor("rfc") == ("RFC", 0.41)
+
+    # a changed directory gets a new artifact and the old one is removed
+    _write(src / "factors_0.3.json", {**V02, "version": "0.3"})
+    third = FactorRegistry(directory=str(src), reload_seconds=-1, compiled_dir=str(compiled))
+    assert third.artifact_loads == 0 and "0.3" in third.versions()
+    assert len(list(compiled.glob("factors-*.json"))) == 1
+
+
+def test_factors_endpoint_versions_and_pinned_calculation():
+    r = client.get("/v1/emissions/factors/versions", headers=headers)
+    assert r.status_code == 200
+    assert FACTORS_VERSION in r.json()["versions"]
+
+    r = client.get("/v1/emissions/factors?version=does-not-exist", headers=headers)
+    assert r.status_code == 404
+
+    payload = {
+        "company": "PinCo",
+        "scope1": {"fuel_type": "diesel", "amount": 1, "unit": "gallon"},
+        "factors_version": FACTORS_VERSION,
+    }
+    r = client.post("/v1/emissions/calculate", json=payload, headers=headers)
+    assert r.status_code == 200
+    assert r.json()["version"] == FACTORS_VERSION
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from app.utils.geo import LatLonGridIndex, haversine_km
+
+
+def test_nearest_matches_brute_force():
+    rng = np.random.default_rng(3)
+    lat = np.degrees(np.arcsin(rng.uniform(-1, 1, 3000)))
+    lon = rng.uniform(-180, 180, 3000)
+    lat[::40] = np.nan  # unindexed
+    index = LatLonGridIndex(lat, lon, cell_deg=2.0)
+    assert len(index) == 3000 - 75
+    for qlat, qlon in [(0.0, 0.0), (89.9, 179.9), (-45.0, -179.99), (10.0, 180.0)] + [tuple(p) for p in rng.uniform([-90, -180], [90, 180], (50, 2))]:
+        got = index.nearest(qlat, qlon, k=3)
+        dist = np.nan_to_num(haversine_km(qlat, qlon, lat, lon), nan=np.inf)
+        assert [d for _, d in got] == pytest.approx(np.sort(dist)[:3])
+        assert dist[got[0][0]] == pytest.approx(got[0][1])
+
+
+def test_max_km_and_bad_input():
+    index = LatLonGridIndex(np.array([0.0, 0.0]), np.array([179.9, -179.9]))
+    # across the antimeridian
+    assert [i for i, _ in index.nearest(0.0, -179.95, k=2)] == [1, 0]
+    assert index.nearest(10.0, 0.0, max_km=100) == []
+    with pytest.raises(ValueError):
+        index.nearest(91.0, 0.0)
@@ -0,0 +1,116 @@
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.api_server import app
+from app.models.corporate_hierarchy import CorporateEntity  # noqa: F401
+from app.repositories.corporate_hierarchy_repository import get_entity, update_entity
+from app.services.hierarchy_rollup import HierarchyRollup, save_group, update_group_node, invalidate_group, get_group_rollup
+
+client = TestClient(app)
+headers = {"X-API-Key": "demo_key_premium_2025"}
+
+GROUP = [
+    {"id": "parent", "kind": "group", "scope1_emissions_kg": 10.0},
+    {"id": "sub-a", "parent_id": "parent", "kind": "subsidiary", "ownership_pct": 100},
+    {"id": "sub-b", "parent_id": "parent", "kind": "subsidiary", "ownership_pct": 40},
+    {"id": "fac-1", "parent_id": "sub-a", "scope1_emissions_kg": 100.0, "scope2_emissions_kg": 50.0},
+    {"id": "fac-2", "parent_id": "sub-b", "scope1_emissions_kg": 200.0},
+    {"id": "fac-3", "parent_id": "sub-b", "ownership_pct": 50, "scope2_emissions_kg": 80.0},
+]
+
+
+def _fresh(rollup):
+    rebuilt = HierarchyRollup({"id": n, "parent_id": rollup.parent[n], "ownership_pct": rollup.share[n] * 100,
+                               "scope1_emissions_kg": rollup.own[n][0], "scope2_emissions_kg": rollup.own[n][1]}
+                              for n in rollup.parent)
+    return rebuilt.totals("parent")
+
+
+def test_ownership_weighted_rollup():
+    r = HierarchyRollup(GROUP)
+    root = r.totals("parent")
+    assert root["scope1_emissions_kg"] == pytest.approx(10 + 100 + 0.4 * 200)
+    assert root["scope2_emissions_kg"] == pytest.approx(50 + 0.4 * 0.5 * 80)
+    assert r.totals("fac-3")["equity_share_of_root"] == pytest.approx(0.2)
+
+
+def test_incremental_updates_match_full_rebuild():
+    r = HierarchyRollup(GROUP)
+    assert r.set_own("fac-3", scope2=100.0) == ["fac-3", "sub-b", "parent"]
+    assert r.set_ownership("sub-b", 60) == ["parent"]
+    r.move("fac-2", "sub-a")
+    r.add_node({"id": "fac-4", "parent_id": "sub-b", "scope1_emissions_kg": 5.0})
+    for key in ("scope1_emissions_kg", "scope2_emissions_kg"):
+        assert r.totals("parent")[key] == pytest.approx(_fresh(r)[key])
+    with pytest.raises(ValueError):
+        r.move("sub-a", "fac-2")
+
+
+def test_cycle_and_unknown_parent_rejected():
+    with pytest.raises(ValueError):
+        HierarchyRollup([{"id": "a", "parent_id": "b"}, {"id": "b", "parent_id": "a"}])
+    with pytest.raises(ValueError):
+        HierarchyRollup([{"id": "a", "parent_id": "missing"}])
+
+
+def test_single_leaf_edit_on_5000_nodes_is_fast():
+    nodes = [{"id": "root"}]
+    for s in range(50):
+        nodes.append({"id": f"s{s}", "parent_id": "root", "ownership_pct": 80})
+        for f in range(99):
+            nodes.append({"id": f"s{s}-f{f}", "parent_id": f"s{s}", "scope1_emissions_kg": 1.0})
+    r = HierarchyRollup(nodes)
+    assert len(r.parent) == 5001
+    started = time.perf_counter()
+    for _ in range(1000):
+        r.set_own("s7-f3", scope1=2.0)
+        r.set_own("s7-f3", scope1=1.0)
+    assert (time.perf_counter() - started) / 2000 < 0.001
+    assert r.totals("root")["scope1_emissions_kg"] == pytest.approx(50 * 99 * 0.8)
+
+
+def test_group_persistence_and_cached_updates(test_db: Session):
+    save_group(test_db, "grp-1", GROUP)
+    out = update_group_node(test_db, "grp-1", "fac-2", scope1_emissions_kg=300.0)
+    assert out["recomputed"] == ["fac-2", "sub-b", "parent"]
+    assert out["root"]["scope1_emissions_kg"] == pytest.approx(10 + 100 + 0.4 * 300)
+
+    invalidate_group("grp-1")
+    reloaded = get_group_rollup(test_db, "grp-1")
+    assert reloaded.totals("parent")["scope1_emissions_kg"] == pytest.approx(10 + 100 + 0.4 * 300)
+
+
+def test_edits_from_another_worker_are_picked_up(test_db: Session):
+    save_group(test_db, "grp-2", GROUP)
+    assert get_group_rollup(test_db, "grp-2").totals("parent")["scope1_emissions_kg"] == pytest.approx(190.0)
+
+    # another worker writes the row directly; this process never saw the edit
+    update_entity(test_db, get_entity(test_db, "fac-2"), scope1_emissions_kg=300.0)
+    assert get_group_rollup(test_db, "grp-2").totals("parent")["scope1_emissions_kg"] == pytest.approx(10 + 100 + 0.4 * 300)
+
+    out = update_group_node(test_db, "grp-2", "fac-1", scope1_emissions_kg=0.0)
+    assert out["root"]["scope1_emissions_kg"] == pytest.approx(10 + 0.4 * 300)
+    assert get_group_rollup(test_db, "grp-2") is get_group_rollup(test_db, "grp-2")
+
+
+def test_hierarchy_endpoints():
+    group = f"grp-{uuid.uuid4().hex[:8]}"
+    nodes = [{**n, "id": f"{group}-{n['id']}", "parent_id": f"{group}-{n['parent_id']}" if n.get("parent_id") else None} for n in GROUP]
+    r = client.put(f"/v1/emissions/hierarchy/{group}", json={"nodes": nodes}, headers=headers)
+    assert r.status_code == 200
+    assert len(r.json()["children"]) == 2
+
+    r = client.patch(f"/v1/emissions/hierarchy/{group}/nodes/{group}-sub-b", json={"ownership_pct": 100}, headers=headers)
+    assert r.status_code == 200
+    assert r.json()["root"]["scope1_emissions_kg"] == pytest.approx(310.0)
+
+    r = client.get(f"/v1/emissions/hierarchy/{group}?depth=2", headers=headers)
+    assert r.json()["children"][1]["children"][0]["id"] == f"{group}-fac-2"
+
+    r = client.patch(f"/v1/emissions/hierarchy/{group}/nodes/{group}-sub-a", json={"parent_id": f"{group}-fac-1"}, headers=headers)
+    assert r.status_code == 400
+    assert client.get("/v1/emissions/hierarchy/no-such-group", headers=headers).status_code == 404
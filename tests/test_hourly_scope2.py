@@ -0,0 +1,114 @@
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api_server import app
+from app.services.hourly_scope2 import (
+    IntervalSeries,
+    compute_hourly_scope2,
+    hours_in_year,
+    load_hourly_curves,
+    write_hourly_curves,
+)
+
+client = TestClient(app)
+headers = {"X-API-Key": "demo_key_premium_2025"}
+
+YEAR = 2023
+JAN1 = datetime(YEAR, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def curves(tmp_path):
+    hours = hours_in_year(YEAR)
+    # RFC: 0.2 at night (hours 0-11 of each day), 0.6 during the day
+    rfc = np.where(np.arange(hours) % 24 < 12, 0.2, 0.6)
+    write_hourly_curves(str(tmp_path), YEAR, {"RFC": rfc}, source="test")
+    return load_hourly_curves(YEAR, directory=str(tmp_path))
+
+
+def test_curves_are_memory_mapped_and_cached(curves, tmp_path):
+    assert isinstance(curves.factors, np.memmap)
+    assert curves.factors.shape == (1, 8760)
+    assert load_hourly_curves(YEAR, directory=str(tmp_path)) is curves
+    assert load_hourly_curves(YEAR + 1, directory=str(tmp_path)) is None
+
+
+def test_hourly_curve_weights_emissions_by_time_of_use(curves):
+    hours = hours_in_year(YEAR)
+    night = np.where(np.arange(hours) % 24 < 12, 1.0, 0.0)
+    # 15-minute data: 0.25 kWh per interval during the day only
+    day_15min = np.repeat(1.0 - night, 4) * 0.25
+    sites = [
+        IntervalSeries("night", night, JAN1, 60, "rfc"),
+        IntervalSeries("day", day_15min, JAN1, 15, "RFC"),
+        IntervalSeries("flat", np.ones(hours), JAN1, 60, "WECC"),
+    ]
+    out = compute_hourly_scope2(sites, YEAR, curves=curves)
+    by_site = {s["site_id"]: s for s in out["sites"]}
+
+    assert by_site["night"]["emissions_kg"] == pytest.approx(365 * 12 * 0.2)
+    assert by_site["day"]["emissions_kg"] == pytest.approx(365 * 12 * 0.6)
+    assert by_site["day"]["kwh"] == pytest.approx(365 * 12)
+    assert by_site["flat"]["factor_curve"] == "flat"
+    assert by_site["flat"]["emissions_kg"] == pytest.approx(hours * 0.35)
+    assert by_site["night"]["monthly_emissions_kg"][1] == pytest.approx(28 * 12 * 0.2)
+    assert sum(out["monthly"]["emissions_kg"]) == pytest.approx(out["totals"]["emissions_kg"])
+
+
+def test_multi_hour_readings_are_spread_over_their_hours(curves):
+    # 12-hour readings alternating night / day, plus one straddling the end of the year
+    half_days = np.ones(2 * 365)
+    sites = [
+        IntervalSeries("halfday", half_days * 12.0, JAN1, 720, "RFC"),
+        IntervalSeries("edge", np.array([4.0]), datetime(YEAR, 12, 31, 22, tzinfo=timezone.utc), 240, "RFC"),
+    ]
+    out = compute_hourly_scope2(sites, YEAR, curves=curves, include_hourly=True)
+    by_site = {s["site_id"]: s for s in out["sites"]}
+    assert by_site["halfday"]["emissions_kg"] == pytest.approx(365 * 12 * (0.2 + 0.6))
+    assert by_site["halfday"]["kwh"] == pytest.approx(365 * 24)
+    assert out["hourly"]["emissions_kg"][11] == pytest.approx(0.2)
+    assert out["hourly"]["emissions_kg"][12] == pytest.approx(0.6)
+    # only the two hours inside the year count
+    assert by_site["edge"]["kwh"] == pytest.approx(2.0)
+    assert by_site["edge"]["dropped_intervals"] == 1
+
+
+def test_out_of_year_and_missing_readings_are_dropped():
+    start = datetime(YEAR - 1, 12, 31, 23, tzinfo=timezone.utc)
+    out = compute_hourly_scope2([IntervalSeries("s", np.array([5.0, 1.0, np.nan, 2.0]), start, 60, None)], YEAR, include_hourly=True)
+    site = out["sites"][0]
+    assert site["dropped_intervals"] == 2
+    assert site["kwh"] == 3.0
+    assert site["grid_region"] == "US_default"
+    assert out["hourly"]["emissions_kg"][0] == pytest.approx(0.4)
+    assert len(out["hourly"]["emissions_kg"]) == 8760
+
+
+def test_portfolio_scale_runs_vectorized(curves):
+    rng = np.random.default_rng(7)
+    sites = [IntervalSeries(f"site-{i}", rng.random(35040), JAN1, 15, "RFC" if i % 2 else "SERC") for i in range(500)]
+    started = time.perf_counter()
+    out = compute_hourly_scope2(sites, YEAR, curves=curves)
+    assert time.perf_counter() - started < 3.0
+    assert out["totals"]["sites"] == 500
+
+
+def test_hourly_endpoint():
+    payload = {
+        "company": "Hourly Co",
+        "year": 2024,
+        "sites": [{"site_id": "a", "start": "2024-03-01T00:00:00Z", "kwh": [10, 10, None], "grid_region": "SERC"}],
+    }
+    r = client.post("/v1/emissions/calculate/scope2/hourly", json=payload, headers=headers)
+    assert r.status_code == 200
+    data = r.json()
+    assert data["totals"]["emissions_kg"] == pytest.approx(20 * 0.5)
+    assert data["monthly"]["kwh"][2] == 20
+
+    payload["sites"][0]["interval_minutes"] = 7
+    r = client.post("/v1/emissions/calculate/scope2/hourly", json=payload, headers=headers)
+    assert r.status_code == 400
@@ -0,0 +1,101 @@
+import os
+
+import pytest
+from openpyxl import Workbook
+
+from app.clients import iso_client as iso_module
+from app.clients.iso_client import ISOClient
+from app.config import settings
+from app.services.cevs_aggregator import has_iso_certificate
+from app.utils.iso_index import ISOIndex, invalidate_iso_index
+
+RECORDS = [
+    {"company": "Nordic Paper AB", "country": "Sweden"},
+    {"company": "Exxon-Mobil, Corp.", "country": "US"},
+    {"company": "Green Energy Co", "country": "US"},
+    {"company": "Acme GmbH", "country": "Germany"},
+    {"company": "Sustain PT", "country": None},
+]
+
+
+def write_workbook(path, companies):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "ISO 14001 certified companies"
+    ws.append(["Appendix: ISO 14001 list"])
+    ws.append(["No", "Company", "Effective date", "Expiry date"])
+    for i, name in enumerate(companies, start=1):
+        ws.append([i, name, "2023-01-01", "2026-01-01"])
+    wb.save(path)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def fresh_indexes():
+    invalidate_iso_index()
+    yield
+    invalidate_iso_index()
+
+
+def test_match_modes():
+    index = ISOIndex(RECORDS)
+    assert [r["company_name"] for r in index.exact("exxon mobil corp")] == ["Exxon-Mobil, Corp."]
+    assert index.has_certification("Exxon Mobil", mode="prefix")
+    assert not index.has_certification("Mobil", mode="prefix")
+    assert index.has_certification("mobil", mode="contains")
+    assert index.has_certification("Energy", country="USA")
+    assert not index.has_certification("Energy", country="Germany")
+    assert index.has_certification("Nordic Papers AB", mode="fuzzy")
+    assert not index.has_certification("Nordic Papers AB", mode="contains")
+    assert not index.has_certification("  ", mode="contains")
+    with pytest.raises(ValueError):
+        index.has_certification("Acme", mode="regex")
+
+
+def test_contains_matches_linear_scan():
+    names = [f"Company {i} {w}" for i, w in enumerate(["Steel", "Paper", "Cement", "Steelworks", "Co"] * 40)]
+    index = ISOIndex({"company": n} for n in names)
+    for term in ["steel", "Company 1", "paper", "co", "works", "1 c", "x", "company 19 steel"]:
+        expected = [n for n in names if term.lower() in n.lower()]
+        assert [r["company_name"] for r in index.search(term)] == expected
+
+
+def test_rows_filtered_by_country():
+    index = ISOIndex(RECORDS)
+    assert [r["company_name"] for r in index.rows(country="United States")] == ["Exxon-Mobil, Corp.", "Green Energy Co"]
+    assert len(index.rows(limit=2)) == 2 and len(index.rows()) == len(RECORDS)
+
+
+def test_index_is_shared_and_rebuilt_only_when_workbook_changes(tmp_path, monkeypatch):
+    path = write_workbook(tmp_path / "list_iso.xlsx", ["Nordic Paper AB", "Acme Steel"])
+    monkeypatch.setenv("ISO_XLSX_PATH", path)
+    monkeypatch.delenv("ISO_CSV_URL", raising=False)
+    monkeypatch.delenv("ISO_API_BASE", raising=False)
+    monkeypatch.setattr(settings, "ISO_INDEX_REFRESH_SECONDS", 0.0)
+
+    first = ISOClient().certification_index()
+    assert first.has_certification("acme steel", mode="exact")
+    assert [r["company_name"] for r in ISOClient().get_iso14001_certifications(limit=1)] == ["Nordic Paper AB"]
+
+    # a new client (per request) reuses the index without re-reading the workbook
+    monkeypatch.setattr(iso_module, "load_workbook", lambda *a, **k: pytest.fail("workbook re-read"))
+    assert ISOClient().certification_index() is first
+    monkeypatch.undo()
+
+    monkeypatch.setenv("ISO_XLSX_PATH", path)
+    monkeypatch.setattr(settings, "ISO_INDEX_REFRESH_SECONDS", 0.0)
+    write_workbook(path, ["Baltic Timber"])
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    second = ISOClient().certification_index()
+    assert second is not first
+    assert second.has_certification("Baltic Timber") and not second.has_certification("Acme Steel")
+
+
+def test_cevs_lookup_uses_country_filtered_index():
+    index = ISOIndex(RECORDS)
+    rows = index.rows(country="US")
+    assert has_iso_certificate("Green Energy", "US", rows, index)
+    assert not has_iso_certificate("Acme", "US", rows, index)
+    assert has_iso_certificate("Acme", "Germany", [{"company_name": "Acme GmbH"}])
+    assert not has_iso_certificate("Acme", "Germany", [], index)
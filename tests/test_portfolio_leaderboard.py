@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api_server import app
+from app.config import settings
+from app.services import cevs_aggregator
+from app.services.cevs_portfolio import cevs_leaderboard
+from app.services.country_features import reset_feature_table
+
+client = TestClient(app)
+headers = {"X-API-Key": "demo_key_premium_2025"}
+
+
+class FakeEPA:
+    calls = 0
+
+    def get_emissions_data(self, limit=200, timeout=5.0):
+        FakeEPA.calls += 1
+        return [{"facility_name": "Acme Steel Mill"}, {"facility_name": "ACME Chemicals"}, {"facility_name": "Nordic Paper"}]
+
+    def create_sample_data(self):
+        return []
+
+    def format_emission_data(self, rows):
+        return rows
+
+
+class FakeISO:
+    def __init__(self):
+        self.countries = []
+
+    def get_iso14001_certifications(self, country=None, limit=100):
+        self.countries.append(country)
+        holders = {"Sweden": ["Nordic Paper AB"], "Germany": ["Acme GmbH"]}
+        return [{"company_name": n} for n in holders.get(country, ["Acme Steel"])]
+
+
+class FakeEEA:
+    async def get_countries_renewables(self):
+        return [
+            {"country": "Sweden", "renewable_energy_share_2021_proxy": 62.0, "target_2020": 49.0},
+            {"country": "Germany", "renewable_energy_share_2021_proxy": 19.0, "target_2020": 18.0},
+            {"country": "EU-27", "renewable_energy_share_2021_proxy": 22.0},
+        ]
+
+    async def get_industrial_pollution(self):
+        return [{"total_n": 10.0, "toc": 5.0}, {"total_n": 14.0, "toc": 4.0}]
+
+
+class FakeEDGAR:
+    xlsx_path = None
+
+    def get_countries_series(self, countries, pollutants):
+        return {c: {p: [{"year": 2020, "value": 80.0}, {"year": 2022, "value": 100.0}] for p in pollutants} for c in countries}
+
+
+PORTFOLIO = [
+    {"company": "Nordic Paper AB", "country": "Sweden"},
+    {"company": "Acme", "country": "Germany"},
+    {"company": "Acme Steel", "country": None},
+    {"company": "Southern Company", "country": "United States"},
+    {"company": "Nobody Inc", "country": "Germany"},
+]
+
+
+@pytest.fixture
+def fake_sources(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "CEVS_FEATURES_PATH", str(tmp_path / "country_features.json"))
+    reset_feature_table()
+    iso = FakeISO()
+    campd = type("FakeCAMPD", (), {
+        "get_emissions_data": lambda self, fid: [{"co2Mass": 6000000, "so2Mass": 10, "noxMass": 1500}],
+        "get_compliance_data": lambda self, fid: [{"compliantIndicator": 0}],
+    })()
+    monkeypatch.setattr(cevs_aggregator, "_CLIENTS", {"epa": FakeEPA(), "iso": iso, "eea": FakeEEA(), "edgar": FakeEDGAR(), "campd": campd})
+    monkeypatch.setattr(cevs_aggregator, "_LAST_GOOD", {})
+    monkeypatch.setattr(cevs_aggregator, "load_best_practices", lambda: [
+        {"country": "Sweden", "scheme": "ISO 14001", "typology": "Reduced inspection frequencies"},
+        {"country": "Sweden", "scheme": "EMAS, ISO 14001", "typology": "Reduced reporting and monitoring requirements"},
+    ])
+    monkeypatch.setattr(cevs_aggregator, "_record_cevs_audit", lambda *a, **k: None)
+    FakeEPA.calls = 0
+    yield iso
+    reset_feature_table()
+
+
+@pytest.mark.parametrize("pollution_source", ["auto", "edgar", "eea"])
+def test_vectorized_scores_match_single_company_path(fake_sources, monkeypatch, pollution_source):
+    monkeypatch.setenv("CEVS_POLLUTION_SOURCE", pollution_source)
+    board = asyncio.run(cevs_leaderboard(PORTFOLIO))["leaderboard"]
+    for row in board:
+        single = cevs_aggregator.compute_cevs_for_company(row["company"], company_country=row["country"])
+        assert row["score"] == pytest.approx(single["score"])
+        assert row["components"] == pytest.approx(single["components"])
+
+
+def test_shared_sources_are_fetched_once(fake_sources):
+    result = asyncio.run(cevs_leaderboard(PORTFOLIO))
+    assert FakeEPA.calls == 1
+    assert sorted(fake_sources.countries, key=str) == sorted(["Sweden", "Germany", None, "United States"], key=str)
+    assert result["sources"]["composition"]["campd"] == {"ok": 1}
+    assert result["sources"]["partial"] is False
+
+
+def test_ranks_percentiles_and_distributions(fake_sources):
+    result = asyncio.run(cevs_leaderboard(PORTFOLIO))
+    board = result["leaderboard"]
+    scores = [r["score"] for r in board]
+    assert scores == sorted(scores, reverse=True)
+    assert board[0]["company"] == "Nordic Paper AB" and board[0]["percentile"] == 100.0
+    assert board[0]["components"]["policy_bonus"] == 2.0
+    assert {r["company"]: r["components"]["campd_penalty"] for r in board}["Southern Company"] == -35.0
+    for a, b in zip(board, board[1:]):
+        assert b["rank"] == (a["rank"] if b["score"] == a["score"] else board.index(b) + 1)
+    dist = result["distributions"]["score"]
+    assert dist["min"] == min(scores) and dist["max"] == max(scores) and dist["p50"] == sorted(scores)[2]
+    assert result["by_country"]["Germany"]["companies"] == 2
+
+
+def test_leaderboard_endpoint(fake_sources):
+    r = client.post("/v1/export/sec/cevs/leaderboard", json={"companies": PORTFOLIO, "top": 2}, headers=headers)
+    assert r.status_code == 200
+    body = r.json()
+    assert body["companies"] == 5 and len(body["leaderboard"]) == 2
+    assert client.post("/v1/export/sec/cevs/leaderboard", json={"companies": []}, headers=headers).status_code == 400
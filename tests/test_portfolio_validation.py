@@ -0,0 +1,70 @@
+import json
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.api_server import app
+from app.repositories.company_map_repository import upsert_mapping
+from app.services.portfolio_validation import plan_portfolio_validation, stream_portfolio_validation
+
+client = TestClient(app)
+headers = {"X-API-Key": "demo_key_premium_2025"}
+
+SCOPE1 = {"fuel_type": "natural_gas", "amount": 1000.0, "unit": "mmbtu"}
+EPA_ROWS = {
+    "TX": [{"facility_name": "Acme Plant TX", "state": "TX"}],
+    "CA": [{"facility_name": "Acme West", "state": "CA"}],
+    "NY": [],
+}
+
+
+def _portfolio(n=12):
+    states = ["TX", "CA", "NY"]
+    return [{"company": "Acme" if i % 2 else f"Other {i}", "state": states[i % 3], "scope1": SCOPE1} for i in range(n)]
+
+
+def test_portfolio_fetches_each_state_once(test_db: Session):
+    with patch("app.services.validation_service.EPAClient") as mock_epa:
+        mock_epa.return_value.get_emissions_data.side_effect = lambda region, year, limit: region
+        mock_epa.return_value.format_emission_data.side_effect = lambda region: EPA_ROWS[region]
+        plan = plan_portfolio_validation(test_db, _portfolio())
+        events = list(stream_portfolio_validation(plan, workers=4, progress_every=5))
+
+    assert mock_epa.return_value.get_emissions_data.call_count == 3
+    results = [e for e in events if e["type"] == "result"]
+    assert events[0]["upstream_calls"] == {"epa": 3, "campd": 0}
+    assert sorted(e["index"] for e in results) == list(range(12))
+    by_index = {e["index"]: e for e in results}
+    assert by_index[1]["matches_count"] == 1  # Acme in CA
+    assert by_index[0]["flags"][0] == "no_epa_match"
+    assert [e["done"] for e in events if e["type"] == "progress"] == [5, 10, 12]
+    assert events[-1]["type"] == "summary" and events[-1]["errors"] == 0
+
+
+def test_shared_campd_facility_fetched_once(test_db: Session):
+    upsert_mapping(test_db, company="Acme", facility_id="3470")
+    upsert_mapping(test_db, company="Acme Sub", facility_id="3470")
+    companies = [{"company": "Acme", "state": "TX", "scope1": SCOPE1}, {"company": "Acme Sub", "state": "TX", "scope1": SCOPE1}]
+    with patch("app.services.validation_service.EPAClient") as mock_epa, \
+         patch("app.services.validation_service.CAMDClient") as mock_campd:
+        mock_epa.return_value.format_emission_data.return_value = []
+        mock_campd.return_value.get_emissions_data.return_value = [{"co2_mass_tons": 50.0}]
+        events = list(stream_portfolio_validation(plan_portfolio_validation(test_db, companies), include_details=True))
+    assert mock_campd.return_value.get_emissions_data.call_count == 1
+    results = [e for e in events if e["type"] == "result"]
+    assert all(e["deviations"] == 1 for e in results)
+    assert results[0]["result"]["mapping"]["facility_id"] == "3470"
+
+
+def test_batch_endpoint_streams_ndjson():
+    with patch("app.services.validation_service.EPAClient") as mock_epa:
+        mock_epa.return_value.format_emission_data.return_value = []
+        r = client.post("/v1/validation/epa/batch", json={"companies": _portfolio(4)}, headers=headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in r.text.splitlines()]
+    assert events[0]["type"] == "start" and events[-1]["type"] == "summary"
+    assert sum(1 for e in events if e["type"] == "result") == 4
+    r = client.post("/v1/validation/epa/batch", json={"companies": []}, headers=headers)
+    assert r.status_code == 400
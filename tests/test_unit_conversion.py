@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from app.services.emissions_batch import calculate_emissions_batch, read_batch_rows
+from app.services.emissions_calculator import calc_scope1
+from app.services.factor_registry import FactorSet
+from app.services.unit_conversion import canonical_unit, compile_conversions, conversion_multiplier
+
+
+def test_canonical_units_and_same_dimension_multipliers():
+    assert canonical_unit(" Short Tons ") == "short_ton"
+    assert canonical_unit("Litres") == "liter"
+    assert conversion_multiplier("diesel", "barrel", "gallon") == pytest.approx(42.0)
+    assert conversion_multiplier("natural_gas", "mcf", "scf") == pytest.approx(1000.0)
+    assert conversion_multiplier("natural_gas", "mwh", "mmbtu") == pytest.approx(3.412142, rel=1e-6)
+    assert conversion_multiplier("coal", "kg", "gallon") is None  # no properties to bridge mass/volume
+    assert conversion_multiplier("diesel", "furlong", "gallon") is None
+
+
+def test_mbtu_is_a_thousand_btu():
+    assert canonical_unit("MBtu") == "kbtu"
+    assert conversion_multiplier("natural_gas", "mbtu", "mmbtu") == pytest.approx(0.001)
+    mbtu = calc_scope1("natural_gas", 1000, "MBtu")
+    assert mbtu["emissions_kg"] == pytest.approx(calc_scope1("natural_gas", 10, "therm")["emissions_kg"])  # not 1000 mmbtu
+
+
+def test_declared_units_win_and_same_dimension_preferred():
+    conv = compile_conversions("natural_gas", ["m3", "therm", "mmbtu"])
+    assert "m3" not in conv
+    assert conv["scf"][0] == "m3"
+    assert conv["gj"][0] == "therm"
+    assert conv["kg"][0] == "m3"
+
+
+def test_converted_units_match_declared_factor():
+    gj = calc_scope1("natural_gas", 1.055056, "GJ")
+    assert gj["emissions_kg"] == pytest.approx(5.3 * 10, rel=1e-9)  # 1 mmbtu == 10 therm
+    assert gj["converted"]["base_unit"] == "therm"
+    barrels = calc_scope1("diesel", 2, "bbl")
+    assert barrels["emissions_kg"] == pytest.approx(2 * 42 * 10.21)
+    assert barrels["gases_kg"]["CH4"] == pytest.approx(2 * 42 * 0.00041)
+    assert "converted" not in calc_scope1("diesel", 1, "gallon")
+    with pytest.raises(ValueError):
+        calc_scope1("coal", 1, "short ton")
+
+
+def test_batch_accepts_converted_units_with_one_lookup_per_row():
+    rows = [
+        {"company": "U", "fuel_type": "diesel", "amount": 1, "unit": "metric ton"},
+        {"company": "U", "fuel_type": "diesel", "amount": 1000, "unit": "kg"},
+        {"company": "U", "fuel_type": "natural_gas", "amount": 10, "unit": "MWh"},
+    ]
+    out = calculate_emissions_batch(read_batch_rows(json.dumps(rows).encode(), "json"))
+    res = out["results"]
+    assert res[0]["error"] is None
+    assert res[0]["scope1_emissions_kg"] == pytest.approx(res[1]["scope1_emissions_kg"])
+    assert res[2]["scope1_emissions_kg"] == pytest.approx(calc_scope1("natural_gas", 10, "mwh")["emissions_kg"])
+
+
+def test_factor_file_can_override_fuel_properties():
+    fs = FactorSet.from_dict({
+        "version": "7.0",
+        "scope1": {"diesel": {"gal": 10.0}},
+        "scope2": {"US_default": 0.4},
+        "fuel_properties": {"diesel": {"density": 1000.0}},
+    }, origin="test")
+    assert fs.scope1_factor("diesel", "gallon") == 10.0
+    # 1 kg of diesel at 1000 kg/m3 is 1 liter
+    assert fs.scope1_factor("diesel", "kg") == pytest.approx(10.0 / 3.785411784)
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from sqlalchemy.orm import Session
+
+from app.repositories.company_map_repository import upsert_mapping
+from app.services import validation_service
+from app.services.validation_service import cross_validate_epa, cross_validate_epa_async
+
+PAYLOAD = {"company": "Slow Co", "scope1": {"fuel_type": "natural_gas", "amount": 1000.0, "unit": "mmbtu"}}
+
+
+def test_sources_are_queried_concurrently(test_db: Session):
+    upsert_mapping(test_db, company="Slow Co", facility_id="123", facility_name="Slow Facility")
+
+    def slow_epa(*args, **kwargs):
+        time.sleep(0.3)
+        return []
+
+    def slow_campd(*args, **kwargs):
+        time.sleep(0.3)
+        return [{"co2_mass_tons": 50.0}]
+
+    with patch("app.services.validation_service.EPAClient") as mock_epa, \
+         patch("app.services.validation_service.CAMDClient") as mock_campd:
+        mock_epa.return_value.get_emissions_data.side_effect = slow_epa
+        mock_epa.return_value.format_emission_data.return_value = []
+        mock_campd.return_value.get_emissions_data.side_effect = slow_campd
+        started = time.perf_counter()
+        result = cross_validate_epa(PAYLOAD, db=test_db, deadline=5)
+        elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.55  # serial would be >= 0.6s
+    assert result["partial"] is False
+    assert result["sources"]["epa"]["status"] == "ok"
+    assert result["sources"]["campd"]["status"] == "ok"
+    assert result["quantitative_deviation"]["deviations"][0]["reference_short_tons"] == 50.0
+
+
+def test_slow_source_is_flagged_not_awaited(test_db: Session):
+    upsert_mapping(test_db, company="Slow Co", facility_id="123", facility_name="Slow Facility")
+    release = threading.Event()
+
+    def stuck(*args, **kwargs):
+        release.wait(5)
+        return []
+
+    with patch("app.services.validation_service.EPAClient") as mock_epa, \
+         patch("app.services.validation_service.CAMDClient") as mock_campd:
+        mock_epa.return_value.get_emissions_data.return_value = []
+        mock_epa.return_value.format_emission_data.return_value = []
+        mock_campd.return_value.get_emissions_data.side_effect = stuck
+        started = time.perf_counter()
+        result = asyncio.run(cross_validate_epa_async(PAYLOAD, db=test_db, deadline=0.2))
+        elapsed = time.perf_counter() - started
+        release.set()
+
+    assert elapsed < 1.0
+    assert result["partial"] is True
+    assert result["sources"]["campd"]["status"] == "timed_out"
+    assert result["sources"]["epa"]["status"] == "ok"
+    assert "quantitative_deviation" not in result
+    assert [f["details"]["source"] for f in result["flags"] if f["code"] == "source_timed_out"] == ["campd"]
+
+
+def test_epa_timeout_skips_match_flags():
+    release = threading.Event()
+    with patch("app.services.validation_service.EPAClient") as mock_epa:
+        mock_epa.return_value.get_emissions_data.side_effect = lambda *a, **k: release.wait(5) and []
+        result = cross_validate_epa({**PAYLOAD, "company": "Nobody"}, state="TX", deadline=0.1)
+        release.set()
+    codes = [f["code"] for f in result["flags"]]
+    assert codes == ["source_timed_out"]
+    assert result["epa"]["timed_out"] is True
+
+
+def test_epa_error_is_partial_not_a_missing_match():
+    with patch("app.services.validation_service.EPAClient") as mock_epa:
+        mock_epa.return_value.get_emissions_data.side_effect = RuntimeError("502 Bad Gateway")
+        result = cross_validate_epa({**PAYLOAD, "company": "Nobody"}, state="TX", deadline=1)
+    assert [(f["code"], f["severity"]) for f in result["flags"]] == [("source_error", "low")]
+    assert result["sources"]["epa"]["status"] == "error"
+    assert result["partial"] is True
+
+
+def test_saturated_pool_skips_lookups_instead_of_queueing(monkeypatch):
+    pool = validation_service._SourcePool(workers=1, queue_depth=0)
+    monkeypatch.setattr(validation_service, "_SOURCE_POOL", pool)
+    release = threading.Event()
+    with patch("app.services.validation_service.EPAClient") as mock_epa:
+        mock_epa.return_value.get_emissions_data.side_effect = lambda *a, **k: release.wait(5) and []
+        mock_epa.return_value.format_emission_data.return_value = []
+        first = cross_validate_epa({**PAYLOAD, "company": "Nobody"}, deadline=0.1)
+        started = time.perf_counter()
+        second = cross_validate_epa({**PAYLOAD, "company": "Nobody"}, deadline=5)
+        elapsed = time.perf_counter() - started
+        release.set()
+
+    assert first["sources"]["epa"]["status"] == "timed_out"
+    assert elapsed < 0.5  # not queued behind the stuck lookup
+    assert second["partial"] is True
+    assert [f["code"] for f in second["flags"]] == ["source_saturated"]
+    assert second["sources"]["epa"]["pool"]["in_flight"] == 1
+    deadline = time.time() + 2
+    while pool.stats()["in_flight"] and time.time() < deadline:
+        time.sleep(0.01)
+    assert pool.stats() == {"workers": 1, "limit": 1, "in_flight": 0, "rejected": 1}
+
+
+def test_async_validation_keeps_local_work_off_the_event_loop(test_db: Session):
+    def slow_index(db):
+        time.sleep(0.3)  # e.g. rebuilding the facility index
+        return None
+
+    async def run():
+        task = asyncio.create_task(cross_validate_epa_async(PAYLOAD, db=test_db, deadline=2))
+        started = time.perf_counter()
+        await asyncio.sleep(0.02)
+        waited = time.perf_counter() - started
+        return waited, await task
+
+    with patch("app.services.validation_service.get_facility_index", side_effect=slow_index), \
+         patch("app.services.validation_service.EPAClient") as mock_epa:
+        mock_epa.return_value.format_emission_data.return_value = []
+        waited, result = asyncio.run(run())
+    assert waited < 0.2
+    assert result["sources"]["epa"]["status"] == "ok"
@@ -57,7 +57,7 @@ def test_validation_with_mapping_integration(test_db: Session):
             co2_dev = deviation["deviations"][0]
             assert co2_dev["pollutant"] == "CO2"
             assert co2_dev["source"] == "CAMPD"
-            assert co2_dev["reference"] == 50.0
+            assert co2_dev["reference_short_tons"] == 50.0
 
 
 def test_validation_without_mapping(test_db: Session):
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api_server import app
+from app.config import settings
+from app.services import cevs_aggregator
+from app.services.cevs_simulator import create_simulation, simulate, sweep
+from app.services.country_features import reset_feature_table
+
+client = TestClient(app)
+headers = {"X-API-Key": "demo_key_premium_2025"}
+
+
+class Counting:
+    calls = 0
+
+
+class FakeEPA(Counting):
+    def get_emissions_data(self, limit=200, timeout=5.0):
+        Counting.calls += 1
+        return [{"facility_name": "Southern Company Plant Bowen"}]
+
+    def create_sample_data(self):
+        return []
+
+    def format_emission_data(self, rows):
+        return rows
+
+
+class FakeISO(Counting):
+    def get_iso14001_certifications(self, country=None, limit=100):
+        Counting.calls += 1
+        return [{"company_name": "Someone Else"}]
+
+
+class FakeEEA(Counting):
+    async def get_countries_renewables(self):
+        Counting.calls += 1
+        return [{"country": "Sweden", "renewable_energy_share_2021_proxy": 50.0, "target_2020": 49.0},
+                {"country": "EU-27", "renewable_energy_share_2021_proxy": 22.0}]
+
+    async def get_industrial_pollution(self):
+        Counting.calls += 1
+        return [{"total_n": 10.0}, {"total_n": 12.0}]
+
+
+class FakeEDGAR(Counting):
+    xlsx_path = None
+
+    def get_countries_series(self, countries, pollutants):
+        Counting.calls += 1
+        return {c: {p: [] for p in pollutants} for c in countries}
+
+
+class FakeCAMPD(Counting):
+    def get_emissions_data(self, fid):
+        Counting.calls += 1
+        return [{"co2Mass": 6000000, "so2Mass": 10, "noxMass": 10}]
+
+    def get_compliance_data(self, fid):
+        return [{"compliantIndicator": 0}]
+
+
+@pytest.fixture
+def snapshot(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "CEVS_FEATURES_PATH", str(tmp_path / "country_features.json"))
+    reset_feature_table()
+    monkeypatch.setattr(cevs_aggregator, "_CLIENTS", {"epa": FakeEPA(), "iso": FakeISO(), "eea": FakeEEA(), "edgar": FakeEDGAR(), "campd": FakeCAMPD()})
+    monkeypatch.setattr(cevs_aggregator, "_LAST_GOOD", {})
+    monkeypatch.setattr(cevs_aggregator, "load_best_practices", lambda: [
+        {"country": "Sweden", "scheme": "ISO 14001", "typology": "Reduced inspection frequencies"},
+    ])
+    monkeypatch.setattr(cevs_aggregator, "_record_cevs_audit", lambda *a, **k: None)
+    snap = asyncio.run(create_simulation("Southern Company", company_country="Sweden"))
+    Counting.calls = 0
+    yield snap
+    reset_feature_table()
+
+
+def test_snapshot_reproduces_baseline(snapshot):
+    inputs = snapshot["inputs"]
+    assert inputs["epa_matches"] == 1 and inputs["has_iso"] is False
+    assert inputs["renewables_share"] == 50.0 and inputs["campd_compliant"] is False
+    result = simulate(snapshot["simulation_id"])
+    assert result["score"] == snapshot["baseline"]["score"] and result["delta"] == 0.0
+    assert result["components"] == pytest.approx(snapshot["baseline"]["components"])
+
+
+def test_overrides_rescore_without_upstream_calls(snapshot):
+    sid = snapshot["simulation_id"]
+    iso = simulate(sid, {"has_iso": True})
+    assert iso["components"]["iso_bonus"] == 30.0 and iso["components"]["policy_bonus"] == 1.0
+    assert iso["delta"] == 31.0
+
+    greener = simulate(sid, {"renewables_share_delta": 5})
+    assert greener["components"]["renewables_bonus"] > snapshot["baseline"]["components"]["renewables_bonus"]
+
+    compliant = simulate(sid, {"campd_compliant": True})
+    assert compliant["components"]["campd_penalty"] == -10.0
+    assert Counting.calls == 0
+
+    with pytest.raises(ValueError):
+        simulate(sid, {"made_up": 1})
+
+
+@pytest.mark.parametrize("raw,expected", [(False, False), ("false", False), ("0", False), (" TRUE ", True), ("1", True)])
+def test_flag_overrides_parse_strictly(snapshot, raw, expected):
+    result = simulate(snapshot["simulation_id"], {"has_iso": raw})
+    assert result["overrides"] == {"has_iso": expected}
+    assert (result["components"]["iso_bonus"] > 0) is expected
+
+
+@pytest.mark.parametrize("raw", ["no", "yes", 1, 0, None, [], "maybe"])
+def test_ambiguous_flag_overrides_are_rejected(snapshot, raw):
+    if raw is None:  # null leaves the input as snapshotted
+        assert simulate(snapshot["simulation_id"], {"has_iso": raw})["overrides"] == {}
+        return
+    with pytest.raises(ValueError, match="has_iso"):
+        simulate(snapshot["simulation_id"], {"campd_compliant": True, "has_iso": raw})
+
+
+def test_grid_sweep(snapshot):
+    result = sweep(snapshot["simulation_id"], {"has_iso": [False, True], "renewables_share": [40.0, 50.0, 60.0]})
+    assert result["count"] == 6
+    assert result["best"]["params"] == {"has_iso": True, "renewables_share": 60.0}
+    assert result["worst"]["params"] == {"has_iso": False, "renewables_share": 40.0}
+    by_params = {(p["params"]["has_iso"], p["params"]["renewables_share"]): p["score"] for p in result["points"]}
+    assert by_params[(False, 50.0)] == snapshot["baseline"]["score"]
+    assert Counting.calls == 0
+
+
+def test_simulation_endpoints(snapshot, monkeypatch):
+    monkeypatch.setattr(settings, "CEVS_SIMULATION_MAX_GRID", 4)
+    sid = snapshot["simulation_id"]
+    r = client.post(f"/v1/export/sec/cevs/simulations/{sid}/score", json={"overrides": {"epa_matches": 0}}, headers=headers)
+    assert r.status_code == 200 and r.json()["components"]["epa_penalty"] == 0.0
+    r = client.post(f"/v1/export/sec/cevs/simulations/{sid}/sweep", json={"grid": {"epa_matches": [0, 1, 2, 3, 4]}}, headers=headers)
+    assert r.status_code == 400
+    r = client.post(f"/v1/export/sec/cevs/simulations/{sid}/score", json={"overrides": {"has_iso": "false"}}, headers=headers)
+    assert r.status_code == 200 and r.json()["components"]["iso_bonus"] == 0.0
+    r = client.post(f"/v1/export/sec/cevs/simulations/{sid}/score", json={"overrides": {"has_iso": "nope"}}, headers=headers)
+    assert r.status_code == 400 and "has_iso" in r.json()["detail"]
+    r = client.post(f"/v1/export/sec/cevs/simulations/{sid}/sweep", json={"grid": {"campd_compliant": ["0", "maybe"]}}, headers=headers)
+    assert r.status_code == 400
+    assert client.get("/v1/export/sec/cevs/simulations/nope", headers=headers).status_code == 404